@@ -48,6 +48,11 @@ warnings.filterwarnings('ignore')
 
 # Configuración
 BASE_DIR = Path(__file__).parent
+
+# Exportación sin pickle (Core/artefactos_modelo.py)
+import sys
+sys.path.append(str(BASE_DIR.parent.parent))
+from Core.artefactos_modelo import exportar_junto_a_pickle
 DATASETS_DIR = BASE_DIR / "Datasets"
 MODELOS_DIR = BASE_DIR / "ModeloEntrenamiento"
 MODELOS_DIR.mkdir(exist_ok=True)
@@ -392,6 +397,13 @@ def guardar_modelo_simplificado(modelo, metricas, imputer, scaler, encoders):
         pickle.dump(preprocesadores, f)
     print(f"✅ Preprocesadores guardados: {preprocesadores_path.name}")
     
+    # Exportar modelo + preprocesadores en formato sin pickle (booster .ubj + manifest)
+    ruta_export = exportar_junto_a_pickle(
+        {'modelo': modelo, 'preprocesadores': preprocesadores}, modelo_path, 'control_glucemico'
+    )
+    if ruta_export:
+        print(f"✅ Modelo exportado: {ruta_export.parent.name}")
+    
     # Guardar métricas
     metricas_path = MODELOS_DIR / f"metricas_simplificado_{timestamp}.json"
     import json
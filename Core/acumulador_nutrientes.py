@@ -0,0 +1,138 @@
+# acumulador_nutrientes.py
+# Totales nutricionales de un día y de sus comidas mantenidos de forma incremental
+#
+# El optimizador ajusta el plan alimento por alimento (escala una porción, agrega
+# o quita un alimento) y después de cada ajuste necesita el cumplimiento del día.
+# En lugar de volver a sumar todos los alimentos de todas las comidas, el
+# acumulador guarda los totales de kcal/CHO/PRO/FAT/fibra por comida y del día, y
+# cada cambio los actualiza en O(1) con la diferencia de los valores del alimento.
+
+from contextlib import nullcontext
+from typing import Dict, Iterable, Optional
+
+from Core.plan_compacto import NUTRIENTES, Porcion, es_comida
+
+
+def valores_alimento(alimento) -> list:
+    """Nutrientes de un alimento (Porcion o dict) en el orden de NUTRIENTES (0 si faltan)"""
+    if type(alimento) is Porcion:
+        return [alimento.kcal, alimento.cho, alimento.pro, alimento.fat, alimento.fibra or 0.0]
+    get = alimento.get
+    return [float(get('kcal', 0) or 0), float(get('cho', 0) or 0), float(get('pro', 0) or 0),
+            float(get('fat', 0) or 0), float(get('fibra', 0) or 0)]
+
+
+def copiar_dia(dia: Dict) -> Dict:
+    """
+    Copia de un día para modificarlo sin afectar el original. Copia las comidas,
+    sus listas de alimentos y cada alimento (Porcion o dict, solo valores simples);
+    es bastante más barata que copy.deepcopy y suficiente para los ajustes del
+    optimizador, que no modifican estructuras anidadas dentro de los alimentos.
+    """
+    copia = {}
+    for tiempo, comida in dia.items():
+        if es_comida(tiempo, comida):
+            comida = dict(comida)
+            comida['alimentos'] = [alimento.copy() for alimento in comida['alimentos']]
+        copia[tiempo] = comida
+    return copia
+
+
+class AcumuladorDia:
+    """Totales por comida y del día, actualizados con cada cambio de alimento"""
+
+    __slots__ = ('comidas', 'totales')
+
+    def __init__(self):
+        self.comidas: Dict[str, list] = {}
+        self.totales = [0.0] * len(NUTRIENTES)
+
+    @classmethod
+    def desde_dia(cls, dia: Dict) -> 'AcumuladorDia':
+        """Construye el acumulador sumando una vez los alimentos del día"""
+        acumulador = cls()
+        for tiempo, comida in dia.items():
+            if es_comida(tiempo, comida):
+                kcal = cho = pro = fat = fibra = 0.0
+                for alimento in comida['alimentos']:
+                    if type(alimento) is Porcion:
+                        kcal += alimento.kcal
+                        cho += alimento.cho
+                        pro += alimento.pro
+                        fat += alimento.fat
+                        fibra += alimento.fibra or 0.0
+                        continue
+                    get = alimento.get
+                    kcal += float(get('kcal', 0) or 0)
+                    cho += float(get('cho', 0) or 0)
+                    pro += float(get('pro', 0) or 0)
+                    fat += float(get('fat', 0) or 0)
+                    fibra += float(get('fibra', 0) or 0)
+                acumulador._sumar(tiempo, (kcal, cho, pro, fat, fibra))
+        return acumulador
+
+    @classmethod
+    def desde_totales_comidas(cls, comidas: Dict) -> 'AcumuladorDia':
+        """Construye el acumulador con los totales ya calculados de cada comida (kcal_total, ...)"""
+        acumulador = cls()
+        for tiempo, comida in comidas.items():
+            if es_comida(tiempo, comida):
+                acumulador._sumar(tiempo, [float(comida.get(f"{m}_total", 0) or 0) for m in NUTRIENTES])
+        return acumulador
+
+    def copiar(self) -> 'AcumuladorDia':
+        copia = AcumuladorDia()
+        copia.comidas = {tiempo: list(totales) for tiempo, totales in self.comidas.items()}
+        copia.totales = list(self.totales)
+        return copia
+
+    def _sumar(self, tiempo: str, valores: Iterable[float]) -> None:
+        comida = self.comidas.setdefault(tiempo, [0.0] * len(NUTRIENTES))
+        for i, valor in enumerate(valores):
+            comida[i] += valor
+            self.totales[i] += valor
+
+    def agregar(self, tiempo: str, alimento: Dict) -> None:
+        self._sumar(tiempo, valores_alimento(alimento))
+
+    def quitar(self, tiempo: str, alimento: Dict) -> None:
+        self._sumar(tiempo, [-v for v in valores_alimento(alimento)])
+
+    def cambio(self, tiempo: str, alimento: Dict) -> '_Cambio':
+        """
+        Registra un cambio en el lugar de un alimento (p. ej. escalar su porción):
+            with acumulador.cambio('alm', alimento):
+                alimento['kcal'] = ...
+        """
+        return _Cambio(self, tiempo, alimento)
+
+    def totales_comida(self, tiempo: str) -> Dict[str, float]:
+        return dict(zip(NUTRIENTES, self.comidas.get(tiempo, [0.0] * len(NUTRIENTES))))
+
+    def totales_dia(self) -> Dict[str, float]:
+        return dict(zip(NUTRIENTES, self.totales))
+
+
+class _Cambio:
+    """Contexto de AcumuladorDia.cambio: suma la diferencia de nutrientes al salir"""
+
+    __slots__ = ('acumulador', 'tiempo', 'alimento', 'antes')
+
+    def __init__(self, acumulador: AcumuladorDia, tiempo: str, alimento: Dict):
+        self.acumulador = acumulador
+        self.tiempo = tiempo
+        self.alimento = alimento
+
+    def __enter__(self) -> Dict:
+        self.antes = valores_alimento(self.alimento)
+        return self.alimento
+
+    def __exit__(self, *exc) -> bool:
+        despues = valores_alimento(self.alimento)
+        self.acumulador._sumar(self.tiempo, [d - a for a, d in zip(self.antes, despues)])
+        return False
+
+
+def registrar_cambio(acumulador: Optional[AcumuladorDia], tiempo: str, alimento: Dict):
+    """acumulador.cambio(...) o un contexto vacío si no hay acumulador"""
+    return acumulador.cambio(tiempo, alimento) if acumulador is not None else nullcontext(alimento)
@@ -0,0 +1,337 @@
+# arboles_compilados.py
+# Evaluador NumPy de ensembles de árboles compilados (Modelo 3: XGBoost + RandomForest)
+#
+# compilar_*() aplana todos los árboles en arreglos contiguos (característica,
+# umbral, primer hijo, valor, dirección de faltantes) y BosqueCompilado.predict()
+# recorre todos los árboles para todas las filas a la vez: cada iteración avanza
+# un nivel de profundidad con operaciones vectorizadas, sin pasar por
+# sklearn/XGBoost (ni por joblib, pandas o la conversión a DMatrix).
+#
+# Convenciones para que un solo evaluador sirva a ambas librerías:
+#   - todas las divisiones son "x < umbral" (el "x <= t" de sklearn se convierte
+#     en "x < siguiente_flotante(t)"), con X convertida a float32 igual que ambas
+#     librerías al predecir,
+#   - los nodos se renumeran en anchura para que el hijo derecho sea siempre
+#     hijo izquierdo + 1 (siguiente nodo = hijo[nodo] + no_ir_a_la_izquierda),
+#   - las hojas apuntan a sí mismas con umbral +inf, así las filas que ya
+#     llegaron a una hoja no se mueven en las iteraciones restantes,
+#   - los árboles se ordenan de mayor a menor profundidad y cada iteración solo
+#     avanza los que todavía pueden bajar (los de XGBoost, menos profundos,
+#     terminan antes que los del RandomForest),
+#   - la predicción es sesgo + suma de hojas; el promedio del RandomForest y el
+#     promedio del ensemble se pliegan en los valores de las hojas y el sesgo.
+
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Objetivos de XGBoost cuya predicción es el margen sin transformar
+OBJETIVOS_IDENTIDAD = ('reg:squarederror', 'reg:linear', 'reg:absoluteerror', 'reg:pseudohubererror')
+
+# Filas por bloque al evaluar lotes grandes (mantiene la matriz de nodos en caché)
+CELDAS_POR_BLOQUE = 1 << 15
+
+
+class BosqueCompilado:
+    """Conjunto de árboles aplanado: predicción = sesgo + suma de los valores de hoja"""
+
+    CAMPOS = ('caracteristica', 'umbral', 'hijo', 'valor', 'faltante_izquierda', 'raices', 'profundidades')
+
+    def __init__(self, caracteristica, umbral, hijo, valor, faltante_izquierda, raices, profundidades,
+                 sesgo: float = 0.0, n_features: Optional[int] = None):
+        self.caracteristica = np.asarray(caracteristica, dtype=np.intp)
+        self.umbral = np.asarray(umbral, dtype=np.float64)
+        self.hijo = np.asarray(hijo, dtype=np.intp)
+        self.valor = np.asarray(valor, dtype=np.float64)
+        self.faltante_izquierda = np.asarray(faltante_izquierda, dtype=bool)
+        self.raices = np.asarray(raices, dtype=np.intp)
+        self.profundidades = np.asarray(profundidades, dtype=np.int64)
+        self.sesgo = float(sesgo)
+        self.n_features = None if n_features is None else int(n_features)
+        # Árboles activos en cada nivel (ordenados de mayor a menor profundidad)
+        self._activos = [int(np.count_nonzero(self.profundidades > nivel)) for nivel in range(self.profundidad)]
+
+    @property
+    def n_arboles(self) -> int:
+        return len(self.raices)
+
+    @property
+    def n_nodos(self) -> int:
+        return len(self.valor)
+
+    @property
+    def profundidad(self) -> int:
+        return int(self.profundidades.max()) if len(self.profundidades) else 0
+
+    def _hojas(self, X: np.ndarray) -> np.ndarray:
+        """Índice de la hoja alcanzada por cada fila en cada árbol (n x n_arboles)"""
+        n, n_features = X.shape
+        plano = X.ravel()
+        desplazamiento = (np.arange(n, dtype=np.intp) * n_features)[:, None]
+        hay_faltantes = bool(np.isnan(plano).any())
+        nodo = np.tile(self.raices, (n, 1))
+        for activos in self._activos:
+            actual = nodo[:, :activos]
+            x = plano.take(desplazamiento + self.caracteristica.take(actual))
+            derecha = ~(x < self.umbral.take(actual))
+            if hay_faltantes:
+                faltante = np.isnan(x)
+                derecha[faltante] = ~self.faltante_izquierda.take(actual[faltante])
+            nodo[:, :activos] = self.hijo.take(actual) + derecha
+        return nodo
+
+    def predict(self, X) -> np.ndarray:
+        """Predicción vectorizada para todas las filas de X (n x n_features)"""
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32), dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n = X.shape[0]
+        salida = np.empty(n, dtype=np.float64)
+        bloque = max(1, CELDAS_POR_BLOQUE // max(1, self.n_arboles))
+        for inicio in range(0, n, bloque):
+            hojas = self._hojas(X[inicio:inicio + bloque])
+            salida[inicio:inicio + len(hojas)] = self.valor.take(hojas).sum(axis=1)
+        return self.sesgo + salida
+
+    def a_arreglos(self) -> Dict[str, np.ndarray]:
+        """Arreglos para guardar en .npy (ver artefactos_modelo)"""
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+
+    def metadatos(self) -> Dict:
+        return {'sesgo': self.sesgo, 'n_features': self.n_features}
+
+    @classmethod
+    def desde_arreglos(cls, arreglos: Dict[str, np.ndarray], metadatos: Dict) -> 'BosqueCompilado':
+        return cls(**{campo: arreglos[campo] for campo in cls.CAMPOS}, **metadatos)
+
+
+class _Acumulador:
+    """Reúne árboles (hijos -1 = hoja) y los concatena en el formato de BosqueCompilado"""
+
+    def __init__(self):
+        self.arboles: List[Dict[str, np.ndarray]] = []
+
+    def agregar(self, caracteristica, umbral, izquierda, derecha, valor, faltante_izquierda, profundidad: int):
+        izquierda = np.asarray(izquierda, dtype=np.int64)
+        derecha = np.asarray(derecha, dtype=np.int64)
+        # Orden en anchura: los dos hijos de cada nodo quedan contiguos
+        orden = [0]
+        for nodo in orden:
+            if izquierda[nodo] >= 0:
+                orden.extend((int(izquierda[nodo]), int(derecha[nodo])))
+        orden = np.asarray(orden, dtype=np.int64)
+        nuevo = np.empty(len(izquierda), dtype=np.int64)
+        nuevo[orden] = np.arange(len(orden))
+
+        hoja = izquierda[orden] < 0
+        self.arboles.append({
+            'caracteristica': np.where(hoja, 0, np.asarray(caracteristica)[orden]),
+            'umbral': np.where(hoja, np.inf, np.asarray(umbral, dtype=np.float64)[orden]),
+            # Las hojas apuntan a sí mismas (umbral +inf: siempre "izquierda")
+            'hijo': np.where(hoja, np.arange(len(orden)), nuevo[np.maximum(izquierda[orden], 0)]),
+            'valor': np.where(hoja, np.asarray(valor, dtype=np.float64)[orden], 0.0),
+            'faltante_izquierda': np.where(hoja, True, np.asarray(faltante_izquierda, dtype=bool)[orden]),
+            'profundidad': int(profundidad),
+        })
+
+    def construir(self, sesgo: float, n_features: Optional[int]) -> BosqueCompilado:
+        arboles = sorted(self.arboles, key=lambda a: -a['profundidad'])
+        tamanos = np.array([len(a['valor']) for a in arboles], dtype=np.int64)
+        raices = np.concatenate(([0], np.cumsum(tamanos)[:-1]))
+        return BosqueCompilado(
+            caracteristica=np.concatenate([a['caracteristica'] for a in arboles]),
+            umbral=np.concatenate([a['umbral'] for a in arboles]),
+            hijo=np.concatenate([a['hijo'] + raiz for a, raiz in zip(arboles, raices)]),
+            valor=np.concatenate([a['valor'] for a in arboles]),
+            faltante_izquierda=np.concatenate([a['faltante_izquierda'] for a in arboles]),
+            raices=raices,
+            profundidades=[a['profundidad'] for a in arboles],
+            sesgo=sesgo,
+            n_features=n_features,
+        )
+
+
+def _profundidad(izquierda: np.ndarray, derecha: np.ndarray) -> int:
+    """Profundidad máxima de un árbol dado por sus hijos (-1 = hoja), raíz en 0"""
+    profundidad = np.zeros(len(izquierda), dtype=np.int64)
+    for i in range(len(izquierda)):  # los hijos siempre tienen índice mayor que el padre
+        for hijo in (izquierda[i], derecha[i]):
+            if hijo >= 0:
+                profundidad[hijo] = profundidad[i] + 1
+    return int(profundidad.max()) if len(profundidad) else 0
+
+
+def _base_score(texto) -> float:
+    # XGBoost >= 2 guarda base_score como "[5E-1]"
+    return float(str(texto).strip('[]').split(',')[0])
+
+
+def _agregar_xgboost(modelo, peso: float, acumulador: _Acumulador) -> Optional[float]:
+    """
+    Agrega los árboles de un XGBRegressor/Booster (gbtree, una salida, objetivo de
+    regresión sin transformación). Devuelve el sesgo ponderado o None si no es compatible.
+    """
+    booster = modelo.get_booster() if hasattr(modelo, 'get_booster') else modelo
+    config = json.loads(booster.save_raw(raw_format='json'))
+    learner = config['learner']
+    objetivo = learner.get('objective', {}).get('name', '')
+    gradient_booster = learner['gradient_booster']
+    parametros = learner.get('learner_model_param', {})
+    if (gradient_booster.get('name') != 'gbtree' or objetivo not in OBJETIVOS_IDENTIDAD
+            or int(parametros.get('num_target', 1) or 1) != 1 or int(parametros.get('num_class', 0) or 0) > 1):
+        print(f"[WARN]  XGBoost no compilable (booster={gradient_booster.get('name')}, objetivo={objetivo})")
+        return None
+
+    arboles = gradient_booster['model']['trees']
+    if any(any(arbol.get('split_type', [])) for arbol in arboles):
+        print("[WARN]  XGBoost con divisiones categóricas no compilable")
+        return None
+    # Con early stopping el wrapper sklearn predice hasta best_iteration
+    try:
+        limite = modelo.best_iteration if hasattr(modelo, 'get_booster') else None
+    except AttributeError:
+        limite = None
+    if limite is not None:
+        arboles = arboles[:int(limite) + 1]
+    for arbol in arboles:
+        izquierda = np.asarray(arbol['left_children'], dtype=np.int64)
+        derecha = np.asarray(arbol['right_children'], dtype=np.int64)
+        condiciones = np.asarray(arbol['split_conditions'], dtype=np.float32).astype(np.float64)
+        acumulador.agregar(
+            caracteristica=np.asarray(arbol['split_indices'], dtype=np.int64),
+            umbral=condiciones,
+            izquierda=izquierda,
+            derecha=derecha,
+            valor=condiciones * peso,  # en las hojas split_conditions guarda el valor de la hoja
+            faltante_izquierda=np.asarray(arbol['default_left'], dtype=bool),
+            profundidad=_profundidad(izquierda, derecha),
+        )
+    return _base_score(parametros.get('base_score', 0.5)) * peso
+
+
+def _agregar_random_forest(modelo, peso: float, acumulador: _Acumulador) -> bool:
+    """Agrega los árboles de un RandomForestRegressor/ExtraTreesRegressor de sklearn (una salida)"""
+    estimadores = getattr(modelo, 'estimators_', None)
+    if not estimadores or getattr(modelo, 'n_outputs_', 1) != 1:
+        return False
+    peso_arbol = peso / len(estimadores)
+    for estimador in estimadores:
+        arbol = estimador.tree_
+        izquierda = np.asarray(arbol.children_left, dtype=np.int64)
+        derecha = np.asarray(arbol.children_right, dtype=np.int64)
+        faltante = getattr(arbol, 'missing_go_to_left', None)
+        acumulador.agregar(
+            caracteristica=np.asarray(arbol.feature, dtype=np.int64),
+            # x <= t  <=>  x < siguiente flotante de t
+            umbral=np.nextafter(np.asarray(arbol.threshold, dtype=np.float64), np.inf),
+            izquierda=izquierda,
+            derecha=derecha,
+            valor=np.asarray(arbol.value, dtype=np.float64).reshape(len(izquierda), -1)[:, 0] * peso_arbol,
+            faltante_izquierda=(np.asarray(faltante, dtype=bool) if faltante is not None
+                                else np.zeros(len(izquierda), dtype=bool)),
+            profundidad=int(arbol.max_depth),
+        )
+    return True
+
+
+def _agregar_compilado(bosque: BosqueCompilado, peso: float, acumulador: _Acumulador) -> float:
+    """Reincorpora los árboles de un bosque ya compilado (artefacto exportado)"""
+    fines = list(bosque.raices[1:]) + [bosque.n_nodos]
+    for raiz, fin, profundidad in zip(bosque.raices, fines, bosque.profundidades):
+        rango = slice(raiz, fin)
+        hoja = bosque.hijo[rango] == np.arange(raiz, fin)
+        izquierda = np.where(hoja, -1, bosque.hijo[rango] - raiz)
+        acumulador.agregar(
+            caracteristica=bosque.caracteristica[rango],
+            umbral=bosque.umbral[rango],
+            izquierda=izquierda,
+            derecha=np.where(hoja, -1, izquierda + 1),
+            valor=bosque.valor[rango] * peso,
+            faltante_izquierda=bosque.faltante_izquierda[rango],
+            profundidad=profundidad,
+        )
+    return bosque.sesgo * peso
+
+
+def _es_xgboost(modelo) -> bool:
+    return hasattr(modelo, 'get_booster') or type(modelo).__name__ == 'Booster'
+
+
+def compilar_ensemble(estimadores: List) -> Optional[BosqueCompilado]:
+    """
+    Compila el promedio de varios estimadores (p. ej. Modelo 3: xgb + rf) en un
+    solo bosque: cada estimador aporta sus hojas y su sesgo con peso 1/k.
+    Devuelve None si alguno no es compilable.
+    """
+    estimadores = [e for e in estimadores if e is not None]
+    if not estimadores:
+        return None
+    acumulador = _Acumulador()
+    peso = 1.0 / len(estimadores)
+    sesgo = 0.0
+    n_features = None
+    for estimador in estimadores:
+        if isinstance(estimador, BosqueCompilado):
+            sesgo += _agregar_compilado(estimador, peso, acumulador)
+        elif _es_xgboost(estimador):
+            sesgo_xgb = _agregar_xgboost(estimador, peso, acumulador)
+            if sesgo_xgb is None:
+                return None
+            sesgo += sesgo_xgb
+        elif not _agregar_random_forest(estimador, peso, acumulador):
+            return None
+        n_features = n_features or getattr(estimador, 'n_features_in_', None) or getattr(estimador, 'n_features', None)
+    return acumulador.construir(sesgo, n_features)
+
+
+def compilar_xgboost(modelo) -> Optional[BosqueCompilado]:
+    return compilar_ensemble([modelo])
+
+
+def compilar_random_forest(modelo) -> Optional[BosqueCompilado]:
+    return compilar_ensemble([modelo])
+
+
+class ModeloCombinacionesCompilado:
+    """Modelo 3 completo en NumPy: estandarización del scaler + ensemble compilado"""
+
+    def __init__(self, media: Optional[np.ndarray], escala: Optional[np.ndarray], bosque: BosqueCompilado,
+                 feature_columns: List[str]):
+        self.media = None if media is None else np.asarray(media, dtype=np.float64)
+        self.escala = None if escala is None else np.asarray(escala, dtype=np.float64)
+        self.bosque = bosque
+        self.feature_columns = list(feature_columns)
+
+    def predecir(self, X_crudo) -> np.ndarray:
+        """X sin escalar (columnas en el orden de feature_columns) -> score del ensemble"""
+        X = np.asarray(X_crudo, dtype=np.float64)
+        if self.media is not None:
+            X = X - self.media
+        if self.escala is not None:
+            X = X / self.escala
+        return self.bosque.predict(X)
+
+
+def compilar_modelo_combinaciones(modelo_completo: Dict) -> Optional[ModeloCombinacionesCompilado]:
+    """Compila el diccionario del Modelo 3 (modelos xgb/rf o 'ensemble' + scaler + feature_columns)"""
+    if not isinstance(modelo_completo, dict):
+        return None
+    modelos = modelo_completo.get('modelos') or {}
+    scaler = modelo_completo.get('scaler')
+    feature_columns = modelo_completo.get('feature_columns') or []
+    if scaler is None or not feature_columns or not isinstance(modelos, dict):
+        return None
+    if modelos.get('ensemble') is not None:
+        estimadores = [modelos['ensemble']]
+    else:
+        estimadores = [modelos[k] for k in ('xgb', 'rf') if modelos.get(k) is not None]
+    try:
+        bosque = compilar_ensemble(estimadores)
+    except Exception as e:
+        print(f"[WARN]  No se pudo compilar el ensemble del Modelo 3: {e}")
+        return None
+    if bosque is None:
+        return None
+    return ModeloCombinacionesCompilado(getattr(scaler, 'mean_', None), getattr(scaler, 'scale_', None),
+                                        bosque, feature_columns)
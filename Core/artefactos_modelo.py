@@ -0,0 +1,350 @@
+# artefactos_modelo.py
+# Formato de artefactos de modelos sin pickle (exportación y carga)
+#
+# Un modelo exportado es un directorio con el mismo nombre que su .pkl (sin la
+# extensión) que contiene:
+#   - manifest.json: estructura del objeto original (dict con modelos, scaler,
+#     feature_columns, ...) con referencias a los archivos de abajo
+#   - *.ubj: boosters XGBoost en su formato binario nativo (UBJSON)
+#   - *.npy: parámetros numéricos (media/escala del StandardScaler, estadísticas
+#     del SimpleImputer); se abren con np.load(mmap_mode='r') para que los
+#     workers compartan las páginas del archivo en lugar de copiarlas al heap
+#   - bosques de regresión de scikit-learn (el RandomForest del Modelo 3):
+#     árboles compilados a arreglos .npy (ver Core/arboles_compilados.py), que
+#     se cargan como BosqueCompilado con la misma interfaz predict()
+#   - *.pkl: solo para estimadores sin formato nativo, que siguen
+#     serializándose con pickle
+#
+# cargar_exportado() reconstruye un objeto con la misma interfaz que el pickle
+# (transform, predict, predict_proba, feature_names_in_), así que el motor de
+# recomendación no distingue el formato. El manifest se escribe al final y de
+# forma atómica, por lo que su presencia indica que la exportación terminó; guarda
+# el sha1 del .pkl de origen para descartar exportaciones de un pickle anterior.
+
+import os
+import json
+import pickle
+import hashlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+ARCHIVO_MANIFIESTO = "manifest.json"
+VERSION_FORMATO = 1
+
+
+# ---------- Preprocesadores reconstruidos (solo NumPy) ----------
+
+class EscaladorEstandar:
+    """Equivalente de StandardScaler.transform a partir de media, escala y with_mean/with_std"""
+
+    def __init__(self, media: Optional[np.ndarray], escala: Optional[np.ndarray],
+                 feature_names_in: Optional[List[str]] = None, con_media: bool = True,
+                 con_escala: bool = True):
+        self.mean_ = media
+        self.scale_ = escala
+        # StandardScaler calcula mean_ aunque with_mean=False, pero no la resta
+        self.with_mean = con_media
+        self.with_std = con_escala
+        if feature_names_in is not None:
+            self.feature_names_in_ = np.asarray(feature_names_in, dtype=object)
+        self.n_features_in_ = len(media) if media is not None else (len(escala) if escala is not None else None)
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.with_mean and self.mean_ is not None:
+            X = X - self.mean_
+        if self.with_std and self.scale_ is not None:
+            X = X / self.scale_
+        return X
+
+
+class ImputadorSimple:
+    """Equivalente de SimpleImputer.transform: reemplaza NaN por la estadística de la columna"""
+
+    def __init__(self, estadisticas: np.ndarray, conservar_vacias: bool = False,
+                 feature_names_in: Optional[List[str]] = None):
+        self.statistics_ = estadisticas
+        self.keep_empty_features = conservar_vacias
+        if feature_names_in is not None:
+            self.feature_names_in_ = np.asarray(feature_names_in, dtype=object)
+        # SimpleImputer descarta las columnas sin estadística (todas NaN en el entrenamiento)
+        self._columnas = None if conservar_vacias else ~np.isnan(estadisticas)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)  # copia: no modificar la entrada
+        faltantes = np.isnan(X)
+        if faltantes.any():
+            X[faltantes] = np.broadcast_to(self.statistics_, X.shape)[faltantes]
+        if self._columnas is not None and not self._columnas.all():
+            X = X[:, self._columnas]
+        return X
+
+
+class CodificadorEtiquetas:
+    """Equivalente de LabelEncoder.transform a partir de classes_"""
+
+    def __init__(self, clases: List[Any]):
+        self.classes_ = np.asarray(clases)
+        self._indice = {c: i for i, c in enumerate(clases)}
+
+    def transform(self, valores):
+        try:
+            return np.array([self._indice[v] for v in valores], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"y contiene etiquetas no vistas: {e}")
+
+
+# ---------- Exportación ----------
+
+def _es_xgboost(objeto) -> bool:
+    try:
+        import xgboost as xgb
+    except ImportError:
+        return False
+    return isinstance(objeto, (xgb.XGBModel, xgb.Booster))
+
+
+def _nombre_clase(objeto) -> str:
+    return type(objeto).__name__
+
+
+class _Exportador:
+    def __init__(self, directorio: Path):
+        self.directorio = directorio
+        self.archivos: List[str] = []
+
+    def _archivo(self, ruta_clave: str, extension: str) -> str:
+        nombre = f"{ruta_clave or 'objeto'}.{extension}"
+        self.archivos.append(nombre)
+        return nombre
+
+    def _npy(self, ruta_clave: str, arreglo, dtype=np.float64) -> Optional[str]:
+        if arreglo is None:
+            return None
+        nombre = self._archivo(ruta_clave, "npy")
+        np.save(self.directorio / nombre, np.asarray(arreglo, dtype=dtype), allow_pickle=False)
+        return nombre
+
+    def nodo(self, objeto, ruta_clave: str) -> Dict:
+        """Convierte un objeto en un nodo del manifest (escribiendo sus archivos)"""
+        if isinstance(objeto, dict):
+            return {'tipo': 'dict', 'valores': {
+                str(k): self.nodo(v, f"{ruta_clave}.{k}" if ruta_clave else str(k)) for k, v in objeto.items()
+            }}
+
+        if _es_xgboost(objeto):
+            nombre = self._archivo(ruta_clave, "ubj")
+            objeto.save_model(str(self.directorio / nombre))
+            return {'tipo': 'xgboost', 'clase': _nombre_clase(objeto), 'archivo': nombre}
+
+        clase = _nombre_clase(objeto)
+        nombres = getattr(objeto, 'feature_names_in_', None)
+        nombres = [str(n) for n in nombres] if nombres is not None else None
+
+        if clase == 'StandardScaler':
+            return {
+                'tipo': 'standard_scaler',
+                'media': self._npy(f"{ruta_clave}.mean", getattr(objeto, 'mean_', None)),
+                'escala': self._npy(f"{ruta_clave}.scale", getattr(objeto, 'scale_', None)),
+                'con_media': bool(getattr(objeto, 'with_mean', True)),
+                'con_escala': bool(getattr(objeto, 'with_std', True)),
+                'feature_names_in': nombres,
+            }
+        if clase == 'SimpleImputer' and getattr(objeto, 'strategy', None) in ('mean', 'median', 'most_frequent', 'constant'):
+            return {
+                'tipo': 'simple_imputer',
+                'estadisticas': self._npy(f"{ruta_clave}.statistics", objeto.statistics_),
+                'conservar_vacias': bool(getattr(objeto, 'keep_empty_features', False)),
+                'feature_names_in': nombres,
+            }
+        if clase in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+            from Core.arboles_compilados import compilar_random_forest
+            bosque = compilar_random_forest(objeto)
+            if bosque is not None:
+                return {
+                    'tipo': 'bosque_compilado',
+                    'clase': clase,
+                    'arreglos': {campo: self._npy(f"{ruta_clave}.{campo}", arreglo, arreglo.dtype)
+                                 for campo, arreglo in bosque.a_arreglos().items()},
+                    'metadatos': bosque.metadatos(),
+                }
+        if clase == 'LabelEncoder':
+            return {'tipo': 'label_encoder', 'clases': [c.item() if hasattr(c, 'item') else c for c in objeto.classes_]}
+
+        if objeto is None or isinstance(objeto, (str, bool, int, float)):
+            return {'tipo': 'json', 'valor': objeto}
+        if isinstance(objeto, (list, tuple)) and all(isinstance(v, (str, bool, int, float, type(None))) for v in objeto):
+            return {'tipo': 'json', 'valor': list(objeto)}
+        if isinstance(objeto, (np.floating, np.integer)):
+            return {'tipo': 'json', 'valor': objeto.item()}
+
+        # Sin formato nativo: se conserva con pickle
+        nombre = self._archivo(ruta_clave, "pkl")
+        with open(self.directorio / nombre, 'wb') as f:
+            pickle.dump(objeto, f)
+        print(f"[WARN]  Exportación: '{ruta_clave}' ({clase}) sin formato nativo, se guarda como pickle")
+        return {'tipo': 'pickle', 'clase': clase, 'archivo': nombre}
+
+
+def directorio_exportado(ruta_pickle) -> Path:
+    """Directorio del artefacto exportado correspondiente a un .pkl"""
+    ruta_pickle = Path(ruta_pickle)
+    return ruta_pickle.with_suffix('')
+
+
+_cache_sha1: Dict[tuple, str] = {}
+
+
+def sha1_archivo(ruta) -> str:
+    """sha1 del contenido (cacheado por ruta, tamaño y fecha de modificación)"""
+    ruta = Path(ruta)
+    stat = ruta.stat()
+    clave = (str(ruta), stat.st_size, stat.st_mtime_ns)
+    valor = _cache_sha1.get(clave)
+    if valor is None:
+        h = hashlib.sha1()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloque)
+        valor = _cache_sha1[clave] = h.hexdigest()
+    return valor
+
+
+def exportar_modelo(objeto: Any, directorio, nombre: str = "", extras: Dict = None,
+                    origen=None) -> Path:
+    """
+    Exporta un objeto de modelo (dict con estimadores, scaler, feature_columns...)
+    al formato sin pickle. Devuelve la ruta del manifest.
+
+    Args:
+        origen: .pkl del que proviene; se guarda su sha1 para saber si la
+                exportación sigue vigente cuando el pickle se reemplaza
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    exportador = _Exportador(directorio)
+    raiz = exportador.nodo(objeto, "")
+
+    manifest = {
+        'formato': VERSION_FORMATO,
+        'nombre': nombre or directorio.name,
+        'creado_en': datetime.now().isoformat(timespec='seconds'),
+        'archivos': exportador.archivos,
+        'raiz': raiz,
+    }
+    if origen is not None and Path(origen).exists():
+        manifest['origen'] = {'archivo': Path(origen).name, 'sha1': sha1_archivo(origen)}
+    if extras:
+        manifest['extras'] = extras
+
+    # Escritura atómica: el manifest solo aparece cuando todo lo demás está en disco
+    ruta = directorio / ARCHIVO_MANIFIESTO
+    temporal = directorio / f".{ARCHIVO_MANIFIESTO}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
+    print(f"[OK] Modelo exportado en {directorio} ({len(exportador.archivos)} archivos)")
+    return ruta
+
+
+def exportar_junto_a_pickle(objeto: Any, ruta_pickle, nombre: str = "") -> Optional[Path]:
+    """Exporta el objeto al directorio hermano del .pkl; los errores no interrumpen el entrenamiento"""
+    try:
+        return exportar_modelo(objeto, directorio_exportado(ruta_pickle), nombre, origen=ruta_pickle)
+    except Exception as e:
+        print(f"[WARN]  No se pudo exportar {ruta_pickle} al formato sin pickle: {e}")
+        return None
+
+
+# ---------- Carga ----------
+
+def _cargar_npy(directorio: Path, nombre: Optional[str], mmap: bool):
+    if nombre is None:
+        return None
+    return np.load(directorio / nombre, mmap_mode='r' if mmap else None, allow_pickle=False)
+
+
+def _cargar_xgboost(ruta: Path, clase: str):
+    import xgboost as xgb
+    if clase == 'Booster':
+        booster = xgb.Booster()
+        booster.load_model(str(ruta))
+        return booster
+    modelo = getattr(xgb, clase, xgb.XGBModel)()
+    modelo.load_model(str(ruta))
+    return modelo
+
+
+def _cargar_nodo(nodo: Dict, directorio: Path, mmap: bool):
+    tipo = nodo['tipo']
+    if tipo == 'dict':
+        return {k: _cargar_nodo(v, directorio, mmap) for k, v in nodo['valores'].items()}
+    if tipo == 'json':
+        return nodo['valor']
+    if tipo == 'xgboost':
+        return _cargar_xgboost(directorio / nodo['archivo'], nodo['clase'])
+    if tipo == 'standard_scaler':
+        return EscaladorEstandar(_cargar_npy(directorio, nodo['media'], mmap),
+                                 _cargar_npy(directorio, nodo['escala'], mmap),
+                                 nodo.get('feature_names_in'),
+                                 nodo.get('con_media', True),
+                                 nodo.get('con_escala', True))
+    if tipo == 'simple_imputer':
+        return ImputadorSimple(_cargar_npy(directorio, nodo['estadisticas'], mmap),
+                               nodo.get('conservar_vacias', False),
+                               nodo.get('feature_names_in'))
+    if tipo == 'label_encoder':
+        return CodificadorEtiquetas(nodo['clases'])
+    if tipo == 'bosque_compilado':
+        from Core.arboles_compilados import BosqueCompilado
+        arreglos = {campo: _cargar_npy(directorio, archivo, mmap) for campo, archivo in nodo['arreglos'].items()}
+        return BosqueCompilado.desde_arreglos(arreglos, nodo['metadatos'])
+    if tipo == 'pickle':
+        with open(directorio / nodo['archivo'], 'rb') as f:
+            return pickle.load(f)
+    raise ValueError(f"Tipo de nodo desconocido en el manifest: {tipo}")
+
+
+def leer_manifest(ruta_manifest) -> Dict:
+    with open(ruta_manifest, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('formato') != VERSION_FORMATO:
+        raise ValueError(f"Formato de artefacto no soportado: {manifest.get('formato')}")
+    return manifest
+
+
+def cargar_exportado(ruta_manifest, mmap: bool = True) -> Any:
+    """Reconstruye el objeto exportado a partir de su manifest"""
+    ruta_manifest = Path(ruta_manifest)
+    manifest = leer_manifest(ruta_manifest)
+    return _cargar_nodo(manifest['raiz'], ruta_manifest.parent, mmap)
+
+
+def es_manifest(ruta) -> bool:
+    return Path(ruta).name == ARCHIVO_MANIFIESTO
+
+
+def manifest_vigente(ruta_pickle) -> Optional[Path]:
+    """
+    Manifest exportado para un .pkl si existe y corresponde al pickle actual
+    (un reentrenamiento que solo escribió el pickle invalida la exportación).
+    MODELOS_FORMATO=pickle fuerza el uso de los pickles.
+    """
+    if os.getenv("MODELOS_FORMATO", "auto") == "pickle":
+        return None
+    ruta_pickle = Path(ruta_pickle)
+    manifest = directorio_exportado(ruta_pickle) / ARCHIVO_MANIFIESTO
+    if not manifest.exists():
+        return None
+    if not ruta_pickle.exists():
+        return manifest
+    try:
+        origen = leer_manifest(manifest).get('origen') or {}
+        if origen.get('sha1') == sha1_archivo(ruta_pickle):
+            return manifest
+    except (OSError, ValueError) as e:
+        print(f"[WARN]  Manifest inválido en {manifest}: {e}")
+    return None
@@ -1,11 +1,20 @@
 # bd_conexion.py
 # Conexión a PostgreSQL con psycopg3 + pool y helpers simples.
+# Para varias sentencias en una misma transacción: transaction() / run_transaction().
+# Cada sentencia se mide en Core/metricas_bd.py (latencia, espera del pool, lentas).
+# Consultas calientes con nombre (y sus estadísticas): registrar_sentencia() / fetch_*_prepared().
 
 import os
+import time
+import weakref
+import threading
+from contextlib import contextmanager, ExitStack
 from psycopg_pool import ConnectionPool
 from dotenv import load_dotenv
 import urllib.parse
 
+from Core.metricas_bd import registrar_consulta, registrar_espera_pool, registrar_reintento, registrar_error
+
 load_dotenv()
 
 # Puedes usar una sola URL (DATABASE_URL) o las variables separadas.
@@ -51,26 +60,125 @@ else:
 
 POOL_MIN = int(os.getenv("POOL_MIN", "1"))
 POOL_MAX = int(os.getenv("POOL_MAX", "5"))
+# BD_PREPARADAS=0: ninguna sentencia se prepara en el servidor (p. ej. detrás de
+# pgbouncer en modo transacción); ver "Sentencias con nombre" más abajo
+USAR_PREPARADAS = os.getenv("BD_PREPARADAS", "1") != "0"
+# prepare_threshold=None apaga también la preparación automática de psycopg
+_KWARGS_CONEXION = {} if USAR_PREPARADAS else {"prepare_threshold": None}
 
 # Configurar el pool con reconexión automática y manejo de errores SSL
-try:
-    pool = ConnectionPool(
-        conninfo=CONNINFO,
-        min_size=POOL_MIN,
-        max_size=POOL_MAX,
-        open=True,
-        # Configuraciones para manejar desconexiones y SSL
-        max_idle=300,  # Cerrar conexiones inactivas después de 5 minutos
-        max_lifetime=3600,  # Máximo tiempo de vida de una conexión: 1 hora
-    )
-except TypeError:
-    # Si algunos parámetros no son compatibles, usar configuración básica
-    pool = ConnectionPool(
-        conninfo=CONNINFO,
-        min_size=POOL_MIN,
-        max_size=POOL_MAX,
-        open=True
-    )
+def _crear_pool(abrir: bool = True) -> ConnectionPool:
+    try:
+        return ConnectionPool(
+            conninfo=CONNINFO,
+            min_size=POOL_MIN,
+            max_size=POOL_MAX,
+            open=abrir,
+            kwargs=_KWARGS_CONEXION,
+            # Configuraciones para manejar desconexiones y SSL
+            max_idle=300,  # Cerrar conexiones inactivas después de 5 minutos
+            max_lifetime=3600,  # Máximo tiempo de vida de una conexión: 1 hora
+        )
+    except TypeError:
+        # Si algunos parámetros no son compatibles, usar configuración básica
+        return ConnectionPool(
+            conninfo=CONNINFO,
+            min_size=POOL_MIN,
+            max_size=POOL_MAX,
+            open=abrir,
+            kwargs=_KWARGS_CONEXION,
+        )
+
+
+pool = _crear_pool()
+
+# Proceso dueño del pool. Tras un fork (workers de gunicorn con --preload,
+# multiprocessing) las conexiones y los threads del pool heredado no sirven en
+# el hijo: se crea un pool nuevo en el primer uso (ver _obtener_pool).
+_pid_pool = os.getpid()
+_lock_pool = threading.Lock()
+# Pools heredados del proceso padre: se conservan referenciados para que el
+# recolector no los finalice en el hijo (cerraría sockets que son del padre)
+_pools_heredados = []
+
+
+def cerrar_pool():
+    """Cierra el pool del proceso actual (p. ej. en el maestro de gunicorn antes del fork)."""
+    try:
+        pool.close()
+        print(f"[INFO] Pool de conexiones cerrado (pid {os.getpid()})")
+    except Exception as e:
+        print(f"[WARN]  Error al cerrar el pool de conexiones: {e}")
+
+
+def _reemplazar_pool():
+    global pool, _pid_pool
+    if _pid_pool != os.getpid():
+        _pools_heredados.append(pool)
+    else:
+        cerrar_pool()
+    pool = _crear_pool()
+    _pid_pool = os.getpid()
+    print(f"[OK] Pool de conexiones abierto en pid {_pid_pool}")
+
+
+def reabrir_pool():
+    """Crea un pool nuevo para el proceso actual (post_fork de gunicorn)."""
+    with _lock_pool:
+        _reemplazar_pool()
+
+
+def _obtener_pool() -> ConnectionPool:
+    if _pid_pool != os.getpid():
+        with _lock_pool:
+            if _pid_pool != os.getpid():
+                _reemplazar_pool()
+    return pool
+
+
+def _reiniciar_lock_en_hijo():
+    # Un lock tomado por otro thread al momento del fork quedaría bloqueado en el hijo
+    global _lock_pool
+    _lock_pool = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_lock_en_hijo)
+
+
+def _es_error_conexion(e: Exception) -> bool:
+    # Criterio de reintento de todos los helpers: errores SSL o de conexión
+    return "SSL" in str(e) or "connection" in str(e).lower()
+
+
+def _explicar(sql: str, params: tuple | None = None) -> str | None:
+    """EXPLAIN de una consulta lenta en otra conexión (no ejecuta la sentencia).
+
+    Lo llama el thread de EXPLAIN de metricas_bd, fuera de la petición.
+    """
+    if sql.lstrip().split(None, 1)[0].upper() not in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE"):
+        return None
+    with _obtener_pool().connection(timeout=2) as conn:
+        with conn.cursor() as cur:
+            cur.execute("EXPLAIN " + sql, params or ())
+            plan = "\n".join(fila[0] for fila in cur.fetchall())
+        conn.rollback()
+    return plan
+
+
+def _medir(sql: str, params, inicio: float, espera: float | None, filas: int):
+    # Latencia de ejecución (sin la espera del pool) y EXPLAIN en segundo plano si fue lenta
+    registrar_consulta(sql, time.perf_counter() - inicio - (espera or 0), filas, espera,
+                       explicar=lambda: _explicar(sql, params))
+
+
+def estadisticas_pool() -> dict:
+    """Tamaño y esperas del pool del proceso (get_stats de psycopg_pool)"""
+    try:
+        stats = _obtener_pool().get_stats()
+    except Exception as e:
+        stats = {"error": str(e)}
+    return {"pid": os.getpid(), "min": POOL_MIN, "max": POOL_MAX, **stats}
 
 
 def fetch_one(sql: str, params: tuple | None = None):
@@ -78,16 +186,21 @@ def fetch_one(sql: str, params: tuple | None = None):
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            with pool.connection() as conn:
+            inicio = time.perf_counter()
+            with _obtener_pool().connection() as conn:
+                espera = time.perf_counter() - inicio
                 with conn.cursor() as cur:
                     cur.execute(sql, params or ())
-                    return cur.fetchone()
+                    row = cur.fetchone()
+            _medir(sql, params, inicio, espera, 1 if row else 0)
+            return row
         except Exception as e:
-            if attempt < max_retries - 1 and ("SSL" in str(e) or "connection" in str(e).lower()):
+            if attempt < max_retries - 1 and _es_error_conexion(e):
                 # Reintentar en caso de error SSL o de conexión
-                import time
+                registrar_reintento(sql)
                 time.sleep(0.5 * (attempt + 1))  # Backoff exponencial
                 continue
+            registrar_error(sql)
             raise
 
 
@@ -96,16 +209,21 @@ def fetch_all(sql: str, params: tuple | None = None):
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            with pool.connection() as conn:
+            inicio = time.perf_counter()
+            with _obtener_pool().connection() as conn:
+                espera = time.perf_counter() - inicio
                 with conn.cursor() as cur:
                     cur.execute(sql, params or ())
-                    return cur.fetchall()
+                    rows = cur.fetchall()
+            _medir(sql, params, inicio, espera, len(rows))
+            return rows
         except Exception as e:
-            if attempt < max_retries - 1 and ("SSL" in str(e) or "connection" in str(e).lower()):
+            if attempt < max_retries - 1 and _es_error_conexion(e):
                 # Reintentar en caso de error SSL o de conexión
-                import time
+                registrar_reintento(sql)
                 time.sleep(0.5 * (attempt + 1))  # Backoff exponencial
                 continue
+            registrar_error(sql)
             raise
 
 
@@ -114,15 +232,261 @@ def execute(sql: str, params: tuple | None = None):
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            with pool.connection() as conn:
+            inicio = time.perf_counter()
+            with _obtener_pool().connection() as conn:
+                espera = time.perf_counter() - inicio
                 with conn.cursor() as cur:
                     cur.execute(sql, params or ())
+                    filas = cur.rowcount
                     conn.commit()
-                    return
+            _medir(sql, params, inicio, espera, filas)
+            return
         except Exception as e:
-            if attempt < max_retries - 1 and ("SSL" in str(e) or "connection" in str(e).lower()):
+            if attempt < max_retries - 1 and _es_error_conexion(e):
                 # Reintentar en caso de error SSL o de conexión
-                import time
+                registrar_reintento(sql)
+                time.sleep(0.5 * (attempt + 1))  # Backoff exponencial
+                continue
+            registrar_error(sql)
+            raise
+
+
+# ---------- Sentencias con nombre ----------
+# Las consultas más repetidas se registran una vez con un nombre y se preparan
+# en el servidor desde su primera llamada en cada conexión (prepare=True; sin
+# él psycopg recién las prepara en la quinta, prepare_threshold). Esa primera
+# llamada paga el Parse aparte, una ida y vuelta más una vez por conexión; las
+# siguientes reutilizan la sentencia preparada de la conexión (solo Bind y
+# Execute, sin parse ni análisis). Se cuentan llamadas, tiempo, preparaciones y
+# conexiones donde está preparada (estadisticas_preparadas).
+# Con BD_PREPARADAS=0 se ejecutan con prepare=False y el pool no prepara nada.
+
+
+class SentenciaNombrada:
+    def __init__(self, nombre: str, sql: str):
+        self.nombre = nombre
+        self.sql = sql
+        self.llamadas = 0
+        self.segundos = 0.0
+        self.preparaciones = 0
+        self.conexiones = weakref.WeakSet()  # conexiones vivas donde está preparada
+
+    def resumen(self) -> dict:
+        return {
+            "nombre": self.nombre,
+            "llamadas": self.llamadas,
+            "preparaciones": self.preparaciones,
+            "conexiones": len(self.conexiones),
+            "media_ms": round(self.segundos * 1000 / self.llamadas, 3) if self.llamadas else None,
+        }
+
+
+_sentencias: dict[str, SentenciaNombrada] = {}
+_lock_sentencias = threading.Lock()
+
+
+def registrar_sentencia(nombre: str, sql: str) -> str:
+    """Registra (una vez, al importar el módulo que la usa) una consulta con nombre."""
+    with _lock_sentencias:
+        existente = _sentencias.get(nombre)
+        if existente is not None and existente.sql != sql:
+            raise ValueError(f"Sentencia '{nombre}' ya registrada con otro SQL")
+        if existente is None:
+            _sentencias[nombre] = SentenciaNombrada(nombre, sql)
+    return nombre
+
+
+def ejecutar_sentencia(cur, nombre: str, params: tuple | None = None):
+    """cur.execute de una sentencia registrada, preparada en la conexión desde la primera llamada."""
+    sentencia = _sentencias[nombre]
+    nueva = USAR_PREPARADAS and cur.connection not in sentencia.conexiones
+    inicio = time.perf_counter()
+    # prepare=True en todas: psycopg reutiliza la que ya preparó en esta
+    # conexión y la vuelve a preparar si la sacó de su caché (prepared_max)
+    cur.execute(sentencia.sql, params or (), prepare=USAR_PREPARADAS)
+    segundos = time.perf_counter() - inicio
+    with _lock_sentencias:
+        sentencia.llamadas += 1
+        sentencia.segundos += segundos
+        if nueva:
+            sentencia.preparaciones += 1
+            sentencia.conexiones.add(cur.connection)
+    return cur
+
+
+def _consultar_sentencia(nombre: str, params, leer, contar):
+    sql = _sentencias[nombre].sql
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            inicio = time.perf_counter()
+            with _obtener_pool().connection() as conn:
+                espera = time.perf_counter() - inicio
+                with conn.cursor() as cur:
+                    resultado = leer(ejecutar_sentencia(cur, nombre, params))
+            _medir(sql, params, inicio, espera, contar(resultado))
+            return resultado
+        except Exception as e:
+            if attempt < max_retries - 1 and _es_error_conexion(e):
+                registrar_reintento(sql)
+                time.sleep(0.5 * (attempt + 1))  # Backoff exponencial
+                continue
+            registrar_error(sql)
+            raise
+
+
+def fetch_one_prepared(nombre: str, params: tuple | None = None):
+    """fetch_one de una sentencia registrada con registrar_sentencia()."""
+    return _consultar_sentencia(nombre, params, lambda cur: cur.fetchone(), lambda fila: 1 if fila else 0)
+
+
+def fetch_all_prepared(nombre: str, params: tuple | None = None):
+    """fetch_all de una sentencia registrada con registrar_sentencia()."""
+    return _consultar_sentencia(nombre, params, lambda cur: cur.fetchall(), len)
+
+
+def estadisticas_preparadas() -> list:
+    """Llamadas, tiempo medio, preparaciones y conexiones vivas de cada sentencia con nombre."""
+    with _lock_sentencias:
+        return sorted((s.resumen() for s in _sentencias.values()), key=lambda r: -r["llamadas"])
+
+
+class Transaccion:
+    """Helper tipo cursor sobre la conexión de transaction(): todo lo que se
+    ejecuta con él va en la misma transacción (commit al salir del with)."""
+
+    def __init__(self, conn, cur, pipeline=None):
+        self.conn = conn
+        self.cursor = cur
+        self.pipeline = pipeline
+
+    def _ejecutar(self, sql: str, params, leer, contar, nombre: str | None = None):
+        inicio = time.perf_counter()
+        try:
+            if nombre:
+                ejecutar_sentencia(self.cursor, nombre, params)
+            else:
+                self.cursor.execute(sql, params or ())
+            resultado = leer(self.cursor)
+        except Exception:
+            registrar_error(sql)
+            raise
+        _medir(sql, params, inicio, None, contar(resultado))
+        return resultado
+
+    def fetch_one(self, sql: str, params: tuple | None = None):
+        return self._ejecutar(sql, params, lambda c: c.fetchone(), lambda fila: 1 if fila else 0)
+
+    def fetch_all(self, sql: str, params: tuple | None = None):
+        return self._ejecutar(sql, params, lambda c: c.fetchall(), len)
+
+    def fetch_all_prepared(self, nombre: str, params: tuple | None = None):
+        """fetch_all de una sentencia registrada con registrar_sentencia()"""
+        return self._ejecutar(_sentencias[nombre].sql, params, lambda c: c.fetchall(), len, nombre)
+
+    def fetch_many(self, consultas: list) -> list:
+        """Varias consultas [(sql, params), ...] -> [filas, ...]; con pipeline viajan juntas"""
+        cursores = [self.conn.cursor() for _ in consultas]
+        sql = None
+        try:
+            # Con pipeline las respuestas llegan al leer: a cada sentencia se le
+            # cuenta el tiempo desde que terminó de leerse la anterior
+            marca = time.perf_counter()
+            for cur, (sql, params) in zip(cursores, consultas):
+                cur.execute(sql, params or ())
+            resultados = []
+            for cur, (sql, params) in zip(cursores, consultas):
+                filas = cur.fetchall()
+                _medir(sql, params, marca, None, len(filas))
+                marca = time.perf_counter()
+                resultados.append(filas)
+            return resultados
+        except Exception:
+            if sql is not None:
+                registrar_error(sql)
+            raise
+        finally:
+            for cur in cursores:
+                cur.close()
+
+    def execute(self, sql: str, params: tuple | None = None) -> int:
+        """INSERT/UPDATE/DELETE sin commit; devuelve las filas afectadas"""
+        return self._ejecutar(sql, params, lambda c: c.rowcount, lambda filas: filas)
+
+    def executemany(self, sql: str, params_seq):
+        params_seq = list(params_seq)
+        inicio = time.perf_counter()
+        try:
+            self.cursor.executemany(sql, params_seq)
+        except Exception:
+            registrar_error(sql)
+            raise
+        _medir(sql, params_seq[0] if params_seq else None, inicio, None, len(params_seq))
+
+    @contextmanager
+    def copy(self, sql: str):
+        """COPY ... FROM STDIN: with tx.copy(sql) as copia: copia.write_row(fila)"""
+        inicio = time.perf_counter()
+        try:
+            with self.cursor.copy(sql) as copia:
+                yield copia
+        except Exception:
+            registrar_error(sql)
+            raise
+        _medir(sql, None, inicio, None, self.cursor.rowcount)
+
+    def savepoint(self, nombre: str | None = None):
+        """Sub-transacción: si el bloque falla se deshace sólo lo suyo y la excepción sigue"""
+        return self.conn.transaction(savepoint_name=nombre)
+
+
+@contextmanager
+def transaction(pipeline: bool = False):
+    """Una conexión del pool y una transacción para varias sentencias.
+
+    with transaction() as tx:
+        pid = tx.fetch_one("INSERT ... RETURNING id", (...))[0]
+        tx.executemany("INSERT ...", filas)
+
+    Commit al salir sin error, rollback si hay excepción. pipeline=True usa el
+    modo pipeline de psycopg (las sentencias viajan sin esperar cada respuesta).
+    Los errores SSL o de conexión al abrir la transacción se reintentan como en
+    los helpers de arriba; una vez dentro del bloque no se puede repetir, para
+    eso está run_transaction.
+    """
+    max_retries = 3
+    for attempt in range(max_retries):
+        pila = ExitStack()
+        try:
+            inicio = time.perf_counter()
+            conn = pila.enter_context(_obtener_pool().connection())
+            registrar_espera_pool(time.perf_counter() - inicio)
+            pila.enter_context(conn.transaction())  # BEGIN: detecta conexiones caídas
+            break
+        except Exception as e:
+            pila.__exit__(type(e), e, e.__traceback__)
+            if attempt < max_retries - 1 and _es_error_conexion(e):
+                registrar_reintento("BEGIN")
                 time.sleep(0.5 * (attempt + 1))  # Backoff exponencial
                 continue
             raise
+    with pila:
+        tubo = pila.enter_context(conn.pipeline()) if pipeline else None
+        cur = pila.enter_context(conn.cursor())
+        yield Transaccion(conn, cur, tubo)
+
+
+def run_transaction(funcion, *args, pipeline: bool = False, **kwargs):
+    """Ejecuta funcion(tx, *args, **kwargs) en transaction() y repite la
+    transacción completa ante errores SSL o de conexión (se deshizo entera)."""
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            with transaction(pipeline=pipeline) as tx:
+                return funcion(tx, *args, **kwargs)
+        except Exception as e:
+            if attempt < max_retries - 1 and _es_error_conexion(e):
+                registrar_reintento(getattr(funcion, "__name__", "transaction"))
+                time.sleep(0.5 * (attempt + 1))
+                continue
+            raise
@@ -0,0 +1,146 @@
+# cache_ingredientes.py
+# Caché por paciente de la lista de ingredientes rankeada por ML
+#
+# Guarda la salida de MotorRecomendacion.obtener_ingredientes_recomendados
+# (scores de idoneidad, picos glucémicos predichos y exclusiones ya aplicadas)
+# para no recalcularla en cada "Recomendación inteligente", regeneración o
+# búsqueda de intercambio. La clave combina la huella del perfil del paciente,
+# los filtros, la versión de los modelos y la versión del catálogo, así que un
+# cambio en cualquiera de ellos produce una clave distinta. Además las rutas que
+# modifican clinico / antropometria / paciente_alergia / paciente_preferencia
+# llaman a invalidar_paciente() para liberar las entradas de inmediato.
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, is_dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+TTL_SEGUNDOS = float(os.getenv("CACHE_INGREDIENTES_TTL", "600"))
+MAX_ENTRADAS = int(os.getenv("CACHE_INGREDIENTES_MAX", "256"))
+
+
+def _json_canonico(valor: Any) -> str:
+    if is_dataclass(valor):
+        valor = asdict(valor)
+    return json.dumps(valor, sort_keys=True, default=str, ensure_ascii=False)
+
+
+def huella(valor: Any) -> str:
+    """Hash estable (sha1 corto) de un dataclass / dict / lista"""
+    return hashlib.sha1(_json_canonico(valor).encode('utf-8')).hexdigest()[:16]
+
+
+class CacheLRUTTL:
+    """Caché LRU con expiración por TTL, segura entre threads"""
+
+    def __init__(self, max_entradas: int = MAX_ENTRADAS, ttl_segundos: float = TTL_SEGUNDOS):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._datos: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    def obtener(self, clave: Tuple) -> Optional[Any]:
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None:
+                self.fallos += 1
+                return None
+            guardado_en, valor = item
+            if time.time() - guardado_en > self.ttl_segundos:
+                del self._datos[clave]
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave: Tuple, valor: Any):
+        with self._lock:
+            self._datos[clave] = (time.time(), valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+
+    def eliminar_si(self, condicion) -> int:
+        """Elimina las entradas cuya clave cumple condicion(clave); devuelve cuántas"""
+        with self._lock:
+            claves = [c for c in self._datos if condicion(c)]
+            for c in claves:
+                del self._datos[c]
+            return len(claves)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            return {
+                'entradas': len(self._datos),
+                'max_entradas': self.max_entradas,
+                'ttl_segundos': self.ttl_segundos,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsiones': self.expulsiones,
+            }
+
+
+_cache = CacheLRUTTL()
+
+
+def clave_ingredientes(paciente_id: int, perfil, metas, filtros: Optional[Dict],
+                       probabilidad_control: Optional[float], version_modelos: str,
+                       version_catalogo: int) -> Tuple:
+    """Clave de caché; el primer elemento es siempre el paciente_id (para invalidar)"""
+    prob = round(probabilidad_control, 4) if probabilidad_control is not None else None
+    return (
+        paciente_id,
+        huella(perfil),
+        huella(metas),
+        huella(filtros or {}),
+        prob,
+        version_modelos,
+        version_catalogo,
+    )
+
+
+def _copiar(ingredientes: List[Dict]) -> List[Dict]:
+    # Copia superficial por alimento: los llamadores agregan claves a los dicts
+    return [dict(a) for a in ingredientes]
+
+
+def obtener_ingredientes(clave: Tuple) -> Optional[List[Dict]]:
+    ingredientes = _cache.obtener(clave)
+    return _copiar(ingredientes) if ingredientes is not None else None
+
+
+def guardar_ingredientes(clave: Tuple, ingredientes: List[Dict]):
+    _cache.guardar(clave, _copiar(ingredientes))
+
+
+def invalidar_paciente(paciente_id) -> int:
+    """Descarta todas las entradas de un paciente (datos clínicos/alergias/preferencias cambiaron)"""
+    try:
+        paciente_id = int(paciente_id)
+    except (TypeError, ValueError):
+        return 0
+    eliminadas = _cache.eliminar_si(lambda clave: clave[0] == paciente_id)
+    if eliminadas:
+        print(f"[INFO] Caché de ingredientes invalidada para paciente {paciente_id} ({eliminadas} entradas)")
+    return eliminadas
+
+
+def limpiar_cache():
+    _cache.limpiar()
+
+
+def estadisticas_cache() -> Dict:
+    return _cache.estadisticas()
@@ -0,0 +1,210 @@
+# cache_planes.py
+# Caché en disco de planes semanales completos (generados y optimizados)
+#
+# Generar un plan cuesta varios segundos (metas con ML, ranking de ingredientes,
+# armado de 7 días y optimización con el Modelo 3). Con los mismos datos del
+# paciente, la misma configuración y la misma semilla el resultado es el mismo,
+# así que se guarda el plan ya convertido al formato de la UI. La clave es la
+# huella de:
+#   - el perfil del paciente (clínico, antropométrico, alergias y preferencias),
+#   - la configuración del frontend y el filtro de ingredientes,
+#   - los días, la versión de los modelos, la versión del catálogo y la semilla,
+#   - la biblioteca de plantillas en uso (o None si no hay / PLANTILLAS_COMIDAS=0)
+#     y el solver del optimizador (OPTIMIZADOR_SOLVER),
+# así que editar al paciente, reentrenar un modelo, cambiar el catálogo,
+# regenerar las plantillas o cambiar de solver produce otra clave. Un archivo JSON por plan (compartido por los workers del mismo
+# servidor); las entradas vencen por TTL y, pasado el máximo, se descartan las
+# menos usadas (el mtime se renueva en cada acierto).
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from Core.cache_ingredientes import huella
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DIR_CACHE_PLANES = Path(os.getenv("CACHE_PLANES_DIR", str(BASE_DIR / "cache_planes")))
+USAR_CACHE_PLANES = os.getenv("CACHE_PLANES", "1") != "0"
+TTL_SEGUNDOS = float(os.getenv("CACHE_PLANES_TTL", str(7 * 24 * 3600)))
+MAX_ENTRADAS = int(os.getenv("CACHE_PLANES_MAX", "500"))
+
+# Subir al cambiar la forma del plan o el algoritmo de generación
+VERSION_FORMATO = 1
+
+# Claves de la configuración que no cambian el plan (la semilla va aparte)
+CLAVES_EXCLUIDAS = ('semilla', 'forzar_regeneracion')
+
+
+def _json_default(valor: Any):
+    # Escalares de NumPy (float32, int64...) presentes en estadísticas del optimizador
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return str(valor)
+
+
+def clave_plan(paciente_id: int, perfil, configuracion: Optional[Dict], ingredientes: Optional[Dict],
+               dias: int, version_modelos: str, version_catalogo: int, semilla: int,
+               version_plantillas: Optional[str] = None, solver: str = 'voraz') -> str:
+    """Nombre del archivo de caché; empieza con el paciente_id (para invalidar)"""
+    configuracion = {k: v for k, v in (configuracion or {}).items() if k not in CLAVES_EXCLUIDAS}
+    firma = huella([
+        VERSION_FORMATO,
+        huella(perfil),
+        configuracion,
+        ingredientes or {},
+        dias,
+        version_modelos,
+        version_catalogo,
+        semilla,
+        version_plantillas,
+        solver,
+    ])
+    return f"{int(paciente_id)}_{firma}"
+
+
+class CachePlanes:
+    """Un JSON por plan en `directorio`, con TTL y expulsión de los menos usados"""
+
+    def __init__(self, directorio: Path = DIR_CACHE_PLANES, max_entradas: int = MAX_ENTRADAS,
+                 ttl_segundos: float = TTL_SEGUNDOS):
+        self.directorio = Path(directorio)
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.errores = 0
+
+    def _ruta(self, clave: str) -> Path:
+        return self.directorio / f"{clave}.json"
+
+    def obtener(self, clave: str) -> Optional[Dict]:
+        ruta = self._ruta(clave)
+        try:
+            if time.time() - ruta.stat().st_mtime > self.ttl_segundos:
+                ruta.unlink(missing_ok=True)
+                raise FileNotFoundError(ruta)
+            with open(ruta, encoding='utf-8') as f:
+                plan = json.load(f)
+            os.utime(ruta)
+        except FileNotFoundError:
+            with self._lock:
+                self.fallos += 1
+            return None
+        except (OSError, ValueError) as e:
+            print(f"[WARN]  Plan cacheado ilegible ({ruta.name}): {e}")
+            with self._lock:
+                self.fallos += 1
+                self.errores += 1
+            return None
+        with self._lock:
+            self.aciertos += 1
+        return plan
+
+    def guardar(self, clave: str, plan: Dict):
+        ruta = self._ruta(clave)
+        temporal = ruta.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(plan, f, ensure_ascii=False, default=_json_default)
+            os.replace(temporal, ruta)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"[WARN]  No se pudo guardar el plan en caché: {e}")
+            with self._lock:
+                self.errores += 1
+            try:
+                temporal.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return
+        self._expulsar()
+
+    def _archivos(self) -> list:
+        archivos = []
+        for ruta in self.directorio.glob('*.json'):
+            try:
+                archivos.append((ruta.stat().st_mtime, ruta))
+            except FileNotFoundError:
+                pass  # otro worker lo borró
+        return archivos
+
+    def _expulsar(self):
+        archivos = self._archivos()
+        limite = time.time() - self.ttl_segundos
+        vencidos = [ruta for mtime, ruta in archivos if mtime < limite]
+        vigentes = sorted((a for a in archivos if a[0] >= limite), key=lambda a: a[0])
+        sobrantes = [ruta for _, ruta in vigentes[:max(0, len(vigentes) - self.max_entradas)]]
+        for ruta in vencidos + sobrantes:
+            ruta.unlink(missing_ok=True)
+        if vencidos or sobrantes:
+            with self._lock:
+                self.expulsiones += len(vencidos) + len(sobrantes)
+
+    def eliminar_paciente(self, paciente_id: int) -> int:
+        eliminadas = 0
+        for ruta in self.directorio.glob(f"{int(paciente_id)}_*.json"):
+            ruta.unlink(missing_ok=True)
+            eliminadas += 1
+        return eliminadas
+
+    def limpiar(self):
+        for ruta in self.directorio.glob('*.json'):
+            ruta.unlink(missing_ok=True)
+
+    def estadisticas(self) -> Dict:
+        archivos = self._archivos() if self.directorio.exists() else []
+        with self._lock:
+            return {
+                'activo': USAR_CACHE_PLANES,
+                'directorio': str(self.directorio),
+                'entradas': len(archivos),
+                'bytes': sum(ruta.stat().st_size for _, ruta in archivos if ruta.exists()),
+                'max_entradas': self.max_entradas,
+                'ttl_segundos': self.ttl_segundos,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsiones': self.expulsiones,
+                'errores': self.errores,
+            }
+
+
+_cache = CachePlanes()
+
+
+def obtener_plan(clave: str) -> Optional[Dict]:
+    if not USAR_CACHE_PLANES:
+        return None
+    return _cache.obtener(clave)
+
+
+def guardar_plan(clave: str, plan: Dict):
+    if USAR_CACHE_PLANES:
+        _cache.guardar(clave, plan)
+
+
+def invalidar_planes_paciente(paciente_id) -> int:
+    """Borra los planes cacheados de un paciente (la clave ya cambia con sus datos; libera disco)"""
+    try:
+        paciente_id = int(paciente_id)
+    except (TypeError, ValueError):
+        return 0
+    try:
+        eliminadas = _cache.eliminar_paciente(paciente_id)
+    except OSError:
+        return 0
+    if eliminadas:
+        print(f"[INFO] Caché de planes invalidada para paciente {paciente_id} ({eliminadas} planes)")
+    return eliminadas
+
+
+def limpiar_cache():
+    _cache.limpiar()
+
+
+def estadisticas_cache() -> Dict:
+    return _cache.estadisticas()
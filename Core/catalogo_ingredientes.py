@@ -0,0 +1,187 @@
+# catalogo_ingredientes.py
+# Catálogo de ingredientes en memoria con matriz de features NumPy cacheada
+#
+# La matriz (n_ingredientes x COLUMNAS_MATRIZ) se construye una vez por versión
+# del catálogo y se reutiliza en cada request que puntúa ingredientes con los
+# modelos ML. La versión se incrementa cuando el admin crea, edita, activa/
+# desactiva o borra un ingrediente (invalidar_catalogo). Como cada worker de
+# gunicorn tiene su propia copia, además se compara periódicamente el contador
+# de modificaciones de la tabla en pg_stat_user_tables para detectar cambios
+# hechos desde otro proceso.
+
+import os
+import time
+import threading
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from Core.bd_conexion import fetch_one, fetch_all
+
+# Orden fijo de columnas de la matriz de features
+COLUMNAS_BASE = ['kcal', 'cho', 'pro', 'fat', 'fibra', 'sodio']
+COLUMNAS_MATRIZ = COLUMNAS_BASE + ['cho_per_100cal', 'pro_per_100cal', 'fat_per_100cal', 'fibra_per_100cal']
+COL = {nombre: i for i, nombre in enumerate(COLUMNAS_MATRIZ)}
+
+# Factores kcal/g para las columnas *_per_100cal (fibra se expresa en g por 100 kcal)
+_FACTORES_PER_100CAL = (('cho', 4), ('pro', 4), ('fat', 9), ('fibra', 1))
+
+# Cada cuántos segundos se consulta a la BD si otro proceso modificó la tabla
+SEGUNDOS_VERIFICACION = float(os.getenv("CATALOGO_VERIFICACION_SEG", "30"))
+
+
+def construir_matriz(alimentos: List[Dict]) -> 'np.ndarray':
+    """
+    Construye la matriz de features (len(alimentos) x COLUMNAS_MATRIZ) a partir de
+    diccionarios de ingrediente. None se trata como 0 y las columnas *_per_100cal
+    valen 0 cuando las calorías no son positivas.
+    """
+    matriz = np.zeros((len(alimentos), len(COLUMNAS_MATRIZ)), dtype=np.float64)
+    for i, alimento in enumerate(alimentos):
+        for j, campo in enumerate(COLUMNAS_BASE):
+            matriz[i, j] = float(alimento.get(campo, 0) or 0)
+
+    calorias = matriz[:, COL['kcal']]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for campo, factor in _FACTORES_PER_100CAL:
+            matriz[:, COL[f'{campo}_per_100cal']] = np.where(
+                calorias > 0, (matriz[:, COL[campo]] * factor / calorias) * 100, 0.0
+            )
+    return matriz
+
+
+class CatalogoIngredientes:
+    """Instantánea inmutable del catálogo de ingredientes activos"""
+
+    def __init__(self, filas: List[Dict], version: int):
+        self.version = version
+        self.filas = filas
+        self.ids = np.array([f['id'] for f in filas], dtype=np.int64)
+        self.indice_por_id = {f['id']: i for i, f in enumerate(filas)}
+        self.matriz = construir_matriz(filas)
+        self.matriz.setflags(write=False)  # compartida entre threads: solo lectura
+        self.creado_en = time.time()
+
+    def __len__(self):
+        return len(self.filas)
+
+    def submatriz(self, ids: List[int]) -> Optional['np.ndarray']:
+        """Filas de la matriz para los ids dados (mismo orden) o None si falta alguno"""
+        try:
+            posiciones = [self.indice_por_id[i] for i in ids]
+        except KeyError:
+            return None
+        return self.matriz[posiciones]
+
+
+class _EstadoCatalogo:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0              # Versión local (se incrementa en cada invalidación)
+        self.firma_bd = None          # Último contador de modificaciones visto en la BD
+        self.ultima_verificacion = 0.0
+        self.catalogo: Optional[CatalogoIngredientes] = None
+
+
+_estado = _EstadoCatalogo()
+
+
+def _firma_bd() -> Optional[int]:
+    """Contador de inserciones/actualizaciones/borrados de la tabla ingrediente"""
+    try:
+        row = fetch_one("""
+            SELECT n_tup_ins + n_tup_upd + n_tup_del
+            FROM pg_stat_user_tables
+            WHERE relname = 'ingrediente'
+        """)
+        return int(row[0]) if row and row[0] is not None else None
+    except Exception as e:
+        print(f"[WARN]  No se pudo leer la firma del catálogo de ingredientes: {e}")
+        return None
+
+
+def _cargar_filas() -> List[Dict]:
+    rows = fetch_all("""
+        SELECT id, nombre, grupo, kcal, cho, pro, fat, fibra, ig, sodio,
+               tags_json, porciones_intercambio, subgrupo_intercambio
+        FROM ingrediente
+        WHERE activo = true
+        ORDER BY id
+    """) or []
+    return [{
+        'id': r[0],
+        'nombre': r[1],
+        'grupo': r[2],
+        'kcal': float(r[3] or 0),
+        'cho': float(r[4] or 0),
+        'pro': float(r[5] or 0),
+        'fat': float(r[6] or 0),
+        'fibra': float(r[7] or 0),
+        'ig': r[8],
+        'sodio': float(r[9]) if r[9] else 0,
+        'tags': r[10] or {},
+        'porciones_intercambio': float(r[11]) if r[11] else None,
+        'subgrupo_intercambio': r[12],
+    } for r in rows]
+
+
+def version_catalogo() -> int:
+    """Versión actual del catálogo (incluye cambios detectados desde otros procesos)"""
+    _verificar_cambios_externos()
+    return _estado.version
+
+
+def invalidar_catalogo(motivo: str = ""):
+    """Incrementa la versión del catálogo y descarta la matriz cacheada"""
+    with _estado.lock:
+        _estado.version += 1
+        _estado.catalogo = None
+        # La próxima verificación solo registra la firma nueva (incluye este cambio)
+        _estado.firma_bd = None
+        _estado.ultima_verificacion = 0.0
+    print(f"[INFO] Catálogo de ingredientes invalidado (v{_estado.version}) {motivo}".rstrip())
+
+
+def _verificar_cambios_externos():
+    ahora = time.time()
+    if ahora - _estado.ultima_verificacion < SEGUNDOS_VERIFICACION:
+        return
+    firma = _firma_bd()
+    with _estado.lock:
+        _estado.ultima_verificacion = ahora
+        if firma is None:
+            return
+        if _estado.firma_bd is not None and firma != _estado.firma_bd:
+            _estado.version += 1
+            _estado.catalogo = None
+        _estado.firma_bd = firma
+
+
+def obtener_catalogo() -> Optional[CatalogoIngredientes]:
+    """Devuelve el catálogo cacheado para la versión actual, reconstruyéndolo si hace falta"""
+    if np is None:
+        return None
+
+    version = version_catalogo()
+    catalogo = _estado.catalogo
+    if catalogo is not None and catalogo.version == version:
+        return catalogo
+
+    with _estado.lock:
+        catalogo = _estado.catalogo
+        if catalogo is not None and catalogo.version == _estado.version:
+            return catalogo
+        version = _estado.version
+        inicio = time.perf_counter()
+        try:
+            catalogo = CatalogoIngredientes(_cargar_filas(), version)
+        except Exception as e:
+            print(f"[WARN]  Error al construir el catálogo de ingredientes: {e}")
+            return None
+        _estado.catalogo = catalogo
+        print(f"[OK] Catálogo de ingredientes v{version}: {len(catalogo)} ingredientes "
+              f"en {time.perf_counter() - inicio:.3f}s")
+        return catalogo
@@ -0,0 +1,433 @@
+# cola_planes.py
+# Cola de trabajos de generación de planes en PostgreSQL (sin broker externo)
+#
+# /api/recomendacion/generar corre todo el pipeline dentro de la petición; un
+# plan de 28 días ocupa el worker de gunicorn (sync) hasta el timeout. Aquí:
+#   - encolar() inserta el trabajo en la tabla plan_trabajo y devuelve su id;
+#   - los trabajadores (threads de cada proceso o `python -m Core.cola_planes`)
+#     reclaman el pendiente más antiguo con FOR UPDATE SKIP LOCKED, así varios
+#     procesos comparten la cola sin tomar el mismo trabajo, y guardan el
+#     resultado de MotorRecomendacion.generar_plan_semanal_completo en la fila;
+#   - esperar_trabajo() hace long-polling del estado hasta que termina;
+#   - los trabajos en proceso de un trabajador caído se devuelven a la cola tras
+#     TIMEOUT_SEGUNDOS (hasta MAX_INTENTOS) y los terminados se borran pasada la
+#     retención.
+# La tabla se crea en el primer uso (CREATE TABLE IF NOT EXISTS).
+
+import os
+import json
+import time
+import socket
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from Core.bd_conexion import fetch_one, fetch_all, execute
+
+HILOS = int(os.getenv("COLA_PLANES_HILOS", "1"))  # por proceso; 0 = solo encolar
+INTERVALO_SEGUNDOS = float(os.getenv("COLA_PLANES_INTERVALO_SEG", "1"))
+TIMEOUT_SEGUNDOS = float(os.getenv("COLA_PLANES_TIMEOUT_SEG", "900"))
+MAX_INTENTOS = int(os.getenv("COLA_PLANES_MAX_INTENTOS", "2"))
+RETENCION_HORAS = float(os.getenv("COLA_PLANES_RETENCION_H", "24"))
+# Tope de una espera de long-polling (por debajo del timeout de gunicorn). La
+# espera ocupa un hilo: con workers gthread es uno de GUNICORN_THREADS; con
+# workers sync sería el proceso entero, y gunicorn.conf.py la baja a 2 s
+MAX_ESPERA_SEGUNDOS = float(os.getenv("COLA_PLANES_ESPERA_MAX_SEG", "25"))
+# Cada cuánto un trabajador revisa vencidos y purga terminados
+MANTENIMIENTO_SEGUNDOS = 60.0
+
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+TERMINADO = 'terminado'
+ERROR = 'error'
+ESTADOS_FINALES = (TERMINADO, ERROR)
+
+SQL_TABLA = """
+    CREATE TABLE IF NOT EXISTS plan_trabajo (
+        id           BIGSERIAL PRIMARY KEY,
+        paciente_id  INTEGER NOT NULL,
+        usuario_id   INTEGER,
+        parametros   JSONB NOT NULL,
+        estado       TEXT NOT NULL DEFAULT 'pendiente',
+        intentos     INTEGER NOT NULL DEFAULT 0,
+        trabajador   TEXT,
+        resultado    JSONB,
+        error        TEXT,
+        creado_en    TIMESTAMPTZ NOT NULL DEFAULT now(),
+        iniciado_en  TIMESTAMPTZ,
+        terminado_en TIMESTAMPTZ
+    );
+    CREATE INDEX IF NOT EXISTS plan_trabajo_pendientes_idx
+        ON plan_trabajo (id) WHERE estado = 'pendiente';
+"""
+
+_tabla_lista = False
+_lock_tabla = threading.Lock()
+
+
+def asegurar_tabla():
+    global _tabla_lista
+    if _tabla_lista:
+        return
+    with _lock_tabla:
+        if not _tabla_lista:
+            execute(SQL_TABLA)
+            _tabla_lista = True
+
+
+def _json_default(valor):
+    # Escalares de NumPy en las estadísticas del optimizador
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return str(valor)
+
+
+def _segundos(inicio: Optional[datetime], fin: Optional[datetime]) -> Optional[float]:
+    if inicio is None or fin is None:
+        return None
+    return round((fin - inicio).total_seconds(), 3)
+
+
+# Avisos dentro del proceso: encolar despierta a los trabajadores locales y
+# terminar un trabajo despierta a las esperas de long-polling locales
+_hay_trabajo = threading.Event()
+_cambio_estado = threading.Condition()
+
+
+def encolar(paciente_id: int, parametros: Dict, usuario_id: Optional[int] = None) -> int:
+    """
+    Encola la generación de un plan.
+
+    Args:
+        paciente_id: Paciente del plan
+        parametros: Argumentos de generar_plan_semanal_completo (dias,
+                    configuracion, ingredientes, semilla, forzar)
+        usuario_id: Usuario que lo pidió (para restringir la consulta)
+
+    Returns:
+        Id del trabajo
+    """
+    asegurar_tabla()
+    row = fetch_one("""
+        INSERT INTO plan_trabajo (paciente_id, usuario_id, parametros)
+        VALUES (%s, %s, %s::jsonb)
+        RETURNING id
+    """, (int(paciente_id), usuario_id, json.dumps(parametros, default=_json_default)))
+    _hay_trabajo.set()
+    return row[0]
+
+
+def reclamar(trabajador: str) -> Optional[tuple]:
+    """Toma el trabajo pendiente más antiguo: (id, paciente_id, parametros, intentos) o None"""
+    return fetch_one("""
+        UPDATE plan_trabajo
+        SET estado = 'en_proceso', iniciado_en = now(), intentos = intentos + 1, trabajador = %s
+        WHERE id = (
+            SELECT id FROM plan_trabajo
+            WHERE estado = 'pendiente'
+            ORDER BY id
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING id, paciente_id, parametros, intentos
+    """, (trabajador,))
+
+
+def _finalizar(trabajo_id: int, trabajador: str, intentos: int, estado: str,
+               resultado: Optional[Dict] = None, error: Optional[str] = None) -> bool:
+    """
+    Guarda el resultado solo si el trabajo sigue siendo de este reclamo (mismo
+    trabajador e intento, aún en proceso). Si mantenimiento() lo devolvió a la
+    cola y otro lo tomó, devuelve False y el resultado se descarta.
+    """
+    row = fetch_one("""
+        UPDATE plan_trabajo
+        SET estado = %s, resultado = %s::jsonb, error = %s, terminado_en = now()
+        WHERE id = %s AND trabajador = %s AND intentos = %s AND estado = 'en_proceso'
+        RETURNING id
+    """, (estado, json.dumps(resultado, default=_json_default) if resultado is not None else None,
+          error, trabajo_id, trabajador, intentos))
+    if row is None:
+        print(f"[WARN]  Cola de planes: trabajo {trabajo_id} ya no es de {trabajador} (intento {intentos}); "
+              f"se descarta su resultado")
+        return False
+    with _cambio_estado:
+        _cambio_estado.notify_all()
+    return True
+
+
+def mantenimiento() -> Dict:
+    """Devuelve a la cola los trabajos vencidos (o los marca con error) y purga los antiguos"""
+    reencolados = fetch_all("""
+        UPDATE plan_trabajo
+        SET estado = CASE WHEN intentos < %s THEN 'pendiente' ELSE 'error' END,
+            error = CASE WHEN intentos < %s THEN error ELSE 'Tiempo de ejecución agotado' END,
+            terminado_en = CASE WHEN intentos < %s THEN NULL ELSE now() END
+        WHERE estado = 'en_proceso' AND iniciado_en < now() - make_interval(secs => %s)
+        RETURNING id, estado
+    """, (MAX_INTENTOS, MAX_INTENTOS, MAX_INTENTOS, TIMEOUT_SEGUNDOS)) or []
+    purgados = fetch_all("""
+        DELETE FROM plan_trabajo
+        WHERE estado IN ('terminado', 'error') AND terminado_en < now() - make_interval(secs => %s)
+        RETURNING id
+    """, (RETENCION_HORAS * 3600,)) or []
+    if reencolados:
+        print(f"[WARN]  Cola de planes: {len(reencolados)} trabajos vencidos "
+              f"({sum(1 for _, e in reencolados if e == PENDIENTE)} reencolados)")
+    return {'vencidos': len(reencolados), 'purgados': len(purgados)}
+
+
+def ejecutar_trabajo(paciente_id: int, parametros: Dict) -> Dict:
+    from Core.motor_recomendacion import MotorRecomendacion
+    motor = MotorRecomendacion()
+    return motor.generar_plan_semanal_completo(
+        paciente_id=paciente_id,
+        dias=parametros.get('dias', 7),
+        configuracion=parametros.get('configuracion'),
+        ingredientes=parametros.get('ingredientes'),
+        semilla=parametros.get('semilla'),
+        forzar=bool(parametros.get('forzar', False)),
+    )
+
+
+def obtener_trabajo(trabajo_id: int, incluir_resultado: bool = True) -> Optional[Dict]:
+    """Estado, tiempos y (si terminó) resultado de un trabajo"""
+    asegurar_tabla()
+    row = fetch_one(f"""
+        SELECT t.id, t.paciente_id, t.usuario_id, t.estado, t.intentos, t.trabajador,
+               {'t.resultado' if incluir_resultado else 'NULL'}, t.error,
+               t.creado_en, t.iniciado_en, t.terminado_en, now(),
+               CASE WHEN t.estado = 'pendiente' THEN
+                   (SELECT count(*) FROM plan_trabajo p WHERE p.estado = 'pendiente' AND p.id < t.id)
+               END
+        FROM plan_trabajo t
+        WHERE t.id = %s
+    """, (trabajo_id,))
+    if not row:
+        return None
+    (id_, paciente_id, usuario_id, estado, intentos, trabajador, resultado, error,
+     creado_en, iniciado_en, terminado_en, ahora, delante) = row
+    trabajo = {
+        'id': id_,
+        'paciente_id': paciente_id,
+        'usuario_id': usuario_id,
+        'estado': estado,
+        'intentos': intentos,
+        'trabajador': trabajador,
+        'posicion': delante,
+        'creado_en': creado_en.isoformat() if creado_en else None,
+        'tiempos': {
+            'espera_s': _segundos(creado_en, iniciado_en or ahora),
+            'ejecucion_s': _segundos(iniciado_en, terminado_en or ahora) if iniciado_en else None,
+            'total_s': _segundos(creado_en, terminado_en or ahora),
+        },
+    }
+    if estado == TERMINADO and incluir_resultado:
+        trabajo['resultado'] = resultado
+    if estado == ERROR:
+        trabajo['error'] = error
+    return trabajo
+
+
+def esperar_trabajo(trabajo_id: int, espera_segundos: float = 0) -> Optional[Dict]:
+    """
+    Long-polling: devuelve el trabajo en cuanto termina o al agotar la espera
+    (tope MAX_ESPERA_SEGUNDOS). Los trabajos de otros procesos se consultan cada
+    INTERVALO_SEGUNDOS; los de este proceso despiertan la espera al terminar.
+    """
+    limite = time.monotonic() + max(0.0, min(float(espera_segundos), MAX_ESPERA_SEGUNDOS))
+    while True:
+        trabajo = obtener_trabajo(trabajo_id, incluir_resultado=False)
+        if trabajo is None:
+            return None
+        restante = limite - time.monotonic()
+        if trabajo['estado'] in ESTADOS_FINALES or restante <= 0:
+            break
+        with _cambio_estado:
+            _cambio_estado.wait(min(restante, INTERVALO_SEGUNDOS))
+    return obtener_trabajo(trabajo_id) if trabajo['estado'] == TERMINADO else trabajo
+
+
+class TrabajadoresCola:
+    """Threads que consumen la cola en este proceso"""
+
+    def __init__(self, hilos: int = HILOS, intervalo: float = INTERVALO_SEGUNDOS):
+        self.hilos = hilos
+        self.intervalo = intervalo
+        self.pid = os.getpid()
+        self.nombre = f"{socket.gethostname()}:{self.pid}"
+        self._detener = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._ultimo_mantenimiento = 0.0
+        self.procesados = 0
+        self.errores = 0
+        self.ocupados = 0
+        self.segundos_ejecucion = 0.0
+        self.ultimo_error: Optional[str] = None
+
+    def iniciar(self):
+        for i in range(self.hilos):
+            thread = threading.Thread(target=self._bucle, name=f"cola-planes-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def detener(self):
+        self._detener.set()
+        _hay_trabajo.set()
+
+    @property
+    def activo(self) -> bool:
+        return any(t.is_alive() for t in self._threads) and not self._detener.is_set()
+
+    def _bucle(self):
+        espera = self.intervalo
+        while not self._detener.is_set():
+            try:
+                asegurar_tabla()
+                self._mantenimiento_periodico()
+                procesado = self.procesar_uno()
+                espera = self.intervalo
+            except Exception as e:
+                # Sin BD: reintentar con espera creciente sin inundar el log
+                if self.ultimo_error != str(e):
+                    print(f"[WARN]  Cola de planes: {e}")
+                self.ultimo_error = str(e)
+                procesado = False
+                espera = min(espera * 2, 30.0)
+            if not procesado:
+                _hay_trabajo.wait(espera)
+                _hay_trabajo.clear()
+
+    def _mantenimiento_periodico(self):
+        with self._lock:
+            if time.monotonic() - self._ultimo_mantenimiento < MANTENIMIENTO_SEGUNDOS:
+                return
+            self._ultimo_mantenimiento = time.monotonic()
+        mantenimiento()
+
+    def procesar_uno(self) -> bool:
+        """Reclama y ejecuta un trabajo; False si la cola estaba vacía"""
+        trabajador = f"{self.nombre}:{threading.current_thread().name}"
+        trabajo = reclamar(trabajador)
+        if trabajo is None:
+            return False
+        trabajo_id, paciente_id, parametros, intentos = trabajo
+        with self._lock:
+            self.ocupados += 1
+        inicio = time.perf_counter()
+        try:
+            resultado = ejecutar_trabajo(paciente_id, parametros or {})
+            _finalizar(trabajo_id, trabajador, intentos, TERMINADO, resultado=resultado)
+            exito = True
+        except Exception as e:
+            print(f"[WARN]  Cola de planes: trabajo {trabajo_id} falló: {e}")
+            _finalizar(trabajo_id, trabajador, intentos, ERROR, error=str(e))
+            exito = False
+        segundos = time.perf_counter() - inicio
+        with self._lock:
+            self.ocupados -= 1
+            self.procesados += 1
+            self.errores += 0 if exito else 1
+            self.segundos_ejecucion += segundos
+        print(f"[INFO] Cola de planes: trabajo {trabajo_id} ({'ok' if exito else 'error'}) en {segundos:.1f}s")
+        return True
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            return {
+                'activo': self.activo,
+                'pid': self.pid,
+                'hilos': self.hilos,
+                'ocupados': self.ocupados,
+                'procesados': self.procesados,
+                'errores': self.errores,
+                'ejecucion_promedio_s': round(self.segundos_ejecucion / self.procesados, 3) if self.procesados else None,
+                'ultimo_error': self.ultimo_error,
+            }
+
+
+_trabajadores: Optional[TrabajadoresCola] = None
+_lock = threading.Lock()
+
+
+def iniciar_trabajadores(hilos: int = HILOS) -> Optional[TrabajadoresCola]:
+    """
+    Inicia los trabajadores del proceso actual (idempotente, por pid como el
+    vigilante de modelos). Con COLA_PLANES_HILOS=0 el proceso solo encola.
+    """
+    global _trabajadores
+    if hilos <= 0:
+        return None
+    with _lock:
+        if _trabajadores is not None and _trabajadores.pid == os.getpid() and _trabajadores.activo:
+            return _trabajadores
+        _trabajadores = TrabajadoresCola(hilos)
+        _trabajadores.iniciar()
+        print(f"[INFO] Cola de planes: {hilos} trabajador(es) en pid {_trabajadores.pid}")
+        return _trabajadores
+
+
+def detener_trabajadores():
+    """Detiene los trabajadores del proceso actual (p. ej. en el maestro de gunicorn)"""
+    with _lock:
+        if _trabajadores is not None and _trabajadores.pid == os.getpid():
+            _trabajadores.detener()
+
+
+def estadisticas_cola() -> Dict:
+    """Profundidad de la cola por estado, tiempos de los últimos terminados y trabajadores locales"""
+    asegurar_tabla()
+    por_estado = {estado: 0 for estado in (PENDIENTE, EN_PROCESO, TERMINADO, ERROR)}
+    for estado, cantidad in fetch_all("SELECT estado, count(*) FROM plan_trabajo GROUP BY estado") or []:
+        por_estado[estado] = cantidad
+    tiempos = fetch_one("""
+        SELECT count(*),
+               avg(extract(epoch FROM iniciado_en - creado_en)),
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY extract(epoch FROM iniciado_en - creado_en)),
+               avg(extract(epoch FROM terminado_en - iniciado_en)),
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY extract(epoch FROM terminado_en - iniciado_en))
+        FROM plan_trabajo
+        WHERE estado = 'terminado' AND terminado_en > now() - interval '1 hour'
+    """)
+    antiguedad = fetch_one("""
+        SELECT extract(epoch FROM now() - min(creado_en)) FROM plan_trabajo WHERE estado = 'pendiente'
+    """)
+
+    def _redondear(valor):
+        return round(float(valor), 3) if valor is not None else None
+
+    trabajadores = _trabajadores
+    return {
+        'profundidad': por_estado[PENDIENTE],
+        'por_estado': por_estado,
+        'pendiente_mas_antiguo_s': _redondear(antiguedad[0]) if antiguedad else None,
+        'ultima_hora': {
+            'terminados': tiempos[0] if tiempos else 0,
+            'espera_promedio_s': _redondear(tiempos[1]) if tiempos else None,
+            'espera_p95_s': _redondear(tiempos[2]) if tiempos else None,
+            'ejecucion_promedio_s': _redondear(tiempos[3]) if tiempos else None,
+            'ejecucion_p95_s': _redondear(tiempos[4]) if tiempos else None,
+        },
+        'trabajadores': (trabajadores.estadisticas()
+                         if trabajadores is not None and trabajadores.pid == os.getpid()
+                         else {'activo': False}),
+    }
+
+
+def main():
+    """Proceso dedicado a la cola: python -m Core.cola_planes [--hilos N]"""
+    import argparse
+    parser = argparse.ArgumentParser(description='Trabajadores de la cola de planes')
+    parser.add_argument('--hilos', type=int, default=max(HILOS, 1))
+    args = parser.parse_args()
+    trabajadores = iniciar_trabajadores(args.hilos)
+    try:
+        while trabajadores.activo:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        trabajadores.detener()
+
+
+if __name__ == "__main__":
+    main()
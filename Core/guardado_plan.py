@@ -0,0 +1,222 @@
+# guardado_plan.py
+# Guardado de un plan (POST /api/planes) en una sola transacción
+#
+# Antes cada comida era un INSERT ... RETURNING, cada alimento un SELECT al
+# catálogo y cada plan_alimento un execute() con su propia conexión y commit:
+# cientos de idas y vueltas por semana. Ahora:
+#   1. INSERT del plan (RETURNING id),
+#   2. un SELECT de todos los ingredientes referenciados (id = ANY / nombre = ANY),
+#   3. un INSERT de varias filas en plan_detalle (RETURNING id, dia, tiempo),
+#   4. COPY (o executemany) de todas las filas de plan_alimento,
+# todo en la misma conexión y con un único commit. Las reglas por alimento
+# (cantidad, unidad, macros desde el catálogo si faltan, CG) son las de siempre.
+# Todo pasa por los helpers de Transaccion, así que cada paso aparece en
+# /admin/bd/estadisticas como cualquier otra sentencia.
+
+import os
+import re
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from Core.bd_conexion import registrar_sentencia, run_transaction
+
+# COPY es lo más rápido; PLAN_GUARDADO_COPY=0 vuelve a executemany (pipeline)
+USAR_COPY = os.getenv("PLAN_GUARDADO_COPY", "1") != "0"
+
+# Mapeo de nombres de comidas a códigos
+TIEMPO_MAP = {
+    'desayuno': 'des',
+    'media_manana': 'mm',
+    'almuerzo': 'alm',
+    'media_tarde': 'mt',
+    'cena': 'cena'
+}
+
+COLUMNAS_ALIMENTO = ('plan_detalle_id', 'ingrediente_id', 'cantidad', 'unidad',
+                     'kcal', 'cho', 'pro', 'fat', 'fibra', 'cg')
+
+SQL_INGREDIENTES = """
+    SELECT id, nombre, kcal, cho, pro, fat, fibra, porcion_base, unidad_base, ig
+    FROM ingrediente
+    WHERE activo = TRUE AND (id = ANY(%s::bigint[]) OR nombre = ANY(%s::text[]))
+    ORDER BY id
+"""
+registrar_sentencia("ingredientes_plan", SQL_INGREDIENTES)
+
+
+def comidas_plan(plan: Dict) -> List[Tuple[date, str, List[Dict]]]:
+    """(fecha, tiempo, alimentos) de cada comida con alimentos, en el orden del plan.
+
+    Si la misma fecha y tiempo aparecen dos veces se juntan en un solo detalle.
+    """
+    comidas = {}
+    for semana in plan.get('semanas', []):
+        for dia_data in semana.get('dias', []):
+            dia_fecha_str = dia_data.get('fecha')
+            if not dia_fecha_str:
+                continue
+            try:
+                dia_fecha = datetime.strptime(dia_fecha_str, '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                continue
+            for comida_nombre, comida_data in (dia_data.get('comidas') or {}).items():
+                tiempo_codigo = TIEMPO_MAP.get(comida_nombre)
+                alimentos = (comida_data or {}).get('alimentos') or []
+                if not tiempo_codigo or not alimentos:
+                    continue
+                comidas.setdefault((dia_fecha, tiempo_codigo), []).extend(alimentos)
+    return [(dia, tiempo, alimentos) for (dia, tiempo), alimentos in comidas.items()]
+
+
+def referencia_alimento(alimento: Dict) -> Optional[Tuple[str, object]]:
+    """('id', int) si trae ingrediente_id (más confiable), si no ('nombre', str)"""
+    ingrediente_id = alimento.get('ingrediente_id')
+    if ingrediente_id:
+        try:
+            return 'id', int(ingrediente_id)
+        except (TypeError, ValueError):
+            return 'id', ingrediente_id
+    nombre = alimento.get('nombre') or (alimento.get('ingrediente') or {}).get('nombre')
+    return ('nombre', nombre) if nombre else None
+
+
+def _nutriente(valor, por_100g: float, factor: float) -> float:
+    # Del objeto si viene y no es 0; si no, desde el catálogo según la cantidad
+    if valor is None or valor == 0:
+        return por_100g * factor
+    return float(valor or 0)
+
+
+def fila_alimento(alimento: Dict, ingrediente: tuple) -> tuple:
+    """Fila de plan_alimento (sin plan_detalle_id) a partir del alimento y su fila de catálogo"""
+    ingrediente_id, _, kcal_100g, cho_100g, pro_100g, fat_100g, fibra_100g, porcion_base, unidad_base, ig = ingrediente
+    porcion_base = float(porcion_base or 100)
+    unidad_base = unidad_base or 'g'
+    ig = float(ig or 0)
+
+    # Extraer cantidad y unidad
+    cantidad = alimento.get('cantidad_num')
+    cantidad_str = alimento.get('cantidad', '')
+    unidad = alimento.get('unidad') or unidad_base
+    if cantidad is None and cantidad_str:
+        # Extraer número y unidad (ej: "120g" -> 120, "g")
+        match = re.match(r'(\d+\.?\d*)\s*(\w*)', str(cantidad_str))
+        if match:
+            cantidad = float(match.group(1))
+            unidad = match.group(2) or unidad_base
+    # Si no hay cantidad, usar porción base por defecto
+    cantidad = float(cantidad) if cantidad else porcion_base
+
+    factor = cantidad / 100.0
+    kcal = _nutriente(alimento.get('kcal'), float(kcal_100g or 0), factor)
+    cho = _nutriente(alimento.get('cho'), float(cho_100g or 0), factor)
+    pro = _nutriente(alimento.get('pro'), float(pro_100g or 0), factor)
+    fat = _nutriente(alimento.get('fat'), float(fat_100g or 0), factor)
+    fibra = _nutriente(alimento.get('fibra'), float(fibra_100g or 0), factor)
+
+    # CG (carga glucémica) si hay IG; sin IG se aproxima con los CHO
+    cg = None
+    if cho and ig:
+        cg = round(cho * (ig / 100.0), 2)
+    elif cho:
+        cg = round(cho, 2)
+
+    return (ingrediente_id, cantidad, unidad, round(kcal, 2), round(cho, 2),
+            round(pro, 2), round(fat, 2), round(fibra, 2), cg)
+
+
+def buscar_ingredientes(tx, comidas: List[Tuple[date, str, List[Dict]]]) -> Tuple[Dict, Dict]:
+    """Una consulta para todos los ingredientes del plan: ({id: fila}, {nombre: fila})"""
+    ids, nombres = set(), set()
+    for _, _, alimentos in comidas:
+        for alimento in alimentos:
+            referencia = referencia_alimento(alimento)
+            if referencia and referencia[0] == 'id' and isinstance(referencia[1], int):
+                ids.add(referencia[1])
+            elif referencia and referencia[0] == 'nombre':
+                nombres.add(referencia[1])
+    if not ids and not nombres:
+        return {}, {}
+    por_id, por_nombre = {}, {}
+    for fila in tx.fetch_all_prepared("ingredientes_plan", (sorted(ids), sorted(nombres))):
+        por_id[fila[0]] = fila
+        por_nombre.setdefault(fila[1], fila)  # el de menor id, como el LIMIT 1 anterior
+    return por_id, por_nombre
+
+
+def insertar_detalles(tx, plan_id: int, comidas: List[Tuple[date, str, List[Dict]]]) -> Dict[tuple, int]:
+    """Un INSERT de varias filas en plan_detalle: {(dia, tiempo): detalle_id}"""
+    if not comidas:
+        return {}
+    valores = ", ".join(["(%s, %s, %s)"] * len(comidas))
+    parametros = [valor for dia, tiempo, _ in comidas for valor in (plan_id, dia, tiempo)]
+    filas = tx.fetch_all(f"INSERT INTO plan_detalle (plan_id, dia, tiempo) VALUES {valores} RETURNING id, dia, tiempo",
+                         parametros)
+    return {(dia, tiempo): detalle_id for detalle_id, dia, tiempo in filas}
+
+
+def insertar_alimentos(tx, filas: List[tuple], usar_copy: bool = USAR_COPY):
+    if not filas:
+        return
+    columnas = ", ".join(COLUMNAS_ALIMENTO)
+    if usar_copy:
+        with tx.copy(f"COPY plan_alimento ({columnas}) FROM STDIN") as copia:
+            for fila in filas:
+                copia.write_row(fila)
+    else:
+        marcadores = ", ".join(["%s"] * len(COLUMNAS_ALIMENTO))
+        tx.executemany(f"INSERT INTO plan_alimento ({columnas}) VALUES ({marcadores})", filas)
+
+
+def guardar_detalle_plan(tx, plan_id: int, plan: Dict, usar_copy: bool = USAR_COPY) -> Dict:
+    """Comidas y alimentos del plan dentro de la Transaccion dada (sin commit: lo hace quien llama)"""
+    comidas = comidas_plan(plan)
+    por_id, por_nombre = buscar_ingredientes(tx, comidas)
+    detalles = insertar_detalles(tx, plan_id, comidas)
+
+    filas, omitidos = [], 0
+    for dia, tiempo, alimentos in comidas:
+        detalle_id = detalles[(dia, tiempo)]
+        for alimento in alimentos:
+            referencia = referencia_alimento(alimento)
+            if not referencia:
+                print(f"⚠️ Alimento sin nombre ni ID: {alimento}")
+                omitidos += 1
+                continue
+            tipo, valor = referencia
+            ingrediente = (por_id if tipo == 'id' else por_nombre).get(valor)
+            if not ingrediente:
+                print(f"⚠️ Ingrediente con ID {valor} no encontrado" if tipo == 'id'
+                      else f"⚠️ Ingrediente no encontrado: {valor}")
+                omitidos += 1
+                continue
+            filas.append((detalle_id,) + fila_alimento(alimento, ingrediente))
+
+    insertar_alimentos(tx, filas, usar_copy)
+    return {'comidas': len(detalles), 'alimentos': len(filas), 'omitidos': omitidos}
+
+
+def _guardar_plan_tx(tx, paciente_id, metas_json, fecha_ini, fecha_fin, estado, creado_por, plan,
+                     version_modelo) -> Tuple[int, Dict]:
+    plan_id = tx.fetch_one("""
+        INSERT INTO plan (paciente_id, metas_json, fecha_ini, fecha_fin, estado, creado_por, version_modelo)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+    """, (paciente_id, metas_json, fecha_ini, fecha_fin, estado, creado_por, version_modelo))[0]
+    return plan_id, guardar_detalle_plan(tx, plan_id, plan)
+
+
+def guardar_plan(paciente_id: int, metas_json: str, fecha_ini: date, fecha_fin: date, estado: str,
+                 creado_por: Optional[int], plan: Dict, version_modelo: str = 'motor_recomendacion_v1') -> Tuple[int, Dict]:
+    """Inserta plan, comidas y alimentos en una transacción. Devuelve (plan_id, resumen).
+
+    run_transaction repite la transacción completa ante errores SSL o de
+    conexión (si falla, no queda nada a medias).
+    """
+    inicio = time.perf_counter()
+    plan_id, resumen = run_transaction(_guardar_plan_tx, paciente_id, metas_json, fecha_ini, fecha_fin,
+                                       estado, creado_por, plan, version_modelo)
+    print(f"[OK] Plan {plan_id} guardado: {resumen['comidas']} comidas, {resumen['alimentos']} alimentos "
+          f"({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+    return plan_id, resumen
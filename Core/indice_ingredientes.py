@@ -0,0 +1,212 @@
+# indice_ingredientes.py
+# Índice de los ingredientes de un plan por grupo, subgrupo, banda de IG, tipo de
+# proteína, clase de cereal y aptitud por comida
+#
+# Los _sugerir_*_variado vuelven a recorrer las listas de cada grupo en cada día
+# y comida (parsear tags, buscar palabras en el nombre, ordenar por IG). Aquí:
+#   - los atributos de cada ingrediente se calculan una vez por versión del
+#     catálogo (ver Core/catalogo_ingredientes.py) y se reutilizan entre planes;
+#   - GruposIngredientes (el dict de grupos que ya recibían los constructores de
+#     comidas) guarda, para cada faceta, una máscara de bits con las posiciones
+#     de los ingredientes del grupo que la cumplen. Una consulta intersecta
+#     máscaras y la lista resultante (en el orden original, el del ranking ML)
+#     se memoriza, así que los días siguientes la obtienen en O(1).
+
+import json
+import threading
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+GRUPOS_PLAN = (
+    'GRUPO2_VERDURAS',
+    'GRUPO5_CARNES',
+    'GRUPO1_CEREALES',
+    'GRUPO3_FRUTAS',
+    'GRUPO4_LACTEOS',
+    'GRUPO7_GRASAS',
+)
+
+# Bandas de índice glucémico (sin dato cuenta como alto, igual que `ig or 100`)
+IG_BAJO = 55
+IG_ALTO = 70
+
+PALABRAS_PESCADO = ('sardina', 'atún', 'salmón', 'trucha', 'pescado', 'camarón', 'marisco')
+PALABRAS_CARNE_ROJA = ('res', 'cerdo', 'carne de res', 'carne de cerdo')
+PALABRAS_TUBERCULO = ('papa', 'camote', 'batata', 'yuca', 'ñame', 'oca')
+PALABRAS_LEGUMBRE = ('lenteja', 'frijol', 'garbanzo', 'alubia', 'haba', 'pallar', 'tarwi', 'judía', 'fréjol')
+TAGS_DESAYUNO = ('desayuno', 'pan', 'breakfast')
+GRASA_BAJA = 5
+
+
+class AtributosIngrediente(NamedTuple):
+    grupo: Optional[str]
+    subgrupo: Optional[str]
+    banda_ig: str            # 'bajo' | 'medio' | 'alto'
+    clase_cereal: str        # 'cereal' | 'tuberculo' | 'legumbre'
+    pescado: bool
+    carne_roja: bool
+    desayuno: bool           # tags de desayuno/pan o 'pan' en el nombre
+    bajo_grasa: bool         # fat informado y < 5
+
+
+def banda_ig(ig) -> str:
+    ig = ig or 100
+    if ig < IG_BAJO:
+        return 'bajo'
+    return 'medio' if ig < IG_ALTO else 'alto'
+
+
+def clase_cereal(nombre: str) -> str:
+    """Subcategoría de un alimento del GRUPO1_CEREALES según su nombre (en minúsculas)"""
+    if any(t in nombre for t in PALABRAS_TUBERCULO):
+        return 'tuberculo'
+    if any(l in nombre for l in PALABRAS_LEGUMBRE):
+        return 'legumbre'
+    return 'cereal'
+
+
+def _tags(ingrediente: Dict) -> List[str]:
+    tags = ingrediente.get('tags', [])
+    if isinstance(tags, str):
+        try:
+            tags = json.loads(tags) if tags else []
+        except ValueError:
+            tags = []
+    return [str(t).lower() for t in tags] if isinstance(tags, list) else []
+
+
+def calcular_atributos(ingrediente: Dict) -> AtributosIngrediente:
+    nombre = str(ingrediente.get('nombre', '')).lower()
+    fat = ingrediente.get('fat', 0)
+    return AtributosIngrediente(
+        grupo=ingrediente.get('grupo'),
+        subgrupo=ingrediente.get('subgrupo_intercambio'),
+        banda_ig=banda_ig(ingrediente.get('ig')),
+        clase_cereal=clase_cereal(nombre),
+        pescado=any(p in nombre for p in PALABRAS_PESCADO),
+        carne_roja=any(p in nombre for p in PALABRAS_CARNE_ROJA),
+        desayuno=any(t in TAGS_DESAYUNO for t in _tags(ingrediente)) or 'pan' in nombre,
+        bajo_grasa=bool(fat) and fat < GRASA_BAJA,
+    )
+
+
+class _CacheAtributos:
+    """Atributos por id de ingrediente para una versión del catálogo"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.por_id: Dict[Hashable, AtributosIngrediente] = {}
+
+
+_cache = _CacheAtributos()
+
+
+def _version_actual() -> Optional[int]:
+    try:
+        from Core.catalogo_ingredientes import version_catalogo
+        return version_catalogo()
+    except Exception:
+        return None
+
+
+def atributos_catalogo(version: Optional[int]) -> Dict[Hashable, AtributosIngrediente]:
+    """Atributos cacheados para `version` (se descartan al cambiar la versión del catálogo)"""
+    with _cache.lock:
+        if _cache.version != version:
+            _cache.version = version
+            _cache.por_id = {}
+        return _cache.por_id
+
+
+def atributos_ingrediente(ingrediente: Dict, cache: Optional[Dict] = None) -> AtributosIngrediente:
+    """
+    Atributos de un ingrediente, del caché por id (por defecto el de la última
+    versión indexada; cada plan indexa sus grupos antes de consultar)
+    """
+    clave = ingrediente.get('id')
+    if cache is None:
+        cache = _cache.por_id
+    if clave is None:
+        return calcular_atributos(ingrediente)
+    atributos = cache.get(clave)
+    if atributos is None:
+        atributos = cache[clave] = calcular_atributos(ingrediente)
+    return atributos
+
+
+class GruposIngredientes(dict):
+    """
+    Ingredientes de un plan por grupo ({'GRUPO1_CEREALES': [...], ...}, como antes)
+    con consultas por faceta:
+
+        grupos.candidatos('GRUPO5_CARNES', pescado=True)
+        grupos.candidatos('GRUPO1_CEREALES', banda_ig='bajo')
+        grupos.ids('GRUPO4_LACTEOS', bajo_grasa=True)
+
+    Las facetas son los campos de AtributosIngrediente (salvo grupo). Las listas
+    devueltas se comparten entre llamadas: no modificarlas.
+    """
+
+    def __init__(self, ingredientes: List[Dict], version: Optional[int] = None):
+        super().__init__({grupo: [] for grupo in GRUPOS_PLAN})
+        self.ingredientes = ingredientes
+        self.version = _version_actual() if version is None else version
+        cache = atributos_catalogo(self.version)
+        self._mascaras: Dict[Tuple[str, str, Hashable], int] = {}
+        self._consultas: Dict[Hashable, object] = {}
+        for ingrediente in ingredientes:
+            grupo = ingrediente['grupo']
+            lista = self.get(grupo)
+            if lista is None:
+                continue
+            bit = 1 << len(lista)
+            lista.append(ingrediente)
+            atributos = atributos_ingrediente(ingrediente, cache)
+            for faceta, valor in zip(AtributosIngrediente._fields[1:], atributos[1:]):
+                clave = (grupo, faceta, valor)
+                self._mascaras[clave] = self._mascaras.get(clave, 0) | bit
+
+    def __reduce__(self):
+        # A los procesos del optimizador se envía solo la lista original
+        return (GruposIngredientes, (self.ingredientes, self.version))
+
+    def _mascara(self, grupo: str, facetas: Dict) -> int:
+        mascara = (1 << len(self.get(grupo, ()))) - 1
+        for faceta, valor in facetas.items():
+            mascara &= self._mascaras.get((grupo, faceta, valor), 0)
+        return mascara
+
+    def candidatos(self, grupo: str, **facetas) -> List[Dict]:
+        """Ingredientes del grupo que cumplen todas las facetas, en el orden original"""
+        if not facetas:
+            return self.get(grupo, [])
+        clave = ('candidatos', grupo, tuple(sorted(facetas.items())))
+        resultado = self._consultas.get(clave)
+        if resultado is None:
+            lista = self.get(grupo, [])
+            mascara = self._mascara(grupo, facetas)
+            resultado = [lista[i] for i in range(mascara.bit_length()) if (mascara >> i) & 1]
+            self._consultas[clave] = resultado
+        return resultado
+
+    def ids(self, grupo: str, **facetas) -> Tuple:
+        """Ids de los candidatos (mismo orden que candidatos)"""
+        clave = ('ids', grupo, tuple(sorted(facetas.items())))
+        resultado = self._consultas.get(clave)
+        if resultado is None:
+            resultado = self._consultas[clave] = tuple(a.get('id') for a in self.candidatos(grupo, **facetas))
+        return resultado
+
+    def consulta(self, clave: Hashable, calcular: Callable[[], object]):
+        """Memoriza una derivación de los grupos (p. ej. una lista ordenada) durante el plan"""
+        resultado = self._consultas.get(clave)
+        if resultado is None:
+            resultado = self._consultas[clave] = calcular()
+        return resultado
+
+
+def indexar_grupos(grupos: Dict) -> GruposIngredientes:
+    """GruposIngredientes a partir de un dict de grupos simple (o el mismo si ya lo es)"""
+    if isinstance(grupos, GruposIngredientes):
+        return grupos
+    return GruposIngredientes([a for lista in grupos.values() for a in lista])
@@ -0,0 +1,278 @@
+# metricas_bd.py
+# Métricas de la capa de BD: latencia por sentencia, espera del pool,
+# reintentos y registro de consultas lentas
+#
+# fetch_one / fetch_all / execute y transaction() (Core/bd_conexion.py) llaman
+# a registrar_consulta() en cada sentencia. Se agrupa por SQL normalizado
+# (espacios colapsados, literales como ?), con un histograma de latencias en
+# buckets fijos, filas devueltas/afectadas, errores y reintentos de la rama
+# SSL/conexión. La espera para obtener una conexión del pool va en su propio
+# histograma: si crece, POOL_MAX se quedó corto.
+#
+# Las sentencias que superan BD_LENTA_MS se imprimen y se guardan en un buffer
+# circular; si BD_EXPLAIN=1 se adjunta su EXPLAIN (una vez por SQL normalizado
+# cada BD_EXPLAIN_INTERVALO_SEG, para no duplicar la carga de las consultas
+# lentas). El EXPLAIN necesita otra conexión del pool, así que no corre en el
+# thread de la petición: va a una cola acotada (BD_EXPLAIN_COLA) que atiende un
+# thread del proceso, y el registro de la consulta lenta lo recibe después
+# ('explain' queda en None mientras tanto). Todo es por proceso:
+# /admin/bd/estadisticas muestra el del worker que atiende la petición.
+
+import os
+import re
+import time
+import queue
+import threading
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+USAR_METRICAS = os.getenv("BD_METRICAS", "1") != "0"
+LENTA_MS = float(os.getenv("BD_LENTA_MS", "500"))
+USAR_EXPLAIN = os.getenv("BD_EXPLAIN", "1") != "0"
+EXPLAIN_INTERVALO_SEG = float(os.getenv("BD_EXPLAIN_INTERVALO_SEG", "300"))
+# EXPLAIN pendientes como máximo; si la cola está llena se descarta el nuevo
+EXPLAIN_COLA = int(os.getenv("BD_EXPLAIN_COLA", "20"))
+MAX_LENTAS = int(os.getenv("BD_LENTAS_MAX", "100"))
+# Tope de SQL distintos; el resto se acumula en OTRAS (SQL armado con literales)
+MAX_SENTENCIAS = int(os.getenv("BD_METRICAS_MAX_SQL", "500"))
+
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+OTRAS = "(otras)"
+
+_RE_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_RE_ESPACIOS = re.compile(r"\s+")
+_RE_VALUES = re.compile(r"(\((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\))(?:\s*,\s*\1)+")
+
+
+def normalizar_sql(sql: str) -> str:
+    """Clave estable de una sentencia: sin literales, espacios ni VALUES repetidos"""
+    sql = _RE_LITERAL.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_ESPACIOS.sub(" ", sql).strip()
+    return _RE_VALUES.sub(r"\1, ...", sql)
+
+
+class Histograma:
+    """Conteo por buckets de ms (el último es '> 5000')"""
+
+    def __init__(self):
+        self.conteos = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0
+        self.suma_ms = 0.0
+        self.max_ms = 0.0
+
+    def agregar(self, ms: float):
+        self.conteos[bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.suma_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentil(self, p: float) -> Optional[float]:
+        """Cota superior del bucket donde cae el percentil p (0-100)"""
+        if not self.total:
+            return None
+        objetivo = self.total * p / 100.0
+        acumulado = 0
+        for i, conteo in enumerate(self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return min(float(BUCKETS_MS[i]), self.max_ms) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def resumen(self) -> Dict:
+        etiquetas = [f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+        return {
+            'n': self.total,
+            'media_ms': round(self.suma_ms / self.total, 2) if self.total else None,
+            'p50_ms': self.percentil(50),
+            'p95_ms': self.percentil(95),
+            'p99_ms': self.percentil(99),
+            'max_ms': round(self.max_ms, 2),
+            'buckets_ms': {e: c for e, c in zip(etiquetas, self.conteos) if c},
+        }
+
+
+class MetricasSentencia:
+    def __init__(self):
+        self.latencia = Histograma()
+        self.filas = 0
+        self.errores = 0
+        self.reintentos = 0
+        self.lentas = 0
+
+    def resumen(self) -> Dict:
+        return {**self.latencia.resumen(), 'filas': self.filas, 'errores': self.errores,
+                'reintentos': self.reintentos, 'lentas': self.lentas}
+
+
+class MetricasBD:
+    """Métricas de un proceso, seguras entre threads"""
+
+    def __init__(self, lenta_ms: float = LENTA_MS, max_lentas: int = MAX_LENTAS,
+                 max_sentencias: int = MAX_SENTENCIAS):
+        self.lenta_ms = lenta_ms
+        self.max_sentencias = max_sentencias
+        self._lock = threading.Lock()
+        self._sentencias: Dict[str, MetricasSentencia] = {}
+        self._espera_pool = Histograma()
+        self._lentas = deque(maxlen=max_lentas)
+        self._ultimo_explain: Dict[str, float] = {}
+        self._desde = time.time()
+        self._cola_explain = None
+        self._pid_explain = None
+
+    def _sentencia(self, clave: str) -> MetricasSentencia:
+        # Llamar con el lock tomado
+        metricas = self._sentencias.get(clave)
+        if metricas is None:
+            if len(self._sentencias) >= self.max_sentencias:
+                clave = OTRAS
+            metricas = self._sentencias.setdefault(clave, MetricasSentencia())
+        return metricas
+
+    def registrar(self, sql: str, segundos: float, filas: int = 0, espera: Optional[float] = None,
+                  explicar: Optional[Callable[[], Optional[str]]] = None):
+        """Una sentencia terminada: latencia de ejecución (sin la espera del pool) y filas"""
+        clave = normalizar_sql(sql)
+        ms = segundos * 1000
+        lenta = ms >= self.lenta_ms
+        with self._lock:
+            metricas = self._sentencia(clave)
+            metricas.latencia.agregar(ms)
+            metricas.filas += max(filas or 0, 0)
+            if espera is not None:
+                self._espera_pool.agregar(espera * 1000)
+            if not lenta:
+                return
+            metricas.lentas += 1
+            ahora = time.time()
+            pedir_explain = (USAR_EXPLAIN and explicar is not None
+                             and ahora - self._ultimo_explain.get(clave, 0) >= EXPLAIN_INTERVALO_SEG)
+            if pedir_explain:
+                self._ultimo_explain[clave] = ahora
+
+        print(f"[WARN]  Consulta lenta ({ms:.0f} ms, {filas} filas): {clave[:200]}")
+        lenta_registro = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'sql': clave,
+            'ms': round(ms, 1),
+            'filas': filas,
+            'explain': None,
+        }
+        with self._lock:
+            self._lentas.append(lenta_registro)
+        if pedir_explain:
+            self._encolar_explain(clave, lenta_registro, explicar)
+
+    def _encolar_explain(self, clave: str, lenta_registro: Dict, explicar: Callable[[], Optional[str]]):
+        # El thread se crea en el proceso que lo usa (no sobrevive a un fork)
+        with self._lock:
+            if self._pid_explain != os.getpid():
+                self._cola_explain = queue.Queue(maxsize=EXPLAIN_COLA)
+                self._pid_explain = os.getpid()
+                threading.Thread(target=self._atender_explain, args=(self._cola_explain,),
+                                 name="explain-bd", daemon=True).start()
+            cola = self._cola_explain
+        try:
+            cola.put_nowait((lenta_registro, explicar))
+        except queue.Full:
+            with self._lock:
+                lenta_registro['explain'] = "(EXPLAIN omitido: cola llena)"
+                self._ultimo_explain.pop(clave, None)  # que la próxima lenta lo vuelva a pedir
+
+    def _atender_explain(self, cola: queue.Queue):
+        while True:
+            lenta_registro, explicar = cola.get()
+            try:
+                plan = explicar()
+            except Exception as e:
+                plan = f"(EXPLAIN falló: {e})"
+            with self._lock:
+                lenta_registro['explain'] = plan
+
+    def registrar_espera(self, espera: float):
+        with self._lock:
+            self._espera_pool.agregar(espera * 1000)
+
+    def registrar_reintento(self, sql: str):
+        with self._lock:
+            self._sentencia(normalizar_sql(sql)).reintentos += 1
+
+    def registrar_error(self, sql: str):
+        with self._lock:
+            self._sentencia(normalizar_sql(sql)).errores += 1
+
+    def consultas_lentas(self) -> List[Dict]:
+        with self._lock:
+            return [dict(lenta) for lenta in reversed(self._lentas)]
+
+    def estadisticas(self, top: int = 20, orden: str = 'total') -> Dict:
+        """Las `top` sentencias con más tiempo total (orden='total'), más llamadas ('n') o peor p95 ('p95')"""
+        with self._lock:
+            sentencias = [(clave, m.resumen(), m.latencia.suma_ms) for clave, m in self._sentencias.items()]
+            espera = self._espera_pool.resumen()
+            total = sum(s[1]['n'] for s in sentencias)
+        criterio = {
+            'n': lambda s: s[1]['n'],
+            'p95': lambda s: s[1]['p95_ms'] or 0,
+        }.get(orden, lambda s: s[2])
+        sentencias.sort(key=criterio, reverse=True)
+        return {
+            'activo': USAR_METRICAS,
+            'desde': datetime.fromtimestamp(self._desde).isoformat(timespec='seconds'),
+            'lenta_ms': self.lenta_ms,
+            'sentencias_distintas': len(sentencias),
+            'sentencias_total': total,
+            'reintentos': sum(s[1]['reintentos'] for s in sentencias),
+            'errores': sum(s[1]['errores'] for s in sentencias),
+            'espera_pool': espera,
+            'sentencias': [{'sql': clave, 'tiempo_total_ms': round(suma, 1), **resumen}
+                           for clave, resumen, suma in sentencias[:top]],
+        }
+
+    def reiniciar(self):
+        with self._lock:
+            self._sentencias.clear()
+            self._espera_pool = Histograma()
+            self._lentas.clear()
+            self._ultimo_explain.clear()
+            self._desde = time.time()
+
+
+_metricas = MetricasBD()
+
+
+def registrar_consulta(sql: str, segundos: float, filas: int = 0, espera: Optional[float] = None,
+                       explicar: Optional[Callable[[], Optional[str]]] = None):
+    if USAR_METRICAS:
+        _metricas.registrar(sql, segundos, filas, espera, explicar)
+
+
+def registrar_espera_pool(espera: float):
+    if USAR_METRICAS:
+        _metricas.registrar_espera(espera)
+
+
+def registrar_reintento(sql: str):
+    if USAR_METRICAS:
+        _metricas.registrar_reintento(sql)
+
+
+def registrar_error(sql: str):
+    if USAR_METRICAS:
+        _metricas.registrar_error(sql)
+
+
+def consultas_lentas() -> List[Dict]:
+    return _metricas.consultas_lentas()
+
+
+def estadisticas_bd(top: int = 20, orden: str = 'total') -> Dict:
+    return _metricas.estadisticas(top, orden)
+
+
+def reiniciar_metricas():
+    _metricas.reiniciar()
@@ -4,13 +4,13 @@
 import math
 from decimal import Decimal
 from datetime import date, datetime, timedelta
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple, Optional
+from dataclasses import asdict, dataclass
 import json
 import os
 import sys
+import time
 from pathlib import Path
-import pickle
 
 # Verificar que las dependencias ML estén disponibles
 try:
@@ -24,6 +24,23 @@ except ImportError as e:
     pd = None
 
 from Core.bd_conexion import fetch_one, fetch_all, execute
+from Core.cache_ingredientes import clave_ingredientes, obtener_ingredientes, guardar_ingredientes
+from Core.cache_planes import clave_plan, obtener_plan, guardar_plan
+from Core.catalogo_ingredientes import obtener_catalogo, construir_matriz, version_catalogo, COL
+from Core.acumulador_nutrientes import AcumuladorDia
+from Core.perfil_paciente import InstantaneaPerfil, cargar_perfil
+from Core.plan_compacto import Porcion, dia_a_formato_ui, es_comida, parsear_cantidad, plan_a_formato_ui
+from Core.seguimiento_repeticiones import SeguimientoRepeticiones, clave_ingrediente
+from Core.indice_ingredientes import GruposIngredientes, atributos_ingrediente, indexar_grupos
+from Core.plantillas_comidas import TIEMPOS_PLANTILLA, obtener_biblioteca, version_biblioteca
+from Core.registro_modelos import (
+    obtener_modelo,
+    obtener_registro,
+    MODELO_CONTROL_GLUCEMICO,
+    MODELO_RESPUESTA_GLUCEMICA,
+    MODELO_SELECCION_ALIMENTOS,
+    MODELO_OPTIMIZACION_COMBINACIONES,
+)
 
 @dataclass
 class PerfilPaciente:
@@ -64,6 +81,9 @@ class MetaNutricional:
 class MotorRecomendacion:
     """Motor principal para generar recomendaciones nutricionales"""
     
+    # Lotes más grandes se evalúan con sklearn/XGBoost (en C rinden más desde ~1000 filas)
+    MAX_FILAS_MODELO3_COMPILADO = 500
+    
     def __init__(self):
         # Parámetros específicos para diabetes tipo 2
         self.PARAMETROS_DIABETES = {
@@ -100,9 +120,22 @@ class MotorRecomendacion:
         self._scaler_respuesta_glucemica = None
         self._scaler_seleccion_alimentos = None
         self._scaler_combinaciones = None
+        self._combinaciones_compilado = None  # Ensemble del Modelo 3 en NumPy (arboles_compilados)
+        
+        # Versiones de los artefactos usados por esta instancia (nombre -> versión)
+        self._versiones_modelos = {}
+        
+        # Semilla del plan en curso (None: variar con la hora, como antes)
+        self._semilla = None
+
+    def _factor_semilla(self) -> int:
+        """Factor de variedad de los constructores de comidas (determinista si hay semilla)"""
+        if self._semilla is not None:
+            return int(self._semilla) % 1000
+        return int(time.time()) % 1000
 
     def _cargar_modelo_ml(self):
-        """Carga el modelo XGBoost y preprocesadores más recientes"""
+        """Carga el modelo XGBoost y preprocesadores más recientes (registro compartido)"""
         if self._modelo_ml is not None and self._preprocesadores_ml is not None:
             return  # Ya está cargado
         
@@ -112,194 +145,68 @@ class MotorRecomendacion:
             self._usar_ml = False
             return
         
-        try:
-            # Intentar importar xgboost
-            try:
-                import xgboost
-            except ImportError:
-                print("[WARN]  XGBoost no está instalado en este entorno Python")
-                print(f"   Python usado: {sys.executable}")
-                print("   Instalar con: pip install xgboost")
-                self._usar_ml = False
-                return
-            # Buscar el directorio de modelos (desde la raíz del proyecto)
-            base_dir = Path(__file__).parent.parent  # Subir un nivel desde Core/ a la raíz
-            modelos_dir = base_dir / "ApartadoInteligente" / "Entrenamiento" / "ModeloEntrenamiento"
-            
-            if not modelos_dir.exists():
-                print("[WARN]  Directorio de modelos no encontrado, usando sistema rule-based")
-                self._usar_ml = False
-                return
-            
-            # Buscar el modelo más reciente
-            # Buscar primero modelos simplificados (prioridad)
-            modelos_simplificados = list(modelos_dir.glob("modelo_xgboost_simplificado_*.pkl"))
-            if modelos_simplificados:
-                # Ordenar por fecha (más reciente primero)
-                modelos_simplificados.sort(reverse=True)
-                modelo_path = modelos_simplificados[0]
-                print(f"[OK] Usando modelo simplificado: {modelo_path.name}")
-            else:
-                # Si no hay simplificados, buscar modelos normales
-                modelos_xgboost = list(modelos_dir.glob("modelo_xgboost_*.pkl"))
-                if not modelos_xgboost:
-                    print("[WARN]  No se encontraron modelos XGBoost, usando sistema rule-based")
-                    self._usar_ml = False
-                    return
-                # Ordenar por fecha (más reciente primero)
-                modelos_xgboost.sort(reverse=True)
-                modelo_path = modelos_xgboost[0]
-                print(f"[OK] Usando modelo estándar: {modelo_path.name}")
-            
-            # Buscar preprocesadores correspondientes (mismo timestamp)
-            # El timestamp tiene formato: YYYYMMDD_HHMMSS (ej: 20251107_185913)
-            # Extraer las últimas dos partes del nombre (fecha y hora)
-            partes = modelo_path.stem.split('_')
-            if len(partes) >= 3:
-                # Tomar las últimas dos partes: fecha y hora
-                timestamp = '_'.join(partes[-2:])
-            else:
-                # Fallback: tomar solo la última parte
-                timestamp = partes[-1]
-            
-            # Determinar si es modelo simplificado o estándar
-            es_simplificado = 'simplificado' in modelo_path.stem
-            if es_simplificado:
-                prepro_path = modelos_dir / f"preprocesadores_simplificado_{timestamp}.pkl"
-            else:
-                prepro_path = modelos_dir / f"preprocesadores_{timestamp}.pkl"
-            
-            # Debug: mostrar qué está buscando
-            print(f"[DEBUG] Buscando preprocesadores: {prepro_path.name}")
-            print(f"[DEBUG] Ruta completa: {prepro_path}")
-            
-            if not prepro_path.exists():
-                print(f"[WARN]  Preprocesadores no encontrados para {timestamp}, usando sistema rule-based")
-                self._usar_ml = False
-                return
-            
-            # Cargar modelo y preprocesadores
-            with open(modelo_path, 'rb') as f:
-                self._modelo_ml = pickle.load(f)
-            
-            with open(prepro_path, 'rb') as f:
-                self._preprocesadores_ml = pickle.load(f)
-            
-            print(f"[OK] Modelo ML cargado: {modelo_path.name}")
-            
-        except Exception as e:
-            print(f"[WARN]  Error al cargar modelo ML: {e}, usando sistema rule-based")
+        entrada = obtener_modelo(MODELO_CONTROL_GLUCEMICO)
+        if not entrada.disponible:
             self._usar_ml = False
-            self._modelo_ml = None
-            self._preprocesadores_ml = None
+            return
+        
+        self._modelo_ml = entrada.get('modelo')
+        self._preprocesadores_ml = entrada.get('preprocesadores')
+        self._versiones_modelos[MODELO_CONTROL_GLUCEMICO] = entrada.version
     
     def _cargar_modelo_respuesta_glucemica(self):
-        """Carga el Modelo 1: Predicción de Respuesta Glucémica"""
+        """Carga el Modelo 1: Predicción de Respuesta Glucémica (registro compartido)"""
         if self._modelo_respuesta_glucemica is not None:
-            # Modelo ya cargado, no imprimir para evitar spam en logs
             return
         
         if not ML_AVAILABLE:
             print("[WARN]  ML_AVAILABLE = False, no se puede cargar Modelo 1")
             return
         
-        print("[DEBUG] Intentando cargar Modelo 1: Respuesta Glucémica...")
+        entrada = obtener_modelo(MODELO_RESPUESTA_GLUCEMICA)
+        if not entrada.disponible:
+            return
         
-        try:
-            # Usar ruta relativa desde la raíz del proyecto
-            base_dir = Path(__file__).parent.parent  # Subir un nivel desde Core/ a la raíz
-            modelo_path = base_dir / "ApartadoInteligente" / "ModeloML" / "modelo_respuesta_glucemica.pkl"
-            scaler_path = base_dir / "ApartadoInteligente" / "ModeloML" / "scaler_respuesta_glucemica.pkl"
-            
-            if not modelo_path.exists() or not scaler_path.exists():
-                print(f"[WARN]  Modelo de respuesta glucémica no encontrado en: {modelo_path}")
-                return
-            
-            with open(modelo_path, 'rb') as f:
-                self._modelo_respuesta_glucemica = pickle.load(f)
-            
-            with open(scaler_path, 'rb') as f:
-                self._scaler_respuesta_glucemica = pickle.load(f)
-            
-            print("[OK] Modelo de respuesta glucémica cargado")
-        except Exception as e:
-            print(f"[WARN]  Error al cargar modelo de respuesta glucémica: {e}")
+        self._modelo_respuesta_glucemica = entrada.get('modelo')
+        self._scaler_respuesta_glucemica = entrada.get('scaler')
+        self._versiones_modelos[MODELO_RESPUESTA_GLUCEMICA] = entrada.version
     
     def _cargar_modelo_seleccion_alimentos(self):
-        """Carga el Modelo 2: Selección Personalizada de Alimentos"""
+        """Carga el Modelo 2: Selección Personalizada de Alimentos (registro compartido)"""
         if self._modelo_seleccion_alimentos is not None:
-            # Modelo ya cargado, no imprimir para evitar spam en logs
             return
         
         if not ML_AVAILABLE:
             print("[WARN]  ML_AVAILABLE = False, no se puede cargar Modelo 2")
             return
         
-        print("[DEBUG] Intentando cargar Modelo 2: Selección de Alimentos...")
+        entrada = obtener_modelo(MODELO_SELECCION_ALIMENTOS)
+        if not entrada.disponible:
+            return
         
-        try:
-            # Usar ruta relativa desde la raíz del proyecto
-            base_dir = Path(__file__).parent.parent  # Subir un nivel desde Core/ a la raíz
-            modelo_path = base_dir / "ApartadoInteligente" / "ModeloML" / "modelo_seleccion_alimentos.pkl"
-            
-            if not modelo_path.exists():
-                print(f"[WARN]  Modelo de selección de alimentos no encontrado en: {modelo_path}")
-                return
-            
-            with open(modelo_path, 'rb') as f:
-                modelo_completo = pickle.load(f)
-            
-            # El scaler está dentro del modelo_completo
-            self._modelo_seleccion_alimentos = modelo_completo
-            self._scaler_seleccion_alimentos = modelo_completo.get('scaler')
-            
-            if self._scaler_seleccion_alimentos is None:
-                print("[WARN]  Scaler no encontrado dentro del modelo de selección de alimentos")
-                return
-            
-            print("[OK] Modelo de selección de alimentos cargado")
-        except Exception as e:
-            print(f"[WARN]  Error al cargar modelo de selección de alimentos: {e}")
-            import traceback
-            traceback.print_exc()
+        # El scaler está dentro del modelo_completo
+        self._modelo_seleccion_alimentos = entrada.get('modelo')
+        self._scaler_seleccion_alimentos = entrada.get('scaler')
+        self._versiones_modelos[MODELO_SELECCION_ALIMENTOS] = entrada.version
     
     def _cargar_modelo_optimizacion_combinaciones(self):
-        """Carga el Modelo 3: Optimización de Combinaciones"""
+        """Carga el Modelo 3: Optimización de Combinaciones (registro compartido)"""
         if self._modelo_optimizacion_combinaciones is not None:
-            # Modelo ya cargado, no imprimir para evitar spam en logs
             return
         
         if not ML_AVAILABLE:
             print("[WARN]  ML_AVAILABLE = False, no se puede cargar Modelo 3")
             return
         
-        print("[DEBUG] Intentando cargar Modelo 3: Optimización de Combinaciones...")
+        entrada = obtener_modelo(MODELO_OPTIMIZACION_COMBINACIONES)
+        if not entrada.disponible:
+            return
         
-        try:
-            # Usar ruta relativa desde la raíz del proyecto
-            base_dir = Path(__file__).parent.parent  # Subir un nivel desde Core/ a la raíz
-            modelo_path = base_dir / "ApartadoInteligente" / "ModeloML" / "modelo_optimizacion_combinaciones.pkl"
-            
-            if not modelo_path.exists():
-                print(f"[WARN]  Modelo de optimización de combinaciones no encontrado en: {modelo_path}")
-                return
-            
-            with open(modelo_path, 'rb') as f:
-                modelo_completo = pickle.load(f)
-            
-            # El scaler está dentro del modelo_completo
-            self._modelo_optimizacion_combinaciones = modelo_completo
-            self._scaler_combinaciones = modelo_completo.get('scaler')
-            
-            if self._scaler_combinaciones is None:
-                print("[WARN]  Scaler no encontrado dentro del modelo de optimización de combinaciones")
-                return
-            
-            print("[OK] Modelo de optimización de combinaciones cargado")
-        except Exception as e:
-            print(f"[WARN]  Error al cargar modelo de optimización de combinaciones: {e}")
-            import traceback
-            traceback.print_exc()
+        # El scaler está dentro del modelo_completo
+        self._modelo_optimizacion_combinaciones = entrada.get('modelo')
+        self._scaler_combinaciones = entrada.get('scaler')
+        self._combinaciones_compilado = entrada.get('compilado')
+        self._versiones_modelos[MODELO_OPTIMIZACION_COMBINACIONES] = entrada.version
 
     def _preparar_features_ml(self, perfil: PerfilPaciente, feature_names_esperadas: List[str] = None) -> pd.DataFrame:
         """
@@ -526,17 +433,43 @@ class MotorRecomendacion:
             print(f"   Traceback: {traceback.format_exc()}")
             return None
     
-    def predecir_respuesta_glucemica(self, perfil: PerfilPaciente, alimento: Dict, contexto: Dict = None) -> Optional[Dict]:
+    @staticmethod
+    def _dataframe_features(columnas: Dict, feature_columns: List[str], n: int) -> 'pd.DataFrame':
+        """DataFrame en el orden de feature_columns; columnas desconocidas quedan en NaN"""
+        datos = {}
+        for col in feature_columns:
+            valor = columnas.get(col, np.nan)
+            datos[col] = valor if isinstance(valor, np.ndarray) else np.full(n, valor, dtype=np.float64)
+        return pd.DataFrame(datos, columns=feature_columns)
+    
+    @staticmethod
+    def _matriz_features(columnas: Dict, feature_columns: List[str], n: int) -> 'np.ndarray':
+        """Igual que _dataframe_features pero como matriz NumPy (n x len(feature_columns))"""
+        matriz = np.empty((n, len(feature_columns)), dtype=np.float64)
+        for j, col in enumerate(feature_columns):
+            valor = columnas.get(col, np.nan)
+            matriz[:, j] = np.nan if valor is None else valor
+        return matriz
+    
+    def predecir_respuesta_glucemica_batch(self, perfil: PerfilPaciente, alimentos: List[Dict], contexto: Dict = None,
+                                           matriz: 'np.ndarray' = None) -> Optional[List[Dict]]:
         """
-        Modelo 1: Predice la respuesta glucémica a un alimento específico
+        Modelo 1 (vectorizado): predice la respuesta glucémica de N alimentos en una sola pasada
+        
+        Las features del paciente y del contexto se difunden (broadcast) sobre la
+        matriz de nutrientes y se hace una sola llamada a predict por target (o una
+        sola en total con el modelo multisalida, ver ml/entrenar_modelo1_respuesta_glucemica.py).
         
         Args:
             perfil: Perfil del paciente
-            alimento: Diccionario con información del alimento (kcal, cho, pro, fat, fibra)
+            alimentos: Lista de diccionarios con información del alimento (kcal, cho, pro, fat, fibra)
             contexto: Diccionario con contexto (tiempo_comida, hora, glucosa_baseline)
+            matriz: Matriz de features del catálogo (filas alineadas con alimentos, columnas
+                    COLUMNAS_MATRIZ); si no se pasa se construye a partir de los diccionarios
         
         Returns:
-            Dict con 'glucose_increment', 'glucose_peak', 'time_to_peak' o None si no está disponible
+            Lista (mismo orden que alimentos) de dicts con 'glucose_increment', 'glucose_peak',
+            'time_to_peak', o None si el modelo no está disponible
         """
         if not ML_AVAILABLE:
             return None
@@ -553,49 +486,47 @@ class MotorRecomendacion:
             if not modelos or not feature_columns:
                 return None
             
-            # Preparar features
-            features = {}
+            n = len(alimentos)
+            if n == 0:
+                return []
+            
+            # Features del paciente (escalares, se difunden a las N filas)
+            fasting_glucose = perfil.glucosa_ayunas if perfil.glucosa_ayunas else np.nan
+            features = {
+                'age': perfil.edad,
+                'gender': 1 if perfil.sexo == 'F' else 0,
+                'bmi': perfil.imc,
+                'weight': perfil.peso,
+                'height': perfil.talla,
+                'a1c': perfil.hba1c if perfil.hba1c else np.nan,
+                'fasting_glucose': fasting_glucose,
+                'homa_ir': np.nan,  # Se calcularía si tuviéramos insulina
+                'triglycerides': perfil.trigliceridos if perfil.trigliceridos else np.nan,
+                'tg_hdl_ratio': np.nan,  # Se calcularía si tuviéramos HDL
+            }
             
-            # Features del paciente
-            features['age'] = perfil.edad
-            features['gender'] = 1 if perfil.sexo == 'F' else 0
-            features['bmi'] = perfil.imc
-            features['weight'] = perfil.peso
-            features['height'] = perfil.talla
-            features['a1c'] = perfil.hba1c if perfil.hba1c else np.nan
-            features['fasting_glucose'] = perfil.glucosa_ayunas if perfil.glucosa_ayunas else np.nan
-            features['homa_ir'] = np.nan  # Se calcularía si tuviéramos insulina
-            features['triglycerides'] = perfil.trigliceridos if perfil.trigliceridos else np.nan
-            features['tg_hdl_ratio'] = np.nan  # Se calcularía si tuviéramos HDL
-            
-            # Features del alimento
-            features['calories'] = alimento.get('kcal', 0) or 0
-            features['carbs'] = alimento.get('cho', 0) or 0
-            features['protein'] = alimento.get('pro', 0) or 0
-            features['fat'] = alimento.get('fat', 0) or 0
-            features['fiber'] = alimento.get('fibra', 0) or 0
-            
-            # Features derivadas
-            if features['calories'] > 0:
-                features['carbs_per_100cal'] = (features['carbs'] * 4 / features['calories']) * 100
-                features['protein_per_100cal'] = (features['protein'] * 4 / features['calories']) * 100
-                features['fat_per_100cal'] = (features['fat'] * 9 / features['calories']) * 100
-                features['fiber_per_100cal'] = (features['fiber'] / features['calories']) * 100
-            else:
-                features['carbs_per_100cal'] = 0
-                features['protein_per_100cal'] = 0
-                features['fat_per_100cal'] = 0
-                features['fiber_per_100cal'] = 0
+            # Features de los alimentos (columnas de la matriz del catálogo)
+            if matriz is None:
+                matriz = construir_matriz(alimentos)
+            features['calories'] = matriz[:, COL['kcal']]
+            features['carbs'] = matriz[:, COL['cho']]
+            features['protein'] = matriz[:, COL['pro']]
+            features['fat'] = matriz[:, COL['fat']]
+            features['fiber'] = matriz[:, COL['fibra']]
+            features['carbs_per_100cal'] = matriz[:, COL['cho_per_100cal']]
+            features['protein_per_100cal'] = matriz[:, COL['pro_per_100cal']]
+            features['fat_per_100cal'] = matriz[:, COL['fat_per_100cal']]
+            features['fiber_per_100cal'] = matriz[:, COL['fibra_per_100cal']]
             
             # Features de contexto
+            baseline_defecto = fasting_glucose if not np.isnan(fasting_glucose) else 100
             if contexto:
-                hora = contexto.get('hora', 12)
-                features['hora'] = hora
-                features['glucose_baseline'] = contexto.get('glucose_baseline', features['fasting_glucose'] if not np.isnan(features['fasting_glucose']) else 100)
+                features['hora'] = contexto.get('hora', 12)
+                features['glucose_baseline'] = contexto.get('glucose_baseline', baseline_defecto)
                 features['tiempo_desde_ultima_comida'] = contexto.get('tiempo_desde_ultima_comida', 240)  # 4 horas por defecto
             else:
                 features['hora'] = 12
-                features['glucose_baseline'] = features['fasting_glucose'] if not np.isnan(features['fasting_glucose']) else 100
+                features['glucose_baseline'] = baseline_defecto
                 features['tiempo_desde_ultima_comida'] = 240
             
             # Codificar tipo de comida
@@ -606,51 +537,70 @@ class MotorRecomendacion:
             # Día de la semana (usar lunes por defecto)
             features['dia_semana_encoded'] = 0
             
-            # Crear DataFrame con todas las features necesarias
-            df_features = pd.DataFrame([features])
-            
-            # Asegurar que todas las columnas esperadas estén presentes
-            for col in feature_columns:
-                if col not in df_features.columns:
-                    df_features[col] = np.nan
+            df_features = self._dataframe_features(features, feature_columns, n)
             
-            # Reordenar columnas
-            df_features = df_features[feature_columns]
-            
-            # Escalar
+            # Escalar una sola vez para todos los alimentos
             df_scaled = pd.DataFrame(
                 self._scaler_respuesta_glucemica.transform(df_features),
                 columns=feature_columns
             )
             
-            # Predecir
-            resultados = {}
-            for target in ['glucose_increment', 'glucose_peak', 'time_to_peak']:
-                if target in modelos:
-                    pred = modelos[target].predict(df_scaled)[0]
-                    resultados[target] = float(pred)
+            # Predecir: una sola pasada con el modelo multisalida o una llamada por target
+            predicciones = {}
+            multisalida = modelos.get('multisalida')
+            if multisalida is not None:
+                targets = self._modelo_respuesta_glucemica.get(
+                    'target_columns', ['glucose_increment', 'glucose_peak', 'time_to_peak']
+                )
+                salida = np.asarray(multisalida.predict(df_scaled), dtype=np.float64).reshape(n, -1)
+                for j, target in enumerate(targets[:salida.shape[1]]):
+                    predicciones[target] = salida[:, j]
+            else:
+                for target in ['glucose_increment', 'glucose_peak', 'time_to_peak']:
+                    if target in modelos:
+                        predicciones[target] = np.asarray(modelos[target].predict(df_scaled), dtype=np.float64)
             
             # Calcular pico de glucosa si no está disponible
-            if 'glucose_peak' not in resultados and 'glucose_increment' in resultados:
-                resultados['glucose_peak'] = features['glucose_baseline'] + resultados['glucose_increment']
+            if 'glucose_peak' not in predicciones and 'glucose_increment' in predicciones:
+                predicciones['glucose_peak'] = features['glucose_baseline'] + predicciones['glucose_increment']
             
-            return resultados
+            return [
+                {target: float(valores[i]) for target, valores in predicciones.items()}
+                for i in range(n)
+            ]
             
         except Exception as e:
-            print(f"[WARN]  Error al predecir respuesta glucémica: {e}")
+            print(f"[WARN]  Error al predecir respuesta glucémica (batch): {e}")
             return None
     
-    def calcular_score_idoneidad_alimento(self, perfil: PerfilPaciente, alimento: Dict, necesidades: Dict) -> Optional[float]:
+    def predecir_respuesta_glucemica(self, perfil: PerfilPaciente, alimento: Dict, contexto: Dict = None) -> Optional[Dict]:
         """
-        Modelo 2: Calcula el score de idoneidad (0-1) de un alimento para un paciente
+        Modelo 1: Predice la respuesta glucémica a un alimento específico
         
         Args:
             perfil: Perfil del paciente
-            alimento: Diccionario con información del alimento
+            alimento: Diccionario con información del alimento (kcal, cho, pro, fat, fibra)
+            contexto: Diccionario con contexto (tiempo_comida, hora, glucosa_baseline)
+        
+        Returns:
+            Dict con 'glucose_increment', 'glucose_peak', 'time_to_peak' o None si no está disponible
+        """
+        resultados = self.predecir_respuesta_glucemica_batch(perfil, [alimento], contexto)
+        return resultados[0] if resultados else None
+    
+    def calcular_score_idoneidad_alimentos_batch(self, perfil: PerfilPaciente, alimentos: List[Dict], necesidades: Dict,
+                                                 matriz: 'np.ndarray' = None) -> Optional[List[float]]:
+        """
+        Modelo 2 (vectorizado): score de idoneidad (0-1) de N alimentos con un solo predict_proba
+        
+        Args:
+            perfil: Perfil del paciente
+            alimentos: Lista de diccionarios con información del alimento
             necesidades: Diccionario con necesidades nutricionales (calorias, carbs, etc.)
+            matriz: Matriz de features del catálogo alineada con alimentos (opcional)
         
         Returns:
-            Score de idoneidad (0-1) o None si no está disponible
+            Lista de scores (mismo orden que alimentos) o None si no está disponible
         """
         if not ML_AVAILABLE:
             return None
@@ -668,75 +618,110 @@ class MotorRecomendacion:
             if modelo is None or not feature_columns:
                 return None
             
-            # Preparar features
-            features = {}
+            n = len(alimentos)
+            if n == 0:
+                return []
             
             # Features del paciente
-            features['age'] = perfil.edad
-            features['gender'] = 1 if perfil.sexo == 'F' else 0
-            features['bmi'] = perfil.imc
-            features['a1c'] = perfil.hba1c if perfil.hba1c else np.nan
-            features['fasting_glucose'] = perfil.glucosa_ayunas if perfil.glucosa_ayunas else np.nan
-            features['homa_ir'] = np.nan  # Se calcularía si tuviéramos insulina
-            
-            # Features del alimento
-            features['calories'] = alimento.get('kcal', 0) or 0
-            features['carbs'] = alimento.get('cho', 0) or 0
-            features['protein'] = alimento.get('pro', 0) or 0
-            features['fat'] = alimento.get('fat', 0) or 0
-            features['sodium'] = alimento.get('sodio', 0) or 0
-            features['sugar'] = 0  # No disponible en BD actual
+            features = {
+                'age': perfil.edad,
+                'gender': 1 if perfil.sexo == 'F' else 0,
+                'bmi': perfil.imc,
+                'a1c': perfil.hba1c if perfil.hba1c else np.nan,
+                'fasting_glucose': perfil.glucosa_ayunas if perfil.glucosa_ayunas else np.nan,
+                'homa_ir': np.nan,  # Se calcularía si tuviéramos insulina
+            }
             
-            # Features derivadas
-            if features['calories'] > 0:
-                features['carbs_per_100cal'] = (features['carbs'] * 4 / features['calories']) * 100
-                features['protein_per_100cal'] = (features['protein'] * 4 / features['calories']) * 100
-                features['fat_per_100cal'] = (features['fat'] * 9 / features['calories']) * 100
-            else:
-                features['carbs_per_100cal'] = 0
-                features['protein_per_100cal'] = 0
-                features['fat_per_100cal'] = 0
+            # Features de los alimentos (columnas de la matriz del catálogo)
+            if matriz is None:
+                matriz = construir_matriz(alimentos)
+            features['calories'] = matriz[:, COL['kcal']]
+            features['carbs'] = matriz[:, COL['cho']]
+            features['protein'] = matriz[:, COL['pro']]
+            features['fat'] = matriz[:, COL['fat']]
+            features['sodium'] = matriz[:, COL['sodio']]
+            features['sugar'] = 0  # No disponible en BD actual
+            features['carbs_per_100cal'] = matriz[:, COL['cho_per_100cal']]
+            features['protein_per_100cal'] = matriz[:, COL['pro_per_100cal']]
+            features['fat_per_100cal'] = matriz[:, COL['fat_per_100cal']]
             
             # Frecuencia de consumo (no disponible, usar 0)
             features['frecuencia_consumo'] = 0
             
-            # Crear DataFrame
-            df_features = pd.DataFrame([features])
-            
-            # Asegurar que todas las columnas esperadas estén presentes
-            for col in feature_columns:
-                if col not in df_features.columns:
-                    df_features[col] = np.nan
-            
-            # Reordenar columnas
-            df_features = df_features[feature_columns]
+            df_features = self._dataframe_features(features, feature_columns, n)
             
-            # Escalar
             df_scaled = pd.DataFrame(
                 self._scaler_seleccion_alimentos.transform(df_features),
                 columns=feature_columns
             )
             
-            # Predecir (el modelo devuelve probabilidad de clase 1 = adecuado)
-            prob_adecuado = modelo.predict_proba(df_scaled)[0][1]
+            # Probabilidad de clase 1 = adecuado, para todas las filas a la vez
+            prob_adecuado = modelo.predict_proba(df_scaled)[:, 1]
             
-            return float(prob_adecuado)
+            return [float(p) for p in prob_adecuado]
             
         except Exception as e:
-            print(f"[WARN]  Error al calcular score de idoneidad: {e}")
+            print(f"[WARN]  Error al calcular score de idoneidad (batch): {e}")
             return None
     
-    def evaluar_combinacion_alimentos(self, perfil, combinacion: List[Dict], contexto: Dict = None) -> Optional[float]:
+    def calcular_score_idoneidad_alimento(self, perfil: PerfilPaciente, alimento: Dict, necesidades: Dict) -> Optional[float]:
         """
-        Modelo 3: Evalúa el score de calidad (0-1) de una combinación de alimentos
+        Modelo 2: Calcula el score de idoneidad (0-1) de un alimento para un paciente
+        
+        Args:
+            perfil: Perfil del paciente
+            alimento: Diccionario con información del alimento
+            necesidades: Diccionario con necesidades nutricionales (calorias, carbs, etc.)
+        
+        Returns:
+            Score de idoneidad (0-1) o None si no está disponible
+        """
+        scores = self.calcular_score_idoneidad_alimentos_batch(perfil, [alimento], necesidades)
+        return scores[0] if scores else None
+    
+    def _perfil_dict_combinaciones(self, perfil) -> Dict:
+        """Normaliza el perfil (PerfilPaciente o dict) al diccionario que usa el Modelo 3"""
+        if isinstance(perfil, PerfilPaciente):
+            return {
+                'edad': perfil.edad,
+                'sexo': perfil.sexo,
+                'imc': perfil.imc,
+                'hba1c': perfil.hba1c,
+                'glucosa_ayunas': perfil.glucosa_ayunas
+            }
+        if isinstance(perfil, dict):
+            return perfil
+        # Perfil básico por defecto
+        return {'edad': 50, 'sexo': 'M', 'imc': 25, 'hba1c': None, 'glucosa_ayunas': None}
+    
+    @staticmethod
+    def _predecir_ensemble_combinaciones(modelos_dict: Dict, X) -> Optional['np.ndarray']:
+        """
+        Predice con el ensemble del Modelo 3. Acepta un estimador 'ensemble' o, como lo
+        guarda ml/entrenar_modelo3_combinaciones.py, 'xgb' + 'rf' promediados.
+        """
+        if not isinstance(modelos_dict, dict):
+            return None
+        modelo = modelos_dict.get('ensemble')
+        if modelo is not None and hasattr(modelo, 'predict'):
+            return np.asarray(modelo.predict(X), dtype=np.float64)
+        estimadores = [modelos_dict[k] for k in ('xgb', 'rf') if hasattr(modelos_dict.get(k), 'predict')]
+        if not estimadores:
+            return None
+        return np.mean([np.asarray(m.predict(X), dtype=np.float64) for m in estimadores], axis=0)
+    
+    def evaluar_combinaciones_batch(self, perfil, combinaciones: List[List[Dict]], contextos=None) -> Optional[List[float]]:
+        """
+        Modelo 3 (vectorizado): evalúa el score de calidad (0-1) de muchas combinaciones
+        (p. ej. todas las comidas principales de un plan) en una sola pasada del ensemble.
         
         Args:
             perfil: PerfilPaciente o diccionario con perfil del paciente
-            combinacion: Lista de diccionarios con alimentos y cantidades
-            contexto: Diccionario con contexto (tiempo_comida, hora)
+            combinaciones: Lista de combinaciones (cada una, lista de alimentos con cantidades)
+            contextos: Un diccionario de contexto común o una lista alineada con combinaciones
         
         Returns:
-            Score de calidad (0-1) o None si no está disponible
+            Lista de scores (mismo orden que combinaciones) o None si el modelo no está disponible
         """
         if not ML_AVAILABLE:
             return None
@@ -751,213 +736,118 @@ class MotorRecomendacion:
             modelos_dict = modelo_completo.get('modelos', {})
             feature_columns = modelo_completo.get('feature_columns', [])
             
-            # El Modelo 3 tiene un ensemble, usar el modelo 'ensemble'
-            modelo = modelos_dict.get('ensemble') if isinstance(modelos_dict, dict) else None
-            
-            if modelo is None or not feature_columns:
+            if not modelos_dict or not feature_columns:
                 return None
             
-            # Convertir perfil a diccionario si es objeto
-            if isinstance(perfil, PerfilPaciente):
-                perfil_dict = {
-                    'edad': perfil.edad,
-                    'sexo': perfil.sexo,
-                    'imc': perfil.imc,
-                    'hba1c': perfil.hba1c,
-                    'glucosa_ayunas': perfil.glucosa_ayunas
+            n = len(combinaciones)
+            if n == 0:
+                return []
+            if contextos is None or isinstance(contextos, dict):
+                contextos = [contextos] * n
+            
+            perfil_dict = self._perfil_dict_combinaciones(perfil)
+            
+            # Totales por combinación: matriz (n x 5) con kcal, cho, pro, fat, fibra
+            totales = np.zeros((n, 5), dtype=np.float64)
+            tipos_comida = np.zeros(n, dtype=np.float64)
+            hora = np.full(n, 12.0)
+            for i, combinacion in enumerate(combinaciones):
+                for j, campo in enumerate(('kcal', 'cho', 'pro', 'fat', 'fibra')):
+                    totales[i, j] = sum(a.get(campo, 0) or 0 for a in combinacion)
+                # Diversidad (número de tipos de comida diferentes)
+                tipos_comida[i] = len(set(a.get('grupo', '') for a in combinacion))
+                if contextos[i]:
+                    hora[i] = contextos[i].get('hora', 12)
+            
+            total_calories = totales[:, 0]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                def _porcentaje(columna, factor):
+                    return np.where(total_calories > 0, (totales[:, columna] * factor / total_calories) * 100, 0.0)
+                
+                features = {
+                    # Features del paciente (se difunden a todas las filas)
+                    'age': perfil_dict.get('edad', 50),
+                    'gender': 1 if perfil_dict.get('sexo', 'M') == 'F' else 0,
+                    'bmi': perfil_dict.get('imc', 25),
+                    'a1c': perfil_dict.get('hba1c') if perfil_dict.get('hba1c') else np.nan,
+                    'fasting_glucose': perfil_dict.get('glucosa_ayunas') if perfil_dict.get('glucosa_ayunas') else np.nan,
+                    'homa_ir': np.nan,
+                    # Features de la combinación
+                    'total_calories': total_calories,
+                    'total_carbs': totales[:, 1],
+                    'total_protein': totales[:, 2],
+                    'total_fat': totales[:, 3],
+                    'total_fiber': totales[:, 4],
+                    'carbs_percent': _porcentaje(1, 4),
+                    'protein_percent': _porcentaje(2, 4),
+                    'fat_percent': _porcentaje(3, 9),
+                    'tipos_comida': tipos_comida,
+                    # Contexto
+                    'hora_primera_comida': hora,
+                    # Duración de la combinación (asumir 0 si es una sola comida)
+                    'duracion_combinacion': 0,
                 }
-            elif isinstance(perfil, dict):
-                perfil_dict = perfil
-            else:
-                # Perfil básico por defecto
-                perfil_dict = {'edad': 50, 'sexo': 'M', 'imc': 25, 'hba1c': None, 'glucosa_ayunas': None}
-            
-            # Calcular totales de la combinación
-            total_calories = sum(a.get('kcal', 0) or 0 for a in combinacion)
-            total_carbs = sum(a.get('cho', 0) or 0 for a in combinacion)
-            total_protein = sum(a.get('pro', 0) or 0 for a in combinacion)
-            total_fat = sum(a.get('fat', 0) or 0 for a in combinacion)
-            total_fiber = sum(a.get('fibra', 0) or 0 for a in combinacion)
-            
-            # Preparar features
-            features = {}
-            
-            # Features del paciente
-            features['age'] = perfil_dict.get('edad', 50)
-            features['gender'] = 1 if perfil_dict.get('sexo', 'M') == 'F' else 0
-            features['bmi'] = perfil_dict.get('imc', 25)
-            features['a1c'] = perfil_dict.get('hba1c') if perfil_dict.get('hba1c') else np.nan
-            features['fasting_glucose'] = perfil_dict.get('glucosa_ayunas') if perfil_dict.get('glucosa_ayunas') else np.nan
-            features['homa_ir'] = np.nan
-            
-            # Features de la combinación
-            features['total_calories'] = total_calories
-            features['total_carbs'] = total_carbs
-            features['total_protein'] = total_protein
-            features['total_fat'] = total_fat
-            features['total_fiber'] = total_fiber
-            
-            # Features derivadas
-            if total_calories > 0:
-                features['carbs_percent'] = (total_carbs * 4 / total_calories) * 100
-                features['protein_percent'] = (total_protein * 4 / total_calories) * 100
-                features['fat_percent'] = (total_fat * 9 / total_calories) * 100
-            else:
-                features['carbs_percent'] = 0
-                features['protein_percent'] = 0
-                features['fat_percent'] = 0
-            
-            # Diversidad (número de tipos de comida diferentes)
-            grupos = set(a.get('grupo', '') for a in combinacion)
-            features['tipos_comida'] = len(grupos)
             
-            # Contexto
-            if contexto:
-                hora = contexto.get('hora', 12)
-                features['hora_primera_comida'] = hora
+            compilado = self._combinaciones_compilado
+            if (compilado is not None and n <= self.MAX_FILAS_MODELO3_COMPILADO
+                    and compilado.feature_columns == list(feature_columns)):
+                # Ensemble compilado: escalado + árboles en NumPy, sin DataFrames
+                scores = compilado.predecir(self._matriz_features(features, feature_columns, n))
             else:
-                features['hora_primera_comida'] = 12
-            
-            # Duración de la combinación (asumir 0 si es una sola comida)
-            features['duracion_combinacion'] = 0
-            
-            # Crear DataFrame
-            df_features = pd.DataFrame([features])
-            
-            # Asegurar que todas las columnas esperadas estén presentes
-            for col in feature_columns:
-                if col not in df_features.columns:
-                    df_features[col] = np.nan
-            
-            # Reordenar columnas
-            df_features = df_features[feature_columns]
-            
-            # Escalar
-            df_scaled = pd.DataFrame(
-                self._scaler_combinaciones.transform(df_features),
-                columns=feature_columns
-            )
-            
-            # Predecir
-            score = modelo.predict(df_scaled)[0]
+                df_features = self._dataframe_features(features, feature_columns, n)
+                
+                # Escalar y predecir todas las combinaciones a la vez
+                df_scaled = pd.DataFrame(
+                    self._scaler_combinaciones.transform(df_features),
+                    columns=feature_columns
+                )
+                scores = self._predecir_ensemble_combinaciones(modelos_dict, df_scaled)
+            if scores is None:
+                return None
             
             # Asegurar que esté en rango [0, 1]
-            score = max(0.0, min(1.0, float(score)))
-            
-            return score
+            scores = np.clip(scores, 0.0, 1.0)
+            return [float(score) for score in scores]
             
         except Exception as e:
-            print(f"[WARN]  Error al evaluar combinación: {e}")
+            print(f"[WARN]  Error al evaluar combinaciones (batch): {e}")
             return None
-
-    def obtener_perfil_paciente(self, paciente_id: int) -> PerfilPaciente:
-        """Obtiene el perfil completo del paciente desde la BD"""
+    
+    def evaluar_combinacion_alimentos(self, perfil, combinacion: List[Dict], contexto: Dict = None) -> Optional[float]:
+        """
+        Modelo 3: Evalúa el score de calidad (0-1) de una combinación de alimentos
         
-        # Datos básicos del paciente
-        paciente_data = fetch_one("""
-            SELECT p.id, p.sexo, p.fecha_nac
-            FROM paciente p
-            WHERE p.id = %s
-        """, (paciente_id,))
+        Args:
+            perfil: PerfilPaciente o diccionario con perfil del paciente
+            combinacion: Lista de diccionarios con alimentos y cantidades
+            contexto: Diccionario con contexto (tiempo_comida, hora)
         
-        if not paciente_data:
+        Returns:
+            Score de calidad (0-1) o None si no está disponible
+        """
+        scores = self.evaluar_combinaciones_batch(perfil, [combinacion], contexto)
+        return scores[0] if scores else None
+
+    def obtener_instantanea_perfil(self, paciente_id: int) -> InstantaneaPerfil:
+        """Perfil del paciente en una sola consulta (inmutable y hashable, sirve de clave de caché)"""
+        instantanea = cargar_perfil(paciente_id)
+        if instantanea is None:
             raise ValueError(f"Paciente {paciente_id} no encontrado")
-        
-        # Última antropometría
-        antropometria = fetch_one("""
-            SELECT peso, talla, actividad, fecha
-            FROM antropometria
-            WHERE paciente_id = %s
-            ORDER BY fecha DESC
-            LIMIT 1
-        """, (paciente_id,))
-        
-        # Últimos datos clínicos
-        clinico = fetch_one("""
-            SELECT hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia, fecha
-            FROM clinico
-            WHERE paciente_id = %s
-            ORDER BY fecha DESC
-            LIMIT 1
-        """, (paciente_id,))
-        
-        # Alergias
-        alergias = fetch_all("""
-            SELECT i.nombre
-            FROM paciente_alergia pa
-            LEFT JOIN ingrediente i ON i.id = pa.ingrediente_id
-            WHERE pa.paciente_id = %s
-        """, (paciente_id,))
-        
-        # Medicamentos
-        medicamentos = fetch_all("""
-            SELECT nombre
-            FROM paciente_medicamento
-            WHERE paciente_id = %s AND activo = true
-        """, (paciente_id,))
-        
-        # Preferencias
-        preferencias_excluir = fetch_all("""
-            SELECT i.nombre
-            FROM paciente_preferencia pp
-            LEFT JOIN ingrediente i ON i.id = pp.ingrediente_id
-            WHERE pp.paciente_id = %s AND pp.tipo = 'excluir'
-        """, (paciente_id,))
-        
-        preferencias_incluir = fetch_all("""
-            SELECT i.nombre
-            FROM paciente_preferencia pp
-            LEFT JOIN ingrediente i ON i.id = pp.ingrediente_id
-            WHERE pp.paciente_id = %s AND pp.tipo = 'incluir'
-        """, (paciente_id,))
-        
-        # Calcular edad
-        fecha_nac = paciente_data[2]
-        edad = (date.today() - fecha_nac).days // 365 if fecha_nac else 30
-        
-        # Datos antropométricos
-        peso = float(antropometria[0]) if antropometria and antropometria[0] else 70.0
-        talla = float(antropometria[1]) if antropometria and antropometria[1] else 1.70
-        actividad = antropometria[2] if antropometria and antropometria[2] else 'moderada'
-        
-        # Calcular IMC
-        imc = peso / (talla ** 2)
-        
-        # Datos clínicos
-        hba1c = float(clinico[0]) if clinico and clinico[0] else None
-        glucosa_ayunas = float(clinico[1]) if clinico and clinico[1] else None
-        ldl = float(clinico[2]) if clinico and clinico[2] else None
-        trigliceridos = float(clinico[3]) if clinico and clinico[3] else None
-        pa_sis = clinico[4] if clinico and clinico[4] else None
-        pa_dia = clinico[5] if clinico and clinico[5] else None
+        return instantanea
+
+    def obtener_perfil_paciente(self, paciente_id: int) -> PerfilPaciente:
+        """Obtiene el perfil completo del paciente desde la BD (ver Core/perfil_paciente.py)"""
+        perfil = PerfilPaciente(**self.obtener_instantanea_perfil(paciente_id).como_dict())
         
         print(f"DEBUG: Perfil del paciente {paciente_id}:")
-        print(f"  - Edad: {edad}, Sexo: {paciente_data[1]}")
-        print(f"  - Peso: {peso}kg, Talla: {talla}m, IMC: {imc:.2f}")
-        print(f"  - Actividad: {actividad}")
-        print(f"  - HbA1c: {hba1c}, Glucosa: {glucosa_ayunas}")
-        print(f"  - Alergias: {len(alergias) if alergias else 0}")
-        print(f"  - Medicamentos: {len(medicamentos) if medicamentos else 0}")
-        
-        return PerfilPaciente(
-            paciente_id=paciente_id,
-            edad=edad,
-            sexo=paciente_data[1],
-            peso=peso,
-            talla=talla,
-            imc=imc,
-            actividad=actividad,
-            hba1c=hba1c,
-            glucosa_ayunas=glucosa_ayunas,
-            ldl=ldl,
-            trigliceridos=trigliceridos,
-            pa_sis=pa_sis,
-            pa_dia=pa_dia,
-            alergias=[a[0] for a in alergias if a[0]],
-            medicamentos=[m[0] for m in medicamentos if m[0]],
-            preferencias_excluir=[p[0] for p in preferencias_excluir if p[0]],
-            preferencias_incluir=[p[0] for p in preferencias_incluir if p[0]]
-        )
+        print(f"  - Edad: {perfil.edad}, Sexo: {perfil.sexo}")
+        print(f"  - Peso: {perfil.peso}kg, Talla: {perfil.talla}m, IMC: {perfil.imc:.2f}")
+        print(f"  - Actividad: {perfil.actividad}")
+        print(f"  - HbA1c: {perfil.hba1c}, Glucosa: {perfil.glucosa_ayunas}")
+        print(f"  - Alergias: {len(perfil.alergias)}")
+        print(f"  - Medicamentos: {len(perfil.medicamentos)}")
+        
+        return perfil
 
     def calcular_metabolismo_basal(self, perfil: PerfilPaciente) -> float:
         """Calcula el metabolismo basal usando la ecuación de Mifflin-St Jeor"""
@@ -1697,23 +1587,13 @@ class MotorRecomendacion:
     #     """VERSIÓN ANTIGUA SIN INTEGRACIÓN ML - NO SE USA"""
     #     pass
     
-    def _agrupar_ingredientes(self, ingredientes: List[Dict]) -> Dict:
-        """Agrupa ingredientes por tipo para facilitar la selección variada"""
-        grupos = {
-            'GRUPO2_VERDURAS': [],
-            'GRUPO5_CARNES': [],
-            'GRUPO1_CEREALES': [],
-            'GRUPO3_FRUTAS': [],
-            'GRUPO4_LACTEOS': [],
-            'GRUPO7_GRASAS': []
-        }
-        
-        for ingrediente in ingredientes:
-            grupo = ingrediente['grupo']
-            if grupo in grupos:
-                grupos[grupo].append(ingrediente)
-        
-        return grupos
+    def _agrupar_ingredientes(self, ingredientes: List[Dict]) -> GruposIngredientes:
+        """
+        Agrupa ingredientes por tipo para facilitar la selección variada.
+        Devuelve el dict de grupos indexado por faceta (IG, tipo de proteína, clase
+        de cereal, desayuno, ...; ver Core/indice_ingredientes.py)
+        """
+        return GruposIngredientes(ingredientes)
     
     def debug_ingredientes_disponibles(self, paciente_id: int) -> Dict:
         """Función de debug para ver qué ingredientes están disponibles"""
@@ -1872,18 +1752,22 @@ class MotorRecomendacion:
         """Genera un plan semanal con variedad de alimentos"""
         
         # Usar ingredientes personalizados si están disponibles
-        if ingredientes:
-            ingredientes_recomendados = self._filtrar_ingredientes_personalizados(perfil, metas, ingredientes)
-        else:
-            ingredientes_recomendados = self.obtener_ingredientes_recomendados(perfil, metas)
-        
-        grupos_alimentos = self._agrupar_ingredientes(ingredientes_recomendados)
+        grupos_alimentos = self._grupos_plan(perfil, metas, ingredientes)
+        plan_semanal = dict(self._generar_dias_plan(grupos_alimentos, perfil, metas, dias, configuracion))
         
-        plan_semanal = {}
+        return {
+            'plan_semanal': plan_semanal,
+            'metas_nutricionales': metas,
+            'resumen': self._generar_resumen_semanal(plan_semanal, metas)
+        }
+    
+    def _generar_dias_plan(self, grupos_alimentos: Dict, perfil: PerfilPaciente, metas: MetaNutricional,
+                           dias: int, configuracion: Dict = None) -> Iterator[Tuple[str, Dict]]:
+        """Genera los días del plan en orden: ('dia_N', día) a medida que se arma cada uno"""
         
         # Sistema de seguimiento de alimentos usados para evitar repeticiones excesivas
-        # Estructura: {nombre_alimento: [días donde se usó]}
-        alimentos_usados = {}
+        # (por id de ingrediente: días de uso y usos por semana, ver Core/seguimiento_repeticiones.py)
+        alimentos_usados = SeguimientoRepeticiones()
         # Máximo de veces que un alimento puede aparecer en la semana
         max_repeticiones_semana = 3
         # Días mínimos entre repeticiones del mismo alimento
@@ -1919,30 +1803,20 @@ class MotorRecomendacion:
             for tiempo, comida in dia_generado.items():
                 if isinstance(comida, dict) and 'alimentos' in comida:
                     for alimento in comida.get('alimentos', []):
-                        nombre = alimento.get('nombre', '')
-                        if nombre:
-                            if nombre not in alimentos_usados:
-                                alimentos_usados[nombre] = []
-                            alimentos_usados[nombre].append(dia)
+                        alimentos_usados.registrar_alimento(alimento, dia)
             
-            plan_semanal[f'dia_{dia}'] = {
+            yield f'dia_{dia}', {
                 'fecha': fecha_str,
                 **dia_generado
             }
-        
-        return {
-            'plan_semanal': plan_semanal,
-            'metas_nutricionales': metas,
-            'resumen': self._generar_resumen_semanal(plan_semanal, metas)
-        }
     
-    def _generar_dia_completo(self, grupos: Dict, dia: int, metas: MetaNutricional, perfil: PerfilPaciente = None, alimentos_usados: Dict = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> Dict:
+    def _generar_dia_completo(self, grupos: Dict, dia: int, metas: MetaNutricional, perfil: PerfilPaciente = None, alimentos_usados: SeguimientoRepeticiones = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> Dict:
         """Genera un día completo con estructura compatible con el frontend, evitando repeticiones"""
         comidas = {}
         
         # Inicializar seguimiento si no se proporciona
         if alimentos_usados is None:
-            alimentos_usados = {}
+            alimentos_usados = SeguimientoRepeticiones()
         
         # Ajustar distribución de calorías por comida según predicción ML
         # Obtener probabilidad ML ajustada si está disponible
@@ -2006,12 +1880,9 @@ class MotorRecomendacion:
             
             # Actualizar seguimiento de alimentos usados para este día (antes de generar siguiente comida)
             for alimento in alimentos_sugeridos:
-                nombre = alimento.get('ingrediente', {}).get('nombre', '')
-                if nombre:
-                    if nombre not in alimentos_usados:
-                        alimentos_usados[nombre] = []
-                    if dia not in alimentos_usados[nombre]:
-                        alimentos_usados[nombre].append(dia)
+                clave = clave_ingrediente(alimento.get('ingrediente', {}))
+                if not alimentos_usados.usado_en(clave, dia):
+                    alimentos_usados.registrar(clave, dia)
             
             # Calcular totales nutricionales
             kcal_total = sum(alimento['ingrediente']['kcal'] * alimento['cantidad_sugerida'] / 100 for alimento in alimentos_sugeridos)
@@ -2041,13 +1912,13 @@ class MotorRecomendacion:
         
         return comidas
 
-    def _generar_dia_variado(self, grupos: Dict, dia: int, metas: MetaNutricional, configuracion: Dict = None, perfil: PerfilPaciente = None, alimentos_usados: Dict = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> Dict:
+    def _generar_dia_variado(self, grupos: Dict, dia: int, metas: MetaNutricional, configuracion: Dict = None, perfil: PerfilPaciente = None, alimentos_usados: SeguimientoRepeticiones = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> Dict:
         """Genera un día completo con variedad, evitando repeticiones excesivas"""
         comidas = {}
         
         # Inicializar seguimiento si no se proporciona
         if alimentos_usados is None:
-            alimentos_usados = {}
+            alimentos_usados = SeguimientoRepeticiones()
         
         # Usar patrón de comidas personalizado si está disponible
         patron_comidas = configuracion.get('patron_comidas', ['des', 'mm', 'alm', 'mt', 'cena']) if configuracion else ['des', 'mm', 'alm', 'mt', 'cena']
@@ -2107,23 +1978,17 @@ class MotorRecomendacion:
                     max_repeticiones=max_repeticiones,
                     dias_minimos_entre_repeticiones=dias_minimos_entre_repeticiones,
                     max_repeticiones_proteinas=max_repeticiones_proteinas,
-                    dias_minimos_entre_proteinas=dias_minimos_entre_proteinas
+                    dias_minimos_entre_proteinas=dias_minimos_entre_proteinas,
+                    calorias_objetivo=calorias_objetivo
                 )
                 
-                # Convertir a formato esperado por el frontend
+                # Alimentos como Porcion (Core/plan_compacto.py); se convierten al
+                # formato del frontend en _convertir_plan_semanal_a_formato_ui
                 comidas[tiempo] = {
                     'nombre': self._obtener_nombre_comida(tiempo),
                     'horario': self._obtener_horario_comida(tiempo),
                     'alimentos': [
-                        {
-                            'nombre': alimento['ingrediente']['nombre'],
-                            'grupo': alimento['ingrediente']['grupo'],
-                            'cantidad': f"{alimento['cantidad_sugerida']}{alimento['unidad']}",
-                            'kcal': round(alimento['ingrediente']['kcal'] * alimento['cantidad_sugerida'] / 100, 1),
-                            'cho': round(alimento['ingrediente']['cho'] * alimento['cantidad_sugerida'] / 100, 1),
-                            'pro': round(alimento['ingrediente']['pro'] * alimento['cantidad_sugerida'] / 100, 1),
-                            'fat': round(alimento['ingrediente']['fat'] * alimento['cantidad_sugerida'] / 100, 1)
-                        }
+                        Porcion.desde_ingrediente(alimento['ingrediente'], alimento['cantidad_sugerida'], alimento['unidad'])
                         for alimento in alimentos_sugeridos
                     ]
                 }
@@ -2152,10 +2017,22 @@ class MotorRecomendacion:
         }
         return horarios.get(tiempo, '00:00')
     
-    def _sugerir_alimentos_tiempo_variado(self, tiempo: str, grupos: Dict, dia: int, perfil: PerfilPaciente = None, metas: MetaNutricional = None, alimentos_usados: Dict = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
-        """Sugiere alimentos variados para un tiempo específico usando porciones de intercambio, evitando repeticiones"""
+    def _sugerir_alimentos_tiempo_variado(self, tiempo: str, grupos: Dict, dia: int, perfil: PerfilPaciente = None, metas: MetaNutricional = None, alimentos_usados: SeguimientoRepeticiones = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3, calorias_objetivo: float = None) -> List[Dict]:
+        """
+        Sugiere alimentos variados para un tiempo específico usando porciones de intercambio, evitando repeticiones.
+        Desayuno, almuerzo y cena salen de la biblioteca de plantillas si está disponible
+        (ver Core/plantillas_comidas.py); si no hay plantilla válida se arman con las reglas.
+        """
         if alimentos_usados is None:
-            alimentos_usados = {}
+            alimentos_usados = SeguimientoRepeticiones()
+        
+        if tiempo in TIEMPOS_PLANTILLA and metas is not None:
+            sugerencias = self._sugerir_desde_plantilla(
+                tiempo, grupos, dia, perfil, metas, alimentos_usados, calorias_objetivo,
+                max_repeticiones, dias_minimos_entre_repeticiones, max_repeticiones_proteinas, dias_minimos_entre_proteinas
+            )
+            if sugerencias:
+                return sugerencias
         
         if tiempo == 'des':
             return self._sugerir_desayuno_variado(grupos, dia, perfil, metas, alimentos_usados, max_repeticiones, dias_minimos_entre_repeticiones, max_repeticiones_proteinas, dias_minimos_entre_proteinas)
@@ -2167,11 +2044,72 @@ class MotorRecomendacion:
             return self._sugerir_cena_variada(grupos, dia, perfil, metas, alimentos_usados, max_repeticiones, dias_minimos_entre_repeticiones, max_repeticiones_proteinas, dias_minimos_entre_proteinas)
         return []
     
-    def _filtrar_alimentos_por_repeticion(self, alimentos: List[Dict], alimentos_usados: Dict, dia: int, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, grupo_alimento: str = None, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
+    def _sugerir_desde_plantilla(self, tiempo: str, grupos: Dict, dia: int, perfil: PerfilPaciente, metas: MetaNutricional,
+                                 alimentos_usados: SeguimientoRepeticiones, calorias_objetivo: float = None,
+                                 max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2,
+                                 max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
+        """
+        Sugerencias de una comida a partir de la biblioteca de plantillas: la plantilla
+        de mejor score con perfil de macros cercano al de las metas, ingredientes de la
+        lista recomendada del paciente y sin repeticiones excesivas, escalada a las
+        calorías de la comida. Lista vacía si no hay biblioteca o plantilla válida.
+        """
+        biblioteca = obtener_biblioteca()
+        if biblioteca is None:
+            return []
+        
+        grupos = indexar_grupos(grupos)
+        disponibles = grupos.consulta('por_id', lambda: {
+            a['id']: a for lista in grupos.values() for a in lista if a.get('id') is not None
+        })
+        
+        def permitida(ingredientes: List[Dict]) -> bool:
+            for ingrediente in ingredientes:
+                es_proteina = ingrediente.get('grupo') == 'GRUPO5_CARNES'
+                _, evitados, prohibidos = alimentos_usados.clasificar(
+                    [ingrediente], dia,
+                    max_repeticiones_proteinas if es_proteina else max_repeticiones,
+                    dias_minimos_entre_proteinas if es_proteina else dias_minimos_entre_repeticiones,
+                    es_proteina
+                )
+                if evitados or prohibidos:
+                    return False
+            return True
+        
+        variedad = dia + (perfil.paciente_id if perfil else 0)
+        elegida = biblioteca.elegir(
+            tiempo, metas.carbohidratos_porcentaje, metas.proteinas_porcentaje, metas.grasas_porcentaje,
+            disponibles, permitida, variedad
+        )
+        if elegida is None:
+            return []
+        plantilla, ingredientes = elegida
+        
+        # Escalar a las calorías de la comida con los nutrientes actuales de los ingredientes
+        if calorias_objetivo is None:
+            calorias_objetivo = metas.calorias_diarias * {'des': 0.25, 'alm': 0.35, 'cena': 0.20}[tiempo]
+        kcal_plantilla = sum(float(i.get('kcal', 0) or 0) * g / 100 for i, g in zip(ingredientes, plantilla.gramos))
+        factor = calorias_objetivo / kcal_plantilla if kcal_plantilla > 0 else 1.0
+        
+        sugerencias = []
+        for ingrediente, gramos, porciones in zip(ingredientes, plantilla.gramos, plantilla.porciones):
+            maximo = self._obtener_limites_cantidad_grupo(ingrediente.get('grupo'))['max_por_alimento']
+            cantidad = min(gramos * factor, maximo)
+            sugerencias.append({
+                'ingrediente': ingrediente,
+                'cantidad_sugerida': round(cantidad, 1),
+                'porciones_intercambio': round(porciones * cantidad / gramos, 2),
+                'unidad': 'g',
+                'motivo': f'Plantilla {tiempo} (score {plantilla.score:.2f}) - día {dia}'
+            })
+        return sugerencias
+    
+    def _filtrar_alimentos_por_repeticion(self, alimentos: List[Dict], alimentos_usados: SeguimientoRepeticiones, dia: int, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, grupo_alimento: str = None, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
         """
         Filtra alimentos para evitar repeticiones excesivas.
         Prioriza alimentos no usados, luego los usados hace más días.
         Para proteínas (GRUPO5_CARNES), aplica reglas más estrictas.
+        Los máximos de repeticiones son por semana del plan (alimentos_usados: SeguimientoRepeticiones).
         """
         if not alimentos_usados:
             return alimentos
@@ -2187,64 +2125,17 @@ class MotorRecomendacion:
             max_rep = max_repeticiones
             dias_min = dias_minimos_entre_repeticiones
         
-        alimentos_priorizados = []
-        alimentos_evitados = []
-        alimentos_prohibidos = []  # Para proteínas usadas en días consecutivos
-        
-        for alimento in alimentos:
-            nombre = alimento.get('nombre', '')
-            if not nombre:
-                alimentos_priorizados.append(alimento)
-                continue
-            
-            # Si no se ha usado, priorizar
-            if nombre not in alimentos_usados:
-                alimentos_priorizados.append(alimento)
-                continue
-            
-            dias_uso = alimentos_usados[nombre]
-            veces_usado = len(dias_uso)
-            
-            # Si ya se usó el máximo de veces, evitar
-            if veces_usado >= max_rep:
-                alimentos_evitados.append(alimento)
-                continue
-            
-            # Para proteínas: verificar si se usó en días consecutivos (muy estricto)
-            if es_proteina and dias_uso:
-                dias_uso_ordenados = sorted(dias_uso)
-                # Verificar si se usó en el día anterior (día - 1)
-                if (dia - 1) in dias_uso_ordenados:
-                    alimentos_prohibidos.append(alimento)
-                    continue
-                # Verificar si hay días consecutivos en el historial
-                tiene_dias_consecutivos = False
-                for i in range(len(dias_uso_ordenados) - 1):
-                    if dias_uso_ordenados[i+1] - dias_uso_ordenados[i] == 1:
-                        # Se usó en días consecutivos, prohibir
-                        tiene_dias_consecutivos = True
-                        break
-                if tiene_dias_consecutivos:
-                    alimentos_prohibidos.append(alimento)
-                    continue
-            
-            # Si se usó recientemente (menos de X días), evitar
-            ultimo_uso = max(dias_uso)
-            dias_desde_ultimo_uso = dia - ultimo_uso
-            if dias_desde_ultimo_uso < dias_min:
-                alimentos_evitados.append(alimento)
-                continue
-            
-            # Si se puede usar, agregar con prioridad menor (al final de priorizados)
-            alimentos_priorizados.append(alimento)
+        # Priorizados: no usados o usados hace suficiente; evitados: máximo semanal o uso
+        # reciente; prohibidos: proteínas usadas ayer o en días consecutivos
+        alimentos_priorizados, alimentos_evitados, alimentos_prohibidos = alimentos_usados.clasificar(
+            alimentos, dia, max_rep, dias_min, es_proteina
+        )
         
         # Si no hay suficientes alimentos priorizados, agregar algunos evitados (pero con menor prioridad)
         # NUNCA agregar proteínas prohibidas (días consecutivos)
         if len(alimentos_priorizados) < 2 and alimentos_evitados:
             # Ordenar evitados por días desde último uso (más antiguo primero)
-            alimentos_evitados.sort(key=lambda x: (
-                max(alimentos_usados.get(x.get('nombre', ''), [0])) if x.get('nombre', '') in alimentos_usados else 0
-            ))
+            alimentos_evitados.sort(key=lambda x: alimentos_usados.ultimo_dia(clave_ingrediente(x)))
             # Agregar solo 1-2 de los menos recientes
             alimentos_priorizados.extend(alimentos_evitados[:min(2, len(alimentos_evitados))])
         
@@ -2279,44 +2170,114 @@ class MotorRecomendacion:
             'calorias_promedio_dia': round(total_calorias / len(plan_semanal), 2)
         }
     
-    def generar_plan_semanal_completo(self, paciente_id: int, dias: int = 7, configuracion: Dict = None, ingredientes: Dict = None) -> Dict:
-        """Genera un plan semanal completo con variedad para un paciente y lo optimiza"""
+    def _preparar_generacion(self, paciente_id: int, dias: int, configuracion: Optional[Dict], ingredientes: Optional[Dict],
+                             semilla: Optional[int], forzar: bool) -> Tuple[PerfilPaciente, int, Optional[str], Optional[Dict]]:
+        """
+        Carga los modelos y el perfil, fija la semilla y busca el plan en la caché.
+        
+        Returns:
+            Tupla (perfil, semilla, clave de caché o None, plan cacheado o None)
+        """
+        # Cargar modelos ML nuevos al inicio
+        print("[DEBUG] Verificando modelos ML nuevos...")
+        self._cargar_modelo_respuesta_glucemica()
+        self._cargar_modelo_seleccion_alimentos()
+        self._cargar_modelo_optimizacion_combinaciones()
+        
+        # Obtener perfil del paciente
+        perfil = self.obtener_perfil_paciente(paciente_id)
+        
+        if semilla is None:
+            semilla = int(time.time()) % 1000 if forzar else 0
         try:
-            # Cargar modelos ML nuevos al inicio
-            print("[DEBUG] Verificando modelos ML nuevos...")
-            self._cargar_modelo_respuesta_glucemica()
-            self._cargar_modelo_seleccion_alimentos()
-            self._cargar_modelo_optimizacion_combinaciones()
-            
-            # Obtener perfil del paciente
-            perfil = self.obtener_perfil_paciente(paciente_id)
-            
-            # Si la configuración viene del frontend después de "Recomendación inteligente",
-            # ya está ajustada por ML, así que saltamos el ajuste ML para evitar doble ajuste
-            # La configuración original (base) debería venir en el dataset del frontend
-            # Por ahora, asumimos que si hay configuración, ya viene ajustada
-            skip_ml = configuracion is not None  # Saltar ML si hay configuración (ya viene ajustada)
-            
-            # Guardar configuración original (si está disponible, se usará desde el frontend)
-            # Si no está disponible, usar la configuración actual como referencia
-            configuracion_original = None
-            if configuracion:
-                # La configuración ya viene ajustada por ML desde "Recomendación inteligente"
-                # La configuración original (base) debería venir del frontend en el dataset
-                # Por ahora, guardamos la configuración actual como referencia
-                configuracion_original = {
-                    'kcal_objetivo': configuracion.get('kcal_objetivo'),
-                    'cho_pct': configuracion.get('cho_pct'),
-                    'pro_pct': configuracion.get('pro_pct'),
-                    'fat_pct': configuracion.get('fat_pct')
-                }
-            
-            # Calcular metas nutricionales (sin aplicar ML nuevamente si ya viene ajustada)
-            metas = self.calcular_metas_nutricionales(perfil, configuracion, skip_ml_ajuste=skip_ml)
+            from Core.optimizador_plan import OptimizadorPlan
+            clave = clave_plan(paciente_id, perfil, configuracion, ingredientes, dias,
+                               obtener_registro().version_global(), version_catalogo(), semilla,
+                               version_plantillas=version_biblioteca(),
+                               solver=OptimizadorPlan.solver_configurado(avisar=False))
+            cacheado = None if forzar else obtener_plan(clave)
+            if cacheado is not None:
+                print(f"[OK] Plan semanal desde caché (paciente {paciente_id}, semilla {semilla})")
+                cacheado['generacion'] = {'semilla': semilla, 'desde_cache': True}
+            return perfil, semilla, clave, cacheado
+        except Exception as e:
+            print(f"[WARN]  Caché de planes no disponible: {e}")
+            return perfil, semilla, None, None
+    
+    def _metas_generacion(self, perfil: PerfilPaciente, configuracion: Optional[Dict]) -> MetaNutricional:
+        """Metas del plan (sin repetir el ajuste ML si la configuración ya viene ajustada)"""
+        # Si la configuración viene del frontend después de "Recomendación inteligente",
+        # ya está ajustada por ML, así que saltamos el ajuste ML para evitar doble ajuste
+        # La configuración original (base) debería venir en el dataset del frontend
+        # Por ahora, asumimos que si hay configuración, ya viene ajustada
+        skip_ml = configuracion is not None  # Saltar ML si hay configuración (ya viene ajustada)
+        
+        # Guardar configuración original (si está disponible, se usará desde el frontend)
+        # Si no está disponible, usar la configuración actual como referencia
+        configuracion_original = None
+        if configuracion:
+            # La configuración ya viene ajustada por ML desde "Recomendación inteligente"
+            # La configuración original (base) debería venir del frontend en el dataset
+            # Por ahora, guardamos la configuración actual como referencia
+            configuracion_original = {
+                'kcal_objetivo': configuracion.get('kcal_objetivo'),
+                'cho_pct': configuracion.get('cho_pct'),
+                'pro_pct': configuracion.get('pro_pct'),
+                'fat_pct': configuracion.get('fat_pct')
+            }
+        
+        # Calcular metas nutricionales (sin aplicar ML nuevamente si ya viene ajustada)
+        metas = self.calcular_metas_nutricionales(perfil, configuracion, skip_ml_ajuste=skip_ml)
+        
+        # Guardar configuración original en el objeto para que esté disponible después
+        self._configuracion_original = configuracion_original
+        print(f"[DEBUG] Configuración original guardada: {configuracion_original}")
+        return metas
+    
+    def _grupos_plan(self, perfil: PerfilPaciente, metas: MetaNutricional, ingredientes: Optional[Dict]) -> GruposIngredientes:
+        """Ingredientes del plan (personalizados o recomendados por ML) agrupados"""
+        if ingredientes:
+            ingredientes_recomendados = self._filtrar_ingredientes_personalizados(perfil, metas, ingredientes)
+        else:
+            ingredientes_recomendados = self.obtener_ingredientes_recomendados(perfil, metas)
+        return self._agrupar_ingredientes(ingredientes_recomendados)
+    
+    def _crear_optimizador(self, perfil: PerfilPaciente, metas: MetaNutricional):
+        """OptimizadorPlan del plan y metas en el formato que espera"""
+        from Core.optimizador_plan import OptimizadorPlan
+        
+        # Convertir metas a formato dict para el optimizador
+        metas_dict = {
+            'calorias_diarias': metas.calorias_diarias,
+            'carbohidratos_g': metas.carbohidratos_g,
+            'proteinas_g': metas.proteinas_g,
+            'grasas_g': metas.grasas_g,
+            'fibra_g': metas.fibra_g
+        }
+        
+        # Motor de IA desactivado - ahora usamos Modelo 3 para optimizar combinaciones
+        # Crear optimizador (sin motor_ia, usará Modelo 3 en su lugar)
+        optimizador = OptimizadorPlan(umbral_cumplimiento=0.90, max_iteraciones=20, motor_ia=None, perfil_paciente=perfil, motor_recomendacion=self)
+        return optimizador, metas_dict
+    
+    def generar_plan_semanal_completo(self, paciente_id: int, dias: int = 7, configuracion: Dict = None, ingredientes: Dict = None,
+                                      semilla: int = None, forzar: bool = False) -> Dict:
+        """
+        Genera un plan semanal completo con variedad para un paciente y lo optimiza.
+        
+        El plan depende solo del paciente, la configuración, los ingredientes, los
+        modelos, el catálogo y la semilla (por defecto 0), así que se cachea con esa
+        clave (ver Core/cache_planes.py). `forzar=True` no consulta la caché y, sin
+        semilla explícita, usa una nueva para obtener otra variante del plan.
+        """
+        try:
+            perfil, semilla, clave, cacheado = self._preparar_generacion(
+                paciente_id, dias, configuracion, ingredientes, semilla, forzar)
+            if cacheado is not None:
+                return cacheado
+            self._semilla = semilla
             
-            # Guardar configuración original en el objeto para que esté disponible después
-            self._configuracion_original = configuracion_original
-            print(f"[DEBUG] Configuración original guardada: {configuracion_original}")
+            metas = self._metas_generacion(perfil, configuracion)
             
             # Generar plan semanal con variedad y configuración personalizada
             plan_semanal = self.generar_plan_semanal(perfil, metas, dias, configuracion, ingredientes)
@@ -2324,29 +2285,9 @@ class MotorRecomendacion:
             # OPTIMIZAR EL PLAN para cumplir objetivos nutricionales
             print("[DEBUG] Iniciando optimización del plan...")
             try:
-                from Core.optimizador_plan import OptimizadorPlan
-                
                 # Preparar grupos de alimentos para el optimizador
-                if ingredientes:
-                    ingredientes_recomendados = self._filtrar_ingredientes_personalizados(perfil, metas, ingredientes)
-                else:
-                    ingredientes_recomendados = self.obtener_ingredientes_recomendados(perfil, metas)
-                grupos_alimentos = self._agrupar_ingredientes(ingredientes_recomendados)
-                
-                # Convertir metas a formato dict para el optimizador
-                metas_dict = {
-                    'calorias_diarias': metas.calorias_diarias,
-                    'carbohidratos_g': metas.carbohidratos_g,
-                    'proteinas_g': metas.proteinas_g,
-                    'grasas_g': metas.grasas_g,
-                    'fibra_g': metas.fibra_g
-                }
-                
-                # Motor de IA desactivado - ahora usamos Modelo 3 para optimizar combinaciones
-                # motor_ia = None  # Ya no se usa para validar combinaciones
-                
-                # Crear optimizador (sin motor_ia, usará Modelo 3 en su lugar)
-                optimizador = OptimizadorPlan(umbral_cumplimiento=0.90, max_iteraciones=20, motor_ia=None, perfil_paciente=perfil, motor_recomendacion=self)
+                grupos_alimentos = self._grupos_plan(perfil, metas, ingredientes)
+                optimizador, metas_dict = self._crear_optimizador(perfil, metas)
                 plan_optimizado, estadisticas = optimizador.optimizar_plan(
                     plan_semanal, 
                     metas_dict, 
@@ -2376,15 +2317,99 @@ class MotorRecomendacion:
                 traceback.print_exc()
             
             # Convertir a formato compatible con la UI existente
-            return self._convertir_plan_semanal_a_formato_ui(plan_semanal, perfil, metas)
+            resultado = self._convertir_plan_semanal_a_formato_ui(plan_semanal, perfil, metas)
+            resultado['generacion'] = {'semilla': semilla, 'desde_cache': False}
+            if clave is not None:
+                guardar_plan(clave, resultado)
+            return resultado
             
         except Exception as e:
             raise ValueError(f"Error generando plan semanal: {str(e)}")
+        finally:
+            self._semilla = None
+    
+    def generar_plan_semanal_stream(self, paciente_id: int, dias: int = 7, configuracion: Dict = None, ingredientes: Dict = None,
+                                    semilla: int = None, forzar: bool = False) -> Iterator[Tuple[str, Dict]]:
+        """
+        Igual que generar_plan_semanal_completo, pero entrega el plan por partes a
+        medida que está listo (para Server-Sent Events). Cada día se genera y se
+        optimiza antes de pasar al siguiente; el resultado es el mismo plan porque
+        la optimización de un día no depende de los demás.
+        
+        Eventos (tipo, datos), en orden:
+            ('inicio', {semilla, desde_cache, dias, metas_nutricionales})
+            ('dia', {dia, fecha, datos, transcurrido_s})    uno por día, en formato de la UI
+            ('resumen', resumen semanal)
+            ('lista_compras', [{nombre, grupo, cantidad, unidad}, ...])
+            ('fin', plan completo, el que devuelve generar_plan_semanal_completo)
+        """
+        inicio = time.perf_counter()
+        try:
+            perfil, semilla, clave, cacheado = self._preparar_generacion(
+                paciente_id, dias, configuracion, ingredientes, semilla, forzar)
+            if cacheado is not None:
+                yield 'inicio', {'semilla': semilla, 'desde_cache': True, 'dias': len(cacheado['plan_semanal']),
+                                 'metas_nutricionales': cacheado.get('metas_nutricionales')}
+                for dia_key, dia_data in cacheado['plan_semanal'].items():
+                    yield 'dia', {'dia': dia_key, 'fecha': dia_data.get('fecha'), 'datos': dia_data,
+                                  'transcurrido_s': round(time.perf_counter() - inicio, 3)}
+                yield 'resumen', cacheado.get('resumen_semanal', {})
+                yield 'lista_compras', self._generar_lista_compras(cacheado['plan_semanal'])
+                yield 'fin', cacheado
+                return
+            self._semilla = semilla
+            
+            metas = self._metas_generacion(perfil, configuracion)
+            grupos_alimentos = self._grupos_plan(perfil, metas, ingredientes)
+            yield 'inicio', {'semilla': semilla, 'desde_cache': False, 'dias': dias,
+                             'metas_nutricionales': asdict(metas)}
+            
+            try:
+                optimizador, metas_dict = self._crear_optimizador(perfil, metas)
+            except ImportError as e:
+                print(f"[WARN]  Optimizador no disponible: {e}. Continuando sin optimización.")
+                optimizador = None
+            
+            plan_generado = {}
+            plan_optimizado = {}
+            estadisticas_dias = []
+            for dia_key, dia_data in self._generar_dias_plan(grupos_alimentos, perfil, metas, dias, configuracion):
+                plan_generado[dia_key] = dia_data
+                if optimizador is not None:
+                    try:
+                        optimizado, estadisticas = optimizador.optimizar_plan(
+                            {'plan_semanal': {dia_key: dia_data}}, metas_dict, grupos_alimentos, perfil, self)
+                        dia_data = optimizado['plan_semanal'][dia_key]
+                        estadisticas_dias.append(estadisticas)
+                    except Exception as e:
+                        print(f"[WARN]  Error optimizando {dia_key}: {e}. Se entrega sin optimizar.")
+                plan_optimizado[dia_key] = dia_data
+                yield 'dia', {'dia': dia_key, 'fecha': dia_data.get('fecha'), 'datos': dia_a_formato_ui(dia_data),
+                              'transcurrido_s': round(time.perf_counter() - inicio, 3)}
+            
+            # Igual que generar_plan_semanal: resumen de los días generados + estadísticas de optimización
+            resumen = self._generar_resumen_semanal(plan_generado, metas)
+            if estadisticas_dias:
+                resumen['optimizacion'] = optimizador.combinar_estadisticas(estadisticas_dias)
+            yield 'resumen', resumen
+            yield 'lista_compras', self._generar_lista_compras(plan_optimizado)
+            
+            resultado = self._convertir_plan_semanal_a_formato_ui(
+                {'plan_semanal': plan_optimizado, 'metas_nutricionales': metas, 'resumen': resumen}, perfil, metas)
+            resultado['generacion'] = {'semilla': semilla, 'desde_cache': False}
+            if clave is not None:
+                guardar_plan(clave, resultado)
+            yield 'fin', resultado
+        finally:
+            self._semilla = None
     
     def _convertir_plan_semanal_a_formato_ui(self, plan_semanal: Dict, perfil: PerfilPaciente, metas: MetaNutricional) -> Dict:
         """Convierte el plan semanal al formato esperado por la UI"""
+        # Alimentos internos (Porcion) -> dict con 'cantidad' en texto ("120.0g")
+        plan_ui = plan_a_formato_ui(plan_semanal['plan_semanal'])
+        
         # Tomar el primer día como ejemplo para la estructura de comidas
-        primer_dia = list(plan_semanal['plan_semanal'].values())[0]
+        primer_dia = list(plan_ui.values())[0]
         
         # Obtener probabilidad ML si está disponible
         probabilidad_ml = getattr(self, '_ultima_probabilidad_ml', None)
@@ -2422,7 +2447,7 @@ class MotorRecomendacion:
             },
             'configuracion_original': configuracion_original,  # Configuración antes del ajuste ML
             'comidas': primer_dia,  # Estructura de comidas para compatibilidad
-            'plan_semanal': plan_semanal['plan_semanal'],  # Plan completo
+            'plan_semanal': plan_ui,  # Plan completo
             'resumen_semanal': plan_semanal['resumen'],
             'recomendaciones_especiales': self._generar_recomendaciones_especiales(perfil)
         }
@@ -2489,20 +2514,8 @@ class MotorRecomendacion:
         - 'tuberculo': papa, camote, yuca, etc.
         - 'legumbre': lentejas, frijoles, garbanzos, etc.
         """
-        nombre = str(alimento.get('nombre', '')).lower()
-        
-        # Tubérculos
-        tuberculos = ['papa', 'camote', 'batata', 'yuca', 'ñame', 'oca']
-        if any(t in nombre for t in tuberculos):
-            return 'tuberculo'
-        
-        # Legumbres
-        legumbres = ['lenteja', 'frijol', 'garbanzo', 'alubia', 'haba', 'pallar', 'tarwi', 'judía', 'fréjol']
-        if any(l in nombre for l in legumbres):
-            return 'legumbre'
-        
-        # Cereales (por defecto)
-        return 'cereal'
+        # Atributo precalculado del índice de ingredientes (por nombre; cereal por defecto)
+        return atributos_ingrediente(alimento).clase_cereal
     
     def _es_combinacion_valida_grupo1(self, alimento1: Dict, alimento2: Dict) -> bool:
         """
@@ -2554,7 +2567,7 @@ class MotorRecomendacion:
         return False
     
     def _agregar_alimento_con_limite(self, grupo: str, alimentos_grupo: List[Dict], porciones_necesarias: float, 
-                                     sugerencias: List[Dict], alimentos_usados: Dict, dia: int, factor_variedad: int,
+                                     sugerencias: List[Dict], alimentos_usados: SeguimientoRepeticiones, dia: int, factor_variedad: int,
                                      max_repeticiones: int, dias_minimos_entre_repeticiones: int,
                                      perfil_alimentario: Dict = None) -> float:
         """
@@ -2570,7 +2583,7 @@ class MotorRecomendacion:
         
         # Filtrar por repetición
         alimentos_filtrados = self._filtrar_alimentos_por_repeticion(
-            alimentos_grupo, alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+            alimentos_grupo, alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
         )
         if not alimentos_filtrados:
             alimentos_filtrados = alimentos_grupo
@@ -2700,8 +2713,9 @@ class MotorRecomendacion:
         
         return porciones_restantes
     
-    def _sugerir_desayuno_variado(self, grupos: Dict, dia: int, perfil: PerfilPaciente = None, metas: MetaNutricional = None, alimentos_usados: Dict = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
+    def _sugerir_desayuno_variado(self, grupos: Dict, dia: int, perfil: PerfilPaciente = None, metas: MetaNutricional = None, alimentos_usados: SeguimientoRepeticiones = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
         """Sugiere alimentos variados para el desayuno según el día y perfil del paciente usando porciones de intercambio"""
+        grupos = indexar_grupos(grupos)
         sugerencias = []
         
         # Calcular porciones necesarias para esta comida
@@ -2713,9 +2727,8 @@ class MotorRecomendacion:
         # Usar perfil del paciente para personalizar selección con factor único por paciente
         # Mejorar aleatoriedad usando hash más robusto para variar entre generaciones
         if perfil:
-            import time
             import hashlib
-            timestamp_factor = int(time.time()) % 1000  # Usar más dígitos para más variación
+            timestamp_factor = self._factor_semilla()  # Usar más dígitos para más variación
             
             # Crear un hash único combinando múltiples características + timestamp
             datos_hash = f"{perfil.paciente_id}_{perfil.edad}_{perfil.peso}_{perfil.imc}_{dia}_{timestamp_factor}"
@@ -2736,9 +2749,8 @@ class MotorRecomendacion:
             
             factor_variedad = perfil_id % 50
         else:
-            import time
             import hashlib
-            timestamp_factor = int(time.time()) % 1000
+            timestamp_factor = self._factor_semilla()
             datos_hash = f"{dia}_{timestamp_factor}"
             hash_int = int(hashlib.md5(datos_hash.encode()).hexdigest()[:8], 16)
             factor_variedad = (dia % 7) + (hash_int % 50)
@@ -2748,43 +2760,22 @@ class MotorRecomendacion:
         
         # 1. Cereales integrales: priorizar los con tags "desayuno" o "pan", luego por IG
         if grupos.get('GRUPO1_CEREALES'):
-            # Separar cereales con tags de desayuno/pan
-            cereales_desayuno = []
-            cereales_otros = []
-            
-            for c in grupos['GRUPO1_CEREALES']:
-                tags = c.get('tags', [])
-                if isinstance(tags, str):
-                    try:
-                        import json
-                        tags = json.loads(tags) if tags else []
-                    except:
-                        tags = []
-                
-                # Verificar si tiene tags relacionados con desayuno
-                tags_lower = [str(t).lower() for t in tags] if isinstance(tags, list) else []
-                nombre_lower = str(c.get('nombre', '')).lower()
-                
-                if any(tag in ['desayuno', 'pan', 'breakfast'] for tag in tags_lower) or 'pan' in nombre_lower:
-                    cereales_desayuno.append(c)
-                else:
-                    cereales_otros.append(c)
+            # Cereales con tags de desayuno/pan (faceta del índice)
+            cereales_desayuno = grupos.candidatos('GRUPO1_CEREALES', desayuno=True)
             
             # Priorizar cereales de desayuno, pero mantener variedad
-            if cereales_desayuno and (factor_variedad % 3 != 0):  # 2 de cada 3 veces usar cereales de desayuno
-                cereales_prioritarios = cereales_desayuno
-            else:
-                # Combinar ambos grupos, priorizando los de desayuno
-                cereales_prioritarios = cereales_desayuno + cereales_otros
+            solo_desayuno = bool(cereales_desayuno) and (factor_variedad % 3 != 0)  # 2 de cada 3 veces usar cereales de desayuno
             
-            if not cereales_prioritarios:
-                cereales_prioritarios = grupos['GRUPO1_CEREALES']
+            def ordenar_cereales():
+                if solo_desayuno:
+                    cereales_prioritarios = cereales_desayuno
+                else:
+                    # Combinar ambos grupos, priorizando los de desayuno
+                    cereales_prioritarios = cereales_desayuno + grupos.candidatos('GRUPO1_CEREALES', desayuno=False)
+                # Ordenar por IG (menor primero) y fibra (mayor primero)
+                return sorted(cereales_prioritarios, key=lambda x: (x.get('ig', 100) or 100, -(x.get('fibra', 0) or 0)))
             
-            # Ordenar por IG (menor primero) y fibra (mayor primero)
-            cereales_ordenados = sorted(
-                cereales_prioritarios,
-                key=lambda x: (x.get('ig', 100) or 100, -(x.get('fibra', 0) or 0))
-            )
+            cereales_ordenados = grupos.consulta(('des_cereales', solo_desayuno), ordenar_cereales)
             cereal_idx = factor_variedad % len(cereales_ordenados)
             cereal = cereales_ordenados[cereal_idx]
             porciones_cereal = porciones_comida.get('GRUPO1_CEREALES', 1.0)
@@ -2801,13 +2792,12 @@ class MotorRecomendacion:
         # 2. Lácteos bajos en grasa: priorizar descremados
         if grupos.get('GRUPO4_LACTEOS'):
             # Filtrar lácteos bajos en grasa si es posible
-            lacteos_bajos_grasa = [l for l in grupos['GRUPO4_LACTEOS'] 
-                                  if l.get('fat', 0) and l.get('fat', 0) < 5]
+            lacteos_bajos_grasa = grupos.candidatos('GRUPO4_LACTEOS', bajo_grasa=True)
             lacteos_disponibles = lacteos_bajos_grasa if lacteos_bajos_grasa else grupos['GRUPO4_LACTEOS']
             
             # Filtrar por repetición
             lacteos_filtrados = self._filtrar_alimentos_por_repeticion(
-                lacteos_disponibles, alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                lacteos_disponibles, alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not lacteos_filtrados:
                 lacteos_filtrados = lacteos_disponibles
@@ -2824,14 +2814,14 @@ class MotorRecomendacion:
         # 3. Frutas: priorizar las de menor IG y limitar a máximo 100g por comida
         if grupos.get('GRUPO3_FRUTAS'):
             # Ordenar por IG (menor primero) y fibra (mayor primero)
-            frutas_ordenadas = sorted(
+            frutas_ordenadas = grupos.consulta('frutas_por_ig', lambda: sorted(
                 grupos['GRUPO3_FRUTAS'],
                 key=lambda x: (x.get('ig', 100) or 100, -(x.get('fibra', 0) or 0))
-            )
+            ))
             
             # Filtrar por repetición
             frutas_filtradas = self._filtrar_alimentos_por_repeticion(
-                frutas_ordenadas, alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                frutas_ordenadas, alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not frutas_filtradas:
                 frutas_filtradas = frutas_ordenadas
@@ -2849,7 +2839,7 @@ class MotorRecomendacion:
         if grupos.get('GRUPO2_VERDURAS'):
             # Filtrar por repetición
             verduras_filtradas = self._filtrar_alimentos_por_repeticion(
-                grupos['GRUPO2_VERDURAS'], alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                grupos['GRUPO2_VERDURAS'], alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not verduras_filtradas:
                 verduras_filtradas = grupos['GRUPO2_VERDURAS']
@@ -2869,13 +2859,13 @@ class MotorRecomendacion:
         # 5. Grasas saludables: usar porciones calculadas o valor por defecto mejorado
         if grupos.get('GRUPO7_GRASAS'):
             # Priorizar aceites y grasas saludables
-            grasas_ordenadas = sorted(
+            grasas_ordenadas = grupos.consulta('grasas_por_nombre', lambda: sorted(
                 grupos['GRUPO7_GRASAS'],
                 key=lambda x: x.get('nombre', '')
-            )
+            ))
             # Filtrar por repetición
             grasas_filtradas = self._filtrar_alimentos_por_repeticion(
-                grasas_ordenadas, alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                grasas_ordenadas, alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not grasas_filtradas:
                 grasas_filtradas = grasas_ordenadas
@@ -2917,7 +2907,7 @@ class MotorRecomendacion:
         
         return sugerencias
     
-    def _sugerir_merienda_variada(self, grupos: Dict, dia: int, perfil: PerfilPaciente = None, metas: MetaNutricional = None, alimentos_usados: Dict = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
+    def _sugerir_merienda_variada(self, grupos: Dict, dia: int, perfil: PerfilPaciente = None, metas: MetaNutricional = None, alimentos_usados: SeguimientoRepeticiones = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
         """Sugiere alimentos variados para meriendas según el día usando porciones de intercambio"""
         sugerencias = []
         
@@ -2930,15 +2920,14 @@ class MotorRecomendacion:
         porciones_comida = self._calcular_porciones_para_comida(tiempo, metas, perfil) if metas else {}
         
         # Contar frutas usadas hoy
-        frutas_usadas_hoy = sum(1 for nombre, dias in (alimentos_usados or {}).items() 
-                               if any(d == dia for d in dias) and 
-                               any(f.get('nombre', '') == nombre for f in grupos.get('GRUPO3_FRUTAS', [])))
+        frutas_usadas_hoy = sum(1 for f in grupos.get('GRUPO3_FRUTAS', [])
+                               if alimentos_usados and alimentos_usados.usado_en(clave_ingrediente(f), dia))
         
         # Alternar entre fruta y lácteo según el día, pero respetar máximo de frutas
         if dia % 2 == 0 and grupos.get('GRUPO3_FRUTAS') and frutas_usadas_hoy < max_frutas_por_dia:
             # Filtrar por repetición
             frutas_filtradas = self._filtrar_alimentos_por_repeticion(
-                grupos['GRUPO3_FRUTAS'], alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                grupos['GRUPO3_FRUTAS'], alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not frutas_filtradas:
                 frutas_filtradas = grupos['GRUPO3_FRUTAS']
@@ -2964,7 +2953,7 @@ class MotorRecomendacion:
         elif grupos.get('GRUPO4_LACTEOS'):
             # Filtrar por repetición
             lacteos_filtrados = self._filtrar_alimentos_por_repeticion(
-                grupos['GRUPO4_LACTEOS'], alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                grupos['GRUPO4_LACTEOS'], alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not lacteos_filtrados:
                 lacteos_filtrados = grupos['GRUPO4_LACTEOS']
@@ -2984,7 +2973,7 @@ class MotorRecomendacion:
         if grupos.get('GRUPO2_VERDURAS'):
             # Filtrar por repetición
             verduras_filtradas = self._filtrar_alimentos_por_repeticion(
-                grupos['GRUPO2_VERDURAS'], alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                grupos['GRUPO2_VERDURAS'], alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not verduras_filtradas:
                 verduras_filtradas = grupos['GRUPO2_VERDURAS']
@@ -3039,8 +3028,9 @@ class MotorRecomendacion:
         
         return sugerencias
     
-    def _sugerir_almuerzo_variado(self, grupos: Dict, dia: int, perfil: PerfilPaciente = None, metas: MetaNutricional = None, alimentos_usados: Dict = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
+    def _sugerir_almuerzo_variado(self, grupos: Dict, dia: int, perfil: PerfilPaciente = None, metas: MetaNutricional = None, alimentos_usados: SeguimientoRepeticiones = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
         """Sugiere alimentos variados para el almuerzo según el día usando porciones de intercambio"""
+        grupos = indexar_grupos(grupos)
         sugerencias = []
         
         # Calcular porciones necesarias para esta comida
@@ -3051,9 +3041,8 @@ class MotorRecomendacion:
         
         # Mejorar factor de variedad usando hash más robusto
         if perfil:
-            import time
             import hashlib
-            timestamp_factor = int(time.time()) % 1000
+            timestamp_factor = self._factor_semilla()
             datos_hash = f"{perfil.paciente_id}_{perfil.edad}_{perfil.peso}_{perfil.imc}_{dia}_{timestamp_factor}_alm"
             hash_int = int(hashlib.md5(datos_hash.encode()).hexdigest()[:8], 16)
             perfil_id = (
@@ -3068,9 +3057,8 @@ class MotorRecomendacion:
             ) % 1000
             factor_variedad = perfil_id % 50
         else:
-            import time
             import hashlib
-            timestamp_factor = int(time.time()) % 1000
+            timestamp_factor = self._factor_semilla()
             datos_hash = f"{dia}_{timestamp_factor}_alm"
             hash_int = int(hashlib.md5(datos_hash.encode()).hexdigest()[:8], 16)
             factor_variedad = (dia % 7) + (hash_int % 50)
@@ -3080,10 +3068,8 @@ class MotorRecomendacion:
             # Separar pescados de otras carnes si el perfil lo requiere
             if perfil_alimentario.get('priorizar_pescado', 1.0) > 1.0:
                 # Priorizar pescados
-                pescados = [p for p in grupos['GRUPO5_CARNES'] 
-                           if any(palabra in p.get('nombre', '').lower() 
-                                 for palabra in ['sardina', 'atún', 'salmón', 'trucha', 'pescado', 'camarón', 'marisco'])]
-                otras_carnes = [p for p in grupos['GRUPO5_CARNES'] if p not in pescados]
+                pescados = grupos.candidatos('GRUPO5_CARNES', pescado=True)
+                otras_carnes = grupos.candidatos('GRUPO5_CARNES', pescado=False)
                 
                 # Si hay pescados, priorizarlos (70% de las veces)
                 if pescados and (factor_variedad % 10 < 7):
@@ -3092,9 +3078,7 @@ class MotorRecomendacion:
                     proteinas_disponibles = grupos['GRUPO5_CARNES']
             elif perfil_alimentario.get('evitar_carnes_rojas', False):
                 # Evitar carnes rojas (res, cerdo)
-                proteinas_disponibles = [p for p in grupos['GRUPO5_CARNES']
-                                         if not any(palabra in p.get('nombre', '').lower() 
-                                                   for palabra in ['res', 'cerdo', 'carne de res', 'carne de cerdo'])]
+                proteinas_disponibles = grupos.candidatos('GRUPO5_CARNES', carne_roja=False)
                 if not proteinas_disponibles:
                     proteinas_disponibles = grupos['GRUPO5_CARNES']
             else:
@@ -3102,7 +3086,7 @@ class MotorRecomendacion:
             
             # Filtrar por repetición (reglas más estrictas para proteínas)
             proteinas_filtradas = self._filtrar_alimentos_por_repeticion(
-                proteinas_disponibles, alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones,
+                proteinas_disponibles, alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones,
                 grupo_alimento='GRUPO5_CARNES', max_repeticiones_proteinas=max_repeticiones_proteinas, dias_minimos_entre_proteinas=dias_minimos_entre_proteinas
             )
             if not proteinas_filtradas:
@@ -3121,7 +3105,7 @@ class MotorRecomendacion:
         if grupos.get('GRUPO1_CEREALES'):
             # Filtrar por repetición
             cereales_filtrados = self._filtrar_alimentos_por_repeticion(
-                grupos['GRUPO1_CEREALES'], alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                grupos['GRUPO1_CEREALES'], alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not cereales_filtrados:
                 cereales_filtrados = grupos['GRUPO1_CEREALES']
@@ -3139,7 +3123,7 @@ class MotorRecomendacion:
         if grupos.get('GRUPO2_VERDURAS'):
             # Filtrar por repetición
             verduras_filtradas = self._filtrar_alimentos_por_repeticion(
-                grupos['GRUPO2_VERDURAS'], alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                grupos['GRUPO2_VERDURAS'], alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not verduras_filtradas:
                 verduras_filtradas = grupos['GRUPO2_VERDURAS']
@@ -3161,7 +3145,7 @@ class MotorRecomendacion:
         if grupos.get('GRUPO7_GRASAS'):
             # Filtrar por repetición
             grasas_filtradas = self._filtrar_alimentos_por_repeticion(
-                grupos['GRUPO7_GRASAS'], alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                grupos['GRUPO7_GRASAS'], alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not grasas_filtradas:
                 grasas_filtradas = grupos['GRUPO7_GRASAS']
@@ -3208,8 +3192,9 @@ class MotorRecomendacion:
         
         return sugerencias
     
-    def _sugerir_cena_variada(self, grupos: Dict, dia: int, perfil: PerfilPaciente = None, metas: MetaNutricional = None, alimentos_usados: Dict = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
+    def _sugerir_cena_variada(self, grupos: Dict, dia: int, perfil: PerfilPaciente = None, metas: MetaNutricional = None, alimentos_usados: SeguimientoRepeticiones = None, max_repeticiones: int = 3, dias_minimos_entre_repeticiones: int = 2, max_repeticiones_proteinas: int = 2, dias_minimos_entre_proteinas: int = 3) -> List[Dict]:
         """Sugiere alimentos variados para la cena según el día usando porciones de intercambio"""
+        grupos = indexar_grupos(grupos)
         sugerencias = []
         
         # Calcular porciones necesarias para esta comida
@@ -3220,9 +3205,8 @@ class MotorRecomendacion:
         
         # Mejorar factor de variedad usando hash más robusto
         if perfil:
-            import time
             import hashlib
-            timestamp_factor = int(time.time()) % 1000
+            timestamp_factor = self._factor_semilla()
             datos_hash = f"{perfil.paciente_id}_{perfil.edad}_{perfil.peso}_{perfil.imc}_{dia}_{timestamp_factor}_cena"
             hash_int = int(hashlib.md5(datos_hash.encode()).hexdigest()[:8], 16)
             perfil_id = (
@@ -3237,9 +3221,8 @@ class MotorRecomendacion:
             ) % 1000
             factor_variedad = perfil_id % 50
         else:
-            import time
             import hashlib
-            timestamp_factor = int(time.time()) % 1000
+            timestamp_factor = self._factor_semilla()
             datos_hash = f"{dia}_{timestamp_factor}_cena"
             hash_int = int(hashlib.md5(datos_hash.encode()).hexdigest()[:8], 16)
             factor_variedad = (dia % 7) + (hash_int % 50)
@@ -3249,10 +3232,8 @@ class MotorRecomendacion:
             # Separar pescados de otras carnes si el perfil lo requiere
             if perfil_alimentario.get('priorizar_pescado', 1.0) > 1.0:
                 # Priorizar pescados
-                pescados = [p for p in grupos['GRUPO5_CARNES'] 
-                           if any(palabra in p.get('nombre', '').lower() 
-                                 for palabra in ['sardina', 'atún', 'salmón', 'trucha', 'pescado', 'camarón', 'marisco'])]
-                otras_carnes = [p for p in grupos['GRUPO5_CARNES'] if p not in pescados]
+                pescados = grupos.candidatos('GRUPO5_CARNES', pescado=True)
+                otras_carnes = grupos.candidatos('GRUPO5_CARNES', pescado=False)
                 
                 # Si hay pescados, priorizarlos (70% de las veces)
                 if pescados and (factor_variedad % 10 < 7):
@@ -3261,9 +3242,7 @@ class MotorRecomendacion:
                     proteinas_disponibles = grupos['GRUPO5_CARNES']
             elif perfil_alimentario.get('evitar_carnes_rojas', False):
                 # Evitar carnes rojas (res, cerdo)
-                proteinas_disponibles = [p for p in grupos['GRUPO5_CARNES']
-                                         if not any(palabra in p.get('nombre', '').lower() 
-                                                   for palabra in ['res', 'cerdo', 'carne de res', 'carne de cerdo'])]
+                proteinas_disponibles = grupos.candidatos('GRUPO5_CARNES', carne_roja=False)
                 if not proteinas_disponibles:
                     proteinas_disponibles = grupos['GRUPO5_CARNES']
             else:
@@ -3271,7 +3250,7 @@ class MotorRecomendacion:
             
             # Filtrar por repetición (reglas más estrictas para proteínas)
             proteinas_filtradas = self._filtrar_alimentos_por_repeticion(
-                proteinas_disponibles, alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones,
+                proteinas_disponibles, alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones,
                 grupo_alimento='GRUPO5_CARNES', max_repeticiones_proteinas=max_repeticiones_proteinas, dias_minimos_entre_proteinas=dias_minimos_entre_proteinas
             )
             if not proteinas_filtradas:
@@ -3292,7 +3271,7 @@ class MotorRecomendacion:
             
             # Filtrar por repetición
             verduras_filtradas = self._filtrar_alimentos_por_repeticion(
-                grupos['GRUPO2_VERDURAS'], alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                grupos['GRUPO2_VERDURAS'], alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not verduras_filtradas:
                 verduras_filtradas = grupos['GRUPO2_VERDURAS']
@@ -3314,7 +3293,7 @@ class MotorRecomendacion:
         if grupos.get('GRUPO7_GRASAS'):
             # Filtrar por repetición
             grasas_filtradas = self._filtrar_alimentos_por_repeticion(
-                grupos['GRUPO7_GRASAS'], alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                grupos['GRUPO7_GRASAS'], alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
             )
             if not grasas_filtradas:
                 grasas_filtradas = grupos['GRUPO7_GRASAS']
@@ -3337,21 +3316,18 @@ class MotorRecomendacion:
         # Filtrar solo cereales con IG bajo (< 55) para mejor control glucémico nocturno
         if grupos.get('GRUPO1_CEREALES'):
             # Filtrar cereales con IG < 55 para cenas
-            cereales_bajo_ig = [
-                c for c in grupos['GRUPO1_CEREALES']
-                if (c.get('ig') or 100) < 55
-            ]
+            cereales_bajo_ig = grupos.candidatos('GRUPO1_CEREALES', banda_ig='bajo')
             # Si no hay cereales con IG bajo, usar los disponibles pero priorizar los de menor IG
             if not cereales_bajo_ig:
-                cereales_bajo_ig = sorted(
+                cereales_bajo_ig = grupos.consulta('cereales_menor_ig', lambda: sorted(
                     grupos['GRUPO1_CEREALES'],
                     key=lambda x: (x.get('ig', 100) or 100)
-                )[:3]  # Tomar los 3 con menor IG
+                )[:3])  # Tomar los 3 con menor IG
             
             if cereales_bajo_ig:
                 # Filtrar por repetición
                 cereales_filtrados = self._filtrar_alimentos_por_repeticion(
-                    cereales_bajo_ig, alimentos_usados or {}, dia, max_repeticiones, dias_minimos_entre_repeticiones
+                    cereales_bajo_ig, alimentos_usados, dia, max_repeticiones, dias_minimos_entre_repeticiones
                 )
                 if not cereales_filtrados:
                     cereales_filtrados = cereales_bajo_ig
@@ -3403,28 +3379,34 @@ class MotorRecomendacion:
         return recomendaciones
 
     def _generar_lista_compras(self, plan_semanal: Dict) -> List[Dict]:
-        """Genera una lista de compras basada en el plan semanal"""
+        """Genera una lista de compras basada en el plan semanal (alimentos como Porcion o en formato de la UI)"""
         ingredientes_totales = {}
         
         # Recopilar todos los ingredientes del plan semanal
         for dia, comidas_dia in plan_semanal.items():
+            if not isinstance(comidas_dia, dict):
+                continue
             for tiempo, comida in comidas_dia.items():
+                if not es_comida(tiempo, comida):
+                    continue  # 'fecha' y otros campos del día
                 for alimento in comida['alimentos']:
                     nombre = alimento['nombre']
-                    cantidad = alimento['cantidad']
-                    unidad = alimento['unidad']
+                    cantidad, unidad = parsear_cantidad(alimento.get('cantidad', 0), alimento.get('unidad', 'g'))
                     
-                    if nombre in ingredientes_totales:
-                        ingredientes_totales[nombre]['cantidad'] += cantidad
+                    if (nombre, unidad) in ingredientes_totales:
+                        ingredientes_totales[(nombre, unidad)]['cantidad'] += cantidad
                     else:
-                        ingredientes_totales[nombre] = {
+                        ingredientes_totales[(nombre, unidad)] = {
                             'nombre': nombre,
+                            'grupo': alimento.get('grupo', ''),
                             'cantidad': cantidad,
                             'unidad': unidad
                         }
         
         # Convertir a lista y ordenar por nombre
         lista_compras = list(ingredientes_totales.values())
+        for item in lista_compras:
+            item['cantidad'] = round(item['cantidad'], 1)
         lista_compras.sort(key=lambda x: x['nombre'])
         
         return lista_compras
@@ -3511,7 +3493,39 @@ class MotorRecomendacion:
         return perfil_alimentario
     
     def obtener_ingredientes_recomendados(self, perfil: PerfilPaciente, metas: MetaNutricional, filtros: Dict = None) -> List[Dict]:
-        """Obtiene ingredientes recomendados basados en el perfil del paciente y filtros"""
+        """
+        Obtiene ingredientes recomendados basados en el perfil del paciente y filtros.
+        
+        El resultado rankeado por ML se cachea por paciente (ver Core/cache_ingredientes.py);
+        la clave incluye la huella del perfil, metas, filtros, versión de modelos y de catálogo.
+        """
+        clave = None
+        try:
+            # Cargar los modelos antes de armar la clave para que su versión sea estable
+            self._cargar_modelo_respuesta_glucemica()
+            self._cargar_modelo_seleccion_alimentos()
+            clave = clave_ingredientes(
+                perfil.paciente_id, perfil, metas, filtros,
+                getattr(self, '_ultima_probabilidad_ajustada', None),
+                obtener_registro().version_global(),
+                version_catalogo()
+            )
+            cacheado = obtener_ingredientes(clave)
+            if cacheado is not None:
+                print(f"[OK] Ingredientes recomendados desde caché (paciente {perfil.paciente_id}, {len(cacheado)} alimentos)")
+                return cacheado
+        except Exception as e:
+            print(f"[WARN]  Caché de ingredientes no disponible: {e}")
+            clave = None
+        
+        resultado = self._calcular_ingredientes_recomendados(perfil, metas, filtros)
+        
+        if clave is not None:
+            guardar_ingredientes(clave, resultado)
+        return resultado
+    
+    def _calcular_ingredientes_recomendados(self, perfil: PerfilPaciente, metas: MetaNutricional, filtros: Dict = None) -> List[Dict]:
+        """Consulta y rankea con ML los ingredientes (sin caché)"""
         
         # Calcular perfil alimentario único para este paciente
         perfil_alimentario = self._calcular_perfil_alimentario_paciente(perfil)
@@ -3673,17 +3687,24 @@ class MotorRecomendacion:
                     'fat': metas.grasas_g
                 }
                 
-                # Evaluar cada alimento con los modelos ML
+                # Modelo 1 y Modelo 2 en una sola pasada vectorizada sobre todos los alimentos
+                contexto = {
+                    'tiempo_comida': 'alm',  # Por defecto, se ajustará por comida
+                    'hora': 12,
+                    'glucose_baseline': perfil.glucosa_ayunas if perfil.glucosa_ayunas else 100
+                }
+                # Reutilizar la matriz de features cacheada del catálogo (si está al día)
+                matriz = None
+                catalogo = obtener_catalogo()
+                if catalogo is not None:
+                    matriz = catalogo.submatriz([a['id'] for a in resultado])
+                
+                respuestas_glucemicas = self.predecir_respuesta_glucemica_batch(perfil, resultado, contexto, matriz)
+                scores_idoneidad = self.calcular_score_idoneidad_alimentos_batch(perfil, resultado, necesidades, matriz)
+                
                 alimentos_evaluados = []
-                for alimento in resultado:
-                    # Modelo 1: Predecir respuesta glucémica
-                    contexto = {
-                        'tiempo_comida': 'alm',  # Por defecto, se ajustará por comida
-                        'hora': 12,
-                        'glucose_baseline': perfil.glucosa_ayunas if perfil.glucosa_ayunas else 100
-                    }
-                    
-                    respuesta_glucemica = self.predecir_respuesta_glucemica(perfil, alimento, contexto)
+                for i, alimento in enumerate(resultado):
+                    respuesta_glucemica = respuestas_glucemicas[i] if respuestas_glucemicas else None
                     
                     # Filtrar alimentos con respuesta glucémica muy alta
                     if respuesta_glucemica:
@@ -3692,8 +3713,7 @@ class MotorRecomendacion:
                             print(f"  [WARN]  Excluyendo {alimento['nombre']}: pico glucémico predicho {glucose_peak:.1f} mg/dL")
                             continue
                     
-                    # Modelo 2: Calcular score de idoneidad
-                    score_idoneidad = self.calcular_score_idoneidad_alimento(perfil, alimento, necesidades)
+                    score_idoneidad = scores_idoneidad[i] if scores_idoneidad else None
                     
                     # Agregar scores al alimento
                     alimento['ml_score_idoneidad'] = score_idoneidad if score_idoneidad else 0.5
@@ -3790,22 +3810,12 @@ class MotorRecomendacion:
 
     def _validar_dia(self, datos_dia: Dict, metas: MetaNutricional, filtros: Dict = None) -> Dict:
         """Valida el cumplimiento de un día específico"""
-        totales_dia = {
-            'kcal': 0,
-            'cho': 0,
-            'pro': 0,
-            'fat': 0,
-            'ig_max': 0,
-            'grupos_usados': set()
-        }
+        # Totales del día a partir de los totales ya calculados de cada comida
+        totales_dia = AcumuladorDia.desde_totales_comidas(datos_dia).totales_dia()
+        totales_dia['ig_max'] = 0
+        totales_dia['grupos_usados'] = set()
         
-        # Calcular totales del día
         for tiempo, comida in datos_dia.items():
-            totales_dia['kcal'] += comida['kcal_total']
-            totales_dia['cho'] += comida['cho_total']
-            totales_dia['pro'] += comida['pro_total']
-            totales_dia['fat'] += comida['fat_total']
-            
             for alimento in comida['alimentos']:
                 if alimento['ig']:
                     totales_dia['ig_max'] = max(totales_dia['ig_max'], alimento['ig'])
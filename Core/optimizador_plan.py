@@ -4,7 +4,12 @@
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import copy
-import re
+import os
+import threading
+import time
+
+from Core.acumulador_nutrientes import AcumuladorDia, copiar_dia, registrar_cambio
+from Core.plan_compacto import Porcion, compactar_dia, plan_a_formato_ui
 
 @dataclass
 class CumplimientoObjetivos:
@@ -22,7 +27,28 @@ class CumplimientoObjetivos:
 class OptimizadorPlan:
     """Optimizador de planes nutricionales para cumplir objetivos"""
     
-    def __init__(self, umbral_cumplimiento: float = 0.90, max_iteraciones: int = 20, motor_ia=None, perfil_paciente=None, motor_recomendacion=None):
+    # Alternativas evaluadas juntas por el Modelo 3 al agregar un alimento
+    MAX_CANDIDATOS_MODELO3 = 5
+    
+    # Modos de optimización: 'voraz' (ajustes iterativos por macronutriente),
+    # 'lp' / 'milp' (porciones del día resueltas de una vez, ver solver_porciones.py)
+    SOLVERS = ('voraz', 'lp', 'milp')
+    
+    # Con menos días el costo de enviar el plan al pool supera lo que se gana
+    MIN_DIAS_PARALELO = 4
+    
+    @classmethod
+    def solver_configurado(cls, solver: Optional[str] = None, avisar: bool = True) -> str:
+        """Solver a usar: el indicado o la variable OPTIMIZADOR_SOLVER ('voraz' si no es válido)"""
+        solver = (solver or os.getenv('OPTIMIZADOR_SOLVER', 'voraz')).lower()
+        if solver not in cls.SOLVERS:
+            if avisar:
+                print(f"[WARN]  Solver de optimización desconocido '{solver}', se usa 'voraz'")
+            solver = 'voraz'
+        return solver
+    
+    def __init__(self, umbral_cumplimiento: float = 0.90, max_iteraciones: int = 20, motor_ia=None, perfil_paciente=None, motor_recomendacion=None,
+                 solver: Optional[str] = None, procesos: Optional[int] = None):
         """
         Inicializa el optimizador
         
@@ -32,8 +58,19 @@ class OptimizadorPlan:
             motor_ia: Instancia opcional de MotorIARecomendaciones (DESACTIVADO - ya no se usa)
             perfil_paciente: Perfil del paciente para validaciones con ML
             motor_recomendacion: Instancia de MotorRecomendacion para usar Modelo 3
+            solver: 'voraz', 'lp' o 'milp' (por defecto la variable OPTIMIZADOR_SOLVER o 'voraz')
+            procesos: Procesos para optimizar los días en paralelo; 0 o 1 = en secuencia
+                      (por defecto la variable OPTIMIZADOR_PROCESOS o 0)
         """
         self.umbral_cumplimiento = umbral_cumplimiento
+        self.solver = self.solver_configurado(solver)
+        if procesos is None:
+            try:
+                procesos = int(os.getenv('OPTIMIZADOR_PROCESOS', '0'))
+            except ValueError:
+                print(f"[WARN]  OPTIMIZADOR_PROCESOS inválido '{os.getenv('OPTIMIZADOR_PROCESOS')}', se optimiza en secuencia")
+                procesos = 0
+        self.procesos = max(0, procesos)
         self.max_iteraciones = max_iteraciones
         self.motor_ia = None  # Desactivado - ya no se usa ChatGPT
         self.motor_recomendacion = motor_recomendacion  # Para usar Modelo 3
@@ -63,27 +100,14 @@ class OptimizadorPlan:
         Returns:
             CumplimientoObjetivos con los porcentajes de cumplimiento
         """
-        # Calcular totales del día
-        totales = {
-            'kcal': 0.0,
-            'cho': 0.0,
-            'pro': 0.0,
-            'fat': 0.0,
-            'fibra': 0.0
-        }
-        
-        # Recorrer todas las comidas del día
-        for tiempo, comida in dia.items():
-            if tiempo == 'fecha':
-                continue
-            
-            if isinstance(comida, dict) and 'alimentos' in comida:
-                for alimento in comida['alimentos']:
-                    totales['kcal'] += float(alimento.get('kcal', 0) or 0)
-                    totales['cho'] += float(alimento.get('cho', 0) or 0)
-                    totales['pro'] += float(alimento.get('pro', 0) or 0)
-                    totales['fat'] += float(alimento.get('fat', 0) or 0)
-                    totales['fibra'] += float(alimento.get('fibra', 0) or 0)
+        return self.cumplimiento_acumulado(AcumuladorDia.desde_dia(dia), metas)
+    
+    def cumplimiento_acumulado(self, acumulador: AcumuladorDia, metas: Dict) -> CumplimientoObjetivos:
+        """
+        Cumplimiento de objetivos a partir de los totales de un AcumuladorDia
+        (sin volver a recorrer los alimentos del día)
+        """
+        totales = acumulador.totales_dia()
         
         # Calcular porcentajes de cumplimiento
         metas_kcal = metas.get('calorias_diarias', 2000)
@@ -187,7 +211,7 @@ class OptimizadorPlan:
             if not self.perfil_paciente.get('actividad'):
                 self.perfil_paciente['actividad'] = getattr(perfil, 'actividad', 'baja')
         
-        plan_optimizado = copy.deepcopy(plan_semanal)
+        plan_optimizado = self._copiar_plan(plan_semanal)
         estadisticas = {
             'iteraciones': 0,
             'dias_optimizados': 0,
@@ -211,106 +235,16 @@ class OptimizadorPlan:
         
         estadisticas['cumplimiento_inicial'] = cumplimiento_promedio_inicial
         
-        # Optimizar cada día
-        for iteracion in range(self.max_iteraciones):
-            estadisticas['iteraciones'] = iteracion + 1
-            mejoras_en_iteracion = 0
-            
-            for dia_key, dia_data in plan_semanal_data.items():
-                if not dia_key.startswith('dia_'):
-                    continue
-                cumplimiento = self.calcular_cumplimiento_dia(dia_data, metas)
-                
-                print(f"[DEBUG] DEBUG Optimizador - {dia_key}: Kcal={cumplimiento.kcal_porcentaje:.1f}%, CHO={cumplimiento.cho_porcentaje:.1f}%, PRO={cumplimiento.pro_porcentaje:.1f}%, FAT={cumplimiento.fat_porcentaje:.1f}%, Cumple={cumplimiento.cumple_objetivos}")
-                
-                # Si ya cumple (entre 90% y 100%), continuar sin optimizar
-                if cumplimiento.cumple_objetivos:
-                    print(f"[OK] {dia_key} ya cumple objetivos, saltando optimización")
-                    continue
-                
-                # Si excede (más del 100%), reducir valores primero
-                # Reducir excesos antes de optimizar para evitar que se acumulen
-                exceso_significativo = (
-                    cumplimiento.kcal_porcentaje > 100 or 
-                    cumplimiento.cho_porcentaje > 100 or 
-                    cumplimiento.pro_porcentaje > 100 or 
-                    cumplimiento.fat_porcentaje > 100
-                )
-                
-                if exceso_significativo:
-                    # Reducir valores que exceden
-                    dia_reducido = self._reducir_excesos_dia(
-                        dia_data,
-                        cumplimiento,
-                        metas
-                    )
-                    # Actualizar el plan con el día reducido
-                    plan_semanal_data[dia_key] = dia_reducido
-                    if 'plan_semanal' in plan_optimizado:
-                        plan_optimizado['plan_semanal'][dia_key] = dia_reducido
-                    mejoras_en_iteracion += 1
-                    # Continuar optimizando después de reducir excesos
-                    dia_data = dia_reducido
-                    cumplimiento = self.calcular_cumplimiento_dia(dia_data, metas)
-                
-                # Intentar optimizar este día
-                print(f"[OPT] Intentando optimizar {dia_key}...")
-                dia_mejorado = self._optimizar_dia(
-                    dia_data, 
-                    cumplimiento, 
-                    metas, 
-                    grupos_alimentos,
-                    perfil,
-                    motor_recomendacion
-                )
-                
-                # Verificar si mejoró
-                cumplimiento_mejorado = self.calcular_cumplimiento_dia(dia_mejorado, metas)
-                
-                # Considerar mejora si:
-                # 1. El promedio mejoró, O
-                # 2. Al menos un macronutriente que estaba bajo ahora está mejor
-                mejora_detectada = False
-                if cumplimiento_mejorado.promedio_cumplimiento > cumplimiento.promedio_cumplimiento:
-                    mejora_detectada = True
-                else:
-                    # Verificar si algún macronutriente bajo mejoró significativamente
-                    mejoras_individuales = [
-                        (cumplimiento.kcal_porcentaje < 90 and cumplimiento_mejorado.kcal_porcentaje > cumplimiento.kcal_porcentaje + 1),
-                        (cumplimiento.fat_porcentaje < 90 and cumplimiento_mejorado.fat_porcentaje > cumplimiento.fat_porcentaje + 1),
-                        (cumplimiento.pro_porcentaje < 90 and cumplimiento_mejorado.pro_porcentaje > cumplimiento.pro_porcentaje + 1),
-                        (cumplimiento.cho_porcentaje < 90 and cumplimiento_mejorado.cho_porcentaje > cumplimiento.cho_porcentaje + 1)
-                    ]
-                    if any(mejoras_individuales):
-                        mejora_detectada = True
-                
-                if mejora_detectada:
-                    # Verificar que no haya excedido el 100% después de la mejora
-                    # Si excedió, reducir excesos antes de guardar
-                    if cumplimiento_mejorado.kcal_porcentaje > 100 or cumplimiento_mejorado.cho_porcentaje > 100 or \
-                       cumplimiento_mejorado.pro_porcentaje > 100 or cumplimiento_mejorado.fat_porcentaje > 100:
-                        print(f"  [WARN]  {dia_key} excedió después de optimizar, reduciendo excesos...")
-                        dia_mejorado = self._reducir_excesos_dia(dia_mejorado, cumplimiento_mejorado, metas)
-                        cumplimiento_mejorado = self.calcular_cumplimiento_dia(dia_mejorado, metas)
-                    
-                    plan_semanal_data[dia_key] = dia_mejorado
-                    # Actualizar también en plan_optimizado si tiene la estructura con 'plan_semanal'
-                    if 'plan_semanal' in plan_optimizado:
-                        plan_optimizado['plan_semanal'][dia_key] = dia_mejorado
-                    mejoras_en_iteracion += 1
-                    estadisticas['dias_optimizados'] += 1
-                    estadisticas['mejoras_aplicadas'].append({
-                        'iteracion': iteracion + 1,
-                        'dia': dia_key,
-                        'mejora': cumplimiento_mejorado.promedio_cumplimiento - cumplimiento.promedio_cumplimiento
-                    })
-                    print(f"[OK] {dia_key} mejorado: {cumplimiento.promedio_cumplimiento:.1f}% → {cumplimiento_mejorado.promedio_cumplimiento:.1f}%")
-                else:
-                    print(f"[WARN] {dia_key} no mejoró significativamente")
-            
-            # Si no hubo mejoras en esta iteración, detener
-            if mejoras_en_iteracion == 0:
-                break
+        # Optimizar cada día. Los días son independientes entre sí (mismas metas y
+        # grupos de alimentos), así que con procesos > 1 se reparten en un pool de
+        # procesos; la mezcla sigue el orden de los días y da el mismo resultado
+        # que la ejecución en secuencia.
+        if self.solver in ('lp', 'milp') and not self._scipy_disponible():
+            print("[WARN]  scipy no disponible, se usa el optimizador voraz")
+            self.solver = 'voraz'
+        dias = [(dia_key, dia_data) for dia_key, dia_data in plan_semanal_data.items() if dia_key.startswith('dia_')]
+        resultados = self._optimizar_dias(dias, metas, grupos_alimentos, perfil, motor_recomendacion)
+        self._mezclar_resultados_dias(resultados, plan_semanal_data, plan_optimizado, estadisticas)
         
         # Calcular cumplimiento final
         cumplimiento_promedio_final = {}
@@ -334,6 +268,324 @@ class OptimizadorPlan:
         
         return plan_optimizado, estadisticas
     
+    @staticmethod
+    def _copiar_plan(plan_semanal: Dict) -> Dict:
+        """
+        Copia del plan a optimizar con los alimentos como Porcion (Core/plan_compacto.py).
+        Los días se copian con copiar_dia, bastante más barata que deepcopy; el
+        resto de claves (metas, resumen) con deepcopy.
+        """
+        def _copiar_dias(dias: Dict) -> Dict:
+            return {
+                clave: compactar_dia(copiar_dia(dia)) if clave.startswith('dia_') and isinstance(dia, dict)
+                else copy.deepcopy(dia)
+                for clave, dia in dias.items()
+            }
+        
+        if isinstance(plan_semanal.get('plan_semanal'), dict):
+            return {
+                clave: _copiar_dias(valor) if clave == 'plan_semanal' else copy.deepcopy(valor)
+                for clave, valor in plan_semanal.items()
+            }
+        return _copiar_dias(plan_semanal)
+    
+    @staticmethod
+    def _porcion_ingrediente(ingrediente: Dict, cantidad: float) -> Porcion:
+        """Porción nueva de un ingrediente (nutrientes por 100 g) para agregar a una comida"""
+        porcion = Porcion.desde_ingrediente(ingrediente, cantidad, con_fibra=True)
+        porcion.cantidad = round(cantidad, 1)
+        return porcion
+    
+    def _limites_grupo(self, grupo: str) -> Dict[str, int]:
+        """Límites de cantidad por grupo del motor de recomendación (o por defecto)"""
+        if self.motor_recomendacion is not None and hasattr(self.motor_recomendacion, '_obtener_limites_cantidad_grupo'):
+            return self.motor_recomendacion._obtener_limites_cantidad_grupo(grupo)
+        return {'max_por_alimento': 200, 'max_total_grupo': 400}
+    
+    def _resolver_dia_solver(self, dia: Dict, metas: Dict) -> Tuple[Dict, Dict]:
+        """
+        Dimensiona todas las porciones de un día con programación lineal.
+        
+        Returns:
+            Tupla (día con las cantidades nuevas, resultado del solver)
+        """
+        from Core.solver_porciones import resolver_porciones_dia, NUTRIENTES
+        
+        dia_resuelto = copiar_dia(dia)
+        items = []
+        alimentos = []
+        for tiempo, comida in dia_resuelto.items():
+            if tiempo == 'fecha' or not isinstance(comida, dict) or 'alimentos' not in comida:
+                continue
+            for alimento in comida['alimentos']:
+                cantidad, unidad = alimento.cantidad, alimento.unidad
+                if cantidad <= 0:
+                    continue  # Sin cantidad no se puede escalar: su aporte queda fijo (0)
+                items.append({
+                    'cantidad': cantidad,
+                    'unidad': unidad,
+                    'grupo': alimento.grupo,
+                    'comida': tiempo,
+                    'densidad': {m: float(alimento.get(m, 0)) / cantidad for m in NUTRIENTES},
+                })
+                alimentos.append((comida, alimento))
+        
+        resultado = resolver_porciones_dia(items, metas, self._limites_grupo, entero=(self.solver == 'milp'))
+        if resultado['cantidades'] is None:
+            return dia, resultado
+        
+        for item, (comida, alimento), nueva in zip(items, alimentos, resultado['cantidades']):
+            nueva = round(float(nueva), 1)
+            alimento.cantidad = nueva
+            alimento.escalar(nueva / item['cantidad'])
+        for tiempo, comida in dia_resuelto.items():
+            if tiempo != 'fecha' and isinstance(comida, dict) and 'alimentos' in comida:
+                self._recalcular_totales_comida(comida)
+        return dia_resuelto, resultado
+    
+    @staticmethod
+    def _scipy_disponible() -> bool:
+        try:
+            from Core.solver_porciones import SCIPY_DISPONIBLE
+        except ImportError:
+            return False
+        return SCIPY_DISPONIBLE
+    
+    def _aplicar_solver_dia(self, dia_key: str, dia_data: Dict, metas: Dict) -> Tuple[Dict, Optional[Dict], Optional[float]]:
+        """
+        Aplica el solver LP/MILP a un día que no cumple objetivos.
+        
+        Returns:
+            Tupla (día, resumen del solver o None si el día ya cumplía, mejora o None)
+        """
+        cumplimiento = self.calcular_cumplimiento_dia(dia_data, metas)
+        if cumplimiento.cumple_objetivos:
+            return dia_data, None, None
+        
+        dia_resuelto, resultado = self._resolver_dia_solver(dia_data, metas)
+        resumen = {
+            'estado': resultado['estado'],
+            'holguras': {m: round(h, 2) for m, h in resultado['holguras'].items()},
+            'ms': round(resultado['segundos'] * 1000, 2),
+        }
+        if resultado['cantidades'] is None:
+            print(f"[WARN]  Solver {self.solver}: {dia_key} sin solución ({resultado['estado']})")
+            return dia_data, resumen, None
+        
+        cumplimiento_nuevo = self.calcular_cumplimiento_dia(dia_resuelto, metas)
+        print(f"[OPT] Solver {self.solver} - {dia_key} ({resultado['estado']}): "
+              f"{cumplimiento.promedio_cumplimiento:.1f}% → {cumplimiento_nuevo.promedio_cumplimiento:.1f}% "
+              f"en {resultado['segundos'] * 1000:.1f} ms")
+        return dia_resuelto, resumen, cumplimiento_nuevo.promedio_cumplimiento - cumplimiento.promedio_cumplimiento
+    
+    def _optimizar_dia_completo(self, dia_key: str, dia_data: Dict, metas: Dict, grupos_alimentos: Dict,
+                                perfil, motor_recomendacion) -> Dict:
+        """
+        Optimiza un día de principio a fin: solver LP/MILP (si está activo) y
+        luego ajustes voraces iterativos hasta que el día cumple, deja de mejorar
+        o se alcanza max_iteraciones.
+        
+        Solo lee y escribe el propio día, por eso los días se pueden optimizar en
+        paralelo. Como los ajustes son deterministas, un día que no cambia en una
+        iteración tampoco cambiaría en las siguientes: parar ahí equivale al bucle
+        global por iteraciones (que se detiene cuando ningún día cambia).
+        
+        Returns:
+            {'dia_key', 'dia', 'iteraciones', 'dias_optimizados', 'mejoras', 'solver'}
+        """
+        resultado = {'dia_key': dia_key, 'dia': dia_data, 'iteraciones': 0, 'dias_optimizados': 0,
+                     'mejoras': [], 'solver': None}
+        
+        # Solver exacto: dimensiona las porciones del día en una sola resolución.
+        # Si no alcanza (faltan alimentos de algún grupo) sigue el bucle voraz, que
+        # puede agregar alimentos.
+        if self.solver in ('lp', 'milp'):
+            dia_data, resultado['solver'], mejora = self._aplicar_solver_dia(dia_key, dia_data, metas)
+            if mejora is not None:
+                resultado['dias_optimizados'] += 1
+                resultado['mejoras'].append({'iteracion': 0, 'dia': dia_key, 'mejora': mejora})
+        
+        # Totales del día: se suman una vez y después cada ajuste los actualiza
+        acumulador = AcumuladorDia.desde_dia(dia_data)
+        for iteracion in range(self.max_iteraciones):
+            resultado['iteraciones'] = iteracion + 1
+            cambio_en_iteracion = False
+            cumplimiento = self.cumplimiento_acumulado(acumulador, metas)
+            
+            print(f"[DEBUG] DEBUG Optimizador - {dia_key}: Kcal={cumplimiento.kcal_porcentaje:.1f}%, CHO={cumplimiento.cho_porcentaje:.1f}%, PRO={cumplimiento.pro_porcentaje:.1f}%, FAT={cumplimiento.fat_porcentaje:.1f}%, Cumple={cumplimiento.cumple_objetivos}")
+            
+            # Si ya cumple (entre 90% y 100%), no optimizar
+            if cumplimiento.cumple_objetivos:
+                print(f"[OK] {dia_key} ya cumple objetivos, saltando optimización")
+                break
+            
+            # Si excede (más del 100%), reducir valores primero
+            # Reducir excesos antes de optimizar para evitar que se acumulen
+            exceso_significativo = (
+                cumplimiento.kcal_porcentaje > 100 or 
+                cumplimiento.cho_porcentaje > 100 or 
+                cumplimiento.pro_porcentaje > 100 or 
+                cumplimiento.fat_porcentaje > 100
+            )
+            
+            if exceso_significativo:
+                # Reducir valores que exceden y continuar optimizando después
+                dia_data, acumulador = self._reducir_excesos_dia_acumulado(dia_data, cumplimiento, metas)
+                cambio_en_iteracion = True
+                cumplimiento = self.cumplimiento_acumulado(acumulador, metas)
+            
+            # Intentar optimizar este día
+            print(f"[OPT] Intentando optimizar {dia_key}...")
+            dia_mejorado, acumulador_mejorado = self._optimizar_dia_acumulado(
+                dia_data, 
+                acumulador,
+                cumplimiento, 
+                metas, 
+                grupos_alimentos,
+                perfil,
+                motor_recomendacion
+            )
+            
+            # Verificar si mejoró
+            cumplimiento_mejorado = self.cumplimiento_acumulado(acumulador_mejorado, metas)
+            
+            # Considerar mejora si:
+            # 1. El promedio mejoró, O
+            # 2. Al menos un macronutriente que estaba bajo ahora está mejor
+            mejora_detectada = False
+            if cumplimiento_mejorado.promedio_cumplimiento > cumplimiento.promedio_cumplimiento:
+                mejora_detectada = True
+            else:
+                # Verificar si algún macronutriente bajo mejoró significativamente
+                mejoras_individuales = [
+                    (cumplimiento.kcal_porcentaje < 90 and cumplimiento_mejorado.kcal_porcentaje > cumplimiento.kcal_porcentaje + 1),
+                    (cumplimiento.fat_porcentaje < 90 and cumplimiento_mejorado.fat_porcentaje > cumplimiento.fat_porcentaje + 1),
+                    (cumplimiento.pro_porcentaje < 90 and cumplimiento_mejorado.pro_porcentaje > cumplimiento.pro_porcentaje + 1),
+                    (cumplimiento.cho_porcentaje < 90 and cumplimiento_mejorado.cho_porcentaje > cumplimiento.cho_porcentaje + 1)
+                ]
+                if any(mejoras_individuales):
+                    mejora_detectada = True
+            
+            if mejora_detectada:
+                # Verificar que no haya excedido el 100% después de la mejora
+                # Si excedió, reducir excesos antes de guardar
+                if cumplimiento_mejorado.kcal_porcentaje > 100 or cumplimiento_mejorado.cho_porcentaje > 100 or \
+                   cumplimiento_mejorado.pro_porcentaje > 100 or cumplimiento_mejorado.fat_porcentaje > 100:
+                    print(f"  [WARN]  {dia_key} excedió después de optimizar, reduciendo excesos...")
+                    dia_mejorado, acumulador_mejorado = self._reducir_excesos_dia_acumulado(
+                        dia_mejorado, cumplimiento_mejorado, metas)
+                    cumplimiento_mejorado = self.cumplimiento_acumulado(acumulador_mejorado, metas)
+                
+                dia_data, acumulador = dia_mejorado, acumulador_mejorado
+                cambio_en_iteracion = True
+                resultado['dias_optimizados'] += 1
+                resultado['mejoras'].append({
+                    'iteracion': iteracion + 1,
+                    'dia': dia_key,
+                    'mejora': cumplimiento_mejorado.promedio_cumplimiento - cumplimiento.promedio_cumplimiento
+                })
+                print(f"[OK] {dia_key} mejorado: {cumplimiento.promedio_cumplimiento:.1f}% → {cumplimiento_mejorado.promedio_cumplimiento:.1f}%")
+            else:
+                print(f"[WARN] {dia_key} no mejoró significativamente")
+            
+            # Si el día no cambió en esta iteración, tampoco cambiará en las siguientes
+            if not cambio_en_iteracion:
+                break
+        
+        resultado['dia'] = dia_data
+        return resultado
+    
+    def _optimizar_dias(self, dias: List[Tuple[str, Dict]], metas: Dict, grupos_alimentos: Dict,
+                        perfil, motor_recomendacion) -> List[Dict]:
+        """Optimiza los días en secuencia o en el pool de procesos (resultados en el orden de dias)"""
+        procesos = min(self.procesos, len(dias))
+        if procesos > 1 and len(dias) >= self.MIN_DIAS_PARALELO:
+            try:
+                return self._optimizar_dias_paralelo(dias, procesos, metas, grupos_alimentos, perfil, motor_recomendacion)
+            except Exception as e:
+                print(f"[WARN]  Optimización en paralelo no disponible ({e}), se optimiza en secuencia")
+        return [
+            self._optimizar_dia_completo(dia_key, dia_data, metas, grupos_alimentos, perfil, motor_recomendacion)
+            for dia_key, dia_data in dias
+        ]
+    
+    def _optimizar_dias_paralelo(self, dias: List[Tuple[str, Dict]], procesos: int, metas: Dict,
+                                 grupos_alimentos: Dict, perfil, motor_recomendacion) -> List[Dict]:
+        """
+        Reparte los días en lotes (uno por proceso, intercalados para equilibrar
+        la carga) y los optimiza en el pool de procesos. Los grupos de alimentos se
+        serializan una vez por lote, no por día.
+        """
+        inicio = time.perf_counter()
+        configuracion = {
+            'umbral_cumplimiento': self.umbral_cumplimiento,
+            'max_iteraciones': self.max_iteraciones,
+            'perfil_paciente': self.perfil_paciente,
+            'solver': self.solver,
+            'usar_motor': motor_recomendacion is not None,
+        }
+        pool = _obtener_pool_procesos(self.procesos)
+        futuros = [
+            pool.submit(_optimizar_lote_en_proceso, configuracion, dias[i::procesos], metas, grupos_alimentos, perfil)
+            for i in range(procesos)
+        ]
+        por_dia = {}
+        for futuro in futuros:
+            for resultado in futuro.result():
+                por_dia[resultado['dia_key']] = resultado
+        print(f"[OPT] {len(dias)} días optimizados en {procesos} procesos en {time.perf_counter() - inicio:.2f}s")
+        return [por_dia[dia_key] for dia_key, _ in dias]
+    
+    def _mezclar_resultados_dias(self, resultados: List[Dict], plan_semanal_data: Dict, plan_optimizado: Dict,
+                                 estadisticas: Dict) -> None:
+        """
+        Escribe los días optimizados en el plan y combina sus estadísticas en el
+        orden de los días: el resultado no depende de qué proceso terminó primero.
+        """
+        resumen_solver = {'modo': self.solver, 'dias': {}, 'segundos': 0.0}
+        mejoras = []
+        for resultado in resultados:
+            dia_key = resultado['dia_key']
+            plan_semanal_data[dia_key] = resultado['dia']
+            if 'plan_semanal' in plan_optimizado:
+                plan_optimizado['plan_semanal'][dia_key] = resultado['dia']
+            estadisticas['dias_optimizados'] += resultado['dias_optimizados']
+            mejoras.extend(resultado['mejoras'])
+            if resultado['solver'] is not None:
+                resumen_solver['dias'][dia_key] = resultado['solver']
+                resumen_solver['segundos'] += resultado['solver']['ms'] / 1000
+        
+        # Iteraciones del bucle global equivalente: las del día que más necesitó
+        estadisticas['iteraciones'] = max((r['iteraciones'] for r in resultados), default=min(1, self.max_iteraciones))
+        # Mismo orden que el bucle global: por iteración y, dentro de ella, por día
+        estadisticas['mejoras_aplicadas'] = sorted(mejoras, key=lambda m: m['iteracion'])
+        if self.solver in ('lp', 'milp'):
+            resumen_solver['segundos'] = round(resumen_solver['segundos'], 4)
+            estadisticas['solver'] = resumen_solver
+    
+    @staticmethod
+    def combinar_estadisticas(estadisticas_dias: List[Dict]) -> Dict:
+        """
+        Estadísticas de la semana a partir de las de optimizar_plan llamado día por
+        día (generación en streaming); mismas reglas que _mezclar_resultados_dias.
+        """
+        combinadas = {
+            'iteraciones': max((e['iteraciones'] for e in estadisticas_dias), default=0),
+            'dias_optimizados': sum(e['dias_optimizados'] for e in estadisticas_dias),
+            'mejoras_aplicadas': sorted((m for e in estadisticas_dias for m in e['mejoras_aplicadas']),
+                                        key=lambda m: m['iteracion']),
+            'cumplimiento_inicial': {},
+            'cumplimiento_final': {},
+        }
+        for e in estadisticas_dias:
+            combinadas['cumplimiento_inicial'].update(e['cumplimiento_inicial'])
+            combinadas['cumplimiento_final'].update(e['cumplimiento_final'])
+            if 'solver' in e:
+                solver = combinadas.setdefault('solver', {'modo': e['solver']['modo'], 'dias': {}, 'segundos': 0.0})
+                solver['dias'].update(e['solver']['dias'])
+                solver['segundos'] = round(solver['segundos'] + e['solver']['segundos'], 4)
+        return combinadas
+    
     def _optimizar_dia(self, dia: Dict, cumplimiento: CumplimientoObjetivos, metas: Dict, 
                       grupos_alimentos: Dict, perfil, motor_recomendacion) -> Dict:
         """
@@ -349,7 +601,20 @@ class OptimizadorPlan:
         Returns:
             Día optimizado
         """
-        dia_optimizado = copy.deepcopy(dia)
+        dia_optimizado, _ = self._optimizar_dia_acumulado(
+            dia, AcumuladorDia.desde_dia(dia), cumplimiento, metas, grupos_alimentos, perfil, motor_recomendacion
+        )
+        return dia_optimizado
+    
+    def _optimizar_dia_acumulado(self, dia: Dict, acumulador: AcumuladorDia, cumplimiento: CumplimientoObjetivos,
+                                 metas: Dict, grupos_alimentos: Dict, perfil,
+                                 motor_recomendacion) -> Tuple[Dict, AcumuladorDia]:
+        """
+        _optimizar_dia manteniendo los totales del día en un AcumuladorDia.
+        No modifica dia ni acumulador: devuelve copias (día optimizado, sus totales).
+        """
+        dia_optimizado = copiar_dia(dia)
+        acumulador = acumulador.copiar()
         
         # Identificar qué macronutrientes faltan (solo si están por debajo de 90%)
         # Calcular déficit basado en llegar al 90% como mínimo
@@ -435,11 +700,12 @@ class OptimizadorPlan:
                                 grupo_principal, 
                                 grupo_secundario,
                                 grupos_alimentos,
-                                motor_recomendacion
+                                motor_recomendacion,
+                                acumulador=acumulador
                             )
                             
                             # Recalcular déficit después del ajuste
-                            cumplimiento_actualizado = self.calcular_cumplimiento_dia(dia_optimizado, metas)
+                            cumplimiento_actualizado = self.cumplimiento_acumulado(acumulador, metas)
                             porcentaje_objetivo = 90.0
                             
                             if macronutriente == 'fat':
@@ -475,7 +741,7 @@ class OptimizadorPlan:
                             if deficit <= 0.1 or porcentaje_actual >= porcentaje_objetivo or porcentaje_actual >= 100:
                                 break
         
-        return dia_optimizado
+        return dia_optimizado, acumulador
     
     def _reducir_excesos_dia(self, dia: Dict, cumplimiento: CumplimientoObjetivos, metas: Dict) -> Dict:
         """
@@ -489,7 +755,17 @@ class OptimizadorPlan:
         Returns:
             Día con valores reducidos
         """
-        dia_reducido = copy.deepcopy(dia)
+        dia_reducido, _ = self._reducir_excesos_dia_acumulado(dia, cumplimiento, metas)
+        return dia_reducido
+    
+    def _reducir_excesos_dia_acumulado(self, dia: Dict, cumplimiento: CumplimientoObjetivos,
+                                       metas: Dict) -> Tuple[Dict, AcumuladorDia]:
+        """
+        _reducir_excesos_dia devolviendo también los totales del día reducido.
+        Se reescalan todos los alimentos, así que los totales se suman una vez al
+        final (una pasada) en lugar de registrar cada cambio.
+        """
+        dia_reducido = copiar_dia(dia)
         
         # Calcular excesos
         exceso_kcal = max(0, cumplimiento.kcal_porcentaje - 100) / 100
@@ -513,69 +789,53 @@ class OptimizadorPlan:
                 if isinstance(comida, dict) and 'alimentos' in comida:
                     for alimento in comida['alimentos']:
                         # Reducir cantidades proporcionalmente
-                        cantidad_str = alimento.get('cantidad', '0')
-                        if isinstance(cantidad_str, str):
-                            match = re.search(r'(\d+\.?\d*)', cantidad_str)
-                            cantidad_actual = float(match.group(1)) if match else 0
-                            unidad_match = re.search(r'[a-zA-Z]+', cantidad_str)
-                            unidad = unidad_match.group(0) if unidad_match else 'g'
-                            
-                            # Determinar qué reducir según el grupo del alimento
-                            grupo = alimento.get('grupo', '')
-                            factor = 1.0
-                            
-                            # Aplicar el factor de reducción específico según el grupo del alimento
-                            # Si es un alimento de CHO y hay exceso de CHO, usar factor de CHO
-                            if grupo in ['GRUPO1_CEREALES', 'GRUPO3_FRUTAS'] and cumplimiento.cho_porcentaje > 100:
-                                factor = factor_reduccion_cho
-                            # Si es un alimento de PRO y hay exceso de PRO, usar factor de PRO
-                            elif grupo in ['GRUPO5_CARNES', 'GRUPO4_LACTEOS'] and cumplimiento.pro_porcentaje > 100:
-                                factor = factor_reduccion_pro
-                            # Si es un alimento de FAT y hay exceso de FAT, usar factor de FAT
-                            elif grupo == 'GRUPO7_GRASAS' and cumplimiento.fat_porcentaje > 100:
-                                factor = factor_reduccion_fat
-                            # Para otros grupos o si hay exceso general de calorías, usar factor de calorías
-                            elif cumplimiento.kcal_porcentaje > 100:
-                                factor = factor_reduccion_kcal
-                            
-                            # Si hay múltiples excesos, usar el factor más restrictivo (menor)
-                            factores_aplicables = []
-                            if cumplimiento.kcal_porcentaje > 100:
-                                factores_aplicables.append(factor_reduccion_kcal)
-                            if grupo in ['GRUPO1_CEREALES', 'GRUPO3_FRUTAS'] and cumplimiento.cho_porcentaje > 100:
-                                factores_aplicables.append(factor_reduccion_cho)
-                            if grupo in ['GRUPO5_CARNES', 'GRUPO4_LACTEOS'] and cumplimiento.pro_porcentaje > 100:
-                                factores_aplicables.append(factor_reduccion_pro)
-                            if grupo == 'GRUPO7_GRASAS' and cumplimiento.fat_porcentaje > 100:
-                                factores_aplicables.append(factor_reduccion_fat)
-                            
-                            if factores_aplicables:
-                                factor = min(factores_aplicables)
-                            
-                            # Reducir cantidad según el factor calculado
-                            nueva_cantidad = cantidad_actual * factor
-                            alimento['cantidad'] = f"{round(nueva_cantidad, 1)}{unidad}"
-                            
-                            # Recalcular macros
-                            if 'kcal' in alimento:
-                                alimento['kcal'] = round(float(alimento.get('kcal', 0) or 0) * factor, 1)
-                            if 'cho' in alimento:
-                                alimento['cho'] = round(float(alimento.get('cho', 0) or 0) * factor, 1)
-                            if 'pro' in alimento:
-                                alimento['pro'] = round(float(alimento.get('pro', 0) or 0) * factor, 1)
-                            if 'fat' in alimento:
-                                alimento['fat'] = round(float(alimento.get('fat', 0) or 0) * factor, 1)
-                            if 'fibra' in alimento:
-                                alimento['fibra'] = round(float(alimento.get('fibra', 0) or 0) * factor, 1)
+                        # Determinar qué reducir según el grupo del alimento
+                        grupo = alimento.grupo
+                        factor = 1.0
+                        
+                        # Aplicar el factor de reducción específico según el grupo del alimento
+                        # Si es un alimento de CHO y hay exceso de CHO, usar factor de CHO
+                        if grupo in ['GRUPO1_CEREALES', 'GRUPO3_FRUTAS'] and cumplimiento.cho_porcentaje > 100:
+                            factor = factor_reduccion_cho
+                        # Si es un alimento de PRO y hay exceso de PRO, usar factor de PRO
+                        elif grupo in ['GRUPO5_CARNES', 'GRUPO4_LACTEOS'] and cumplimiento.pro_porcentaje > 100:
+                            factor = factor_reduccion_pro
+                        # Si es un alimento de FAT y hay exceso de FAT, usar factor de FAT
+                        elif grupo == 'GRUPO7_GRASAS' and cumplimiento.fat_porcentaje > 100:
+                            factor = factor_reduccion_fat
+                        # Para otros grupos o si hay exceso general de calorías, usar factor de calorías
+                        elif cumplimiento.kcal_porcentaje > 100:
+                            factor = factor_reduccion_kcal
+                        
+                        # Si hay múltiples excesos, usar el factor más restrictivo (menor)
+                        factores_aplicables = []
+                        if cumplimiento.kcal_porcentaje > 100:
+                            factores_aplicables.append(factor_reduccion_kcal)
+                        if grupo in ['GRUPO1_CEREALES', 'GRUPO3_FRUTAS'] and cumplimiento.cho_porcentaje > 100:
+                            factores_aplicables.append(factor_reduccion_cho)
+                        if grupo in ['GRUPO5_CARNES', 'GRUPO4_LACTEOS'] and cumplimiento.pro_porcentaje > 100:
+                            factores_aplicables.append(factor_reduccion_pro)
+                        if grupo == 'GRUPO7_GRASAS' and cumplimiento.fat_porcentaje > 100:
+                            factores_aplicables.append(factor_reduccion_fat)
+                        
+                        if factores_aplicables:
+                            factor = min(factores_aplicables)
+                        
+                        # Reducir cantidad según el factor calculado
+                        alimento.cantidad = round(alimento.cantidad * factor, 1)
+                        
+                        # Recalcular macros
+                        alimento.escalar(factor)
         
         # Recalcular totales de todas las comidas después de reducir
+        acumulador = AcumuladorDia.desde_dia(dia_reducido)
         for tiempo in ['des', 'mm', 'alm', 'mt', 'cena']:
             if tiempo in dia_reducido:
                 comida = dia_reducido[tiempo]
                 if isinstance(comida, dict) and 'alimentos' in comida:
-                    self._recalcular_totales_comida(comida)
+                    self._recalcular_totales_comida(comida, acumulador, tiempo)
         
-        return dia_reducido
+        return dia_reducido, acumulador
     
     def _es_combinacion_apetitosa(self, comida: Dict, nuevo_grupo: str, nuevo_nombre: str) -> bool:
         """
@@ -640,7 +900,8 @@ class OptimizadorPlan:
     
     def _ajustar_comida_para_macronutriente(self, comida: Dict, macronutriente: str, deficit: float,
                                            grupo_principal: Optional[str], grupo_secundario: Optional[str],
-                                           grupos_alimentos: Dict, motor_recomendacion) -> None:
+                                           grupos_alimentos: Dict, motor_recomendacion,
+                                           acumulador: Optional[AcumuladorDia] = None) -> None:
         """
         Ajusta una comida para aumentar un macronutriente específico
         
@@ -652,9 +913,11 @@ class OptimizadorPlan:
             grupo_secundario: Grupo secundario
             grupos_alimentos: Grupos de alimentos disponibles
             motor_recomendacion: Instancia del motor de recomendación
+            acumulador: Totales del día a actualizar con cada cambio (comida['tiempo'] es la comida)
         """
         if 'alimentos' not in comida:
             return
+        tiempo_comida = comida.get('tiempo', '')
         
         # Buscar alimentos del grupo principal en la comida
         alimentos_grupo_principal = [
@@ -672,19 +935,8 @@ class OptimizadorPlan:
             )
             
             # Calcular cuánto aumentar
-            valor_actual = float(mejor_alimento_existente.get(macronutriente, 0) or 0)
-            
-            # Manejar cantidad que puede ser string ("100g") o número
-            cantidad_str = mejor_alimento_existente.get('cantidad', '0')
-            if isinstance(cantidad_str, str):
-                # Extraer número del string (ej: "100g" -> 100)
-                match = re.search(r'(\d+\.?\d*)', cantidad_str)
-                cantidad_actual = float(match.group(1)) if match else 0
-                unidad_match = re.search(r'[a-zA-Z]+', cantidad_str)
-                unidad = unidad_match.group(0) if unidad_match else 'g'
-            else:
-                cantidad_actual = float(cantidad_str or 0)
-                unidad = mejor_alimento_existente.get('unidad', 'g')
+            valor_actual = float(mejor_alimento_existente.get(macronutriente, 0))
+            cantidad_actual = mejor_alimento_existente.cantidad
             
             if cantidad_actual > 0 and valor_actual > 0:
                 # Calcular factor de aumento necesario
@@ -697,23 +949,16 @@ class OptimizadorPlan:
                 aumento = min(gramos_necesarios, max_aumento)
                 nueva_cantidad = cantidad_actual + aumento
                 
-                # Actualizar cantidad (mantener formato string si era string)
-                if isinstance(cantidad_str, str):
-                    mejor_alimento_existente['cantidad'] = f"{round(nueva_cantidad, 1)}{unidad}"
-                else:
-                    mejor_alimento_existente['cantidad'] = round(nueva_cantidad, 1)
+                # Actualizar cantidad
+                mejor_alimento_existente.cantidad = round(nueva_cantidad, 1)
                 
                 # Recalcular valores nutricionales proporcionalmente
                 factor = nueva_cantidad / cantidad_actual
-                mejor_alimento_existente['kcal'] = round(float(mejor_alimento_existente.get('kcal', 0) or 0) * factor, 1)
-                mejor_alimento_existente['cho'] = round(float(mejor_alimento_existente.get('cho', 0) or 0) * factor, 1)
-                mejor_alimento_existente['pro'] = round(float(mejor_alimento_existente.get('pro', 0) or 0) * factor, 1)
-                mejor_alimento_existente['fat'] = round(float(mejor_alimento_existente.get('fat', 0) or 0) * factor, 1)
-                if 'fibra' in mejor_alimento_existente:
-                    mejor_alimento_existente['fibra'] = round(float(mejor_alimento_existente.get('fibra', 0) or 0) * factor, 1)
+                with registrar_cambio(acumulador, tiempo_comida, mejor_alimento_existente):
+                    mejor_alimento_existente.escalar(factor)
                 
                 # Actualizar totales de la comida
-                self._recalcular_totales_comida(comida)
+                self._recalcular_totales_comida(comida, acumulador, tiempo_comida)
                 
                 # Reducir déficit
                 deficit -= aumento * valor_por_gramo
@@ -757,93 +1002,69 @@ class OptimizadorPlan:
                     cantidad_necesaria = min(cantidad_necesaria, 200)
                     
                     if cantidad_necesaria > 5:  # Solo agregar si es una cantidad significativa
-                        nuevo_alimento = {
-                            'nombre': mejor_alimento.get('nombre', ''),
-                            'grupo': mejor_alimento.get('grupo', ''),
-                            'cantidad': f"{round(cantidad_necesaria, 1)}g",
-                            'unidad': 'g',
-                            'kcal': round(float(mejor_alimento.get('kcal', 0) or 0) * cantidad_necesaria / 100, 1),
-                            'cho': round(float(mejor_alimento.get('cho', 0) or 0) * cantidad_necesaria / 100, 1),
-                            'pro': round(float(mejor_alimento.get('pro', 0) or 0) * cantidad_necesaria / 100, 1),
-                            'fat': round(float(mejor_alimento.get('fat', 0) or 0) * cantidad_necesaria / 100, 1),
-                            'fibra': round(float(mejor_alimento.get('fibra', 0) or 0) * cantidad_necesaria / 100, 1)
-                        }
+                        nuevo_alimento = self._porcion_ingrediente(mejor_alimento, cantidad_necesaria)
                         
                         # Validar combinación con IA si está disponible (solo para comidas principales)
                         tiempo = comida.get('tiempo', '')
                         # Usar Modelo 3 para evaluar combinaciones (reemplaza ChatGPT)
                         if self.motor_recomendacion and tiempo in ['des', 'alm', 'cena']:
-                            alimentos_temporal = comida['alimentos'] + [nuevo_alimento]
+                            def _aporte(x):
+                                return float(x.get(macronutriente, 0) or 0) if macronutriente in ['fat', 'pro', 'cho'] else float(x.get('kcal', 0) or 0)
+                            
+                            def _crear_alimento(al):
+                                valor = _aporte(al)
+                                cantidad = min((deficit / valor * 100) if valor > 0 else 0, 200)
+                                return self._porcion_ingrediente(al, cantidad)
+                            
+                            # Candidatos en orden de aporte del macronutriente (el primero es mejor_alimento);
+                            # se puntúan todos juntos con una sola llamada al Modelo 3
+                            candidatos = [mejor_alimento] + sorted(
+                                [a for a in alimentos_apetitosos if a.get('nombre') != mejor_alimento.get('nombre')],
+                                key=_aporte, reverse=True
+                            )[:self.MAX_CANDIDATOS_MODELO3 - 1]
+                            nuevos = [nuevo_alimento] + [_crear_alimento(c) for c in candidatos[1:]]
+                            
                             # Convertir a formato para Modelo 3
-                            combinacion_ml = [
-                                {
-                                    'nombre': a.get('nombre', ''),
-                                    'grupo': a.get('grupo', ''),
-                                    'kcal': a.get('kcal', 0),
-                                    'cho': a.get('cho', 0),
-                                    'pro': a.get('pro', 0),
-                                    'fat': a.get('fat', 0),
-                                    'fibra': 0  # No disponible en este contexto
-                                }
-                                for a in alimentos_temporal
+                            combinaciones_ml = [
+                                [
+                                    {
+                                        'nombre': a.get('nombre', ''),
+                                        'grupo': a.get('grupo', ''),
+                                        'kcal': a.get('kcal', 0),
+                                        'cho': a.get('cho', 0),
+                                        'pro': a.get('pro', 0),
+                                        'fat': a.get('fat', 0),
+                                        'fibra': 0  # No disponible en este contexto
+                                    }
+                                    for a in comida['alimentos'] + [nuevo]
+                                ]
+                                for nuevo in nuevos
                             ]
-                            contexto = {
-                                'tiempo_comida': tiempo,
-                                'hora': 12 if tiempo == 'alm' else (8 if tiempo == 'des' else 20)
-                            }
-                            # Preparar perfil como diccionario para el modelo
-                            if isinstance(self.perfil_paciente, dict):
-                                perfil_dict = self.perfil_paciente
-                            else:
-                                perfil_dict = {
-                                    'edad': getattr(self.perfil_paciente, 'edad', 50),
-                                    'sexo': getattr(self.perfil_paciente, 'sexo', 'M'),
-                                    'imc': getattr(self.perfil_paciente, 'imc', 25),
-                                    'hba1c': getattr(self.perfil_paciente, 'hba1c', None),
-                                    'glucosa_ayunas': getattr(self.perfil_paciente, 'glucosa_ayunas', None)
-                                }
                             
-                            score_combinacion = self.motor_recomendacion.evaluar_combinacion_alimentos(
-                                perfil_dict,
-                                combinacion_ml,
-                                contexto
+                            scores = self.motor_recomendacion.evaluar_combinaciones_batch(
+                                self._perfil_dict_modelo3(),
+                                combinaciones_ml,
+                                self._contexto_modelo3(tiempo)
                             )
                             
-                            if score_combinacion is not None:
-                                print(f"  [ML] Modelo 3 - Score combinación: {score_combinacion:.3f}")
+                            if scores:
+                                print(f"  [ML] Modelo 3 - Score combinación: {scores[0]:.3f}")
                             
-                            # Si el score es muy bajo (< 0.4), rechazar la combinación
-                            if score_combinacion is not None and score_combinacion < 0.4:
-                                # Si la combinación no es apetitosa, intentar con otro alimento
-                                alimentos_alternativos = [a for a in alimentos_apetitosos if a.get('nombre') != mejor_alimento.get('nombre')]
-                                if alimentos_alternativos:
-                                    mejor_alimento = max(
-                                        alimentos_alternativos,
-                                        key=lambda x: float(x.get(macronutriente, 0) or 0) if macronutriente in ['fat', 'pro', 'cho'] else float(x.get('kcal', 0) or 0)
-                                    )
-                                    # Recalcular con el nuevo alimento
-                                    valor_por_100g = float(mejor_alimento.get(macronutriente, 0) or 0) if macronutriente in ['fat', 'pro', 'cho'] else float(mejor_alimento.get('kcal', 0) or 0)
-                                    cantidad_necesaria = (deficit / valor_por_100g * 100) if valor_por_100g > 0 else 0
-                                    cantidad_necesaria = min(cantidad_necesaria, 200)
-                                    
-                                    nuevo_alimento = {
-                                        'nombre': mejor_alimento.get('nombre', ''),
-                                        'grupo': mejor_alimento.get('grupo', ''),
-                                        'cantidad': f"{round(cantidad_necesaria, 1)}g",
-                                        'unidad': 'g',
-                                        'kcal': round(float(mejor_alimento.get('kcal', 0) or 0) * cantidad_necesaria / 100, 1),
-                                        'cho': round(float(mejor_alimento.get('cho', 0) or 0) * cantidad_necesaria / 100, 1),
-                                        'pro': round(float(mejor_alimento.get('pro', 0) or 0) * cantidad_necesaria / 100, 1),
-                                        'fat': round(float(mejor_alimento.get('fat', 0) or 0) * cantidad_necesaria / 100, 1),
-                                        'fibra': round(float(mejor_alimento.get('fibra', 0) or 0) * cantidad_necesaria / 100, 1)
-                                    }
+                            # Si el score es muy bajo (< 0.4), rechazar la combinación y usar el
+                            # siguiente candidato con score aceptable (o el siguiente en aporte)
+                            if scores and scores[0] < 0.4 and len(candidatos) > 1:
+                                elegido = next((i for i in range(1, len(scores)) if scores[i] >= 0.4), 1)
+                                mejor_alimento = candidatos[elegido]
+                                nuevo_alimento = nuevos[elegido]
                         
                         comida['alimentos'].append(nuevo_alimento)
+                        if acumulador is not None:
+                            acumulador.agregar(tiempo_comida, nuevo_alimento)
                         
                         # Verificar y limitar verduras después de agregar
-                        self._limitar_verduras_por_comida(comida, tiempo_comida=None)
+                        self._limitar_verduras_por_comida(comida, tiempo_comida=None, acumulador=acumulador)
                         
-                        self._recalcular_totales_comida(comida)
+                        self._recalcular_totales_comida(comida, acumulador, tiempo_comida)
                         return  # Salir después de agregar alimento del grupo principal
         
         # Si aún falta y hay grupo secundario, agregar alimento nuevo
@@ -874,23 +1095,19 @@ class OptimizadorPlan:
                     cantidad_necesaria = min(cantidad_necesaria, 200)
                     
                     if cantidad_necesaria > 5:  # Solo agregar si es una cantidad significativa
-                        nuevo_alimento = {
-                            'nombre': mejor_alimento.get('nombre', ''),
-                            'grupo': mejor_alimento.get('grupo', ''),
-                            'cantidad': f"{round(cantidad_necesaria, 1)}g",  # Formato string como espera el frontend
-                            'unidad': 'g',
-                            'kcal': round(float(mejor_alimento.get('kcal', 0) or 0) * cantidad_necesaria / 100, 1),
-                            'cho': round(float(mejor_alimento.get('cho', 0) or 0) * cantidad_necesaria / 100, 1),
-                            'pro': round(float(mejor_alimento.get('pro', 0) or 0) * cantidad_necesaria / 100, 1),
-                            'fat': round(float(mejor_alimento.get('fat', 0) or 0) * cantidad_necesaria / 100, 1),
-                            'fibra': round(float(mejor_alimento.get('fibra', 0) or 0) * cantidad_necesaria / 100, 1)
-                        }
+                        nuevo_alimento = self._porcion_ingrediente(mejor_alimento, cantidad_necesaria)
                         
                         comida['alimentos'].append(nuevo_alimento)
-                        self._recalcular_totales_comida(comida)
+                        if acumulador is not None:
+                            acumulador.agregar(tiempo_comida, nuevo_alimento)
+                        self._recalcular_totales_comida(comida, acumulador, tiempo_comida)
     
-    def _limitar_verduras_por_comida(self, comida: Dict, tiempo_comida: Optional[str] = None) -> None:
-        """Limita la cantidad de verduras por comida según el tiempo de comida"""
+    def _limitar_verduras_por_comida(self, comida: Dict, tiempo_comida: Optional[str] = None,
+                                     acumulador: Optional[AcumuladorDia] = None) -> None:
+        """
+        Limita la cantidad de verduras por comida según el tiempo de comida
+        (acumulador: totales del día a actualizar, la comida es comida['tiempo'])
+        """
         if not tiempo_comida:
             # Intentar inferir el tiempo de comida desde el contexto
             # Si no se puede, usar límite por defecto
@@ -912,47 +1129,33 @@ class OptimizadorPlan:
             return
         
         # Calcular total de verduras en gramos
-        total_verduras_g = 0
-        for al in verduras_en_comida:
-            cantidad_str = str(al.get('cantidad', '0g'))
-            cantidad_num = float(re.sub(r'[^\d.]', '', cantidad_str))
-            total_verduras_g += cantidad_num
+        total_verduras_g = sum(al.cantidad for al in verduras_en_comida)
         
         # Si excede el límite, reducir proporcionalmente
         if total_verduras_g > max_verduras_g:
             factor_reduccion = max_verduras_g / total_verduras_g
             for al in verduras_en_comida:
-                cantidad_str = str(al.get('cantidad', '0g'))
-                cantidad_num = float(re.sub(r'[^\d.]', '', cantidad_str))
-                cantidad_nueva = cantidad_num * factor_reduccion
-                al['cantidad'] = f"{round(cantidad_nueva, 1)}g"
+                cantidad_nueva = al.cantidad * factor_reduccion
+                al.cantidad = round(cantidad_nueva, 1)
+                al.unidad = 'g'
                 # Recalcular nutrientes
                 factor = cantidad_nueva / 100.0
-                al['kcal'] = round(float(al.get('kcal', 0) or 0) * factor, 1)
-                al['cho'] = round(float(al.get('cho', 0) or 0) * factor, 1)
-                al['pro'] = round(float(al.get('pro', 0) or 0) * factor, 1)
-                al['fat'] = round(float(al.get('fat', 0) or 0) * factor, 1)
-                al['fibra'] = round(float(al.get('fibra', 0) or 0) * factor, 1)
+                with registrar_cambio(acumulador, comida.get('tiempo', ''), al):
+                    al.escalar(factor, fibra=True)
     
-    def _recalcular_totales_comida(self, comida: Dict) -> None:
-        """Recalcula los totales nutricionales de una comida"""
+    def _recalcular_totales_comida(self, comida: Dict, acumulador: Optional[AcumuladorDia] = None,
+                                   tiempo: Optional[str] = None) -> None:
+        """
+        Recalcula los totales nutricionales de una comida (con acumulador, los
+        toma de sus totales de la comida `tiempo` en vez de volver a sumar)
+        """
         if 'alimentos' not in comida:
             return
         
-        totales = {
-            'kcal': 0.0,
-            'cho': 0.0,
-            'pro': 0.0,
-            'fat': 0.0,
-            'fibra': 0.0
-        }
-        
-        for alimento in comida['alimentos']:
-            totales['kcal'] += float(alimento.get('kcal', 0) or 0)
-            totales['cho'] += float(alimento.get('cho', 0) or 0)
-            totales['pro'] += float(alimento.get('pro', 0) or 0)
-            totales['fat'] += float(alimento.get('fat', 0) or 0)
-            totales['fibra'] += float(alimento.get('fibra', 0) or 0)
+        if acumulador is not None and tiempo in acumulador.comidas:
+            totales = acumulador.totales_comida(tiempo)
+        else:
+            totales = AcumuladorDia.desde_dia({'comida': comida}).totales_comida('comida')
         
         # Actualizar totales en la comida
         if 'kcal_total' in comida:
@@ -966,6 +1169,68 @@ class OptimizadorPlan:
         if 'fibra_total' in comida:
             comida['fibra_total'] = round(totales['fibra'], 1)
     
+    def _perfil_dict_modelo3(self) -> Dict:
+        """Perfil del paciente como diccionario para el Modelo 3"""
+        if isinstance(self.perfil_paciente, dict):
+            return self.perfil_paciente
+        return {
+            'edad': getattr(self.perfil_paciente, 'edad', 50),
+            'sexo': getattr(self.perfil_paciente, 'sexo', 'M'),
+            'imc': getattr(self.perfil_paciente, 'imc', 25),
+            'hba1c': getattr(self.perfil_paciente, 'hba1c', None),
+            'glucosa_ayunas': getattr(self.perfil_paciente, 'glucosa_ayunas', None)
+        }
+    
+    @staticmethod
+    def _contexto_modelo3(tiempo: str) -> Dict:
+        return {
+            'tiempo_comida': tiempo,
+            'hora': 12 if tiempo == 'alm' else (8 if tiempo == 'des' else 20)
+        }
+    
+    def _puntuar_comidas_plan(self, plan_data: Dict) -> Dict[Tuple[str, str], float]:
+        """
+        Puntúa con el Modelo 3 todas las comidas principales del plan en una sola pasada
+        
+        Returns:
+            Diccionario {(dia_key, tiempo): score}; vacío si el modelo no está disponible
+        """
+        claves = []
+        combinaciones = []
+        contextos = []
+        for dia_key, dia_data in plan_data.items():
+            if not dia_key.startswith('dia_') or not isinstance(dia_data, dict):
+                continue
+            for tiempo in ['des', 'alm', 'cena']:
+                comida = dia_data.get(tiempo)
+                if not isinstance(comida, dict) or not comida.get('alimentos'):
+                    continue
+                claves.append((dia_key, tiempo))
+                combinaciones.append([
+                    {
+                        'nombre': a.get('nombre', ''),
+                        'grupo': a.get('grupo', ''),
+                        'kcal': float(a.get('kcal', 0) or 0),
+                        'cho': float(a.get('cho', 0) or 0),
+                        'pro': float(a.get('pro', 0) or 0),
+                        'fat': float(a.get('fat', 0) or 0),
+                        'fibra': float(a.get('fibra', 0) or 0)
+                    }
+                    for a in comida['alimentos']
+                ])
+                contextos.append(self._contexto_modelo3(tiempo))
+        
+        if not combinaciones:
+            return {}
+        
+        scores = self.motor_recomendacion.evaluar_combinaciones_batch(
+            self._perfil_dict_modelo3(), combinaciones, contextos
+        )
+        if scores is None:
+            return {}
+        print(f"[ML] Modelo 3: {len(scores)} comidas puntuadas en una sola pasada")
+        return dict(zip(claves, scores))
+    
     def _validar_comidas_con_ia(self, plan_optimizado: Dict, plan_semanal_data: Dict) -> Dict:
         """
         Valida todas las comidas del plan con Modelo 3 (ML) para mejorar combinaciones
@@ -995,6 +1260,9 @@ class OptimizadorPlan:
         # Usar plan_optimizado directamente para asegurar que los cambios se reflejen
         plan_data = plan_optimizado.get('plan_semanal', plan_semanal_data)
         
+        # Puntuar todas las comidas principales del plan en una sola pasada del Modelo 3
+        scores_comidas = self._puntuar_comidas_plan(plan_data)
+        
         for dia_key, dia_data in plan_data.items():
             if not dia_key.startswith('dia_'):
                 continue
@@ -1018,40 +1286,8 @@ class OptimizadorPlan:
                     print(f"[ML] Validando con IA: {dia_key} - {tiempo} ({len(alimentos)} alimentos: {', '.join(nombres_alimentos[:3])}...)")
                     
                     try:
-                        # Usar Modelo 3 para evaluar combinación
-                        combinacion_ml = [
-                            {
-                                'nombre': a.get('nombre', ''),
-                                'grupo': a.get('grupo', ''),
-                                'kcal': float(a.get('kcal', 0) or 0),
-                                'cho': float(a.get('cho', 0) or 0),
-                                'pro': float(a.get('pro', 0) or 0),
-                                'fat': float(a.get('fat', 0) or 0),
-                                'fibra': float(a.get('fibra', 0) or 0)
-                            }
-                            for a in alimentos
-                        ]
-                        contexto = {
-                            'tiempo_comida': tiempo,
-                            'hora': 12 if tiempo == 'alm' else (8 if tiempo == 'des' else 20)
-                        }
-                        # Preparar perfil como diccionario para el modelo
-                        if isinstance(self.perfil_paciente, dict):
-                            perfil_dict = self.perfil_paciente
-                        else:
-                            perfil_dict = {
-                                'edad': getattr(self.perfil_paciente, 'edad', 50),
-                                'sexo': getattr(self.perfil_paciente, 'sexo', 'M'),
-                                'imc': getattr(self.perfil_paciente, 'imc', 25),
-                                'hba1c': getattr(self.perfil_paciente, 'hba1c', None),
-                                'glucosa_ayunas': getattr(self.perfil_paciente, 'glucosa_ayunas', None)
-                            }
-                        
-                        score_combinacion = self.motor_recomendacion.evaluar_combinacion_alimentos(
-                            perfil_dict,
-                            combinacion_ml,
-                            contexto
-                        )
+                        # Score calculado en lote por _puntuar_comidas_plan
+                        score_combinacion = scores_comidas.get((dia_key, tiempo))
                         comidas_validadas += 1
                         
                         # Si el score es muy bajo (< 0.4), considerar la combinación como no adecuada
@@ -1103,7 +1339,7 @@ class OptimizadorPlan:
                                 
                                 # Limitar cantidad de verduras por comida (especialmente en cena para diabéticos)
                                 verduras_en_comida = [al for al in nuevos_alimentos if al.get('grupo', '').startswith('GRUPO2_VERDURAS')]
-                                total_verduras_g = sum(float(re.sub(r'[^\d.]', '', str(al.get('cantidad', '0g')))) for al in verduras_en_comida)
+                                total_verduras_g = sum(al.cantidad for al in verduras_en_comida)
                                 
                                 # Límites de verduras por comida (en gramos)
                                 max_verduras_g = {
@@ -1120,17 +1356,12 @@ class OptimizadorPlan:
                                     print(f"      [WARN]  Reduciendo verduras: {total_verduras_g:.1f}g → {max_verduras_g:.1f}g (factor: {factor_reduccion:.2f})")
                                     for al in nuevos_alimentos:
                                         if al.get('grupo', '').startswith('GRUPO2_VERDURAS'):
-                                            cantidad_str = str(al.get('cantidad', '0g'))
-                                            cantidad_num = float(re.sub(r'[^\d.]', '', cantidad_str))
-                                            cantidad_nueva = cantidad_num * factor_reduccion
-                                            al['cantidad'] = f"{round(cantidad_nueva, 1)}g"
+                                            cantidad_nueva = al.cantidad * factor_reduccion
+                                            al.cantidad = round(cantidad_nueva, 1)
+                                            al.unidad = 'g'
                                             # Recalcular nutrientes
                                             factor = cantidad_nueva / 100.0
-                                            al['kcal'] = round(float(al.get('kcal', 0) or 0) * factor, 1)
-                                            al['cho'] = round(float(al.get('cho', 0) or 0) * factor, 1)
-                                            al['pro'] = round(float(al.get('pro', 0) or 0) * factor, 1)
-                                            al['fat'] = round(float(al.get('fat', 0) or 0) * factor, 1)
-                                            al['fibra'] = round(float(al.get('fibra', 0) or 0) * factor, 1)
+                                            al.escalar(factor, fibra=True)
                                 
                                 # Agregar alimentos sugeridos, compensando nutrientes removidos
                                 nutrientes_agregados = {'kcal': 0, 'cho': 0, 'pro': 0, 'fat': 0, 'fibra': 0}
@@ -1205,17 +1436,7 @@ class OptimizadorPlan:
                                             cantidad_sugerida = max(30.0, min(cantidad_sugerida, 200.0))
                                             
                                             # Crear nuevo alimento
-                                            nuevo_alimento = {
-                                                'nombre': alimento_encontrado.get('nombre', ''),
-                                                'grupo': grupo_alimento,
-                                                'cantidad': f"{round(cantidad_sugerida, 1)}g",
-                                                'unidad': 'g',
-                                                'kcal': round(kcal_por_100g * cantidad_sugerida / 100, 1),
-                                                'cho': round(cho_por_100g * cantidad_sugerida / 100, 1),
-                                                'pro': round(pro_por_100g * cantidad_sugerida / 100, 1),
-                                                'fat': round(fat_por_100g * cantidad_sugerida / 100, 1),
-                                                'fibra': round(float(alimento_encontrado.get('fibra', 0) or 0) * cantidad_sugerida / 100, 1)
-                                            }
+                                            nuevo_alimento = self._porcion_ingrediente(alimento_encontrado, cantidad_sugerida)
                                             
                                             nuevos_alimentos.append(nuevo_alimento)
                                             alimentos_agregados_count += 1
@@ -1231,7 +1452,7 @@ class OptimizadorPlan:
                                             if grupo_alimento.startswith('GRUPO3_FRUTAS'):
                                                 frutas_en_comida += 1
                                             
-                                            print(f"      [OK] Agregado: {nuevo_alimento['nombre']} - {nuevo_alimento['cantidad']}")
+                                            print(f"      [OK] Agregado: {nuevo_alimento.nombre} - {nuevo_alimento.cantidad}{nuevo_alimento.unidad}")
                                     else:
                                         print(f"      [WARN]  No se encontró en BD: {nombre_sugerido}")
                                 
@@ -1366,7 +1587,7 @@ class OptimizadorPlan:
         # Llamar a la validación completa de IA
         try:
             validacion_completa = self.motor_ia.validar_plan_completo(
-                plan_semanal_data,
+                plan_a_formato_ui(plan_semanal_data),
                 self.perfil_paciente,
                 configuracion,
                 metas,
@@ -1447,17 +1668,7 @@ class OptimizadorPlan:
                                                 cantidad_por_kcal = (deficit_kcal_restante / num_alimentos_restantes) / kcal_por_100g * 100
                                                 cantidad_sugerida = max(50.0, min(cantidad_por_kcal, 200.0))
                                         
-                                        nuevo_alimento = {
-                                            'nombre': alimento_encontrado.get('nombre', ''),
-                                            'grupo': alimento_encontrado.get('grupo', ''),
-                                            'cantidad': f"{round(cantidad_sugerida, 1)}g",
-                                            'unidad': 'g',
-                                            'kcal': round(float(alimento_encontrado.get('kcal', 0) or 0) * cantidad_sugerida / 100, 1),
-                                            'cho': round(float(alimento_encontrado.get('cho', 0) or 0) * cantidad_sugerida / 100, 1),
-                                            'pro': round(float(alimento_encontrado.get('pro', 0) or 0) * cantidad_sugerida / 100, 1),
-                                            'fat': round(float(alimento_encontrado.get('fat', 0) or 0) * cantidad_sugerida / 100, 1),
-                                            'fibra': round(float(alimento_encontrado.get('fibra', 0) or 0) * cantidad_sugerida / 100, 1)
-                                        }
+                                        nuevo_alimento = self._porcion_ingrediente(alimento_encontrado, cantidad_sugerida)
                                         nuevos_alimentos.append(nuevo_alimento)
                                         nutrientes_agregados['kcal'] += nuevo_alimento['kcal']
                                         nutrientes_agregados['cho'] += nuevo_alimento['cho']
@@ -1519,3 +1730,89 @@ class OptimizadorPlan:
         
         return plan_optimizado
 
+
+# ============================================================================
+# POOL DE PROCESOS PARA OPTIMIZAR DÍAS EN PARALELO
+# ============================================================================
+# Se crea en el primer uso y se reutiliza entre planes. En Linux los procesos se
+# crean con fork: heredan los modelos ya cargados en el registro (sin volver a
+# leerlos del disco) y el pool de BD se reabre solo si se usa (ver bd_conexion).
+# Si el registro publica una versión nueva de los modelos (recarga en caliente),
+# el pool se reemplaza para que los procesos no evalúen con la versión anterior.
+#
+# Por eso OPTIMIZADOR_PROCESOS queda en 0: la aceleración solo se ha medido en 1
+# CPU, donde el modo paralelo es más lento (benchmarks/optimizador_paralelo.py);
+# activarlo solo tras medir en el host de producción.
+
+_pool_procesos = None
+_clave_pool_procesos = None
+_lock_pool_procesos = threading.Lock()
+
+# Estado de cada proceso del pool
+_motor_proceso = None
+
+
+def _version_modelos() -> Optional[str]:
+    try:
+        from Core.registro_modelos import obtener_registro
+        return obtener_registro().version_global()
+    except Exception:
+        return None
+
+
+def _obtener_pool_procesos(procesos: int):
+    global _pool_procesos, _clave_pool_procesos
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+    
+    clave = (procesos, os.getpid(), _version_modelos())
+    with _lock_pool_procesos:
+        if _pool_procesos is None or _clave_pool_procesos != clave:
+            # Un pool heredado de otro proceso (fork de gunicorn) no se puede usar ni cerrar
+            if _pool_procesos is not None and _clave_pool_procesos[1] == os.getpid():
+                _pool_procesos.shutdown(wait=False)
+            metodos = multiprocessing.get_all_start_methods()
+            contexto = multiprocessing.get_context('fork' if 'fork' in metodos else 'spawn')
+            _pool_procesos = ProcessPoolExecutor(max_workers=procesos, mp_context=contexto)
+            _clave_pool_procesos = clave
+            print(f"[OK] Pool de optimización con {procesos} procesos")
+        return _pool_procesos
+
+
+def cerrar_pool_procesos():
+    """Cierra el pool de optimización en paralelo (si se creó)"""
+    global _pool_procesos, _clave_pool_procesos
+    with _lock_pool_procesos:
+        if _pool_procesos is not None and _clave_pool_procesos[1] == os.getpid():
+            _pool_procesos.shutdown(wait=True)
+        _pool_procesos = None
+        _clave_pool_procesos = None
+
+
+def _obtener_motor_proceso():
+    """MotorRecomendacion del proceso (los modelos se toman del registro)"""
+    global _motor_proceso
+    if _motor_proceso is None:
+        from Core.motor_recomendacion import MotorRecomendacion
+        _motor_proceso = MotorRecomendacion()
+    return _motor_proceso
+
+
+def _optimizar_lote_en_proceso(configuracion: Dict, dias: List[Tuple[str, Dict]], metas: Dict,
+                               grupos_alimentos: Dict, perfil) -> List[Dict]:
+    """Optimiza un lote de días dentro de un proceso del pool"""
+    motor = _obtener_motor_proceso() if configuracion['usar_motor'] else None
+    optimizador = OptimizadorPlan(
+        umbral_cumplimiento=configuracion['umbral_cumplimiento'],
+        max_iteraciones=configuracion['max_iteraciones'],
+        perfil_paciente=configuracion['perfil_paciente'],
+        motor_recomendacion=motor,
+        solver=configuracion['solver'],
+        procesos=0,
+    )
+    optimizador.grupos_alimentos = grupos_alimentos
+    optimizador.metas_nutricionales = metas
+    return [
+        optimizador._optimizar_dia_completo(dia_key, dia_data, metas, grupos_alimentos, perfil, motor)
+        for dia_key, dia_data in dias
+    ]
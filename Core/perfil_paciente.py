@@ -0,0 +1,128 @@
+# perfil_paciente.py
+# Carga del perfil del paciente en una sola sentencia SQL
+#
+# MotorRecomendacion.obtener_perfil_paciente hacía siete consultas seguidas
+# (paciente, última antropometría, último clínico, alergias, medicamentos y
+# preferencias excluir/incluir), y se llama en cada generación, en la
+# configuración propuesta y en cada búsqueda de intercambio: con la BD remota
+# son siete idas y vueltas. Aquí todo sale en una fila: LATERAL ... LIMIT 1 para
+# los últimos registros y array_agg para las listas (ordenadas, para que el
+# mismo estado del paciente dé siempre la misma instantánea).
+#
+# Va registrada con nombre: se prepara en cada conexión del pool desde su
+# primera ejecución (el plan de los LATERAL ya no se recalcula). El resultado es una InstantaneaPerfil
+# inmutable y hashable (listas como tuplas), usable directamente como clave de
+# caché.
+
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from Core.bd_conexion import fetch_one_prepared, registrar_sentencia
+
+SQL_PERFIL = """
+    SELECT p.id, p.sexo, p.fecha_nac,
+           a.peso, a.talla, a.actividad,
+           c.hba1c, c.glucosa_ayunas, c.ldl, c.trigliceridos, c.pa_sis, c.pa_dia,
+           al.nombres, me.nombres, pr.excluir, pr.incluir
+    FROM paciente p
+    LEFT JOIN LATERAL (
+        SELECT peso, talla, actividad
+        FROM antropometria
+        WHERE paciente_id = p.id
+        ORDER BY fecha DESC
+        LIMIT 1
+    ) a ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia
+        FROM clinico
+        WHERE paciente_id = p.id
+        ORDER BY fecha DESC
+        LIMIT 1
+    ) c ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT array_agg(i.nombre ORDER BY i.nombre) FILTER (WHERE i.nombre IS NOT NULL) AS nombres
+        FROM paciente_alergia pa
+        LEFT JOIN ingrediente i ON i.id = pa.ingrediente_id
+        WHERE pa.paciente_id = p.id
+    ) al ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT array_agg(nombre ORDER BY nombre) FILTER (WHERE nombre IS NOT NULL) AS nombres
+        FROM paciente_medicamento
+        WHERE paciente_id = p.id AND activo = true
+    ) me ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT array_agg(i.nombre ORDER BY i.nombre) FILTER (WHERE pp.tipo = 'excluir' AND i.nombre IS NOT NULL) AS excluir,
+               array_agg(i.nombre ORDER BY i.nombre) FILTER (WHERE pp.tipo = 'incluir' AND i.nombre IS NOT NULL) AS incluir
+        FROM paciente_preferencia pp
+        LEFT JOIN ingrediente i ON i.id = pp.ingrediente_id
+        WHERE pp.paciente_id = p.id
+    ) pr ON TRUE
+    WHERE p.id = %s
+"""
+registrar_sentencia("perfil_paciente", SQL_PERFIL)
+
+
+@dataclass(frozen=True)
+class InstantaneaPerfil:
+    """Perfil del paciente tal como está en la BD (mismos campos que PerfilPaciente)"""
+    paciente_id: int
+    edad: int
+    sexo: str
+    peso: float
+    talla: float
+    imc: float
+    actividad: str
+    hba1c: Optional[float]
+    glucosa_ayunas: Optional[float]
+    ldl: Optional[float]
+    trigliceridos: Optional[float]
+    pa_sis: Optional[int]
+    pa_dia: Optional[int]
+    alergias: Tuple[str, ...]
+    medicamentos: Tuple[str, ...]
+    preferencias_excluir: Tuple[str, ...]
+    preferencias_incluir: Tuple[str, ...]
+
+    def como_dict(self) -> Dict:
+        """Campos para construir un PerfilPaciente (las tuplas vuelven a ser listas)"""
+        return {k: list(v) if isinstance(v, tuple) else v for k, v in asdict(self).items()}
+
+
+def instantanea_desde_fila(paciente_id: int, fila: tuple) -> InstantaneaPerfil:
+    """Aplica a la fila de SQL_PERFIL los mismos valores por defecto de siempre"""
+    (_, sexo, fecha_nac, peso, talla, actividad,
+     hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia,
+     alergias, medicamentos, excluir, incluir) = fila
+
+    edad = (date.today() - fecha_nac).days // 365 if fecha_nac else 30
+    peso = float(peso) if peso else 70.0
+    talla = float(talla) if talla else 1.70
+
+    return InstantaneaPerfil(
+        paciente_id=paciente_id,
+        edad=edad,
+        sexo=sexo,
+        peso=peso,
+        talla=talla,
+        imc=peso / (talla ** 2),
+        actividad=actividad or 'moderada',
+        hba1c=float(hba1c) if hba1c else None,
+        glucosa_ayunas=float(glucosa_ayunas) if glucosa_ayunas else None,
+        ldl=float(ldl) if ldl else None,
+        trigliceridos=float(trigliceridos) if trigliceridos else None,
+        pa_sis=pa_sis or None,
+        pa_dia=pa_dia or None,
+        alergias=tuple(alergias or ()),
+        medicamentos=tuple(medicamentos or ()),
+        preferencias_excluir=tuple(excluir or ()),
+        preferencias_incluir=tuple(incluir or ()),
+    )
+
+
+def cargar_perfil(paciente_id: int) -> Optional[InstantaneaPerfil]:
+    """Perfil completo en una ida y vuelta; None si el paciente no existe"""
+    fila = fetch_one_prepared("perfil_paciente", (paciente_id,))
+    if not fila:
+        return None
+    return instantanea_desde_fila(paciente_id, fila)
@@ -0,0 +1,186 @@
+# plan_compacto.py
+# Representación interna compacta de los alimentos de un plan
+#
+# Durante la generación y la optimización cada alimento del plan es una Porcion
+# (__slots__): id del ingrediente, cantidad numérica + unidad y los nutrientes de
+# la porción. Así la cantidad no se guarda como texto ("120.0g") que haya que
+# volver a parsear con expresiones regulares en cada ajuste, y cada alimento
+# ocupa bastante menos memoria que un diccionario.
+#
+# Los días y las comidas siguen siendo diccionarios ({'fecha', 'des': {'nombre',
+# 'horario', 'alimentos': [Porcion, ...]}, ...}); solo la lista de alimentos es
+# compacta. La conversión al formato de la UI (alimentos como dict con
+# 'cantidad': "120.0g") se hace una vez, al final, con plan_a_formato_ui.
+
+import re
+from typing import Dict, Optional, Tuple
+
+NUTRIENTES = ('kcal', 'cho', 'pro', 'fat', 'fibra')
+
+_RE_NUMERO = re.compile(r'(\d+\.?\d*)')
+_RE_UNIDAD = re.compile(r'[a-zA-Z]+')
+
+
+def parsear_cantidad(cantidad, unidad_defecto: str = 'g') -> Tuple[float, str]:
+    """Cantidad numérica y unidad de un texto como "120.5g" (o de un número)"""
+    if isinstance(cantidad, str):
+        numero = _RE_NUMERO.search(cantidad)
+        unidad = _RE_UNIDAD.search(cantidad)
+        return (float(numero.group(1)) if numero else 0.0), (unidad.group(0) if unidad else unidad_defecto)
+    return float(cantidad or 0), unidad_defecto
+
+
+class Porcion:
+    """
+    Un alimento del plan: ingrediente, cantidad (número, en `unidad`) y nutrientes
+    de la porción. fibra es None si el alimento no la informa.
+
+    Admite lectura tipo diccionario (porcion['kcal'], porcion.get('grupo', ''))
+    para el código que trata los alimentos como dict (Modelo 3, reglas de
+    combinación); las modificaciones se hacen por atributo.
+    """
+
+    __slots__ = ('ingrediente_id', 'nombre', 'grupo', 'cantidad', 'unidad',
+                 'kcal', 'cho', 'pro', 'fat', 'fibra')
+
+    def __init__(self, nombre: str, grupo: str, cantidad: float, unidad: str = 'g',
+                 kcal: float = 0.0, cho: float = 0.0, pro: float = 0.0, fat: float = 0.0,
+                 fibra: Optional[float] = None, ingrediente_id: Optional[int] = None):
+        self.ingrediente_id = ingrediente_id
+        self.nombre = nombre
+        self.grupo = grupo
+        self.cantidad = cantidad
+        self.unidad = unidad
+        self.kcal = kcal
+        self.cho = cho
+        self.pro = pro
+        self.fat = fat
+        self.fibra = fibra
+
+    @classmethod
+    def desde_ingrediente(cls, ingrediente: Dict, cantidad: float, unidad: str = 'g',
+                          con_fibra: bool = False) -> 'Porcion':
+        """Porción de un ingrediente con nutrientes por 100 (redondeados a 0.1, como en el plan)"""
+        get = ingrediente.get
+        factor = cantidad / 100
+        porcion = cls.__new__(cls)
+        porcion.ingrediente_id = get('id')
+        porcion.nombre = get('nombre', '')
+        porcion.grupo = get('grupo', '')
+        porcion.cantidad = cantidad
+        porcion.unidad = unidad
+        porcion.kcal = round(float(get('kcal') or 0) * factor, 1)
+        porcion.cho = round(float(get('cho') or 0) * factor, 1)
+        porcion.pro = round(float(get('pro') or 0) * factor, 1)
+        porcion.fat = round(float(get('fat') or 0) * factor, 1)
+        porcion.fibra = round(float(get('fibra') or 0) * factor, 1) if con_fibra else None
+        return porcion
+
+    @classmethod
+    def desde_dict(cls, alimento: Dict) -> 'Porcion':
+        """Porción desde un alimento en formato de la UI ('cantidad': "120.0g" o número)"""
+        cantidad, unidad = parsear_cantidad(alimento.get('cantidad', 0), alimento.get('unidad', 'g'))
+        fibra = alimento.get('fibra')
+        return cls(
+            nombre=alimento.get('nombre', ''),
+            grupo=alimento.get('grupo', ''),
+            cantidad=cantidad,
+            unidad=unidad,
+            kcal=float(alimento.get('kcal', 0) or 0),
+            cho=float(alimento.get('cho', 0) or 0),
+            pro=float(alimento.get('pro', 0) or 0),
+            fat=float(alimento.get('fat', 0) or 0),
+            fibra=float(fibra) if fibra is not None else None,
+            ingrediente_id=alimento.get('ingrediente_id', alimento.get('id')),
+        )
+
+    def a_dict(self) -> Dict:
+        """Alimento en el formato de la UI"""
+        alimento = {
+            'nombre': self.nombre,
+            'grupo': self.grupo,
+            'cantidad': f"{self.cantidad}{self.unidad}",
+            'unidad': self.unidad,
+            'kcal': self.kcal,
+            'cho': self.cho,
+            'pro': self.pro,
+            'fat': self.fat,
+        }
+        if self.fibra is not None:
+            alimento['fibra'] = self.fibra
+        if self.ingrediente_id is not None:
+            alimento['ingrediente_id'] = self.ingrediente_id
+        return alimento
+
+    def copy(self) -> 'Porcion':
+        copia = Porcion.__new__(Porcion)
+        copia.ingrediente_id = self.ingrediente_id
+        copia.nombre = self.nombre
+        copia.grupo = self.grupo
+        copia.cantidad = self.cantidad
+        copia.unidad = self.unidad
+        copia.kcal = self.kcal
+        copia.cho = self.cho
+        copia.pro = self.pro
+        copia.fat = self.fat
+        copia.fibra = self.fibra
+        return copia
+
+    def escalar(self, factor: float, fibra: bool = False) -> None:
+        """
+        Multiplica los nutrientes por `factor` (redondeo a 0.1). La fibra se escala
+        si el alimento la informa; con fibra=True se fija también si faltaba.
+        """
+        self.kcal = round(self.kcal * factor, 1)
+        self.cho = round(self.cho * factor, 1)
+        self.pro = round(self.pro * factor, 1)
+        self.fat = round(self.fat * factor, 1)
+        if self.fibra is not None or fibra:
+            self.fibra = round((self.fibra or 0.0) * factor, 1)
+
+    # Lectura tipo diccionario
+    def get(self, clave: str, defecto=None):
+        valor = getattr(self, clave, None) if clave in self.__slots__ else None
+        return defecto if valor is None else valor
+
+    def __getitem__(self, clave: str):
+        if clave not in self.__slots__:
+            raise KeyError(clave)
+        return getattr(self, clave)
+
+    def __contains__(self, clave: str) -> bool:
+        return clave in self.__slots__ and getattr(self, clave) is not None
+
+    def __repr__(self) -> str:
+        return f"Porcion({self.nombre!r}, {self.grupo!r}, {self.cantidad}{self.unidad}, kcal={self.kcal})"
+
+
+def es_comida(tiempo: str, comida) -> bool:
+    """True si la entrada del día es una comida con alimentos (no 'fecha' ni otros campos)"""
+    return tiempo != 'fecha' and isinstance(comida, dict) and 'alimentos' in comida
+
+
+def compactar_dia(dia: Dict) -> Dict:
+    """Convierte en Porcion los alimentos de un día que aún sean dict (en el lugar)"""
+    for tiempo, comida in dia.items():
+        if es_comida(tiempo, comida):
+            comida['alimentos'] = [a if isinstance(a, Porcion) else Porcion.desde_dict(a)
+                                   for a in comida['alimentos']]
+    return dia
+
+
+def dia_a_formato_ui(dia: Dict) -> Dict:
+    """Copia del día con los alimentos como dict (formato de la UI)"""
+    resultado = {}
+    for tiempo, comida in dia.items():
+        if es_comida(tiempo, comida):
+            comida = dict(comida)
+            comida['alimentos'] = [a.a_dict() if isinstance(a, Porcion) else a for a in comida['alimentos']]
+        resultado[tiempo] = comida
+    return resultado
+
+
+def plan_a_formato_ui(plan_semanal: Dict) -> Dict:
+    """dia_a_formato_ui para todos los días de un plan"""
+    return {clave: dia_a_formato_ui(dia) if isinstance(dia, dict) else dia
+            for clave, dia in plan_semanal.items()}
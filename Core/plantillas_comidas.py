@@ -0,0 +1,399 @@
+# plantillas_comidas.py
+# Biblioteca de plantillas de comida (desayuno, almuerzo, cena) generada offline
+#
+# ml/generar_plantillas_comidas.py enumera combinaciones por tiempo de comida a
+# partir del catálogo activo (un ingrediente por grupo de la estructura de la
+# comida, con las mismas preferencias que los _sugerir_*_variado), descarta las
+# que no pasan OptimizadorPlan._es_combinacion_apetitosa, puntúa el resto en lote
+# con el Modelo 3 y guarda las mejores en JSON junto a su perfil de
+# macronutrientes (% de kcal de CHO/PRO/FAT en bandas de PASO_PERFIL puntos).
+#
+# En línea, MotorRecomendacion busca las plantillas cuyo perfil está más cerca
+# del de las metas del paciente, cuyos ingredientes están en su lista
+# recomendada y respetan las reglas de variedad, elige una y la escala a las
+# calorías de la comida; después el optimizador ajusta las porciones del día.
+
+import os
+import json
+import time
+import random
+import itertools
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from Core.indice_ingredientes import GruposIngredientes
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ARCHIVO_PLANTILLAS = Path(os.getenv(
+    "PLANTILLAS_COMIDAS_ARCHIVO",
+    str(BASE_DIR / "ApartadoInteligente" / "ModeloML" / "plantillas_comidas.json")
+))
+# "0" desactiva el uso de la biblioteca aunque el archivo exista
+USAR_PLANTILLAS = os.getenv("PLANTILLAS_COMIDAS", "1") != "0"
+SEGUNDOS_VERIFICACION = float(os.getenv("PLANTILLAS_COMIDAS_VERIFICACION_SEG", "30"))
+
+VERSION_FORMATO = 1
+PASO_PERFIL = 5          # Ancho de banda (puntos de % de kcal) del perfil de macros
+RADIO_BUSQUEDA = 6       # Distancia L1 máxima (en bandas) al buscar plantillas
+TOP_VARIEDAD = 8         # Plantillas válidas entre las que se rota por día
+
+# Estructura de cada comida: (grupo, porciones de referencia, facetas preferidas).
+# Porciones y preferencias por defecto de los _sugerir_*_variado; si ningún
+# ingrediente cumple las facetas se usa el grupo completo.
+ESTRUCTURAS = {
+    'des': (
+        ('GRUPO1_CEREALES', 1.0, {'desayuno': True}),
+        ('GRUPO4_LACTEOS', 0.5, {'bajo_grasa': True}),
+        ('GRUPO3_FRUTAS', 1.0, {}),
+        ('GRUPO2_VERDURAS', 0.5, {}),
+        ('GRUPO7_GRASAS', 0.8, {}),
+    ),
+    'alm': (
+        ('GRUPO5_CARNES', 1.5, {}),
+        ('GRUPO1_CEREALES', 2.0, {}),
+        ('GRUPO2_VERDURAS', 1.5, {}),
+        ('GRUPO7_GRASAS', 1.5, {}),
+    ),
+    'cena': (
+        ('GRUPO5_CARNES', 1.0, {}),
+        ('GRUPO2_VERDURAS', 1.5, {}),
+        ('GRUPO7_GRASAS', 1.2, {}),
+        ('GRUPO1_CEREALES', 0.5, {'banda_ig': 'bajo'}),
+    ),
+}
+TIEMPOS_PLANTILLA = tuple(ESTRUCTURAS)
+HORA_COMIDA = {'des': 8, 'alm': 12, 'cena': 20}  # Contexto del Modelo 3 (como OptimizadorPlan._contexto_modelo3)
+
+# Perfil con el que se puntúan las plantillas offline (paciente con DM2 típico)
+PERFIL_REFERENCIA = {'edad': 55, 'sexo': 'F', 'imc': 28.0, 'hba1c': 7.0, 'glucosa_ayunas': 130.0}
+
+_CAMPOS_MACROS = ('kcal', 'cho', 'pro', 'fat', 'fibra')
+
+
+class Plantilla(NamedTuple):
+    tiempo: str
+    ids: Tuple
+    grupos: Tuple[str, ...]
+    porciones: Tuple[float, ...]   # porciones de intercambio de referencia
+    gramos: Tuple[float, ...]      # gramos de referencia
+    macros: Tuple[float, ...]      # kcal, cho, pro, fat, fibra con los gramos de referencia
+    perfil: Tuple[int, int, int]   # bandas de % de kcal de CHO, PRO, FAT
+    score: float
+
+
+def macros_combinacion(ingredientes: Sequence[Dict], gramos: Sequence[float]) -> Tuple[float, ...]:
+    """Totales (kcal, cho, pro, fat, fibra) de ingredientes con valores por 100 g"""
+    return tuple(
+        round(sum(float(ing.get(campo, 0) or 0) * g / 100 for ing, g in zip(ingredientes, gramos)), 1)
+        for campo in _CAMPOS_MACROS
+    )
+
+
+def perfil_macros(cho_pct: float, pro_pct: float, fat_pct: float) -> Tuple[int, int, int]:
+    return (int(round(cho_pct / PASO_PERFIL)), int(round(pro_pct / PASO_PERFIL)), int(round(fat_pct / PASO_PERFIL)))
+
+
+def perfil_de_macros(macros: Sequence[float]) -> Tuple[int, int, int]:
+    kcal = macros[0]
+    if kcal <= 0:
+        return (0, 0, 0)
+    return perfil_macros(macros[1] * 4 / kcal * 100, macros[2] * 4 / kcal * 100, macros[3] * 9 / kcal * 100)
+
+
+def score_reglas(ingredientes: Sequence[Dict], macros: Sequence[float]) -> float:
+    """
+    Score (0-1) sin Modelo 3: IG medio ponderado por CHO bajo y fibra alta.
+    Solo se usa si el modelo no está disponible al generar la biblioteca.
+    """
+    cho_total = sum(float(i.get('cho', 0) or 0) for i in ingredientes) or 1.0
+    ig_medio = sum((i.get('ig') or 100) * float(i.get('cho', 0) or 0) for i in ingredientes) / cho_total
+    fibra = min(macros[4] / 10.0, 1.0)
+    return round(max(0.0, 1.0 - ig_medio / 100.0) * 0.7 + fibra * 0.3, 4)
+
+
+# ---------- Generación (offline) ----------
+
+def _candidatos_estructura(grupos: GruposIngredientes, tiempo: str) -> List[List[Dict]]:
+    candidatos = []
+    for grupo, _, facetas in ESTRUCTURAS[tiempo]:
+        lista = grupos.candidatos(grupo, **facetas) if facetas else grupos.get(grupo, [])
+        candidatos.append(lista or grupos.get(grupo, []))
+    return candidatos
+
+
+def _combinaciones(candidatos: List[List[Dict]], maximo: int, rnd: random.Random) -> Iterator[Tuple[Dict, ...]]:
+    """Todas las combinaciones si son pocas; si no, una muestra determinista sin repetidas"""
+    total = 1
+    for lista in candidatos:
+        total *= len(lista)
+    if total <= maximo:
+        yield from itertools.product(*candidatos)
+        return
+    vistas = set()
+    for _ in range(maximo * 3):
+        posiciones = tuple(rnd.randrange(len(lista)) for lista in candidatos)
+        if posiciones in vistas:
+            continue
+        vistas.add(posiciones)
+        yield tuple(lista[p] for lista, p in zip(candidatos, posiciones))
+        if len(vistas) >= maximo:
+            return
+
+
+def generar_plantillas(ingredientes: List[Dict],
+                       gramos: Callable[[Dict, float], float],
+                       puntuar: Optional[Callable[[List[List[Dict]], List[Dict]], Optional[List[float]]]] = None,
+                       es_apetitosa: Optional[Callable[[Dict, str, str], bool]] = None,
+                       max_por_tiempo: int = 2000,
+                       max_evaluadas: int = 20000,
+                       semilla: int = 42,
+                       lote: int = 2048,
+                       version: Optional[int] = None) -> Dict[str, List[Plantilla]]:
+    """
+    Enumera, valida y puntúa plantillas para cada tiempo de TIEMPOS_PLANTILLA.
+
+    Args:
+        ingredientes: Ingredientes activos del catálogo (dicts con id, grupo, nutrientes por 100 g)
+        gramos: Función (ingrediente, porciones) -> gramos (p. ej. MotorRecomendacion._convertir_porciones_a_gramos)
+        puntuar: Función (combinaciones, contextos) -> scores en lote (Modelo 3); None o sin
+                 resultado usa score_reglas
+        es_apetitosa: Reglas de combinación (comida, grupo, nombre) -> bool
+        max_por_tiempo: Plantillas que se guardan por tiempo (las de mayor score)
+        max_evaluadas: Combinaciones evaluadas como máximo por tiempo
+        version: Versión del catálogo de `ingredientes` (caché de atributos del índice)
+    """
+    grupos = GruposIngredientes(ingredientes, version=version)
+    rnd = random.Random(semilla)
+    cache_gramos: Dict[Tuple, float] = {}
+
+    def _gramos(ingrediente: Dict, porciones: float) -> float:
+        clave = (ingrediente.get('id'), porciones)
+        if clave not in cache_gramos:
+            cache_gramos[clave] = round(float(gramos(ingrediente, porciones)), 1)
+        return cache_gramos[clave]
+
+    resultado = {}
+    for tiempo, estructura in ESTRUCTURAS.items():
+        porciones = tuple(p for _, p, _ in estructura)
+        candidatos = _candidatos_estructura(grupos, tiempo)
+        if not all(candidatos):
+            print(f"[WARN]  Plantillas {tiempo}: faltan ingredientes de algún grupo de la estructura")
+            resultado[tiempo] = []
+            continue
+
+        validas = []
+        for combinacion in _combinaciones(candidatos, max_evaluadas, rnd):
+            if len({a.get('id') for a in combinacion}) < len(combinacion):
+                continue
+            if es_apetitosa is not None:
+                comida = {'tiempo': tiempo, 'alimentos': []}
+                apetitosa = True
+                for alimento in combinacion:
+                    if not es_apetitosa(comida, alimento.get('grupo', ''), alimento.get('nombre', '')):
+                        apetitosa = False
+                        break
+                    comida['alimentos'].append(alimento)
+                if not apetitosa:
+                    continue
+            gramos_ref = tuple(_gramos(a, p) for a, p in zip(combinacion, porciones))
+            if any(g <= 0 for g in gramos_ref):
+                continue
+            validas.append((combinacion, gramos_ref, macros_combinacion(combinacion, gramos_ref)))
+
+        scores: List[Optional[float]] = [None] * len(validas)
+        if puntuar is not None:
+            contexto = {'tiempo_comida': tiempo, 'hora': HORA_COMIDA[tiempo]}
+            for inicio in range(0, len(validas), lote):
+                bloque = validas[inicio:inicio + lote]
+                combinaciones = [
+                    [dict(zip(_CAMPOS_MACROS, macros_combinacion([a], [g])), nombre=a.get('nombre', ''), grupo=a.get('grupo', ''))
+                     for a, g in zip(combinacion, gramos_ref)]
+                    for combinacion, gramos_ref, _ in bloque
+                ]
+                puntuados = puntuar(combinaciones, [contexto] * len(bloque))
+                if puntuados is None:
+                    break
+                scores[inicio:inicio + len(bloque)] = puntuados
+
+        plantillas = []
+        for (combinacion, gramos_ref, macros), score in zip(validas, scores):
+            if score is None:
+                score = score_reglas(combinacion, macros)
+            plantillas.append(Plantilla(
+                tiempo=tiempo,
+                ids=tuple(a.get('id') for a in combinacion),
+                grupos=tuple(a.get('grupo') for a in combinacion),
+                porciones=porciones,
+                gramos=gramos_ref,
+                macros=macros,
+                perfil=perfil_de_macros(macros),
+                score=round(float(score), 4),
+            ))
+        plantillas.sort(key=lambda p: -p.score)
+        resultado[tiempo] = plantillas[:max_por_tiempo]
+        print(f"[OK] Plantillas {tiempo}: {len(validas)} combinaciones válidas, {len(resultado[tiempo])} guardadas")
+    return resultado
+
+
+def guardar_biblioteca(plantillas: Dict[str, List[Plantilla]], ruta: Path = None, metadatos: Dict = None) -> Path:
+    ruta = Path(ruta or ARCHIVO_PLANTILLAS)
+    datos = {
+        'version_formato': VERSION_FORMATO,
+        'creado_en': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'paso_perfil': PASO_PERFIL,
+        **(metadatos or {}),
+        'plantillas': {
+            tiempo: [
+                {'ids': list(p.ids), 'grupos': list(p.grupos), 'porciones': list(p.porciones),
+                 'gramos': list(p.gramos), 'macros': list(p.macros), 'perfil': list(p.perfil), 'score': p.score}
+                for p in lista
+            ]
+            for tiempo, lista in plantillas.items()
+        },
+    }
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_suffix(ruta.suffix + '.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(temporal, ruta)  # Los workers nunca leen un archivo a medio escribir
+    return ruta
+
+
+# ---------- Biblioteca (en línea) ----------
+
+class BibliotecaPlantillas:
+    """Plantillas cargadas e indexadas por (tiempo, perfil de macros)"""
+
+    def __init__(self, datos: Dict, version: Optional[str] = None):
+        self.metadatos = {k: v for k, v in datos.items() if k != 'plantillas'}
+        # Identifica el archivo cargado (fecha de generación + mtime); va en la clave de la caché de planes
+        self.version = version or str(datos.get('creado_en'))
+        self.paso_perfil = datos.get('paso_perfil', PASO_PERFIL)
+        self.indice: Dict[str, Dict[Tuple[int, int, int], List[Plantilla]]] = {}
+        self._orden_perfiles: Dict[Tuple, List[Tuple[int, int, int]]] = {}
+        self.total = 0
+        for tiempo, lista in (datos.get('plantillas') or {}).items():
+            por_perfil = self.indice.setdefault(tiempo, {})
+            for p in lista:
+                plantilla = Plantilla(
+                    tiempo=tiempo,
+                    ids=tuple(p['ids']),
+                    grupos=tuple(p['grupos']),
+                    porciones=tuple(p['porciones']),
+                    gramos=tuple(p['gramos']),
+                    macros=tuple(p['macros']),
+                    perfil=tuple(p['perfil']),
+                    score=float(p['score']),
+                )
+                por_perfil.setdefault(plantilla.perfil, []).append(plantilla)
+                self.total += 1
+            for plantillas in por_perfil.values():
+                plantillas.sort(key=lambda p: -p.score)
+
+    @classmethod
+    def cargar(cls, ruta: Path = None) -> Optional['BibliotecaPlantillas']:
+        ruta = Path(ruta or ARCHIVO_PLANTILLAS)
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+                datos = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[WARN]  No se pudo leer la biblioteca de plantillas {ruta}: {e}")
+            return None
+        if datos.get('version_formato') != VERSION_FORMATO:
+            print(f"[WARN]  Biblioteca de plantillas con formato {datos.get('version_formato')} "
+                  f"(se esperaba {VERSION_FORMATO}); regenerar con ml/generar_plantillas_comidas.py")
+            return None
+        return cls(datos, version=f"{datos.get('creado_en')}@{mtime_ns}")
+
+    def __len__(self):
+        return self.total
+
+    def _perfiles_cercanos(self, tiempo: str, objetivo: Tuple[int, int, int]) -> List[Tuple[int, int, int]]:
+        """Perfiles con plantillas dentro de RADIO_BUSQUEDA, del más cercano al más lejano"""
+        clave = (tiempo, objetivo)
+        orden = self._orden_perfiles.get(clave)
+        if orden is None:
+            distancias = [
+                (sum(abs(a - b) for a, b in zip(perfil, objetivo)), perfil)
+                for perfil in self.indice.get(tiempo, {})
+            ]
+            orden = [perfil for distancia, perfil in sorted(distancias) if distancia <= RADIO_BUSQUEDA]
+            self._orden_perfiles[clave] = orden
+        return orden
+
+    def candidatas(self, tiempo: str, cho_pct: float, pro_pct: float, fat_pct: float) -> Iterator[Plantilla]:
+        """Plantillas por cercanía al perfil objetivo y, dentro de cada perfil, por score"""
+        objetivo = tuple(int(round(v / self.paso_perfil)) for v in (cho_pct, pro_pct, fat_pct))
+        por_perfil = self.indice.get(tiempo, {})
+        for perfil in self._perfiles_cercanos(tiempo, objetivo):
+            yield from por_perfil[perfil]
+
+    def elegir(self, tiempo: str, cho_pct: float, pro_pct: float, fat_pct: float,
+               disponibles: Dict, permitida: Callable[[List[Dict]], bool],
+               variedad: int = 0) -> Optional[Tuple[Plantilla, List[Dict]]]:
+        """
+        Primera(s) plantillas válidas: todos sus ingredientes en `disponibles` (id ->
+        ingrediente del paciente) y aceptadas por `permitida` (reglas de variedad).
+        Rota entre las TOP_VARIEDAD mejores según `variedad`.
+        """
+        opciones = []
+        for plantilla in self.candidatas(tiempo, cho_pct, pro_pct, fat_pct):
+            ingredientes = [disponibles.get(i) for i in plantilla.ids]
+            if any(ing is None for ing in ingredientes) or not permitida(ingredientes):
+                continue
+            opciones.append((plantilla, ingredientes))
+            if len(opciones) >= TOP_VARIEDAD:
+                break
+        if not opciones:
+            return None
+        return opciones[variedad % len(opciones)]
+
+    def estadisticas(self) -> Dict:
+        return {
+            **self.metadatos,
+            'plantillas': {tiempo: sum(len(l) for l in por_perfil.values()) for tiempo, por_perfil in self.indice.items()},
+            'perfiles': {tiempo: len(por_perfil) for tiempo, por_perfil in self.indice.items()},
+        }
+
+
+class _EstadoBiblioteca:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.biblioteca: Optional[BibliotecaPlantillas] = None
+        self.mtime = None
+        self.ultima_verificacion = 0.0
+
+
+_estado = _EstadoBiblioteca()
+
+
+def obtener_biblioteca() -> Optional[BibliotecaPlantillas]:
+    """Biblioteca cargada (se recarga si el archivo cambió); None si no hay o está desactivada"""
+    if not USAR_PLANTILLAS:
+        return None
+    ahora = time.time()
+    if ahora - _estado.ultima_verificacion < SEGUNDOS_VERIFICACION:
+        return _estado.biblioteca
+    with _estado.lock:
+        _estado.ultima_verificacion = ahora
+        try:
+            mtime = ARCHIVO_PLANTILLAS.stat().st_mtime
+        except OSError:
+            _estado.biblioteca, _estado.mtime = None, None
+            return None
+        if mtime != _estado.mtime:
+            _estado.biblioteca = BibliotecaPlantillas.cargar(ARCHIVO_PLANTILLAS)
+            _estado.mtime = mtime
+            if _estado.biblioteca is not None:
+                print(f"[OK] Biblioteca de plantillas de comida: {len(_estado.biblioteca)} plantillas")
+        return _estado.biblioteca
+
+
+def version_biblioteca() -> Optional[str]:
+    """Versión de la biblioteca que usaría la generación ahora; None si no hay o está desactivada"""
+    biblioteca = obtener_biblioteca()
+    return biblioteca.version if biblioteca is not None else None
@@ -0,0 +1,59 @@
+# precarga.py
+# Precarga de librerías y modelos ML en el proceso maestro de gunicorn
+#
+# Con preload_app (ver gunicorn.conf.py) main.py se importa una sola vez en el
+# maestro; aquí además se importan pandas/XGBoost/scikit-learn y se cargan los
+# cuatro modelos del registro, de modo que los workers los heredan por fork
+# (copy-on-write) en lugar de cargarlos en su primera petición.
+
+import gc
+import time
+import importlib
+from typing import Dict
+
+LIBRERIAS_ML = ['numpy', 'pandas', 'xgboost', 'sklearn']
+
+
+def precargar_aplicacion(incluir_catalogo: bool = False) -> Dict:
+    """
+    Importa las librerías ML y carga todos los modelos en el proceso actual.
+
+    Args:
+        incluir_catalogo: Si True, también construye la matriz del catálogo de
+                          ingredientes (requiere conexión a la BD)
+
+    Returns:
+        Diccionario con los tiempos de carga (segundos) y el estado de los modelos
+    """
+    inicio_total = time.perf_counter()
+    tiempos = {}
+
+    for nombre in LIBRERIAS_ML:
+        inicio = time.perf_counter()
+        try:
+            importlib.import_module(nombre)
+            tiempos[nombre] = round(time.perf_counter() - inicio, 3)
+        except ImportError as e:
+            print(f"[WARN]  Precarga: librería {nombre} no disponible: {e}")
+
+    from Core.registro_modelos import precargar_modelos
+    inicio = time.perf_counter()
+    modelos = precargar_modelos()
+    tiempos['modelos'] = round(time.perf_counter() - inicio, 3)
+
+    if incluir_catalogo:
+        from Core.catalogo_ingredientes import obtener_catalogo
+        inicio = time.perf_counter()
+        obtener_catalogo()
+        tiempos['catalogo'] = round(time.perf_counter() - inicio, 3)
+
+    # Mover los objetos ya creados a la generación permanente: el GC de los
+    # workers no los recorre y así no se copian páginas compartidas tras el fork
+    if hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+
+    tiempos['total'] = round(time.perf_counter() - inicio_total, 3)
+    disponibles = [n for n, r in modelos.items() if r.get('disponible')]
+    print(f"[OK] Precarga completa en {tiempos['total']}s: modelos disponibles {disponibles}")
+    return {'tiempos': tiempos, 'modelos': modelos}
@@ -0,0 +1,412 @@
+# registro_modelos.py
+# Registro de modelos ML compartido por todo el proceso (thread-safe)
+#
+# Los artefactos (pickles) se cargan una sola vez por proceso: todas las
+# instancias de MotorRecomendacion comparten las mismas referencias en lugar
+# de volver a leer los .pkl en cada request. Con gunicorn se puede precargar
+# en el proceso maestro (antes del fork) llamando a precargar_modelos().
+
+import os
+import sys
+import time
+import pickle
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).parent.parent  # Raíz del proyecto
+DIR_MODELO_CONTROL = BASE_DIR / "ApartadoInteligente" / "Entrenamiento" / "ModeloEntrenamiento"
+DIR_MODELOS_ML = BASE_DIR / "ApartadoInteligente" / "ModeloML"
+
+# Nombres lógicos de los modelos del sistema
+MODELO_CONTROL_GLUCEMICO = "control_glucemico"            # Modelo 0 (XGBoost + preprocesadores)
+MODELO_RESPUESTA_GLUCEMICA = "respuesta_glucemica"        # Modelo 1
+MODELO_SELECCION_ALIMENTOS = "seleccion_alimentos"        # Modelo 2
+MODELO_OPTIMIZACION_COMBINACIONES = "optimizacion_combinaciones"  # Modelo 3
+
+
+@dataclass
+class ModeloCargado:
+    """Entrada del registro: artefactos de un modelo y metadatos de carga"""
+    nombre: str
+    artefactos: Dict[str, Any] = field(default_factory=dict)
+    disponible: bool = False
+    version: Optional[str] = None
+    rutas: List[str] = field(default_factory=list)
+    tiempo_carga_s: float = 0.0
+    tamano_disco_bytes: int = 0
+    memoria_bytes: Optional[int] = None
+    cargado_en: Optional[str] = None
+    error: Optional[str] = None
+
+    def get(self, clave: str, default=None):
+        return self.artefactos.get(clave, default)
+
+    def resumen(self) -> Dict:
+        """Metadatos serializables (sin los artefactos)"""
+        return {
+            'nombre': self.nombre,
+            'disponible': self.disponible,
+            'version': self.version,
+            'rutas': self.rutas,
+            'tiempo_carga_s': round(self.tiempo_carga_s, 4),
+            'tamano_disco_bytes': self.tamano_disco_bytes,
+            'memoria_bytes': self.memoria_bytes,
+            'cargado_en': self.cargado_en,
+            'error': self.error,
+        }
+
+
+def _rss_bytes() -> Optional[int]:
+    """Memoria residente actual del proceso (solo Linux, None si no se puede medir)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            residente = int(f.read().split()[1])
+        return residente * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        return None
+
+
+def version_artefactos(rutas: List[Path]) -> str:
+    """Versión de un conjunto de artefactos: nombre + fecha de modificación + hash corto"""
+    h = hashlib.sha1()
+    partes = []
+    for ruta in rutas:
+        stat = ruta.stat()
+        # Artefacto exportado: el manifest se identifica por su directorio
+        nombre = f"{ruta.parent.name}/{ruta.name}" if ruta.name == "manifest.json" else ruta.name
+        h.update(nombre.encode())
+        h.update(str(stat.st_size).encode())
+        h.update(str(int(stat.st_mtime)).encode())
+        partes.append(f"{nombre}@{datetime.fromtimestamp(stat.st_mtime).strftime('%Y%m%d_%H%M%S')}")
+    return f"{'+'.join(partes)}#{h.hexdigest()[:10]}"
+
+
+def _tamano_disco(rutas: List[Path]) -> int:
+    total = 0
+    for ruta in rutas:
+        if ruta.name == "manifest.json":
+            # Artefacto exportado: todos los archivos del directorio
+            total += sum(p.stat().st_size for p in ruta.parent.iterdir() if p.is_file())
+        else:
+            total += ruta.stat().st_size
+    return total
+
+
+def _leer_pickle(ruta: Path):
+    with open(ruta, 'rb') as f:
+        return pickle.load(f)
+
+
+def _leer_artefacto(ruta: Path):
+    """Lee un .pkl o un artefacto exportado sin pickle (manifest.json, ver artefactos_modelo)"""
+    from Core.artefactos_modelo import es_manifest, cargar_exportado
+    if es_manifest(ruta):
+        return cargar_exportado(ruta)
+    return _leer_pickle(ruta)
+
+
+def _exportado_o_pickle(ruta_pickle: Path) -> Optional[Path]:
+    """Manifest exportado vigente para el .pkl, el .pkl si existe, o None"""
+    from Core.artefactos_modelo import manifest_vigente
+    manifest = manifest_vigente(ruta_pickle)
+    if manifest is not None:
+        return manifest
+    return ruta_pickle if ruta_pickle.exists() else None
+
+
+# ---------- Localizadores de artefactos (sin cargar) ----------
+
+def localizar_modelo_control(avisar: bool = True) -> Optional[List[Path]]:
+    """Devuelve [modelo, preprocesadores] del Modelo 0 más reciente, o None."""
+    if not DIR_MODELO_CONTROL.exists():
+        if avisar:
+            print("[WARN]  Directorio de modelos no encontrado, usando sistema rule-based")
+        return None
+
+    from Core.artefactos_modelo import manifest_vigente
+
+    def _candidatos(patron: str) -> List[Path]:
+        # .pkl y directorios exportados (mismo nombre sin extensión), más reciente primero
+        rutas = {p.with_suffix('.pkl') for p in DIR_MODELO_CONTROL.glob(f"{patron}.pkl")}
+        rutas |= {d.with_suffix('.pkl') for d in DIR_MODELO_CONTROL.glob(patron) if (d / "manifest.json").exists()}
+        return sorted(rutas, reverse=True)
+
+    # Buscar primero modelos simplificados (prioridad)
+    modelos = _candidatos("modelo_xgboost_simplificado_*")
+    if not modelos:
+        modelos = _candidatos("modelo_xgboost_*")
+    if not modelos:
+        if avisar:
+            print("[WARN]  No se encontraron modelos XGBoost, usando sistema rule-based")
+        return None
+
+    # Preprocesadores con el mismo timestamp (YYYYMMDD_HHMMSS). Si el modelo más
+    # reciente aún no tiene los suyos (entrenamiento en curso) se usa el anterior.
+    for modelo_path in modelos:
+        # El artefacto exportado incluye modelo y preprocesadores
+        manifest = manifest_vigente(modelo_path)
+        if manifest is not None:
+            return [manifest]
+
+        partes = modelo_path.stem.split('_')
+        timestamp = '_'.join(partes[-2:]) if len(partes) >= 3 else partes[-1]
+        if 'simplificado' in modelo_path.stem:
+            prepro_path = DIR_MODELO_CONTROL / f"preprocesadores_simplificado_{timestamp}.pkl"
+        else:
+            prepro_path = DIR_MODELO_CONTROL / f"preprocesadores_{timestamp}.pkl"
+
+        if modelo_path.exists() and prepro_path.exists():
+            return [modelo_path, prepro_path]
+        if avisar:
+            print(f"[WARN]  Preprocesadores no encontrados para {timestamp}, se omite {modelo_path.name}")
+
+    if avisar:
+        print("[WARN]  Ningún modelo XGBoost tiene sus preprocesadores, usando sistema rule-based")
+    return None
+
+
+def localizar_modelo_respuesta_glucemica(avisar: bool = True) -> Optional[List[Path]]:
+    modelo_path = DIR_MODELOS_ML / "modelo_respuesta_glucemica.pkl"
+    scaler_path = DIR_MODELOS_ML / "scaler_respuesta_glucemica.pkl"
+    from Core.artefactos_modelo import manifest_vigente
+    manifest = manifest_vigente(modelo_path)
+    if manifest is not None:
+        return [manifest]  # El scaler va dentro del artefacto exportado
+    if not modelo_path.exists() or not scaler_path.exists():
+        if avisar:
+            print(f"[WARN]  Modelo de respuesta glucémica no encontrado en: {modelo_path}")
+        return None
+    return [modelo_path, scaler_path]
+
+
+def localizar_modelo_seleccion_alimentos(avisar: bool = True) -> Optional[List[Path]]:
+    modelo_path = DIR_MODELOS_ML / "modelo_seleccion_alimentos.pkl"
+    ruta = _exportado_o_pickle(modelo_path)
+    if ruta is None:
+        if avisar:
+            print(f"[WARN]  Modelo de selección de alimentos no encontrado en: {modelo_path}")
+        return None
+    return [ruta]
+
+
+def localizar_modelo_optimizacion_combinaciones(avisar: bool = True) -> Optional[List[Path]]:
+    modelo_path = DIR_MODELOS_ML / "modelo_optimizacion_combinaciones.pkl"
+    ruta = _exportado_o_pickle(modelo_path)
+    if ruta is None:
+        if avisar:
+            print(f"[WARN]  Modelo de optimización de combinaciones no encontrado en: {modelo_path}")
+        return None
+    return [ruta]
+
+
+# ---------- Cargadores (rutas -> artefactos) ----------
+
+def _cargar_control(rutas: List[Path]) -> Dict[str, Any]:
+    try:
+        import xgboost  # noqa: F401  (necesario para deserializar el modelo)
+    except ImportError:
+        print("[WARN]  XGBoost no está instalado en este entorno Python")
+        print(f"   Python usado: {sys.executable}")
+        print("   Instalar con: pip install xgboost")
+        raise
+    if len(rutas) == 1:
+        # Artefacto exportado: {'modelo', 'preprocesadores'} en un solo manifest
+        exportado = _leer_artefacto(rutas[0])
+        return {'modelo': exportado.get('modelo'), 'preprocesadores': exportado.get('preprocesadores')}
+    return {'modelo': _leer_pickle(rutas[0]), 'preprocesadores': _leer_pickle(rutas[1])}
+
+
+def _cargar_respuesta_glucemica(rutas: List[Path]) -> Dict[str, Any]:
+    if len(rutas) == 1:
+        modelo_completo = _leer_artefacto(rutas[0])
+        return {'modelo': modelo_completo, 'scaler': modelo_completo.get('scaler')}
+    return {'modelo': _leer_pickle(rutas[0]), 'scaler': _leer_pickle(rutas[1])}
+
+
+def _cargar_modelo_con_scaler(rutas: List[Path]) -> Dict[str, Any]:
+    # El scaler está dentro del diccionario del modelo
+    modelo_completo = _leer_artefacto(rutas[0])
+    scaler = modelo_completo.get('scaler') if isinstance(modelo_completo, dict) else None
+    if scaler is None:
+        print(f"[WARN]  Scaler no encontrado dentro de {rutas[0].name}")
+    return {'modelo': modelo_completo, 'scaler': scaler}
+
+
+def _cargar_optimizacion_combinaciones(rutas: List[Path]) -> Dict[str, Any]:
+    """
+    Modelo 3: además del diccionario original, compila el ensemble xgb + rf a
+    arreglos NumPy (Core/arboles_compilados.py) para puntuar sin sklearn/XGBoost.
+    Se desactiva con MODELO3_COMPILADO=0.
+    """
+    artefactos = _cargar_modelo_con_scaler(rutas)
+    if os.getenv("MODELO3_COMPILADO", "1") != "0" and artefactos['modelo'] is not None:
+        from Core.arboles_compilados import compilar_modelo_combinaciones
+        inicio = time.perf_counter()
+        compilado = compilar_modelo_combinaciones(artefactos['modelo'])
+        if compilado is not None:
+            artefactos['compilado'] = compilado
+            print(f"[OK] Modelo 3 compilado: {compilado.bosque.n_arboles} árboles, "
+                  f"{compilado.bosque.n_nodos} nodos ({time.perf_counter() - inicio:.2f}s)")
+    return artefactos
+
+
+DEFINICIONES = {
+    MODELO_CONTROL_GLUCEMICO: (localizar_modelo_control, _cargar_control),
+    MODELO_RESPUESTA_GLUCEMICA: (localizar_modelo_respuesta_glucemica, _cargar_respuesta_glucemica),
+    MODELO_SELECCION_ALIMENTOS: (localizar_modelo_seleccion_alimentos, _cargar_modelo_con_scaler),
+    MODELO_OPTIMIZACION_COMBINACIONES: (localizar_modelo_optimizacion_combinaciones, _cargar_optimizacion_combinaciones),
+}
+
+
+class RegistroModelos:
+    """
+    Registro de modelos compartido por el proceso.
+
+    Cada modelo se carga una única vez (doble verificación con lock por modelo);
+    las lecturas posteriores no toman ningún lock. Reemplazar una entrada es una
+    asignación atómica del diccionario, por lo que los lectores siempre ven una
+    versión completa del modelo (la anterior o la nueva).
+    """
+
+    def __init__(self, definiciones: Dict[str, tuple] = None):
+        self._definiciones = dict(definiciones or DEFINICIONES)
+        self._entradas: Dict[str, ModeloCargado] = {}
+        self._lock_global = threading.Lock()
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def reiniciar_locks(self):
+        """Locks nuevos (tras un fork): los del padre podían estar tomados por otro thread"""
+        self._lock_global = threading.Lock()
+        self._locks = {}
+
+    def _lock_de(self, nombre: str) -> threading.Lock:
+        with self._lock_global:
+            lock = self._locks.get(nombre)
+            if lock is None:
+                lock = self._locks[nombre] = threading.Lock()
+            return lock
+
+    def _cargar_entrada(self, nombre: str, rutas: Optional[List[Path]] = None) -> ModeloCargado:
+        """Lee los artefactos del disco y construye una entrada nueva (no la publica)"""
+        localizar, cargar = self._definiciones[nombre]
+        entrada = ModeloCargado(nombre=nombre)
+        inicio = time.perf_counter()
+        rss_antes = _rss_bytes()
+        try:
+            if rutas is None:
+                rutas = localizar()
+            if not rutas:
+                entrada.error = "artefactos no encontrados"
+                return entrada
+            entrada.rutas = [str(r) for r in rutas]
+            entrada.version = version_artefactos(rutas)
+            entrada.tamano_disco_bytes = _tamano_disco(rutas)
+            entrada.artefactos = cargar(rutas)
+            entrada.disponible = entrada.artefactos.get('modelo') is not None
+        except Exception as e:
+            print(f"[WARN]  Error al cargar modelo '{nombre}': {e}")
+            entrada.artefactos = {}
+            entrada.disponible = False
+            entrada.error = str(e)
+        finally:
+            entrada.tiempo_carga_s = time.perf_counter() - inicio
+            rss_despues = _rss_bytes()
+            if rss_antes is not None and rss_despues is not None:
+                entrada.memoria_bytes = max(0, rss_despues - rss_antes)
+            entrada.cargado_en = datetime.now().isoformat(timespec='seconds')
+
+        if entrada.disponible:
+            print(f"[OK] Modelo '{nombre}' cargado en {entrada.tiempo_carga_s:.3f}s "
+                  f"({entrada.tamano_disco_bytes / 1024:.0f} KB en disco) - versión {entrada.version}")
+        return entrada
+
+    def obtener(self, nombre: str) -> ModeloCargado:
+        """Devuelve la entrada del modelo, cargándola la primera vez."""
+        entrada = self._entradas.get(nombre)
+        if entrada is not None:
+            return entrada
+        with self._lock_de(nombre):
+            entrada = self._entradas.get(nombre)
+            if entrada is None:
+                entrada = self._cargar_entrada(nombre)
+                self._entradas[nombre] = entrada
+            return entrada
+
+    def publicar(self, nombre: str, entrada: ModeloCargado):
+        """Reemplaza atómicamente la entrada de un modelo"""
+        with self._lock_de(nombre):
+            self._entradas[nombre] = entrada
+
+    def recargar(self, nombre: str, rutas: Optional[List[Path]] = None) -> ModeloCargado:
+        """Vuelve a leer los artefactos del disco y publica la nueva versión si es válida"""
+        nueva = self._cargar_entrada(nombre, rutas)
+        actual = self._entradas.get(nombre)
+        if nueva.disponible or actual is None or not actual.disponible:
+            self.publicar(nombre, nueva)
+            return nueva
+        print(f"[WARN]  Recarga de '{nombre}' fallida, se mantiene la versión {actual.version}")
+        return actual
+
+    def precargar(self, nombres: List[str] = None) -> Dict[str, Dict]:
+        """Carga todos los modelos (p. ej. en el maestro de gunicorn antes del fork)"""
+        for nombre in (nombres or list(self._definiciones.keys())):
+            self.obtener(nombre)
+        return self.estadisticas()
+
+    def localizar(self, nombre: str, avisar: bool = True) -> Optional[List[Path]]:
+        """Rutas de los artefactos más recientes de un modelo (sin cargarlos)"""
+        localizar, _ = self._definiciones[nombre]
+        return localizar(avisar=avisar)
+
+    def nombres(self) -> List[str]:
+        return list(self._definiciones.keys())
+
+    def version(self, nombre: str) -> Optional[str]:
+        entrada = self._entradas.get(nombre)
+        return entrada.version if entrada else None
+
+    def version_disco(self, nombre: str) -> Optional[str]:
+        """Versión de los artefactos en disco de un modelo (None si no hay)"""
+        try:
+            rutas = self.localizar(nombre, avisar=False)
+            return version_artefactos(rutas) if rutas else None
+        except OSError:
+            return None
+
+    def version_global(self) -> str:
+        """Huella de las versiones de todos los modelos (para claves de caché).
+
+        Siempre la misma lista de modelos: los cargados aportan su versión y los
+        que este proceso aún no cargó, la de sus artefactos en disco. Así dos
+        workers arman la misma clave aunque uno no haya usado todavía el Modelo 3.
+        """
+        partes = [f"{n}={self.version(n) or self.version_disco(n)}" for n in sorted(self._definiciones)]
+        return hashlib.sha1('|'.join(partes).encode()).hexdigest()[:16]
+
+    def estadisticas(self) -> Dict[str, Dict]:
+        return {nombre: entrada.resumen() for nombre, entrada in self._entradas.items()}
+
+
+# Instancia única por proceso
+_registro = RegistroModelos()
+
+# Si el vigilante de modelos del padre estaba en medio de una recarga al hacer
+# fork, el hijo heredaría sus locks tomados y se bloquearía al primer acceso
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: _registro.reiniciar_locks())
+
+
+def obtener_registro() -> RegistroModelos:
+    return _registro
+
+
+def obtener_modelo(nombre: str) -> ModeloCargado:
+    return _registro.obtener(nombre)
+
+
+def precargar_modelos() -> Dict[str, Dict]:
+    return _registro.precargar()
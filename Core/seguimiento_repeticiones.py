@@ -0,0 +1,126 @@
+# seguimiento_repeticiones.py
+# Seguimiento de los ingredientes usados en cada día del plan (reglas de variedad)
+#
+# Por ingrediente (id; nombre si no tiene id) se guarda:
+#   - una máscara de bits con los días en que se usó (bit d = día d),
+#   - un contador de usos por semana del plan (días 1-7, 8-14, ...).
+# Con eso las preguntas de _filtrar_alimentos_por_repeticion se responden en
+# O(1), sin ordenar ni recorrer listas de días: ¿cuántas veces se usó esta
+# semana?, ¿se usó ayer?, ¿hay días consecutivos?, ¿hace cuántos días se usó?
+# Los límites (max_repeticiones, ...) son por semana, así que un plan de varias
+# semanas no agota los ingredientes en la primera.
+
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from Core.plan_compacto import Porcion
+
+DIAS_SEMANA = 7
+
+
+def clave_ingrediente(alimento) -> Optional[Hashable]:
+    """Id del ingrediente (Porcion o dict de ingrediente/alimento); el nombre si no tiene id"""
+    if type(alimento) is Porcion:
+        clave = alimento.ingrediente_id
+        return clave if clave is not None else (alimento.nombre or None)
+    get = alimento.get
+    clave = get('id')
+    if clave is None:
+        clave = get('ingrediente_id')
+    return clave if clave is not None else (get('nombre') or None)
+
+
+def semana_del_dia(dia: int) -> int:
+    return (dia - 1) // DIAS_SEMANA
+
+
+def _mascara_semana(dia: int) -> int:
+    """Bits de los días de la semana de `dia`"""
+    primero = semana_del_dia(dia) * DIAS_SEMANA + 1
+    return ((1 << DIAS_SEMANA) - 1) << primero
+
+
+class SeguimientoRepeticiones:
+    """Días y usos por semana de cada ingrediente del plan"""
+
+    __slots__ = ('_dias', '_usos')
+
+    def __init__(self):
+        self._dias: Dict[Hashable, int] = {}             # clave -> máscara de días
+        self._usos: Dict[Hashable, Dict[int, int]] = {}  # clave -> {semana: usos}
+
+    def registrar(self, clave: Hashable, dia: int) -> None:
+        """Un uso del ingrediente en `dia` (varios usos el mismo día cuentan por separado)"""
+        if clave is None:
+            return
+        self._dias[clave] = self._dias.get(clave, 0) | (1 << dia)
+        usos = self._usos.setdefault(clave, {})
+        semana = semana_del_dia(dia)
+        usos[semana] = usos.get(semana, 0) + 1
+
+    def registrar_alimento(self, alimento, dia: int) -> None:
+        self.registrar(clave_ingrediente(alimento), dia)
+
+    def usos_semana(self, clave: Hashable, dia: int) -> int:
+        """Usos del ingrediente en la semana de `dia`"""
+        usos = self._usos.get(clave)
+        return usos.get(semana_del_dia(dia), 0) if usos else 0
+
+    def usado_en(self, clave: Hashable, dia: int) -> bool:
+        return dia >= 0 and bool((self._dias.get(clave, 0) >> dia) & 1)
+
+    def ultimo_dia(self, clave: Hashable) -> int:
+        """Último día de uso (0 si no se usó)"""
+        return max(self._dias.get(clave, 0).bit_length() - 1, 0)
+
+    def dias_desde_ultimo_uso(self, clave: Hashable, dia: int) -> Optional[int]:
+        """Días entre `dia` y el último uso (None si no se usó)"""
+        if clave not in self._dias:
+            return None
+        return dia - self.ultimo_dia(clave)
+
+    def tiene_dias_consecutivos(self, clave: Hashable, dia: int) -> bool:
+        """True si en la semana de `dia` el ingrediente se usó dos días seguidos"""
+        mascara = self._dias.get(clave, 0) & _mascara_semana(dia)
+        return bool(mascara & (mascara >> 1))
+
+    def clasificar(self, alimentos: List, dia: int, max_repeticiones: int, dias_minimos: int,
+                   es_proteina: bool = False) -> Tuple[List, List, List]:
+        """
+        Reglas de variedad de _filtrar_alimentos_por_repeticion en una pasada.
+
+        Returns:
+            (permitidos, evitados, prohibidos): permitidos en el orden recibido (no
+            usados o usados hace suficiente); evitados por máximo semanal o uso
+            reciente; prohibidos (solo proteínas) por uso el día anterior o en días
+            consecutivos de la semana
+        """
+        permitidos, evitados, prohibidos = [], [], []
+        dias_get = self._dias.get
+        usos_get = self._usos.get
+        semana = semana_del_dia(dia)
+        bit_ayer = 1 << (dia - 1) if dia >= 1 else 0
+        bits_semana = _mascara_semana(dia)
+        for alimento in alimentos:
+            # Candidatos de grupos_alimentos: dict de ingrediente con 'id' (camino rápido)
+            clave = alimento.get('id') if type(alimento) is dict else None
+            if clave is None:
+                clave = clave_ingrediente(alimento)
+            mascara = dias_get(clave) if clave is not None else None
+            if mascara is None:
+                permitidos.append(alimento)
+            elif usos_get(clave).get(semana, 0) >= max_repeticiones:
+                evitados.append(alimento)
+            elif es_proteina and ((mascara & bit_ayer) or
+                                  ((mascara & bits_semana) & ((mascara & bits_semana) >> 1))):
+                prohibidos.append(alimento)
+            elif dia - (mascara.bit_length() - 1) < dias_minimos:
+                evitados.append(alimento)
+            else:
+                permitidos.append(alimento)
+        return permitidos, evitados, prohibidos
+
+    def __contains__(self, clave: Hashable) -> bool:
+        return clave in self._dias
+
+    def __len__(self) -> int:
+        return len(self._dias)
@@ -0,0 +1,201 @@
+# solver_porciones.py
+# Dimensionamiento exacto de porciones de un día con programación lineal (scipy)
+#
+# Variables: cantidad de cada alimento del día (en su unidad, normalmente g).
+# Los nutrientes de cada alimento escalan linealmente con su cantidad, así que
+# los totales del día son una función lineal de las cantidades:
+#   - restricciones: cada nutriente (kcal, CHO, PRO, FAT, fibra) dentro de la
+#     banda [90%, 100%] de su meta; las restricciones son elásticas (holguras
+#     penalizadas), así el problema siempre es factible y, si la banda se puede
+#     cumplir, la solución la cumple exactamente (holgura 0),
+#   - cotas: límites por alimento y por grupo dentro de cada comida
+#     (MotorRecomendacion._obtener_limites_cantidad_grupo) y una cantidad mínima
+#     para no eliminar alimentos del menú,
+#   - objetivo: holguras (con peso alto) + cambio relativo respecto a la cantidad
+#     original (el menú cambia lo mínimo necesario).
+# Con milp las cantidades en gramos son múltiplos de PASO_GRAMOS.
+
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+try:
+    from scipy.optimize import linprog, milp, LinearConstraint, Bounds
+    from scipy.sparse import csr_matrix
+    SCIPY_DISPONIBLE = True
+except ImportError:  # scipy < 1.9 no trae milp
+    SCIPY_DISPONIBLE = False
+
+NUTRIENTES = ('kcal', 'cho', 'pro', 'fat', 'fibra')
+CLAVES_METAS = {
+    'kcal': 'calorias_diarias',
+    'cho': 'carbohidratos_g',
+    'pro': 'proteinas_g',
+    'fat': 'grasas_g',
+    'fibra': 'fibra_g',
+}
+METAS_DEFECTO = {'kcal': 2000, 'cho': 250, 'pro': 100, 'fat': 65, 'fibra': 25}
+
+# Banda objetivo en % de la meta. Se deja un margen de 1 punto a cada lado porque
+# los nutrientes de cada alimento se redondean a 0.1 al escribir el plan.
+BANDA_MINIMA = 91.0
+BANDA_MAXIMA = 99.0
+
+# Penalización por punto porcentual fuera de la banda. La fibra pesa menos: los
+# alimentos generados no siempre traen fibra y no debe forzar cambios en el resto.
+PESO_HOLGURA = {'kcal': 1000.0, 'cho': 1000.0, 'pro': 1000.0, 'fat': 1000.0, 'fibra': 100.0}
+
+FRACCION_MINIMA = 0.25   # Cantidad mínima: 25% de la original (no se quitan alimentos)
+FACTOR_MAXIMO_SIN_LIMITE = 2.0  # Unidades no métricas (p. ej. "1 unidad"): hasta el doble
+PASO_GRAMOS = 5.0        # Granularidad de las cantidades en g/ml con milp
+UNIDADES_METRICAS = ('g', 'ml')
+
+
+def _cotas_alimentos(items: List[Dict], limites_grupo: Callable[[str], Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    inferior = np.empty(len(items))
+    superior = np.empty(len(items))
+    for i, item in enumerate(items):
+        q0 = item['cantidad']
+        if item['unidad'] in UNIDADES_METRICAS:
+            maximo = float(limites_grupo(item['grupo'])['max_por_alimento'])
+        else:
+            maximo = q0 * FACTOR_MAXIMO_SIN_LIMITE
+        superior[i] = maximo
+        inferior[i] = min(q0 * FRACCION_MINIMA, maximo)
+    return inferior, superior
+
+
+def resolver_porciones_dia(items: List[Dict], metas: Dict, limites_grupo: Callable[[str], Dict],
+                           entero: bool = False) -> Dict:
+    """
+    Calcula las cantidades de todos los alimentos de un día en una sola resolución.
+
+    Args:
+        items: Alimentos del día; cada uno con 'cantidad' (>0), 'unidad', 'grupo',
+               'comida' (tiempo) y 'densidad' (nutrientes por unidad de cantidad, dict)
+        metas: Metas diarias (calorias_diarias, carbohidratos_g, proteinas_g, grasas_g, fibra_g)
+        limites_grupo: Función grupo -> {'max_por_alimento', 'max_total_grupo'}
+        entero: Cantidades métricas en múltiplos de PASO_GRAMOS (milp)
+
+    Returns:
+        {'estado', 'cantidades' (np.ndarray o None), 'holguras' (puntos % por nutriente),
+         'porcentajes', 'segundos'}
+    """
+    inicio = time.perf_counter()
+    n = len(items)
+    nutrientes = [m for m in NUTRIENTES if float(metas.get(CLAVES_METAS[m], METAS_DEFECTO[m]) or 0) > 0]
+    k = len(nutrientes)
+    if n == 0 or k == 0:
+        return {'estado': 'sin_alimentos', 'cantidades': None, 'holguras': {}, 'porcentajes': {},
+                'segundos': time.perf_counter() - inicio}
+
+    q0 = np.array([item['cantidad'] for item in items], dtype=np.float64)
+    # Aporte por unidad en % de la meta: A[m, i]
+    A = np.array([
+        [item['densidad'].get(m, 0.0) * 100.0 / float(metas.get(CLAVES_METAS[m], METAS_DEFECTO[m]))
+         for item in items]
+        for m in nutrientes
+    ])
+    inferior, superior = _cotas_alimentos(items, limites_grupo)
+
+    # Variables: [q (n) | desviación |q - q0| (n) | holgura bajo banda (k) | holgura sobre banda (k)]
+    nv = 2 * n + 2 * k
+    c = np.zeros(nv)
+    c[n:2 * n] = 1.0 / q0
+    c[2 * n:2 * n + k] = [PESO_HOLGURA[m] for m in nutrientes]
+    c[2 * n + k:] = [PESO_HOLGURA[m] for m in nutrientes]
+
+    filas, li, ls = [], [], []
+
+    def _fila(coeficientes: Dict[int, float], minimo: float, maximo: float):
+        fila = np.zeros(nv)
+        for j, v in coeficientes.items():
+            fila[j] = v
+        filas.append(fila)
+        li.append(minimo)
+        ls.append(maximo)
+
+    for r, m in enumerate(nutrientes):
+        # BANDA_MINIMA <= A q + holgura_baja ; A q - holgura_alta <= BANDA_MAXIMA
+        fila = np.zeros(nv)
+        fila[:n] = A[r]
+        fila[2 * n + r] = 1.0
+        filas.append(fila)
+        li.append(BANDA_MINIMA)
+        ls.append(np.inf)
+        fila = np.zeros(nv)
+        fila[:n] = A[r]
+        fila[2 * n + k + r] = -1.0
+        filas.append(fila)
+        li.append(-np.inf)
+        ls.append(BANDA_MAXIMA)
+    for i in range(n):
+        # desviación >= q - q0  y  desviación >= q0 - q
+        _fila({n + i: 1.0, i: -1.0}, -q0[i], np.inf)
+        _fila({n + i: 1.0, i: 1.0}, q0[i], np.inf)
+    # Límite total por grupo dentro de cada comida (solo unidades métricas)
+    por_grupo: Dict[Tuple[str, str], List[int]] = {}
+    for i, item in enumerate(items):
+        if item['unidad'] in UNIDADES_METRICAS:
+            por_grupo.setdefault((item['comida'], item['grupo']), []).append(i)
+    for (_, grupo), indices in por_grupo.items():
+        if len(indices) > 1:
+            maximo = float(limites_grupo(grupo)['max_total_grupo'])
+            _fila({i: 1.0 for i in indices}, -np.inf, max(maximo, float(inferior[indices].sum())))
+
+    cotas_inf = np.concatenate([inferior, np.zeros(n + 2 * k)])
+    cotas_sup = np.concatenate([superior, np.full(n + 2 * k, np.inf)])
+    matriz = np.vstack(filas)
+
+    if entero:
+        # q_i = PASO_GRAMOS * z_i con z_i entero para las cantidades métricas
+        escala = np.ones(nv)
+        integralidad = np.zeros(nv)
+        for i, item in enumerate(items):
+            if item['unidad'] in UNIDADES_METRICAS:
+                escala[i] = PASO_GRAMOS
+                integralidad[i] = 1
+        cotas_inf_z = cotas_inf / escala
+        cotas_sup_z = cotas_sup / escala
+        cotas_inf_z[:n] = np.where(integralidad[:n] == 1, np.ceil(cotas_inf_z[:n] - 1e-9), cotas_inf_z[:n])
+        cotas_sup_z[:n] = np.where(integralidad[:n] == 1, np.floor(cotas_sup_z[:n] + 1e-9), cotas_sup_z[:n])
+        cotas_inf_z[:n] = np.minimum(cotas_inf_z[:n], cotas_sup_z[:n])
+        resultado = milp(
+            c * escala,
+            constraints=LinearConstraint(csr_matrix(matriz * escala), li, ls),
+            integrality=integralidad,
+            bounds=Bounds(cotas_inf_z, cotas_sup_z),
+            options={'time_limit': 5.0},
+        )
+        x = resultado.x * escala if resultado.x is not None else None
+    else:
+        # linprog trabaja con A_ub x <= b_ub: cada fila de doble lado se divide en dos
+        A_ub, b_ub = [], []
+        for fila, minimo, maximo in zip(filas, li, ls):
+            if np.isfinite(maximo):
+                A_ub.append(fila)
+                b_ub.append(maximo)
+            if np.isfinite(minimo):
+                A_ub.append(-fila)
+                b_ub.append(-minimo)
+        resultado = linprog(c, A_ub=np.array(A_ub), b_ub=np.array(b_ub),
+                            bounds=list(zip(cotas_inf, cotas_sup)), method='highs')
+        x = resultado.x
+
+    if x is None or not resultado.success:
+        return {'estado': f"error: {resultado.message}", 'cantidades': None, 'holguras': {}, 'porcentajes': {},
+                'segundos': time.perf_counter() - inicio}
+
+    cantidades = x[:n]
+    holguras = {m: float(x[2 * n + r] + x[2 * n + k + r]) for r, m in enumerate(nutrientes)}
+    porcentajes = {m: float(A[r] @ cantidades) for r, m in enumerate(nutrientes)}
+    # 'optimo': kcal y macronutrientes dentro de la banda (la fibra puede quedar relajada)
+    factible = all(h < 1e-6 for m, h in holguras.items() if m != 'fibra')
+    return {
+        'estado': 'optimo' if factible else 'relajado',
+        'cantidades': cantidades,
+        'holguras': holguras,
+        'porcentajes': porcentajes,
+        'segundos': time.perf_counter() - inicio,
+    }
@@ -0,0 +1,186 @@
+# vigilante_modelos.py
+# Recarga en caliente de los modelos ML cuando aparecen artefactos nuevos
+#
+# Un thread en segundo plano revisa periódicamente ApartadoInteligente/
+# Entrenamiento/ModeloEntrenamiento (Modelo 0) y ApartadoInteligente/ModeloML
+# (Modelos 1-3). Cuando la versión en disco difiere de la cargada:
+#   1. espera a verla igual en dos revisiones seguidas (archivo terminado de escribir),
+#   2. verifica que los artefactos sean del mismo entrenamiento (timestamp de los
+#      preprocesadores / scaler),
+#   3. carga la versión nueva en el propio thread (las peticiones siguen usando la
+#      anterior sin esperar) y la publica en el registro con una asignación atómica.
+# Así los reentrenamientos (aprendizaje/tarea_reentrenamiento.py, ml/entrenar_*)
+# quedan en producción sin reiniciar los workers. Cada proceso (worker de
+# gunicorn) tiene su propio vigilante.
+
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from Core.registro_modelos import (
+    obtener_registro,
+    version_artefactos,
+    MODELO_CONTROL_GLUCEMICO,
+)
+
+INTERVALO_SEGUNDOS = float(os.getenv("MODELOS_VIGILANCIA_SEG", "30"))
+# Diferencia máxima de fecha de modificación entre archivos de un mismo modelo
+# (modelo + scaler) para considerarlos del mismo entrenamiento
+VENTANA_COHERENCIA_SEG = float(os.getenv("MODELOS_VENTANA_COHERENCIA_SEG", "600"))
+# Espera máxima al detener el vigilante a que termine la revisión en curso
+ESPERA_DETENER_SEG = float(os.getenv("MODELOS_ESPERA_DETENER_SEG", "30"))
+
+
+def _timestamp_nombre(ruta: Path) -> str:
+    """YYYYMMDD_HHMMSS al final del nombre del archivo (modelo_xgboost_simplificado_20251116_192016.pkl)"""
+    partes = ruta.stem.split('_')
+    return '_'.join(partes[-2:]) if len(partes) >= 3 else partes[-1]
+
+
+def artefactos_coherentes(nombre: str, rutas: List[Path]) -> bool:
+    """Verifica que todos los artefactos de un modelo provengan del mismo entrenamiento"""
+    if len(rutas) == 1:
+        return True  # Un solo archivo (o manifest exportado, escrito de forma atómica)
+    if nombre == MODELO_CONTROL_GLUCEMICO:
+        # Modelo 0: el timestamp del nombre del modelo y de los preprocesadores debe coincidir
+        return len(rutas) == 2 and _timestamp_nombre(rutas[0]) == _timestamp_nombre(rutas[1])
+    # Modelos 1-3: nombres fijos, se comparan las fechas de modificación
+    mtimes = [r.stat().st_mtime for r in rutas]
+    return max(mtimes) - min(mtimes) <= VENTANA_COHERENCIA_SEG
+
+
+class VigilanteModelos:
+    """Thread que detecta artefactos nuevos y los publica en el registro de modelos"""
+
+    def __init__(self, registro=None, intervalo: float = INTERVALO_SEGUNDOS):
+        self.registro = registro or obtener_registro()
+        self.intervalo = intervalo
+        self._pendientes: Dict[str, str] = {}  # nombre -> versión vista en la revisión anterior
+        self._detener = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.pid = os.getpid()
+        self.revisiones = 0
+        self.recargas = 0
+        self.rechazos = 0
+        self.ultima_revision: Optional[str] = None
+        self.ultimo_error: Optional[str] = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._bucle, name="vigilante-modelos", daemon=True)
+        self._thread.start()
+
+    def detener(self, espera: float = ESPERA_DETENER_SEG) -> bool:
+        """Pide al thread que termine y espera a que salga de la revisión en curso"""
+        self._detener.set()
+        thread = self._thread
+        if thread is None or thread is threading.current_thread():
+            return True
+        thread.join(espera)
+        if thread.is_alive():
+            print(f"[WARN]  Vigilante de modelos: sigue en una revisión tras {espera:.0f}s")
+            return False
+        return True
+
+    @property
+    def activo(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._detener.is_set()
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.revisar()
+            except Exception as e:
+                self.ultimo_error = str(e)
+                print(f"[WARN]  Vigilante de modelos: error en la revisión: {e}")
+
+    def revisar(self) -> List[str]:
+        """Una pasada sobre todos los modelos; devuelve los nombres recargados"""
+        recargados = []
+        for nombre in self.registro.nombres():
+            rutas = self.registro.localizar(nombre, avisar=False)
+            if not rutas:
+                continue
+            try:
+                version_disco = version_artefactos(rutas)
+            except OSError:
+                continue  # Archivo reemplazado durante la revisión: se ve en la siguiente
+            if version_disco == self.registro.version(nombre):
+                self._pendientes.pop(nombre, None)
+                continue
+
+            # Versión nueva: solo se carga si no cambió desde la revisión anterior
+            if self._pendientes.get(nombre) != version_disco:
+                self._pendientes[nombre] = version_disco
+                continue
+            del self._pendientes[nombre]
+
+            if not artefactos_coherentes(nombre, rutas):
+                self.rechazos += 1
+                print(f"[WARN]  Vigilante de modelos: artefactos de '{nombre}' de entrenamientos distintos, "
+                      f"se mantiene la versión actual ({[r.name for r in rutas]})")
+                continue
+
+            anterior = self.registro.version(nombre)
+            entrada = self.registro.recargar(nombre, rutas)
+            if entrada.version == version_disco and entrada.disponible:
+                self.recargas += 1
+                recargados.append(nombre)
+                print(f"[ML] Modelo '{nombre}' recargado en caliente: {anterior} -> {entrada.version}")
+            else:
+                self.rechazos += 1
+
+        self.revisiones += 1
+        self.ultima_revision = datetime.now().isoformat(timespec='seconds')
+        return recargados
+
+    def estadisticas(self) -> Dict:
+        return {
+            'activo': self.activo,
+            'pid': self.pid,
+            'intervalo_s': self.intervalo,
+            'revisiones': self.revisiones,
+            'recargas': self.recargas,
+            'rechazos': self.rechazos,
+            'pendientes': dict(self._pendientes),
+            'ultima_revision': self.ultima_revision,
+            'ultimo_error': self.ultimo_error,
+        }
+
+
+_vigilante: Optional[VigilanteModelos] = None
+_lock = threading.Lock()
+
+
+def iniciar_vigilante() -> Optional[VigilanteModelos]:
+    """
+    Inicia el vigilante del proceso actual (idempotente). Tras un fork el thread
+    del padre no existe en el hijo, por eso se compara el pid.
+    Se desactiva con MODELOS_RECARGA_AUTOMATICA=0.
+    """
+    global _vigilante
+    if os.getenv("MODELOS_RECARGA_AUTOMATICA", "1") == "0":
+        return None
+    with _lock:
+        if _vigilante is not None and _vigilante.pid == os.getpid() and _vigilante.activo:
+            return _vigilante
+        _vigilante = VigilanteModelos()
+        _vigilante.iniciar()
+        print(f"[INFO] Vigilante de modelos activo en pid {_vigilante.pid} (cada {_vigilante.intervalo:.0f}s)")
+        return _vigilante
+
+
+def detener_vigilante():
+    """Detiene el vigilante del proceso actual y espera a su thread (p. ej. antes de un fork)"""
+    with _lock:
+        vigilante = _vigilante if _vigilante is not None and _vigilante.pid == os.getpid() else None
+    if vigilante is not None:
+        vigilante.detener()
+
+
+def estadisticas_vigilante() -> Dict:
+    vigilante = _vigilante
+    if vigilante is None or vigilante.pid != os.getpid():
+        return {'activo': False}
+    return vigilante.estadisticas()
@@ -4,7 +4,27 @@
 
 from aprendizaje.aprendizaje_continuo import obtener_aprendizaje
 from datetime import date
-from Core.bd_conexion import fetch_one
+from Core.bd_conexion import transaction
+
+
+def _datos_actuales(paciente_id: int):
+    """Último registro clínico y antropométrico (ambas consultas en un solo viaje)"""
+    with transaction(pipeline=True) as tx:
+        clinico, antropo = tx.fetch_many([
+            ("""
+                SELECT hba1c, glucosa_ayunas
+                FROM clinico
+                WHERE paciente_id = %s
+                ORDER BY fecha DESC LIMIT 1
+            """, (paciente_id,)),
+            ("""
+                SELECT peso, talla
+                FROM antropometria
+                WHERE paciente_id = %s
+                ORDER BY fecha DESC LIMIT 1
+            """, (paciente_id,)),
+        ])
+    return (clinico[0] if clinico else None), (antropo[0] if antropo else None)
 
 
 def hook_plan_guardado(plan_id: int, paciente_id: int, fecha_inicio: date):
@@ -20,19 +40,7 @@ def hook_plan_guardado(plan_id: int, paciente_id: int, fecha_inicio: date):
             return
         
         # Obtener datos clínicos actuales del paciente
-        clinico = fetch_one("""
-            SELECT hba1c, glucosa_ayunas
-            FROM clinico
-            WHERE paciente_id = %s
-            ORDER BY fecha DESC LIMIT 1
-        """, (paciente_id,))
-        
-        antropo = fetch_one("""
-            SELECT peso, talla
-            FROM antropometria
-            WHERE paciente_id = %s
-            ORDER BY fecha DESC LIMIT 1
-        """, (paciente_id,))
+        clinico, antropo = _datos_actuales(paciente_id)
         
         hba1c = float(clinico[0]) if clinico and clinico[0] else None
         glucosa = float(clinico[1]) if clinico and clinico[1] else None
@@ -74,19 +82,7 @@ def hook_plan_completado(plan_id: int, paciente_id: int, fecha_fin: date):
         aprendizaje = obtener_aprendizaje()
         
         # Obtener datos clínicos finales
-        clinico = fetch_one("""
-            SELECT hba1c, glucosa_ayunas
-            FROM clinico
-            WHERE paciente_id = %s
-            ORDER BY fecha DESC LIMIT 1
-        """, (paciente_id,))
-        
-        antropo = fetch_one("""
-            SELECT peso, talla
-            FROM antropometria
-            WHERE paciente_id = %s
-            ORDER BY fecha DESC LIMIT 1
-        """, (paciente_id,))
+        clinico, antropo = _datos_actuales(paciente_id)
         
         hba1c_final = float(clinico[0]) if clinico and clinico[0] else None
         glucosa_final = float(clinico[1]) if clinico and clinico[1] else None
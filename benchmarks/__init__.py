@@ -0,0 +1 @@
+# Benchmarks - Scripts de medición de rendimiento (no forman parte de la app)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# cache_planes.py
+# Plan generado de nuevo vs leído de la caché de planes (Core/cache_planes.py)
+#
+# Sin BD no se puede correr generar_plan_semanal_completo, así que la generación
+# se aproxima por lo barato: los constructores de comidas de los 7 días sobre los
+# ingredientes sintéticos de benchmarks/indice_ingredientes.py (sin consultas,
+# ML ni optimización, que en producción son la mayor parte del tiempo). Se mide:
+#   - que con la misma semilla las elecciones sean idénticas (y con otra, no),
+#   - ms de la generación aproximada vs clave + lectura del JSON cacheado,
+#   - ms de guardar un plan con el directorio lleno (incluye la expulsión).
+#
+# Uso: python -m benchmarks.cache_planes [--alimentos 600] [--dias 7] [--repeticiones 10] [--entradas 500]
+
+import io
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+
+def plan_ui(elecciones: list) -> dict:
+    """Plan con la forma aproximada del de la UI a partir de (día, comida, nombre, gramos)"""
+    plan = {}
+    for dia, tiempo, nombre, gramos in elecciones:
+        comida = plan.setdefault(f"dia_{dia}", {}).setdefault(tiempo, {'nombre': tiempo, 'alimentos': []})
+        comida['alimentos'].append({'nombre': nombre, 'cantidad': f"{gramos}g", 'kcal': gramos * 1.2,
+                                    'cho': gramos * 0.15, 'pro': gramos * 0.08, 'fat': gramos * 0.03})
+    return {'plan_semanal': plan, 'resumen_semanal': {'dias': len(plan)}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plan generado vs plan desde la caché')
+    parser.add_argument('--alimentos', type=int, default=600)
+    parser.add_argument('--dias', type=int, default=7)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--entradas', type=int, default=500)
+    args = parser.parse_args()
+
+    from Core.cache_planes import CachePlanes, clave_plan
+    from Core.motor_recomendacion import MotorRecomendacion
+    from benchmarks.datos_sinteticos import perfil_sintetico
+    from benchmarks.indice_ingredientes import ingredientes_benchmark, simular, _preparar, _mejor_de
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        motor = _preparar(MotorRecomendacion())
+    ingredientes = ingredientes_benchmark(args.alimentos)
+    perfil = perfil_sintetico()
+
+    def generar(semilla):
+        motor._semilla = semilla
+        return simular(motor, ingredientes, args.dias, perfil)
+
+    print("=" * 72)
+    print(f"CACHÉ DE PLANES ({args.alimentos} alimentos, {args.dias} días)")
+    print("=" * 72)
+    t_generar, elecciones = _mejor_de(args.repeticiones, lambda: generar(7))
+    repetidas = generar(7)[1]
+    otra = generar(8)[1]
+    print(f"misma semilla, mismas elecciones: {'sí' if elecciones == repetidas else 'NO'}")
+    print(f"otra semilla, otras elecciones:   {'sí' if elecciones != otra else 'NO'}")
+
+    cache = CachePlanes(Path(tempfile.mkdtemp()), max_entradas=args.entradas, ttl_segundos=3600)
+    plan = plan_ui(elecciones)
+    configuracion = {'kcal_objetivo': 1800, 'cho_pct': 50, 'pro_pct': 18, 'fat_pct': 32, 'dias_plan': args.dias}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(args.entradas):
+            cache.guardar(clave_plan(i, perfil, configuracion, None, args.dias, 'v1', 1, 0), plan)
+
+    def leer():
+        inicio = time.perf_counter()
+        clave = clave_plan(perfil.paciente_id, perfil, configuracion, None, args.dias, 'v1', 1, 0)
+        return time.perf_counter() - inicio, cache.obtener(clave)
+
+    def guardar():
+        inicio = time.perf_counter()
+        clave = clave_plan(perfil.paciente_id, perfil, configuracion, None, args.dias, 'v1', 1, 0)
+        cache.guardar(clave, plan)
+        return time.perf_counter() - inicio, None
+
+    t_guardar, _ = _mejor_de(args.repeticiones, guardar)
+    t_leer, leido = _mejor_de(args.repeticiones, leer)
+    print()
+    print(f"{'generar (aprox.)':<20}{t_generar * 1000:>10.2f} ms")
+    print(f"{'leer de caché':<20}{t_leer * 1000:>10.2f} ms   ({t_generar / t_leer:.1f}x)")
+    print(f"{'guardar':<20}{t_guardar * 1000:>10.2f} ms   ({args.entradas} entradas en disco)")
+    print(f"plan leído igual al guardado: {'sí' if leido == plan else 'NO'}")
+    print(f"estadísticas: {cache.estadisticas()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# carga_artefactos.py
+# Carga en frío y memoria: pickles vs artefactos exportados (Core/artefactos_modelo.py)
+#
+# Exporta los modelos actuales a un directorio temporal, mide en un intérprete
+# nuevo por caso el tiempo de carga y el aumento de memoria residente (RSS) de
+# cada formato (las librerías numpy/sklearn/xgboost se importan antes de medir,
+# para comparar solo la lectura del artefacto) y verifica que las predicciones
+# de ambos formatos coincidan. Antes verifica los preprocesadores reconstruidos
+# contra scikit-learn en todas sus variantes (StandardScaler con y sin
+# with_mean/with_std); --paridad hace solo esa verificación.
+#
+# Uso: python -m benchmarks.carga_artefactos [--repeticiones 3] [--paridad]
+
+import io
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import contextlib
+import tempfile
+import subprocess
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+
+def _rss_bytes() -> int:
+    with open('/proc/self/statm', 'r') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _medir_carga(formato: str, rutas: list) -> dict:
+    """Se ejecuta en un intérprete nuevo"""
+    import warnings
+    warnings.filterwarnings('ignore')
+    import numpy  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+    import sklearn.impute  # noqa: F401
+    import xgboost  # noqa: F401
+    from Core.artefactos_modelo import cargar_exportado
+
+    rss_antes = _rss_bytes()
+    inicio = time.perf_counter()
+    if formato == 'exportado':
+        objeto = cargar_exportado(rutas[0])
+    else:
+        objeto = []
+        for ruta in rutas:
+            with open(ruta, 'rb') as f:
+                objeto.append(pickle.load(f))
+    segundos = time.perf_counter() - inicio
+    return {'segundos': segundos, 'rss_bytes': _rss_bytes() - rss_antes}
+
+
+def _comparar_predicciones(nombre: str, rutas_pickle: list, manifest: Path) -> float:
+    """Diferencia máxima entre las predicciones de ambos formatos sobre datos aleatorios"""
+    import numpy as np
+    from Core.artefactos_modelo import cargar_exportado
+    from Core.registro_modelos import MODELO_CONTROL_GLUCEMICO
+
+    exportado = cargar_exportado(manifest)
+    with open(rutas_pickle[0], 'rb') as f:
+        original = pickle.load(f)
+    rnd = np.random.default_rng(0)
+
+    if nombre == MODELO_CONTROL_GLUCEMICO:
+        with open(rutas_pickle[1], 'rb') as f:
+            prepro = pickle.load(f)
+        n_features = len(prepro['imputer'].statistics_)
+        X = rnd.normal(size=(500, n_features)) * 10 + 50
+        X[rnd.random(X.shape) < 0.1] = np.nan
+        try:
+            X_imputado = prepro['imputer'].transform(X)
+        except AttributeError as e:
+            # Imputer pickleado con otra versión de scikit-learn: se imputa a mano
+            print(f"[WARN]  El imputer pickleado no funciona con esta versión de scikit-learn ({e})")
+            X_imputado = np.where(np.isnan(X), prepro['imputer'].statistics_, X)
+        a = original.predict_proba(prepro['scaler'].transform(X_imputado))
+        pe = exportado['preprocesadores']
+        b = exportado['modelo'].predict_proba(pe['scaler'].transform(pe['imputer'].transform(X)))
+        return float(np.max(np.abs(a - b)))
+
+    columnas = original['feature_columns']
+    X = rnd.normal(size=(500, len(columnas))) * 10 + 50
+    Xa = original['scaler'].transform(X)
+    Xb = exportado['scaler'].transform(X)
+    diferencia = float(np.max(np.abs(Xa - Xb)))
+    if 'modelos' in original:
+        for clave, modelo in original['modelos'].items():
+            if hasattr(modelo, 'predict'):
+                a = modelo.predict(Xa)
+                b = exportado['modelos'][clave].predict(Xb)
+                diferencia = max(diferencia, float(np.max(np.abs(a - b))))
+    else:
+        a = original['modelo'].predict_proba(Xa)
+        b = exportado['modelo'].predict_proba(Xb)
+        diferencia = max(diferencia, float(np.max(np.abs(a - b))))
+    return diferencia
+
+
+def paridad_escaladores() -> bool:
+    """StandardScaler exportado vs scikit-learn con cada combinación de with_mean/with_std"""
+    import numpy as np
+    from sklearn.preprocessing import StandardScaler
+    from Core.artefactos_modelo import exportar_modelo, cargar_exportado
+
+    entrenamiento = np.array([[1.0, 2.0], [3.0, 5.0], [4.0, 11.0]])
+    X = np.random.default_rng(0).normal(size=(50, 2)) * 10 + 5
+    todo_igual = True
+    with tempfile.TemporaryDirectory(prefix='paridad_') as directorio:
+        for con_media in (True, False):
+            for con_escala in (True, False):
+                scaler = StandardScaler(with_mean=con_media, with_std=con_escala).fit(entrenamiento)
+                destino = Path(directorio) / f"m{int(con_media)}_s{int(con_escala)}"
+                with contextlib.redirect_stdout(io.StringIO()):
+                    exportado = cargar_exportado(exportar_modelo({'scaler': scaler}, destino))['scaler']
+                diferencia = float(np.max(np.abs(scaler.transform(X) - exportado.transform(X))))
+                igual = diferencia < 1e-12
+                todo_igual &= igual
+                print(f"StandardScaler(with_mean={con_media}, with_std={con_escala}): "
+                      f"dif. máx. {diferencia:.2e} {'[OK]' if igual else '[WARN]  distinto'}")
+    return todo_igual
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga: pickle vs formato exportado')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--paridad', action='store_true', help='solo verificar los preprocesadores contra scikit-learn')
+    parser.add_argument('--medir', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        # Proceso hijo: formato + rutas
+        print(json.dumps(_medir_carga(args.medir[0], args.medir[1:])))
+        return
+
+    if not paridad_escaladores():
+        sys.exit(1)
+    if args.paridad:
+        return
+
+    import warnings
+    warnings.filterwarnings('ignore')
+    from ml.exportar_modelos import exportar_modelos_actuales
+    from Core.registro_modelos import DEFINICIONES
+
+    destino = Path(tempfile.mkdtemp(prefix='artefactos_'))
+    exportados = exportar_modelos_actuales(destino)
+
+    print("=" * 90)
+    print(f"CARGA EN FRÍO POR MODELO ({args.repeticiones} repeticiones, intérprete nuevo por medición)")
+    print("=" * 90)
+    print(f"{'modelo':<28}{'formato':<11}{'disco KB':>10}{'carga ms':>11}{'RSS +MB':>10}{'dif. pred.':>14}")
+    for nombre, (ruta_pickle, manifest) in exportados.items():
+        os.environ['MODELOS_FORMATO'] = 'pickle'
+        rutas_pickle = DEFINICIONES[nombre][0](avisar=False)
+        os.environ.pop('MODELOS_FORMATO')
+        diferencia = _comparar_predicciones(nombre, rutas_pickle, manifest)
+
+        casos = {
+            'pickle': [str(r) for r in rutas_pickle],
+            'exportado': [str(manifest)],
+        }
+        for formato, rutas in casos.items():
+            if formato == 'exportado':
+                disco = sum(p.stat().st_size for p in manifest.parent.iterdir())
+            else:
+                disco = sum(Path(r).stat().st_size for r in rutas)
+            medidas = []
+            for _ in range(args.repeticiones):
+                proc = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.carga_artefactos', '--medir', formato, *rutas],
+                    capture_output=True, text=True, cwd=str(RAIZ)
+                )
+                lineas = [l for l in proc.stdout.strip().splitlines() if l.startswith('{')]
+                if lineas:
+                    medidas.append(json.loads(lineas[-1]))
+            if not medidas:
+                print(f"{nombre:<28}{formato:<11} sin datos")
+                continue
+            segundos = sum(m['segundos'] for m in medidas) / len(medidas)
+            rss = sum(m['rss_bytes'] for m in medidas) / len(medidas)
+            dif = f"{diferencia:.2e}" if formato == 'exportado' else ''
+            print(f"{nombre:<28}{formato:<11}{disco / 1024:>10.0f}{segundos * 1000:>11.1f}{rss / 2**20:>10.2f}{dif:>14}")
+    print(f"\nArtefactos exportados en {destino}")
+
+
+if __name__ == "__main__":
+    main()
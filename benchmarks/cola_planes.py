@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# cola_planes.py
+# Contrato SQL y rendimiento de la cola de planes (Core/cola_planes.py)
+#
+# Necesita PostgreSQL (DATABASE_URL o PG*), pero no toca las tablas reales:
+# plan_trabajo se crea en un esquema propio (search_path vía PGOPTIONS) que se
+# borra al terminar. No genera planes: los trabajos se reclaman y se finalizan
+# directamente. Se verifica:
+#   - reclamar() toma el pendiente más antiguo, suma un intento y no repite,
+#   - mantenimiento() devuelve a la cola un trabajo vencido y, agotados los
+#     intentos, lo marca con error,
+#   - _finalizar() solo guarda el resultado del reclamo vigente (mismo
+#     trabajador e intento, aún en proceso): el trabajador lento de un trabajo
+#     reencolado no pisa al que lo volvió a tomar,
+# y se mide cuántos trabajos por segundo reclaman y finalizan --hilos threads
+# sobre --trabajos pendientes, comprobando que ninguno se procese dos veces.
+#
+# Uso: python -m benchmarks.cola_planes [--trabajos 500] [--hilos 4]
+
+import os
+import sys
+import time
+import argparse
+import threading
+from collections import Counter
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+ESQUEMA = "benchmark_cola"
+
+
+def _vencer(trabajo_id: int):
+    """Simula un trabajador caído: el trabajo lleva en proceso más que el timeout"""
+    from Core.bd_conexion import execute
+    execute("UPDATE plan_trabajo SET iniciado_en = iniciado_en - interval '1 day' WHERE id = %s", (trabajo_id,))
+
+
+def verificar_contrato() -> bool:
+    from Core import cola_planes as cola
+
+    fallos = []
+
+    def comprobar(descripcion: str, condicion: bool):
+        print(f"  {'[OK]' if condicion else '[WARN]  FALLA'} {descripcion}")
+        if not condicion:
+            fallos.append(descripcion)
+
+    primero = cola.encolar(1, {'dias': 7})
+    segundo = cola.encolar(2, {'dias': 7})
+
+    a = cola.reclamar("A")
+    comprobar("reclamar toma el pendiente más antiguo (intento 1)", a is not None and a[0] == primero and a[3] == 1)
+    b = cola.reclamar("B")
+    comprobar("un segundo reclamo toma el siguiente", b is not None and b[0] == segundo)
+    comprobar("sin pendientes, reclamar devuelve None", cola.reclamar("C") is None)
+
+    _vencer(primero)
+    comprobar("mantenimiento reencola el trabajo vencido", cola.mantenimiento()['vencidos'] == 1
+              and cola.obtener_trabajo(primero)['estado'] == cola.PENDIENTE)
+    otro = cola.reclamar("B2")
+    comprobar("otro trabajador lo vuelve a tomar (intento 2)", otro is not None and otro[0] == primero and otro[3] == 2)
+
+    comprobar("el trabajador original no puede finalizarlo",
+              not cola._finalizar(primero, "A", 1, cola.TERMINADO, resultado={'de': 'A'}))
+    trabajo = cola.obtener_trabajo(primero)
+    comprobar("...y el trabajo sigue en proceso con el reclamo nuevo",
+              trabajo['estado'] == cola.EN_PROCESO and trabajo['trabajador'] == "B2")
+    comprobar("el reclamo vigente lo finaliza",
+              cola._finalizar(primero, "B2", 2, cola.TERMINADO, resultado={'de': 'B2'}))
+    trabajo = cola.obtener_trabajo(primero)
+    comprobar("el resultado guardado es el del reclamo vigente",
+              trabajo['estado'] == cola.TERMINADO and trabajo['resultado'] == {'de': 'B2'})
+    comprobar("un trabajo terminado no se vuelve a finalizar",
+              not cola._finalizar(primero, "B2", 2, cola.ERROR, error="tarde"))
+
+    # El segundo agota sus intentos: vence, se reencola, se retoma y vuelve a vencer
+    _vencer(segundo)
+    cola.mantenimiento()
+    retomado = cola.reclamar("B3")
+    _vencer(segundo)
+    cola.mantenimiento()
+    trabajo = cola.obtener_trabajo(segundo)
+    comprobar(f"tras {cola.MAX_INTENTOS} intentos vencidos queda en error",
+              retomado is not None and retomado[3] == cola.MAX_INTENTOS and trabajo['estado'] == cola.ERROR
+              and trabajo['error'] == 'Tiempo de ejecución agotado')
+    return not fallos
+
+
+def medir_rendimiento(trabajos: int, hilos: int) -> bool:
+    from Core import cola_planes as cola
+    from Core.bd_conexion import execute
+
+    execute("TRUNCATE plan_trabajo")
+    execute("""
+        INSERT INTO plan_trabajo (paciente_id, parametros)
+        SELECT g, '{"dias": 7}'::jsonb FROM generate_series(1, %s) g
+    """, (trabajos,))
+
+    reclamados = Counter()
+    lock = threading.Lock()
+
+    def consumir(nombre: str):
+        while True:
+            trabajo = cola.reclamar(nombre)
+            if trabajo is None:
+                return
+            trabajo_id, _, _, intentos = trabajo
+            cola._finalizar(trabajo_id, nombre, intentos, cola.TERMINADO, resultado={})
+            with lock:
+                reclamados[trabajo_id] += 1
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=consumir, args=(f"T{i}",)) for i in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    segundos = time.perf_counter() - inicio
+
+    from Core.bd_conexion import fetch_one
+    terminados = fetch_one("SELECT count(*) FROM plan_trabajo WHERE estado = 'terminado'")[0]
+    repetidos = sum(1 for n in reclamados.values() if n > 1)
+    print(f"  {trabajos} trabajos, {hilos} hilos: {segundos * 1000:.0f} ms, "
+          f"{trabajos / segundos:.0f} trabajos/s (reclamar + finalizar)")
+    correcto = len(reclamados) == trabajos and repetidos == 0 and terminados == trabajos
+    print(f"  {'[OK]' if correcto else '[WARN]  FALLA'} cada trabajo reclamado y terminado una vez "
+          f"({len(reclamados)} reclamados, {repetidos} repetidos, {terminados} terminados)")
+    return correcto
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Contrato SQL y rendimiento de la cola de planes')
+    parser.add_argument('--trabajos', type=int, default=500)
+    parser.add_argument('--hilos', type=int, default=4)
+    args = parser.parse_args()
+
+    import psycopg
+    # Todo lo que abra Core.bd_conexion usa el esquema del benchmark
+    os.environ['PGOPTIONS'] = f"-c search_path={ESQUEMA}"
+    os.environ.setdefault('POOL_MAX', str(args.hilos + 1))
+    from Core.bd_conexion import CONNINFO
+
+    with psycopg.connect(CONNINFO, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE")
+        conn.execute(f"CREATE SCHEMA {ESQUEMA}")
+    try:
+        print("=" * 72)
+        print("COLA DE PLANES: contrato de reclamar / mantenimiento / _finalizar")
+        print("=" * 72)
+        contrato = verificar_contrato()
+        print()
+        print("RENDIMIENTO")
+        rendimiento = medir_rendimiento(args.trabajos, args.hilos)
+    finally:
+        with psycopg.connect(CONNINFO, autocommit=True) as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE")
+    if not (contrato and rendimiento):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# datos_sinteticos.py
+# Perfiles y alimentos sintéticos para los benchmarks (no requieren BD)
+
+import random
+from typing import Dict, List
+
+from Core.motor_recomendacion import PerfilPaciente, MetaNutricional
+
+GRUPOS = ['GRUPO1_CEREALES', 'GRUPO2_VERDURAS', 'GRUPO3_FRUTAS', 'GRUPO4_LACTEOS',
+          'GRUPO5_CARNES', 'GRUPO6_AZUCARES', 'GRUPO7_GRASAS']
+
+
+def perfil_sintetico(paciente_id: int = 1) -> PerfilPaciente:
+    return PerfilPaciente(
+        paciente_id=paciente_id, edad=58, sexo='F', peso=74.0, talla=1.60, imc=28.9,
+        actividad='moderada', hba1c=7.4, glucosa_ayunas=138.0, ldl=120.0,
+        trigliceridos=180.0, pa_sis=130, pa_dia=85, alergias=[], medicamentos=[],
+        preferencias_excluir=[], preferencias_incluir=[]
+    )
+
+
+def alimentos_sinteticos(n: int = 200, semilla: int = 42) -> List[Dict]:
+    """Alimentos con nutrientes por 100 g en rangos realistas"""
+    rnd = random.Random(semilla)
+    alimentos = []
+    for i in range(n):
+        cho = round(rnd.uniform(0, 70), 1)
+        pro = round(rnd.uniform(0, 30), 1)
+        fat = round(rnd.uniform(0, 25), 1)
+        alimentos.append({
+            'id': i + 1,
+            'nombre': f'Alimento {i + 1}',
+            'grupo': GRUPOS[i % len(GRUPOS)],
+            'kcal': round(cho * 4 + pro * 4 + fat * 9, 1),
+            'cho': cho,
+            'pro': pro,
+            'fat': fat,
+            'fibra': round(rnd.uniform(0, 10), 1),
+            'sodio': round(rnd.uniform(0, 600), 1),
+            'ig': rnd.choice([None, 30, 45, 55, 70, 85]),
+        })
+    return alimentos
+
+
+def necesidades_sinteticas() -> Dict:
+    return {'calorias': 1800, 'carbohidratos': 225, 'proteinas': 80, 'grasas': 60, 'fibra': 30}
+
+
+def metas_sinteticas() -> MetaNutricional:
+    return MetaNutricional(
+        calorias_diarias=1800, carbohidratos_g=203, carbohidratos_porcentaje=45,
+        proteinas_g=90, proteinas_porcentaje=20, grasas_g=60, grasas_porcentaje=30,
+        fibra_g=30, sodio_mg=2000,
+        carbohidratos_por_comida={'des': 45, 'mm': 20, 'alm': 60, 'mt': 20, 'cena': 45}
+    )
+
+
+def metas_dict_sinteticas() -> Dict:
+    """Metas en el formato que recibe OptimizadorPlan"""
+    metas = metas_sinteticas()
+    return {
+        'calorias_diarias': metas.calorias_diarias,
+        'carbohidratos_g': metas.carbohidratos_g,
+        'proteinas_g': metas.proteinas_g,
+        'grasas_g': metas.grasas_g,
+        'fibra_g': metas.fibra_g,
+    }
+
+
+# Grupos por tiempo de comida (como los arma _generar_dia_variado)
+GRUPOS_POR_COMIDA = {
+    'des': ['GRUPO1_CEREALES', 'GRUPO4_LACTEOS', 'GRUPO3_FRUTAS'],
+    'mm': ['GRUPO3_FRUTAS', 'GRUPO7_GRASAS'],
+    'alm': ['GRUPO1_CEREALES', 'GRUPO5_CARNES', 'GRUPO2_VERDURAS', 'GRUPO7_GRASAS'],
+    'mt': ['GRUPO4_LACTEOS', 'GRUPO3_FRUTAS'],
+    'cena': ['GRUPO1_CEREALES', 'GRUPO5_CARNES', 'GRUPO2_VERDURAS'],
+}
+
+
+def grupos_sinteticos(alimentos: List[Dict] = None) -> Dict[str, List[Dict]]:
+    """Alimentos agrupados por grupo (formato de _agrupar_ingredientes)"""
+    grupos: Dict[str, List[Dict]] = {}
+    for alimento in alimentos or alimentos_sinteticos():
+        grupos.setdefault(alimento['grupo'], []).append(alimento)
+    return grupos
+
+
+def plan_sintetico(dias: int = 7, semilla: int = 1, alimentos: List[Dict] = None) -> Dict:
+    """
+    Plan con el formato de generar_plan_semanal (dia_N -> comidas -> alimentos con
+    cantidad "Xg" y nutrientes sin fibra) y cumplimiento diario disperso entre
+    ~70% y ~125% de metas_sinteticas(), como el que recibe el optimizador.
+    """
+    rnd = random.Random(semilla)
+    grupos = grupos_sinteticos(alimentos)
+    metas = metas_sinteticas()
+    plan = {}
+    for dia in range(1, dias + 1):
+        comidas = {}
+        for tiempo, grupos_comida in GRUPOS_POR_COMIDA.items():
+            alimentos_comida = []
+            for grupo in grupos_comida:
+                ingrediente = rnd.choice(grupos[grupo])
+                gramos = rnd.uniform(40, 160)
+                alimentos_comida.append({
+                    'nombre': ingrediente['nombre'],
+                    'grupo': grupo,
+                    'cantidad': f"{round(gramos, 1)}g",
+                    'kcal': round(ingrediente['kcal'] * gramos / 100, 1),
+                    'cho': round(ingrediente['cho'] * gramos / 100, 1),
+                    'pro': round(ingrediente['pro'] * gramos / 100, 1),
+                    'fat': round(ingrediente['fat'] * gramos / 100, 1),
+                })
+            comidas[tiempo] = {'nombre': tiempo, 'horario': '', 'alimentos': alimentos_comida}
+        # Escalar el día para que las kcal queden entre 70% y 125% de la meta
+        kcal = sum(a['kcal'] for c in comidas.values() for a in c['alimentos'])
+        factor = metas.calorias_diarias * rnd.uniform(0.70, 1.25) / kcal if kcal > 0 else 1.0
+        for comida in comidas.values():
+            for a in comida['alimentos']:
+                gramos = float(a['cantidad'][:-1]) * factor
+                a['cantidad'] = f"{round(gramos, 1)}g"
+                for m in ('kcal', 'cho', 'pro', 'fat'):
+                    a[m] = round(a[m] * factor, 1)
+        plan[f'dia_{dia}'] = {'fecha': f"2025-10-{19 + dia}", **comidas}
+    return {'plan_semanal': plan}
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# guardado_plan.py
+# Latencia de guardar un plan (POST /api/planes) según su tamaño: el camino
+# anterior (un INSERT ... RETURNING por comida, un SELECT al catálogo y un
+# INSERT con commit por alimento) vs Core/guardado_plan.py (un SELECT con ANY,
+# un INSERT de varias filas y COPY o executemany, con un solo commit)
+#
+# Necesita PostgreSQL (DATABASE_URL o PG*), pero no toca las tablas reales:
+# ingrediente, plan, plan_detalle y plan_alimento se crean como tablas
+# temporales de la sesión, que ocultan a las reales. Todo corre en una sola
+# conexión, así que el camino anterior sale favorecido (en la app cada
+# sentencia además pedía una conexión al pool).
+#
+# Resultados con PostgreSQL 16.2, 4 alimentos por comida (mismas filas
+# guardadas en los tres caminos en todos los tamaños):
+#
+#   días  alimentos  por fila          bloque + COPY  bloque + executemany
+#   socket local (RTT ~0), mejor de 5:
+#      7     140        33.5 ms (316)     8.2 ms         11.7 ms
+#     14     280        72.2 ms (631)    12.1 ms         23.2 ms
+#     28     560       121.9 ms (1261)   16.6 ms         37.2 ms
+#   proxy TCP con 20 ms de RTT, mejor de 2:
+#      7     140      7207.6 ms         166.9 ms        147.0 ms
+#     14     280     14158.9 ms         166.9 ms        156.8 ms
+#     28     560     27573.2 ms         171.9 ms        168.9 ms
+#
+# (entre paréntesis, sentencias del camino anterior). En bloque son unas pocas
+# idas y vueltas fijas sin importar el tamaño del plan; COPY suma una, así que
+# con RTT real empata con executemany y en local es hasta 2x más rápido en
+# planes grandes. COPY sigue por defecto (PLAN_GUARDADO_COPY=0 lo cambia).
+#
+# Uso: python -m benchmarks.guardado_plan [--dias 7,14,28] [--alimentos-comida 4] [--repeticiones 5]
+
+import io
+import re
+import sys
+import time
+import argparse
+import contextlib
+from datetime import date, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+CATALOGO = 300
+
+TABLAS = """
+    CREATE TEMP TABLE ingrediente (
+        id serial PRIMARY KEY, nombre text, kcal numeric, cho numeric, pro numeric, fat numeric,
+        fibra numeric, porcion_base numeric, unidad_base text, ig numeric, activo boolean DEFAULT TRUE);
+    CREATE TEMP TABLE plan (
+        id serial PRIMARY KEY, paciente_id int, metas_json text, fecha_ini date, fecha_fin date,
+        estado text, creado_por int, version_modelo text);
+    CREATE TEMP TABLE plan_detalle (id serial PRIMARY KEY, plan_id int, dia date, tiempo text);
+    CREATE TEMP TABLE plan_alimento (
+        id serial PRIMARY KEY, plan_detalle_id int, ingrediente_id int, cantidad numeric, unidad text,
+        kcal numeric, cho numeric, pro numeric, fat numeric, fibra numeric, cg numeric);
+"""
+
+
+def plan_sintetico(dias: int, alimentos_comida: int) -> dict:
+    """Plan con la forma que envía la UI; la mitad de los alimentos trae ingrediente_id"""
+    semanas, inicio = [], date(2025, 1, 6)
+    for d in range(dias):
+        if d % 7 == 0:
+            semanas.append({'dias': []})
+        comidas = {}
+        for t, comida in enumerate(('desayuno', 'media_manana', 'almuerzo', 'media_tarde', 'cena')):
+            alimentos = []
+            for k in range(alimentos_comida):
+                i = (d * 37 + t * 11 + k * 5) % CATALOGO + 1
+                alimento = {'cantidad': f"{80 + 10 * k}g", 'kcal': 0 if k % 3 == 0 else 100 + i}
+                if k % 2:
+                    alimento['ingrediente_id'] = i
+                else:
+                    alimento['nombre'] = f"ingrediente_{i}"
+                alimentos.append(alimento)
+            comidas[comida] = {'alimentos': alimentos}
+        semanas[-1]['dias'].append({'fecha': (inicio + timedelta(days=d)).isoformat(), 'comidas': comidas})
+    return {'semanas': semanas}
+
+
+def _insertar_plan(cur) -> int:
+    cur.execute("INSERT INTO plan (paciente_id, estado) VALUES (1, 'borrador') RETURNING id")
+    return cur.fetchone()[0]
+
+
+def por_fila(conn, plan: dict) -> int:
+    """El camino anterior: cada sentencia es su propia transacción (autocommit)"""
+    from Core.guardado_plan import comidas_plan, referencia_alimento, fila_alimento
+    commits = 0
+    with conn.cursor() as cur:
+        plan_id = _insertar_plan(cur)
+        commits += 1
+        for dia, tiempo, alimentos in comidas_plan(plan):
+            cur.execute("INSERT INTO plan_detalle (plan_id, dia, tiempo) VALUES (%s, %s, %s) RETURNING id",
+                        (plan_id, dia, tiempo))
+            detalle_id = cur.fetchone()[0]
+            commits += 1
+            for alimento in alimentos:
+                tipo, valor = referencia_alimento(alimento)
+                cur.execute(f"""
+                    SELECT id, nombre, kcal, cho, pro, fat, fibra, porcion_base, unidad_base, ig
+                    FROM ingrediente WHERE {tipo} = %s AND activo = TRUE LIMIT 1
+                """, (valor,))
+                ingrediente = cur.fetchone()
+                cur.execute("""
+                    INSERT INTO plan_alimento (plan_detalle_id, ingrediente_id, cantidad, unidad, kcal, cho, pro, fat, fibra, cg)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (detalle_id,) + fila_alimento(alimento, ingrediente))
+                commits += 2
+    return commits
+
+
+def en_bloque(usar_copy: bool):
+    def guardar(conn, plan: dict) -> int:
+        from Core.bd_conexion import Transaccion
+        from Core.guardado_plan import guardar_detalle_plan
+        with conn.transaction(), conn.cursor() as cur:
+            guardar_detalle_plan(Transaccion(conn, cur), _insertar_plan(cur), plan, usar_copy=usar_copy)
+        return 1
+    return guardar
+
+
+def _contenido(conn) -> list:
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT d.dia, d.tiempo, a.ingrediente_id, a.cantidad, a.unidad, a.kcal, a.cho, a.cg
+            FROM plan_alimento a JOIN plan_detalle d ON d.id = a.plan_detalle_id
+            WHERE d.plan_id = (SELECT max(id) FROM plan)
+            ORDER BY 1, 2, 3, 4
+        """)
+        return cur.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Guardado de un plan: por fila vs en bloque')
+    parser.add_argument('--dias', default='7,14,28')
+    parser.add_argument('--alimentos-comida', type=int, default=4)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    import psycopg
+    with contextlib.redirect_stdout(io.StringIO()):
+        from Core.bd_conexion import CONNINFO
+
+    with psycopg.connect(CONNINFO, autocommit=True) as conn:
+        with conn.transaction(), conn.cursor() as cur:
+            cur.execute(TABLAS)
+            cur.executemany(
+                "INSERT INTO ingrediente (nombre, kcal, cho, pro, fat, fibra, porcion_base, unidad_base, ig) "
+                "VALUES (%s, %s, %s, %s, %s, %s, 100, 'g', %s)",
+                [(f"ingrediente_{i}", 50 + i % 300, i % 40, i % 25, i % 15, i % 8, (i * 7) % 100 or None)
+                 for i in range(1, CATALOGO + 1)])
+
+        print("=" * 72)
+        print(f"GUARDADO DE PLANES ({args.alimentos_comida} alimentos por comida, mejor de {args.repeticiones})")
+        print("=" * 72)
+        print(f"{'días':>5}{'alimentos':>11}{'':<3}{'camino':<22}{'commits':>9}{'ms':>10}")
+        caminos = (('por fila', por_fila), ('bloque + COPY', en_bloque(True)),
+                   ('bloque + executemany', en_bloque(False)))
+        for dias in (int(d) for d in re.split(r'[,\s]+', args.dias) if d):
+            plan = plan_sintetico(dias, args.alimentos_comida)
+            alimentos = dias * 5 * args.alimentos_comida
+            contenidos = []
+            for nombre, guardar in caminos:
+                mejor, commits = float('inf'), 0
+                for _ in range(args.repeticiones):
+                    inicio = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        commits = guardar(conn, plan)
+                    mejor = min(mejor, time.perf_counter() - inicio)
+                contenidos.append(_contenido(conn))
+                print(f"{dias:>5}{alimentos:>11}{'':<3}{nombre:<22}{commits:>9}{mejor * 1000:>10.1f}")
+            print(f"      mismas filas guardadas: {'sí' if all(c == contenidos[0] for c in contenidos) else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
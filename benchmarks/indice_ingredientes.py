@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# indice_ingredientes.py
+# Constructores de comidas (_sugerir_*_variado) recorriendo las listas de cada
+# grupo vs consultando el índice de GruposIngredientes (Core/indice_ingredientes.py)
+#
+# Simula sin BD la selección de alimentos de un plan: para cada día se llaman los
+# constructores de desayuno, merienda, almuerzo y cena y se registran los
+# alimentos elegidos. Sin BD, _convertir_porciones_a_gramos se reemplaza en la
+# instancia por 100 g por porción y time.time se fija durante la simulación (los
+# constructores lo usan en el factor de variedad) para que las elecciones sean
+# comparables. Con --referencia se compara contra otra versión del motor, p. ej.:
+#   git show <commit>:Core/motor_recomendacion.py > /tmp/motor_anterior.py
+#   python -m benchmarks.indice_ingredientes --referencia /tmp/motor_anterior.py
+# Ambas versiones deben elegir exactamente lo mismo.
+#
+# Uso: python -m benchmarks.indice_ingredientes [--alimentos 600] [--dias 7] [--repeticiones 10] [--referencia RUTA]
+
+import io
+import sys
+import time
+import argparse
+import contextlib
+import importlib.util
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+# Nombres con las palabras que usan las reglas (pan, tubérculos, legumbres, pescados, carnes rojas)
+NOMBRES_POR_GRUPO = {
+    'GRUPO1_CEREALES': ['Pan integral', 'Arroz', 'Papa', 'Lenteja', 'Quinua', 'Camote', 'Garbanzo', 'Avena'],
+    'GRUPO5_CARNES': ['Trucha', 'Pollo', 'Carne de res', 'Atún', 'Pavo', 'Cerdo', 'Huevo'],
+    'GRUPO2_VERDURAS': ['Brócoli', 'Espinaca', 'Tomate', 'Zanahoria'],
+    'GRUPO3_FRUTAS': ['Manzana', 'Fresa', 'Pera', 'Naranja'],
+    'GRUPO4_LACTEOS': ['Leche', 'Yogur', 'Queso fresco'],
+    'GRUPO7_GRASAS': ['Aceite de oliva', 'Palta', 'Nueces'],
+}
+
+
+def ingredientes_benchmark(n: int) -> list:
+    from benchmarks.datos_sinteticos import alimentos_sinteticos
+    ingredientes = alimentos_sinteticos(n)
+    for ingrediente in ingredientes:
+        nombres = NOMBRES_POR_GRUPO.get(ingrediente['grupo'])
+        if nombres:
+            ingrediente['nombre'] = f"{nombres[(ingrediente['id'] // 7) % len(nombres)]} {ingrediente['id']}"
+        if ingrediente['id'] % 5 == 0:
+            ingrediente['tags'] = '["desayuno"]'
+    return ingredientes
+
+
+@contextlib.contextmanager
+def _tiempo_fijo(valor: float = 1_700_000_000.0):
+    original = time.time
+    time.time = lambda: valor
+    try:
+        yield
+    finally:
+        time.time = original
+
+
+def simular(motor, ingredientes: list, dias: int, perfil) -> tuple:
+    """(segundos en agrupar + constructores, elecciones [(día, comida, nombre, gramos)])"""
+    from Core.seguimiento_repeticiones import SeguimientoRepeticiones
+    usados = SeguimientoRepeticiones()
+    elecciones = []
+    with _tiempo_fijo(), contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        grupos = motor._agrupar_ingredientes(ingredientes)
+        for dia in range(1, dias + 1):
+            comidas = {
+                'des': motor._sugerir_desayuno_variado(grupos, dia, perfil, None, usados),
+                'mm': motor._sugerir_merienda_variada(grupos, dia, perfil, None, usados),
+                'alm': motor._sugerir_almuerzo_variado(grupos, dia, perfil, None, usados),
+                'cena': motor._sugerir_cena_variada(grupos, dia, perfil, None, usados),
+            }
+            for tiempo, sugerencias in comidas.items():
+                for s in sugerencias:
+                    usados.registrar_alimento(s['ingrediente'], dia)
+                    elecciones.append((dia, tiempo, s['ingrediente']['nombre'], s['cantidad_sugerida']))
+        segundos = time.perf_counter() - inicio
+    return segundos, elecciones
+
+
+def _preparar(motor):
+    motor._convertir_porciones_a_gramos = lambda ingrediente, porciones: round(100.0 * porciones, 1)
+    return motor
+
+
+def _cargar_referencia(ruta: str):
+    spec = importlib.util.spec_from_file_location('motor_referencia', ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(modulo)
+    return modulo.MotorRecomendacion
+
+
+def _mejor_de(repeticiones: int, funcion) -> tuple:
+    resultados = [funcion() for _ in range(repeticiones)]
+    return min(r[0] for r in resultados), resultados[0][1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Constructores de comidas: listas vs índice de ingredientes')
+    parser.add_argument('--alimentos', type=int, default=600)
+    parser.add_argument('--dias', type=int, default=7)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--referencia', help='motor_recomendacion.py de otra versión (sin índice)')
+    args = parser.parse_args()
+
+    from Core.motor_recomendacion import MotorRecomendacion
+    from benchmarks.datos_sinteticos import perfil_sintetico
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        motor = _preparar(MotorRecomendacion())
+        referencia = _preparar(_cargar_referencia(args.referencia)()) if args.referencia else None
+    ingredientes = ingredientes_benchmark(args.alimentos)
+    perfil = perfil_sintetico()
+
+    print("=" * 72)
+    print(f"SELECCIÓN DE ALIMENTOS ({args.alimentos} alimentos, {args.dias} días, ms por plan)")
+    print("=" * 72)
+    t_actual, elecciones = _mejor_de(args.repeticiones, lambda: simular(motor, ingredientes, args.dias, perfil))
+    if referencia is None:
+        print(f"{'índice':<12}{t_actual * 1000:>10.2f}")
+        return
+    t_referencia, elecciones_ref = _mejor_de(args.repeticiones,
+                                             lambda: simular(referencia, ingredientes, args.dias, perfil))
+    print(f"{'referencia':<12}{t_referencia * 1000:>10.2f}")
+    print(f"{'índice':<12}{t_actual * 1000:>10.2f}   ({t_referencia / t_actual:.2f}x)")
+    print(f"mismas elecciones: {'sí' if elecciones == elecciones_ref else 'NO'} ({len(elecciones)} alimentos)")
+
+
+if __name__ == "__main__":
+    main()
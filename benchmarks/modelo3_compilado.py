@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# modelo3_compilado.py
+# Paridad y latencia del ensemble compilado del Modelo 3 (Core/arboles_compilados.py)
+#
+# El pickle del Modelo 3 no se versiona en el repositorio, así que se entrena un
+# modelo sintético con la misma estructura que ml/entrenar_modelo3_combinaciones.py
+# (StandardScaler + XGBRegressor 200x6 + RandomForestRegressor 200x10, mismas
+# feature_columns) y se publica en el registro de modelos. Se compara, a través de
+# MotorRecomendacion.evaluar_combinaciones_batch:
+#   - paridad: scores del ensemble original (DataFrame + sklearn/XGBoost) vs el
+#     compilado, cargando desde el pickle y desde el artefacto exportado (donde el
+#     RandomForest ya viene compilado en .npy); incluye features faltantes (NaN),
+#   - latencia: 1 fila (evaluar_combinacion_alimentos) y lotes de varios tamaños.
+#
+# Uso: python -m benchmarks.modelo3_compilado [--repeticiones 50]
+
+import sys
+import time
+import pickle
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+FEATURE_COLUMNS = [
+    'age', 'gender', 'bmi', 'a1c', 'fasting_glucose', 'homa_ir',
+    'n_comidas_combinadas', 'total_calories', 'total_carbs', 'total_protein',
+    'total_fat', 'total_fiber',
+    'carbs_percent', 'protein_percent', 'fat_percent',
+    'tipos_comida',
+    'hora_primera_comida', 'duracion_combinacion',
+]
+
+TOLERANCIA = 1e-5  # XGBoost acumula las hojas en float32
+
+
+def entrenar_modelo_sintetico(n: int = 4000, semilla: int = 42) -> dict:
+    """Diccionario con la misma estructura que guarda entrenar_modelo3_combinaciones.py"""
+    import numpy as np
+    import pandas as pd
+    import xgboost as xgb
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    rnd = np.random.default_rng(semilla)
+    carbs, protein, fat = rnd.uniform(0, 120, n), rnd.uniform(0, 60, n), rnd.uniform(0, 50, n)
+    calories = carbs * 4 + protein * 4 + fat * 9
+    df = pd.DataFrame({
+        'age': rnd.integers(25, 80, n), 'gender': rnd.integers(0, 2, n), 'bmi': rnd.uniform(18, 40, n),
+        'a1c': rnd.uniform(5, 11, n), 'fasting_glucose': rnd.uniform(80, 220, n), 'homa_ir': rnd.uniform(0.5, 8, n),
+        'n_comidas_combinadas': rnd.integers(1, 4, n), 'total_calories': calories, 'total_carbs': carbs,
+        'total_protein': protein, 'total_fat': fat, 'total_fiber': rnd.uniform(0, 20, n),
+        'carbs_percent': carbs * 400 / calories, 'protein_percent': protein * 400 / calories,
+        'fat_percent': fat * 900 / calories, 'tipos_comida': rnd.integers(1, 6, n),
+        'hora_primera_comida': rnd.choice([7, 10, 13, 16, 20], n), 'duracion_combinacion': rnd.uniform(0, 3, n),
+    })
+    y = np.clip(0.6 - 0.004 * (df['carbs_percent'] - 45).abs() + 0.01 * df['total_fiber']
+                - 0.02 * (df['a1c'] - 7) + rnd.normal(0, 0.05, n), 0, 1)
+
+    scaler = StandardScaler()
+    X = pd.DataFrame(scaler.fit_transform(df[FEATURE_COLUMNS]), columns=FEATURE_COLUMNS)
+    modelo_xgb = xgb.XGBRegressor(n_estimators=200, max_depth=6, learning_rate=0.1, subsample=0.8,
+                                  colsample_bytree=0.8, random_state=42, n_jobs=-1, verbosity=0).fit(X, y)
+    modelo_rf = RandomForestRegressor(n_estimators=200, max_depth=10, min_samples_split=5,
+                                      min_samples_leaf=2, random_state=42, n_jobs=-1).fit(X, y)
+    return {
+        'modelos': {'xgb': modelo_xgb, 'rf': modelo_rf, 'tipo': 'ensemble'},
+        'feature_columns': FEATURE_COLUMNS,
+        'target_column': 'score_calidad',
+        'scaler': scaler,
+    }
+
+
+def combinaciones_sinteticas(n: int, semilla: int = 7):
+    import random
+    from benchmarks.datos_sinteticos import alimentos_sinteticos
+    rnd = random.Random(semilla)
+    alimentos = alimentos_sinteticos(300)
+    combinaciones = []
+    for _ in range(n):
+        combinacion = []
+        for alimento in rnd.sample(alimentos, rnd.randint(1, 5)):
+            factor = rnd.uniform(0.3, 2.0)
+            combinacion.append({**alimento, **{c: alimento[c] * factor for c in ('kcal', 'cho', 'pro', 'fat', 'fibra')}})
+        combinaciones.append(combinacion)
+    contextos = [{'hora': rnd.choice([7, 10, 13, 16, 20])} for _ in range(n)]
+    return combinaciones, contextos
+
+
+def _mediana_ms(funcion, repeticiones: int) -> float:
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Paridad y latencia del Modelo 3 compilado')
+    parser.add_argument('--repeticiones', type=int, default=50)
+    args = parser.parse_args()
+
+    import warnings
+    warnings.filterwarnings('ignore')
+    import numpy as np
+    from Core.artefactos_modelo import exportar_junto_a_pickle
+    from Core.motor_recomendacion import MotorRecomendacion
+    from Core.registro_modelos import obtener_registro, MODELO_OPTIMIZACION_COMBINACIONES
+    from benchmarks.datos_sinteticos import perfil_sintetico
+
+    print("Entrenando Modelo 3 sintético (XGB 200x6 + RF 200x10)...")
+    directorio = Path(tempfile.mkdtemp(prefix='modelo3_'))
+    ruta_pickle = directorio / 'modelo_optimizacion_combinaciones.pkl'
+    modelo_completo = entrenar_modelo_sintetico()
+    with open(ruta_pickle, 'wb') as f:
+        pickle.dump(modelo_completo, f)
+    manifest = exportar_junto_a_pickle(modelo_completo, ruta_pickle, MODELO_OPTIMIZACION_COMBINACIONES)
+
+    perfiles = {
+        'completo': perfil_sintetico(),
+        # Sin HbA1c ni glucosa en ayunas: esas features llegan como NaN (igual que homa_ir siempre)
+        'con_faltantes': {'edad': 61, 'sexo': 'M', 'imc': 31.2, 'hba1c': None, 'glucosa_ayunas': None},
+    }
+    combinaciones, contextos = combinaciones_sinteticas(1000)
+    registro = obtener_registro()
+
+    print("=" * 78)
+    print("PARIDAD (scores del ensemble original vs compilado)")
+    print("=" * 78)
+    motores = {}
+    paridad_ok = True
+    for origen, ruta in (('pickle', ruta_pickle), ('exportado', manifest)):
+        entrada = registro.recargar(MODELO_OPTIMIZACION_COMBINACIONES, [ruta])
+        compilado, original = MotorRecomendacion(), MotorRecomendacion()
+        compilado._cargar_modelo_optimizacion_combinaciones()
+        original._cargar_modelo_optimizacion_combinaciones()
+        original._combinaciones_compilado = None
+        if compilado._combinaciones_compilado is None:
+            print(f"[WARN]  {origen}: el ensemble no se compiló")
+            paridad_ok = False
+            continue
+        motores[origen] = (original, compilado)
+        for nombre_perfil, perfil in perfiles.items():
+            compilado.MAX_FILAS_MODELO3_COMPILADO = len(combinaciones)
+            a = np.array(original.evaluar_combinaciones_batch(perfil, combinaciones, contextos))
+            b = np.array(compilado.evaluar_combinaciones_batch(perfil, combinaciones, contextos))
+            diferencia = float(np.max(np.abs(a - b)))
+            paridad_ok &= diferencia <= TOLERANCIA
+            print(f"{origen:<10} perfil {nombre_perfil:<14} {len(a)} combinaciones  "
+                  f"dif. máx {diferencia:.2e}  {'OK' if diferencia <= TOLERANCIA else 'FALLA'}")
+        print(f"{'':<10} árboles {entrada.get('compilado').bosque.n_arboles}, "
+              f"nodos {entrada.get('compilado').bosque.n_nodos}")
+
+    original, compilado = motores.get('pickle', (None, None))
+    if original is None:
+        sys.exit(1)
+    # Para medir el evaluador compilado también en lotes grandes
+    compilado.MAX_FILAS_MODELO3_COMPILADO = len(combinaciones)
+    perfil = perfiles['completo']
+    print()
+    print("=" * 78)
+    print(f"LATENCIA (mediana de {args.repeticiones} repeticiones, ms)")
+    print("=" * 78)
+    print(f"{'filas':>8}{'original':>14}{'compilado':>14}{'aceleración':>14}")
+    for n in (1, 5, 30, 200, 1000):
+        def evaluar(motor, n=n):
+            if n == 1:
+                return motor.evaluar_combinacion_alimentos(perfil, combinaciones[0], contextos[0])
+            return motor.evaluar_combinaciones_batch(perfil, combinaciones[:n], contextos[:n])
+        t_original = _mediana_ms(lambda: evaluar(original), args.repeticiones)
+        t_compilado = _mediana_ms(lambda: evaluar(compilado), args.repeticiones)
+        print(f"{n:>8}{t_original:>14.2f}{t_compilado:>14.2f}{t_original / t_compilado:>13.1f}x")
+
+    print(f"\nParidad: {'OK' if paridad_ok else 'FALLA'} (tolerancia {TOLERANCIA:g})")
+    sys.exit(0 if paridad_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
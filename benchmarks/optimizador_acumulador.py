@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# optimizador_acumulador.py
+# Micro-benchmark de los totales incrementales del optimizador (Core/acumulador_nutrientes.py)
+#
+# Sobre planes sintéticos de 7 días (benchmarks/datos_sinteticos.py) mide:
+#   - cumplimiento de un día: suma completa de los alimentos (calcular_cumplimiento_dia)
+#     vs lectura de los totales del AcumuladorDia (cumplimiento_acumulado),
+#   - actualización tras escalar una porción: nueva suma completa vs cambio O(1),
+#   - copia de un día: copy.deepcopy vs copiar_dia,
+#   - tiempo del optimizador por día (optimizar_plan / días).
+# Con --referencia se mide además el tiempo por día de otra versión del
+# optimizador para comparar antes/después, p. ej.:
+#   git show <commit>:Core/optimizador_plan.py > /tmp/optimizador_anterior.py
+#   python -m benchmarks.optimizador_acumulador --referencia /tmp/optimizador_anterior.py
+#
+# Uso: python -m benchmarks.optimizador_acumulador [--planes 10] [--repeticiones 2000]
+
+import io
+import sys
+import copy
+import time
+import argparse
+import statistics
+import contextlib
+import importlib.util
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+
+def _mediana_us(funcion, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1e6
+
+
+def _cargar_referencia(ruta: str):
+    spec = importlib.util.spec_from_file_location('optimizador_referencia', ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo.OptimizadorPlan
+
+
+def ms_por_dia(clase, planes, metas, grupos, perfil, motor, solver: str) -> float:
+    total, dias = 0.0, 0
+    for i, plan in enumerate([planes[0]] + planes):  # el primero calienta (imports de scipy, etc.)
+        optimizador = clase(umbral_cumplimiento=0.90, max_iteraciones=20, motor_ia=None,
+                            perfil_paciente=perfil, motor_recomendacion=motor, solver=solver)
+        plan = copy.deepcopy(plan)
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            optimizador.optimizar_plan(plan, metas, grupos, perfil, motor)
+        if i > 0:
+            total += time.perf_counter() - inicio
+            dias += len(plan['plan_semanal'])
+    return total / dias * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark del acumulador de nutrientes del optimizador')
+    parser.add_argument('--planes', type=int, default=10)
+    parser.add_argument('--repeticiones', type=int, default=2000)
+    parser.add_argument('--solver', default='voraz', choices=('voraz', 'lp', 'milp'))
+    parser.add_argument('--referencia', help='optimizador_plan.py de otra versión para comparar el tiempo por día')
+    args = parser.parse_args()
+
+    from Core.acumulador_nutrientes import AcumuladorDia, copiar_dia
+    from Core.plan_compacto import compactar_dia
+    from Core.motor_recomendacion import MotorRecomendacion
+    from Core.optimizador_plan import OptimizadorPlan
+    from benchmarks.datos_sinteticos import (
+        perfil_sintetico, metas_dict_sinteticas, grupos_sinteticos, plan_sintetico, alimentos_sinteticos,
+    )
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        motor = MotorRecomendacion()
+    perfil = perfil_sintetico()
+    metas = metas_dict_sinteticas()
+    alimentos = alimentos_sinteticos()
+    grupos = grupos_sinteticos(alimentos)
+    planes = [plan_sintetico(7, semilla, alimentos) for semilla in range(1, args.planes + 1)]
+    optimizador = OptimizadorPlan(solver=args.solver)
+
+    dia = compactar_dia(copiar_dia(planes[0]['plan_semanal']['dia_1']))  # Alimentos como Porcion, como en el optimizador
+    acumulador = AcumuladorDia.desde_dia(dia)
+    alimento = dia['alm']['alimentos'][0]
+    n_alimentos = sum(len(c['alimentos']) for c in dia.values() if isinstance(c, dict) and 'alimentos' in c)
+
+    def escalar_y_sumar():
+        alimento.kcal *= 1.0
+        return optimizador.calcular_cumplimiento_dia(dia, metas)
+
+    def escalar_acumulado():
+        with acumulador.cambio('alm', alimento):
+            alimento.kcal *= 1.0
+        return optimizador.cumplimiento_acumulado(acumulador, metas)
+
+    print("=" * 72)
+    print(f"OPERACIONES POR DÍA ({n_alimentos} alimentos, mediana de {args.repeticiones}, µs)")
+    print("=" * 72)
+    print(f"{'operación':<34}{'completo':>12}{'incremental':>14}{'aceleración':>12}")
+    filas = [
+        ('cumplimiento del día',
+         lambda: optimizador.calcular_cumplimiento_dia(dia, metas),
+         lambda: optimizador.cumplimiento_acumulado(acumulador, metas)),
+        ('escalar porción + cumplimiento', escalar_y_sumar, escalar_acumulado),
+        ('copia del día (deepcopy / copiar_dia)', lambda: copy.deepcopy(dia), lambda: copiar_dia(dia)),
+    ]
+    for nombre, completo, incremental in filas:
+        t_completo = _mediana_us(completo, args.repeticiones)
+        t_incremental = _mediana_us(incremental, args.repeticiones)
+        print(f"{nombre:<34}{t_completo:>12.1f}{t_incremental:>14.1f}{t_completo / t_incremental:>11.1f}x")
+
+    print()
+    print("=" * 72)
+    print(f"OPTIMIZADOR ({args.planes} planes de 7 días, solver {args.solver}, ms por día)")
+    print("=" * 72)
+    actual = ms_por_dia(OptimizadorPlan, planes, metas, grupos, perfil, motor, args.solver)
+    if args.referencia:
+        referencia = ms_por_dia(_cargar_referencia(args.referencia), planes, metas, grupos, perfil, motor, args.solver)
+        print(f"{'referencia':<20}{referencia:>10.2f}")
+        print(f"{'actual':<20}{actual:>10.2f}   ({referencia / actual:.2f}x)")
+    else:
+        print(f"{'actual':<20}{actual:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# optimizador_paralelo.py
+# Optimización de días en secuencia vs en el pool de procesos (OPTIMIZADOR_PROCESOS)
+#
+# Planes sintéticos de 7, 14 y 28 días (benchmarks/datos_sinteticos.py; el
+# generador real necesita la BD). Para cada tamaño se optimiza el mismo plan en
+# secuencia y con N procesos y se verifica que el plan y las estadísticas sean
+# idénticos (la mezcla es determinista). Con --modelo3 se publica en el registro
+# un Modelo 3 sintético para que los ajustes voraces evalúen combinaciones con ML,
+# como en producción (los procesos del pool lo heredan con fork).
+#
+# Con menos CPU que procesos solo se mide el costo del pool (en 1 CPU el modo
+# paralelo es más lento); la aceleración hay que medirla en un host multinúcleo.
+#
+# Uso: python -m benchmarks.optimizador_paralelo [--procesos N] [--modelo3] [--solver voraz|lp|milp]
+
+import io
+import os
+import sys
+import copy
+import json
+import time
+import pickle
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+
+def publicar_modelo3_sintetico():
+    from benchmarks.modelo3_compilado import entrenar_modelo_sintetico
+    from Core.registro_modelos import obtener_registro, MODELO_OPTIMIZACION_COMBINACIONES
+    ruta = Path(tempfile.mkdtemp(prefix='modelo3_')) / 'modelo_optimizacion_combinaciones.pkl'
+    with open(ruta, 'wb') as f:
+        pickle.dump(entrenar_modelo_sintetico(), f)
+    obtener_registro().recargar(MODELO_OPTIMIZACION_COMBINACIONES, [ruta])
+
+
+def optimizar(plan: dict, procesos: int, solver: str, metas: dict, grupos: dict, perfil, motor):
+    from Core.optimizador_plan import OptimizadorPlan
+    optimizador = OptimizadorPlan(umbral_cumplimiento=0.90, max_iteraciones=20, motor_ia=None,
+                                  perfil_paciente=perfil, motor_recomendacion=motor,
+                                  solver=solver, procesos=procesos)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        plan_optimizado, estadisticas = optimizador.optimizar_plan(copy.deepcopy(plan), metas, grupos, perfil, motor)
+    return time.perf_counter() - inicio, plan_optimizado, estadisticas
+
+
+def _huella(plan: dict, estadisticas: dict) -> str:
+    from Core.plan_compacto import plan_a_formato_ui
+    estadisticas = {k: v for k, v in estadisticas.items() if k != 'solver'}  # 'ms' del solver varía
+    plan = dict(plan, plan_semanal=plan_a_formato_ui(plan['plan_semanal']))
+    return json.dumps([plan, estadisticas], sort_keys=True, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimización de días en secuencia vs en paralelo')
+    parser.add_argument('--procesos', type=int, default=max(2, os.cpu_count() or 2))
+    parser.add_argument('--solver', default='voraz', choices=('voraz', 'lp', 'milp'))
+    parser.add_argument('--modelo3', action='store_true', help='Evaluar combinaciones con un Modelo 3 sintético')
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+    if args.procesos < 2:
+        parser.error('--procesos debe ser al menos 2 (con 0 o 1 el optimizador corre en secuencia)')
+
+    import warnings
+    warnings.filterwarnings('ignore')
+    from Core.motor_recomendacion import MotorRecomendacion
+    from Core.optimizador_plan import cerrar_pool_procesos
+    from benchmarks.datos_sinteticos import (
+        perfil_sintetico, metas_dict_sinteticas, grupos_sinteticos, plan_sintetico, alimentos_sinteticos,
+    )
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args.modelo3:
+            publicar_modelo3_sintetico()
+        motor = MotorRecomendacion()
+    perfil = perfil_sintetico()
+    metas = metas_dict_sinteticas()
+    alimentos = alimentos_sinteticos()
+    grupos = grupos_sinteticos(alimentos)
+
+    print("=" * 78)
+    print(f"OPTIMIZACIÓN POR DÍAS: secuencia vs {args.procesos} procesos "
+          f"(solver {args.solver}, Modelo 3 {'sí' if args.modelo3 else 'no'}, {os.cpu_count()} CPU)")
+    print("=" * 78)
+    if (os.cpu_count() or 1) < args.procesos:
+        print(f"[WARN]  {os.cpu_count()} CPU para {args.procesos} procesos: solo se mide el costo del pool, no la aceleración")
+    # Crear el pool antes de medir (el primer fork no es parte del costo por plan)
+    optimizar(plan_sintetico(args.procesos, args.semilla, alimentos), args.procesos, args.solver, metas, grupos, perfil, motor)
+
+    print(f"{'días':>6}{'secuencia (s)':>16}{'paralelo (s)':>16}{'aceleración':>14}{'idénticos':>12}")
+    identicos = True
+    for dias in (7, 14, 28):
+        plan = plan_sintetico(dias, args.semilla, alimentos)
+        t_secuencia, plan_a, est_a = optimizar(plan, 0, args.solver, metas, grupos, perfil, motor)
+        t_paralelo, plan_b, est_b = optimizar(plan, args.procesos, args.solver, metas, grupos, perfil, motor)
+        iguales = _huella(plan_a, est_a) == _huella(plan_b, est_b)
+        identicos &= iguales
+        print(f"{dias:>6}{t_secuencia:>16.3f}{t_paralelo:>16.3f}{t_secuencia / t_paralelo:>13.2f}x"
+              f"{'sí' if iguales else 'NO':>12}")
+    cerrar_pool_procesos()
+
+    print(f"\nResultados idénticos: {'OK' if identicos else 'FALLA'}")
+    sys.exit(0 if identicos else 1)
+
+
+if __name__ == "__main__":
+    main()
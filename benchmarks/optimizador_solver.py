@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# optimizador_solver.py
+# Tiempo y cumplimiento del optimizador de planes: voraz vs solver LP/MILP
+#
+# generar_plan_semanal necesita la BD (metas, ingredientes), así que se usan
+# planes sintéticos con el mismo formato (benchmarks/datos_sinteticos.py) y
+# cumplimiento diario disperso entre ~70% y ~125%. Para cada semilla se optimiza
+# el mismo plan con OptimizadorPlan(solver=...) y se reporta:
+#   - tiempo total de optimizar_plan,
+#   - cumplimiento final por día (promedio, días que cumplen 83-100% en kcal y
+#     macronutrientes, peor exceso sobre 100%),
+#   - estados del solver (óptimo / relajado).
+# El Modelo 3 no se carga, así que la validación con ML se omite en los tres modos.
+#
+# Uso: python -m benchmarks.optimizador_solver [--semillas 5] [--dias 7]
+
+import io
+import sys
+import copy
+import time
+import argparse
+import contextlib
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+
+def optimizar(solver: str, plan: dict, metas: dict, grupos: dict, perfil, motor) -> tuple:
+    from Core.optimizador_plan import OptimizadorPlan
+    optimizador = OptimizadorPlan(umbral_cumplimiento=0.90, max_iteraciones=20, motor_ia=None,
+                                  perfil_paciente=perfil, motor_recomendacion=motor, solver=solver)
+    plan = copy.deepcopy(plan)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        plan_optimizado, estadisticas = optimizador.optimizar_plan(plan, metas, grupos, perfil, motor)
+    segundos = time.perf_counter() - inicio
+
+    cumplimientos = [optimizador.calcular_cumplimiento_dia(dia, metas)
+                     for clave, dia in plan_optimizado['plan_semanal'].items() if clave.startswith('dia_')]
+    exceso = max(max(c.kcal_porcentaje, c.cho_porcentaje, c.pro_porcentaje, c.fat_porcentaje)
+                 for c in cumplimientos) - 100
+    return {
+        'ms': segundos * 1000,
+        'promedio': sum(c.promedio_cumplimiento for c in cumplimientos) / len(cumplimientos),
+        'cumplen': sum(c.cumple_objetivos for c in cumplimientos),
+        'dias': len(cumplimientos),
+        'exceso': max(exceso, 0.0),
+        'estados': [d['estado'] for d in estadisticas.get('solver', {}).get('dias', {}).values()],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimizador voraz vs solver LP/MILP')
+    parser.add_argument('--semillas', type=int, default=5)
+    parser.add_argument('--dias', type=int, default=7)
+    args = parser.parse_args()
+
+    from Core.motor_recomendacion import MotorRecomendacion
+    from Core.solver_porciones import SCIPY_DISPONIBLE
+    from benchmarks.datos_sinteticos import (
+        perfil_sintetico, metas_dict_sinteticas, grupos_sinteticos, plan_sintetico, alimentos_sinteticos,
+    )
+    if not SCIPY_DISPONIBLE:
+        print("[WARN]  scipy no disponible: solo se puede medir el optimizador voraz")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        motor = MotorRecomendacion()  # Límites por grupo (_obtener_limites_cantidad_grupo)
+    perfil = perfil_sintetico()
+    metas = metas_dict_sinteticas()
+    alimentos = alimentos_sinteticos()
+    grupos = grupos_sinteticos(alimentos)
+    solvers = ('voraz', 'lp', 'milp') if SCIPY_DISPONIBLE else ('voraz',)
+
+    print("=" * 84)
+    print(f"OPTIMIZADOR: {args.semillas} planes sintéticos de {args.dias} días")
+    print("=" * 84)
+    print(f"{'semilla':>8}{'solver':>8}{'ms':>12}{'cumpl. prom.':>14}{'días OK':>10}{'exceso máx':>12}  estados")
+    totales = {s: {'ms': 0.0, 'cumplen': 0, 'dias': 0, 'promedio': 0.0} for s in solvers}
+    for semilla in range(1, args.semillas + 1):
+        plan = plan_sintetico(args.dias, semilla, alimentos)
+        for solver in solvers:
+            r = optimizar(solver, plan, metas, grupos, perfil, motor)
+            for clave in ('ms', 'cumplen', 'dias', 'promedio'):
+                totales[solver][clave] += r[clave]
+            estados = ', '.join(f"{e}:{r['estados'].count(e)}" for e in sorted(set(r['estados']))) or '-'
+            print(f"{semilla:>8}{solver:>8}{r['ms']:>12.1f}{r['promedio']:>13.1f}%"
+                  f"{r['cumplen']:>6}/{r['dias']:<3}{r['exceso']:>11.1f}%  {estados}")
+
+    print()
+    print(f"{'solver':>8}{'ms/plan':>12}{'cumpl. prom.':>14}{'días OK':>14}")
+    for solver, t in totales.items():
+        print(f"{solver:>8}{t['ms'] / args.semillas:>12.1f}{t['promedio'] / args.semillas:>13.1f}%"
+              f"{t['cumplen']:>8}/{t['dias']:<5}")
+
+
+if __name__ == "__main__":
+    main()
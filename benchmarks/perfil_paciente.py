@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# perfil_paciente.py
+# Carga del perfil del paciente: las siete consultas de antes vs las mismas en
+# un lote de pipeline vs la sentencia única de Core/perfil_paciente.py
+# (LATERAL + array_agg)
+#
+# Necesita PostgreSQL (DATABASE_URL o PG*), pero no toca las tablas reales: se
+# crean como tablas temporales de la sesión con pacientes sintéticos. Con una BD
+# local el RTT es casi 0, así que además del tiempo medido se muestra el
+# estimado para una BD remota: medido + idas y vueltas x --rtt-ms (7 / 2 / 1;
+# el pipeline necesita una ida y vuelta más para el Sync al salir del bloque).
+# Se verifica que los tres caminos den el mismo perfil.
+#
+# Uso: python -m benchmarks.perfil_paciente [--pacientes 200] [--rtt-ms 20] [--repeticiones 5]
+
+import io
+import sys
+import time
+import random
+import argparse
+import contextlib
+from datetime import date, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+TABLAS = """
+    CREATE TEMP TABLE ingrediente (id serial PRIMARY KEY, nombre text);
+    CREATE TEMP TABLE paciente (id serial PRIMARY KEY, sexo text, fecha_nac date);
+    CREATE TEMP TABLE antropometria (
+        id serial PRIMARY KEY, paciente_id int, fecha date, peso numeric, talla numeric, actividad text);
+    CREATE TEMP TABLE clinico (
+        id serial PRIMARY KEY, paciente_id int, fecha date, hba1c numeric, glucosa_ayunas numeric,
+        ldl numeric, trigliceridos numeric, pa_sis int, pa_dia int);
+    CREATE TEMP TABLE paciente_alergia (id serial PRIMARY KEY, paciente_id int, ingrediente_id int);
+    CREATE TEMP TABLE paciente_medicamento (id serial PRIMARY KEY, paciente_id int, nombre text, activo boolean);
+    CREATE TEMP TABLE paciente_preferencia (id serial PRIMARY KEY, paciente_id int, ingrediente_id int, tipo text);
+    CREATE INDEX ON antropometria (paciente_id, fecha);
+    CREATE INDEX ON clinico (paciente_id, fecha);
+    CREATE INDEX ON paciente_alergia (paciente_id);
+    CREATE INDEX ON paciente_medicamento (paciente_id);
+    CREATE INDEX ON paciente_preferencia (paciente_id);
+"""
+
+# Las consultas de la versión anterior de obtener_perfil_paciente
+CONSULTAS = (
+    ("one", "SELECT p.id, p.sexo, p.fecha_nac FROM paciente p WHERE p.id = %s"),
+    ("one", "SELECT peso, talla, actividad, fecha FROM antropometria WHERE paciente_id = %s ORDER BY fecha DESC LIMIT 1"),
+    ("one", "SELECT hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia, fecha FROM clinico "
+            "WHERE paciente_id = %s ORDER BY fecha DESC LIMIT 1"),
+    ("all", "SELECT i.nombre FROM paciente_alergia pa LEFT JOIN ingrediente i ON i.id = pa.ingrediente_id "
+            "WHERE pa.paciente_id = %s"),
+    ("all", "SELECT nombre FROM paciente_medicamento WHERE paciente_id = %s AND activo = true"),
+    ("all", "SELECT i.nombre FROM paciente_preferencia pp LEFT JOIN ingrediente i ON i.id = pp.ingrediente_id "
+            "WHERE pp.paciente_id = %s AND pp.tipo = 'excluir'"),
+    ("all", "SELECT i.nombre FROM paciente_preferencia pp LEFT JOIN ingrediente i ON i.id = pp.ingrediente_id "
+            "WHERE pp.paciente_id = %s AND pp.tipo = 'incluir'"),
+)
+
+
+def poblar(cur, pacientes: int):
+    azar = random.Random(7)
+    cur.executemany("INSERT INTO ingrediente (nombre) VALUES (%s)", [(f"ingrediente_{i}",) for i in range(1, 301)])
+    hoy = date.today()
+    for pid in range(1, pacientes + 1):
+        cur.execute("INSERT INTO paciente (sexo, fecha_nac) VALUES (%s, %s)",
+                    (azar.choice('MF'), hoy - timedelta(days=azar.randint(30, 75) * 365)))
+        cur.executemany("INSERT INTO antropometria (paciente_id, fecha, peso, talla, actividad) VALUES (%s, %s, %s, %s, %s)",
+                        [(pid, hoy - timedelta(days=30 * k), azar.uniform(55, 110), azar.uniform(1.5, 1.9),
+                          azar.choice(('baja', 'moderada', 'alta'))) for k in range(12)])
+        cur.executemany("INSERT INTO clinico (paciente_id, fecha, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia) "
+                        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                        [(pid, hoy - timedelta(days=30 * k), azar.uniform(5.5, 10), azar.uniform(80, 220),
+                          azar.uniform(70, 190), azar.uniform(90, 300), azar.randint(100, 160), azar.randint(60, 100))
+                         for k in range(12)])
+        cur.executemany("INSERT INTO paciente_alergia (paciente_id, ingrediente_id) VALUES (%s, %s)",
+                        [(pid, azar.randint(1, 300)) for _ in range(azar.randint(0, 3))])
+        cur.executemany("INSERT INTO paciente_medicamento (paciente_id, nombre, activo) VALUES (%s, %s, %s)",
+                        [(pid, f"medicamento_{azar.randint(1, 20)}", azar.random() > 0.2) for _ in range(azar.randint(0, 4))])
+        cur.executemany("INSERT INTO paciente_preferencia (paciente_id, ingrediente_id, tipo) VALUES (%s, %s, %s)",
+                        [(pid, azar.randint(1, 300), azar.choice(('excluir', 'incluir'))) for _ in range(azar.randint(0, 6))])
+    cur.execute("ANALYZE")
+
+
+def _instantanea(pid: int, resultados: list):
+    """Arma la misma fila que SQL_PERFIL a partir de las siete consultas"""
+    from Core.perfil_paciente import instantanea_desde_fila
+    paciente, antropo, clinico, alergias, meds, excluir, incluir = resultados
+
+    def nombres(filas):
+        return sorted(f[0] for f in filas if f[0]) or None
+
+    fila = (paciente[0], paciente[1], paciente[2]) + tuple((antropo or (None,) * 4)[:3]) \
+        + tuple((clinico or (None,) * 7)[:6]) + (nombres(alergias), nombres(meds), nombres(excluir), nombres(incluir))
+    return instantanea_desde_fila(pid, fila)
+
+
+def siete_consultas(conn, pid: int):
+    resultados = []
+    with conn.cursor() as cur:
+        for tipo, sql in CONSULTAS:
+            cur.execute(sql, (pid,))
+            resultados.append(cur.fetchone() if tipo == "one" else cur.fetchall())
+    return _instantanea(pid, resultados)
+
+
+def lote_pipeline(conn, pid: int):
+    with conn.pipeline():
+        cursores = [conn.cursor() for _ in CONSULTAS]
+        for cur, (_, sql) in zip(cursores, CONSULTAS):
+            cur.execute(sql, (pid,))
+        resultados = [cur.fetchone() if tipo == "one" else cur.fetchall()
+                      for cur, (tipo, _) in zip(cursores, CONSULTAS)]
+    for cur in cursores:
+        cur.close()
+    return _instantanea(pid, resultados)
+
+
+def sentencia_unica(conn, pid: int):
+    from Core.perfil_paciente import SQL_PERFIL, instantanea_desde_fila
+    with conn.cursor() as cur:
+        cur.execute(SQL_PERFIL, (pid,))
+        return instantanea_desde_fila(pid, cur.fetchone())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Perfil del paciente: 7 consultas vs pipeline vs 1 sentencia')
+    parser.add_argument('--pacientes', type=int, default=200)
+    parser.add_argument('--rtt-ms', type=float, default=20.0)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    import psycopg
+    with contextlib.redirect_stdout(io.StringIO()):
+        from Core.bd_conexion import CONNINFO
+
+    with psycopg.connect(CONNINFO, autocommit=True) as conn:
+        with conn.transaction(), conn.cursor() as cur:
+            cur.execute(TABLAS)
+            poblar(cur, args.pacientes)
+
+        print("=" * 72)
+        print(f"PERFIL DEL PACIENTE ({args.pacientes} pacientes, RTT simulado {args.rtt_ms:.0f} ms, "
+              f"mejor de {args.repeticiones})")
+        print("=" * 72)
+        print(f"{'camino':<18}{'viajes':>8}{'ms medidos':>12}{'ms con RTT':>12}")
+        caminos = (('7 consultas', siete_consultas, len(CONSULTAS)), ('pipeline', lote_pipeline, 2),
+                   ('1 sentencia', sentencia_unica, 1))
+        perfiles = {}
+        for nombre, cargar, viajes in caminos:
+            mejor = float('inf')
+            for _ in range(args.repeticiones):
+                inicio = time.perf_counter()
+                perfiles[nombre] = [cargar(conn, pid) for pid in range(1, args.pacientes + 1)]
+                mejor = min(mejor, (time.perf_counter() - inicio) / args.pacientes)
+            print(f"{nombre:<18}{viajes:>8}{mejor * 1000:>12.3f}{mejor * 1000 + viajes * args.rtt_ms:>12.3f}")
+        iguales = perfiles['7 consultas'] == perfiles['pipeline'] == perfiles['1 sentencia']
+        print(f"mismos perfiles: {'sí' if iguales else 'NO'}")
+        print(f"perfiles distintos (hash de la instantánea): {len(set(perfiles['1 sentencia']))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# plan_compacto.py
+# Plan con alimentos como dict ("120.0g") vs alimentos como Porcion (Core/plan_compacto.py)
+#
+# generar_plan_semanal necesita la BD, así que las sugerencias de cada comida
+# ({'ingrediente', 'cantidad_sugerida', 'unidad'}, como las devuelven los
+# _sugerir_*_variado) se toman de planes sintéticos (benchmarks/datos_sinteticos.py).
+# Se mide:
+#   - memoria de un plan de 7 días (tracemalloc, solo lo que queda vivo),
+#   - construcción de los días a partir de las sugerencias (_generar_dia_variado),
+#   - construcción + optimización + formato UI por plan, frente a la versión
+#     anterior del optimizador con --referencia, p. ej.:
+#       git show <commit>:Core/optimizador_plan.py > /tmp/optimizador_anterior.py
+#       python -m benchmarks.plan_compacto --referencia /tmp/optimizador_anterior.py
+#
+# Uso: python -m benchmarks.plan_compacto [--planes 10] [--solver voraz|lp|milp]
+
+import io
+import gc
+import sys
+import time
+import argparse
+import tracemalloc
+import contextlib
+import importlib.util
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+
+def sugerencias_plan(plan: dict, ingredientes: dict) -> dict:
+    """{dia: {tiempo: [sugerencia, ...]}} con el formato de los _sugerir_*_variado"""
+    from Core.plan_compacto import parsear_cantidad
+    sugerencias = {}
+    for dia_key, dia in plan['plan_semanal'].items():
+        sugerencias[dia_key] = {
+            tiempo: [
+                {'ingrediente': ingredientes[a['nombre']], 'cantidad_sugerida': parsear_cantidad(a['cantidad'])[0],
+                 'unidad': 'g'}
+                for a in comida['alimentos']
+            ]
+            for tiempo, comida in dia.items() if tiempo != 'fecha'
+        }
+    return sugerencias
+
+
+def construir_dict(sugerencias: dict) -> dict:
+    """Días como los construía _generar_dia_variado (alimentos dict, cantidad en texto)"""
+    plan = {}
+    for dia_key, comidas in sugerencias.items():
+        plan[dia_key] = {'fecha': '2025-10-20'}
+        for tiempo, alimentos in comidas.items():
+            plan[dia_key][tiempo] = {
+                'nombre': tiempo, 'horario': '',
+                'alimentos': [
+                    {
+                        'nombre': s['ingrediente']['nombre'],
+                        'grupo': s['ingrediente']['grupo'],
+                        'cantidad': f"{s['cantidad_sugerida']}{s['unidad']}",
+                        'kcal': round(s['ingrediente']['kcal'] * s['cantidad_sugerida'] / 100, 1),
+                        'cho': round(s['ingrediente']['cho'] * s['cantidad_sugerida'] / 100, 1),
+                        'pro': round(s['ingrediente']['pro'] * s['cantidad_sugerida'] / 100, 1),
+                        'fat': round(s['ingrediente']['fat'] * s['cantidad_sugerida'] / 100, 1),
+                    }
+                    for s in alimentos
+                ],
+            }
+    return {'plan_semanal': plan}
+
+
+def construir_compacto(sugerencias: dict) -> dict:
+    """Días como los construye ahora _generar_dia_variado (alimentos Porcion)"""
+    from Core.plan_compacto import Porcion
+    plan = {}
+    for dia_key, comidas in sugerencias.items():
+        plan[dia_key] = {'fecha': '2025-10-20'}
+        for tiempo, alimentos in comidas.items():
+            plan[dia_key][tiempo] = {
+                'nombre': tiempo, 'horario': '',
+                'alimentos': [Porcion.desde_ingrediente(s['ingrediente'], s['cantidad_sugerida'], s['unidad'])
+                              for s in alimentos],
+            }
+    return {'plan_semanal': plan}
+
+
+def _memoria_kb(construir, sugerencias: list) -> float:
+    gc.collect()
+    tracemalloc.start()
+    planes = [construir(s) for s in sugerencias]
+    actual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del planes
+    return actual / len(sugerencias) / 1024
+
+
+def _ms(funcion, repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def _cargar_referencia(ruta: str):
+    spec = importlib.util.spec_from_file_location('optimizador_referencia', ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo.OptimizadorPlan
+
+
+def ms_generar_optimizar(clase, construir, a_ui, sugerencias: list, metas, grupos, perfil, motor, solver: str) -> float:
+    total = 0.0
+    for i, s in enumerate([sugerencias[0]] + sugerencias):  # el primero calienta (imports de scipy, etc.)
+        inicio = time.perf_counter()
+        plan = construir(s)
+        optimizador = clase(umbral_cumplimiento=0.90, max_iteraciones=20, motor_ia=None,
+                            perfil_paciente=perfil, motor_recomendacion=motor, solver=solver)
+        with contextlib.redirect_stdout(io.StringIO()):
+            plan_optimizado, _ = optimizador.optimizar_plan(plan, metas, grupos, perfil, motor)
+        a_ui(plan_optimizado['plan_semanal'])
+        if i > 0:
+            total += time.perf_counter() - inicio
+    return total / len(sugerencias) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plan con alimentos dict vs Porcion')
+    parser.add_argument('--planes', type=int, default=10)
+    parser.add_argument('--solver', default='voraz', choices=('voraz', 'lp', 'milp'))
+    parser.add_argument('--referencia', help='optimizador_plan.py de otra versión (alimentos dict)')
+    args = parser.parse_args()
+
+    from Core.motor_recomendacion import MotorRecomendacion
+    from Core.optimizador_plan import OptimizadorPlan
+    from Core.plan_compacto import plan_a_formato_ui
+    from benchmarks.datos_sinteticos import (
+        perfil_sintetico, metas_dict_sinteticas, grupos_sinteticos, plan_sintetico, alimentos_sinteticos,
+    )
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        motor = MotorRecomendacion()
+    perfil = perfil_sintetico()
+    metas = metas_dict_sinteticas()
+    alimentos = alimentos_sinteticos()
+    grupos = grupos_sinteticos(alimentos)
+    ingredientes = {a['nombre']: a for a in alimentos}
+    sugerencias = [sugerencias_plan(plan_sintetico(7, semilla, alimentos), ingredientes)
+                   for semilla in range(1, args.planes + 1)]
+    n_alimentos = sum(len(c) for d in sugerencias[0].values() for c in d.values())
+
+    print("=" * 72)
+    print(f"PLAN DE 7 DÍAS ({n_alimentos} alimentos)")
+    print("=" * 72)
+    print(f"{'':<34}{'dict':>12}{'Porcion':>12}{'relación':>12}")
+    kb_dict = _memoria_kb(construir_dict, sugerencias)
+    kb_compacto = _memoria_kb(construir_compacto, sugerencias)
+    print(f"{'memoria por plan (KB)':<34}{kb_dict:>12.1f}{kb_compacto:>12.1f}{kb_dict / kb_compacto:>11.2f}x")
+    ms_dict = _ms(lambda: [construir_dict(s) for s in sugerencias], 20) / len(sugerencias)
+    ms_compacto = _ms(lambda: [construir_compacto(s) for s in sugerencias], 20) / len(sugerencias)
+    print(f"{'construcción por plan (ms)':<34}{ms_dict:>12.3f}{ms_compacto:>12.3f}{ms_dict / ms_compacto:>11.2f}x")
+    planes_compactos = [construir_compacto(s) for s in sugerencias]
+    ms_ui = _ms(lambda: [plan_a_formato_ui(p['plan_semanal']) for p in planes_compactos], 20) / len(sugerencias)
+    print(f"{'formato UI por plan (ms)':<34}{'-':>12}{ms_ui:>12.3f}")
+
+    print()
+    print("=" * 72)
+    print(f"CONSTRUCCIÓN + OPTIMIZACIÓN + FORMATO UI ({args.planes} planes, solver {args.solver}, ms por plan)")
+    print("=" * 72)
+    actual = ms_generar_optimizar(OptimizadorPlan, construir_compacto, plan_a_formato_ui,
+                                  sugerencias, metas, grupos, perfil, motor, args.solver)
+    if args.referencia:
+        referencia = ms_generar_optimizar(_cargar_referencia(args.referencia), construir_dict, lambda plan: plan,
+                                          sugerencias, metas, grupos, perfil, motor, args.solver)
+        print(f"{'referencia (dict)':<20}{referencia:>10.2f}")
+        print(f"{'actual (Porcion)':<20}{actual:>10.2f}   ({referencia / actual:.2f}x)")
+    else:
+        print(f"{'actual (Porcion)':<20}{actual:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
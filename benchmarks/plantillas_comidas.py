@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# plantillas_comidas.py
+# Desayuno/almuerzo/cena armados con las reglas (_sugerir_*_variado) vs elegidos
+# de la biblioteca de plantillas (Core/plantillas_comidas.py)
+#
+# Sin BD: el catálogo son los ingredientes sintéticos de
+# benchmarks/indice_ingredientes.py, 100 g por porción de intercambio y, si el
+# Modelo 3 no está disponible, las plantillas se puntúan con score_reglas. Se mide:
+#   - generación offline de la biblioteca (enumeración + reglas + score),
+#   - ms por plan (7 días x 3 comidas) con cada camino,
+#   - desvío medio de kcal respecto a la meta de cada comida y de los % de
+#     CHO/PRO/FAT respecto a las metas, antes de la optimización.
+#
+# Uso: python -m benchmarks.plantillas_comidas [--alimentos 600] [--dias 7] [--repeticiones 10]
+
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+DISTRIBUCION = {'des': 0.25, 'alm': 0.35, 'cena': 0.20}
+
+
+def _desvios(comidas: list, metas) -> tuple:
+    """(desvío medio de kcal en %, desvío medio de % de kcal de CHO/PRO/FAT en puntos)"""
+    desvio_kcal = desvio_macros = 0.0
+    for tiempo, sugerencias in comidas:
+        totales = [0.0, 0.0, 0.0, 0.0]
+        for s in sugerencias:
+            for j, campo in enumerate(('kcal', 'cho', 'pro', 'fat')):
+                totales[j] += float(s['ingrediente'].get(campo, 0) or 0) * s['cantidad_sugerida'] / 100
+        objetivo = metas.calorias_diarias * DISTRIBUCION[tiempo]
+        desvio_kcal += abs(totales[0] - objetivo) / objetivo * 100
+        if totales[0] > 0:
+            desvio_macros += (abs(totales[1] * 4 / totales[0] * 100 - metas.carbohidratos_porcentaje)
+                              + abs(totales[2] * 4 / totales[0] * 100 - metas.proteinas_porcentaje)
+                              + abs(totales[3] * 9 / totales[0] * 100 - metas.grasas_porcentaje)) / 3
+    return desvio_kcal / len(comidas), desvio_macros / len(comidas)
+
+
+def simular(funcion_comida, dias: int) -> tuple:
+    from Core.seguimiento_repeticiones import SeguimientoRepeticiones
+    usados = SeguimientoRepeticiones()
+    comidas = []
+    inicio = time.perf_counter()
+    for dia in range(1, dias + 1):
+        for tiempo in DISTRIBUCION:
+            sugerencias = funcion_comida(tiempo, dia, usados)
+            for s in sugerencias:
+                usados.registrar_alimento(s['ingrediente'], dia)
+            comidas.append((tiempo, sugerencias))
+    return time.perf_counter() - inicio, comidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comidas por reglas vs biblioteca de plantillas')
+    parser.add_argument('--alimentos', type=int, default=600)
+    parser.add_argument('--dias', type=int, default=7)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args()
+
+    archivo = Path(tempfile.mkdtemp()) / 'plantillas_comidas.json'
+    os.environ['PLANTILLAS_COMIDAS_ARCHIVO'] = str(archivo)
+
+    from Core.motor_recomendacion import MotorRecomendacion
+    from Core.optimizador_plan import OptimizadorPlan
+    from Core.plantillas_comidas import generar_plantillas, guardar_biblioteca, PERFIL_REFERENCIA
+    from benchmarks.datos_sinteticos import metas_sinteticas, perfil_sintetico
+    from benchmarks.indice_ingredientes import ingredientes_benchmark, _preparar, _tiempo_fijo
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        motor = _preparar(MotorRecomendacion())
+        optimizador = OptimizadorPlan(motor_recomendacion=motor)
+        modelo3 = optimizador._modelo3_disponible()
+    ingredientes = ingredientes_benchmark(args.alimentos)
+    grupos = motor._agrupar_ingredientes(ingredientes)
+    perfil = perfil_sintetico()
+    metas = metas_sinteticas()
+
+    print("=" * 72)
+    print(f"BIBLIOTECA DE PLANTILLAS ({args.alimentos} alimentos, Modelo 3: {'sí' if modelo3 else 'no'})")
+    print("=" * 72)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        plantillas = generar_plantillas(
+            ingredientes,
+            gramos=lambda ingrediente, porciones: 100.0 * porciones,
+            puntuar=(lambda c, x: motor.evaluar_combinaciones_batch(PERFIL_REFERENCIA, c, x)) if modelo3 else None,
+            es_apetitosa=optimizador._es_combinacion_apetitosa,
+            version=grupos.version,
+        )
+        guardar_biblioteca(plantillas, archivo)
+    print(f"generación: {time.perf_counter() - inicio:.2f}s, "
+          + ", ".join(f"{t}: {len(l)}" for t, l in plantillas.items()))
+
+    def por_reglas(tiempo, dia, usados):
+        constructor = {'des': motor._sugerir_desayuno_variado, 'alm': motor._sugerir_almuerzo_variado,
+                       'cena': motor._sugerir_cena_variada}[tiempo]
+        return constructor(grupos, dia, perfil, metas, usados)
+
+    def por_plantilla(tiempo, dia, usados):
+        return motor._sugerir_alimentos_tiempo_variado(
+            tiempo, grupos, dia, perfil, metas, usados,
+            calorias_objetivo=metas.calorias_diarias * DISTRIBUCION[tiempo])
+
+    print()
+    print(f"{'':<12}{'ms/plan':>10}{'desvío kcal %':>16}{'desvío macros pp':>19}")
+    for nombre, funcion in (('reglas', por_reglas), ('plantillas', por_plantilla)):
+        with _tiempo_fijo(), contextlib.redirect_stdout(io.StringIO()):
+            resultados = [simular(funcion, args.dias) for _ in range(args.repeticiones)]
+        segundos = min(r[0] for r in resultados)
+        desvio_kcal, desvio_macros = _desvios(resultados[0][1], metas)
+        print(f"{nombre:<12}{segundos * 1000:>10.2f}{desvio_kcal:>16.1f}{desvio_macros:>19.1f}")
+    usadas = sum(1 for _, s in resultados[0][1] if s and s[0]['motivo'].startswith('Plantilla'))
+    print(f"comidas desde plantilla: {usadas}/{len(resultados[0][1])}")
+
+
+if __name__ == "__main__":
+    main()
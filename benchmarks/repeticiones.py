@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# repeticiones.py
+# Reglas de variedad: {nombre: [días]} vs SeguimientoRepeticiones (máscaras de bits por ingrediente)
+#
+# Simula la generación de un plan sin BD: para cada día y comida se filtran los
+# candidatos de cada grupo con _filtrar_alimentos_por_repeticion, se elige uno
+# (rotando por día, como factor_variedad) y se registra su uso. Se mide el tiempo
+# total de los filtros con el seguimiento actual y, con --referencia, con otra
+# versión de Core/motor_recomendacion.py (historial {nombre: [días]}), p. ej.:
+#   git show <commit>:Core/motor_recomendacion.py > /tmp/motor_anterior.py
+#   python -m benchmarks.repeticiones --referencia /tmp/motor_anterior.py
+# En planes de hasta 7 días ambos deben elegir exactamente lo mismo; en planes
+# más largos los límites ahora son por semana.
+#
+# Uso: python -m benchmarks.repeticiones [--alimentos 600] [--repeticiones 20] [--referencia RUTA]
+
+import io
+import sys
+import time
+import argparse
+import contextlib
+import importlib.util
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+
+def _cargar_referencia(ruta: str):
+    spec = importlib.util.spec_from_file_location('motor_referencia', ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(modulo)
+    return modulo.MotorRecomendacion
+
+
+def simular(motor, grupos: dict, dias: int, nuevo_seguimiento, registrar) -> tuple:
+    """(segundos en filtros, elecciones [(día, comida, grupo, nombre)])"""
+    from benchmarks.datos_sinteticos import GRUPOS_POR_COMIDA
+    usados = nuevo_seguimiento()
+    elecciones = []
+    segundos = 0.0
+    for dia in range(1, dias + 1):
+        elegidos_dia = []
+        for tiempo, grupos_comida in GRUPOS_POR_COMIDA.items():
+            for indice, grupo in enumerate(grupos_comida):
+                candidatos = grupos[grupo]
+                inicio = time.perf_counter()
+                filtrados = motor._filtrar_alimentos_por_repeticion(
+                    candidatos, usados, dia, 3, 2, grupo_alimento=grupo,
+                    max_repeticiones_proteinas=2, dias_minimos_entre_proteinas=3
+                ) or candidatos
+                segundos += time.perf_counter() - inicio
+                elegido = filtrados[(dia + indice) % len(filtrados)]
+                elecciones.append((dia, tiempo, grupo, elegido['nombre']))
+                elegidos_dia.append(elegido)
+        for alimento in elegidos_dia:  # Como generar_plan_semanal: se registra al terminar el día
+            registrar(usados, alimento, dia)
+    return segundos, elecciones
+
+
+def _mejor_de(repeticiones: int, funcion) -> tuple:
+    """Mínimo tiempo de `repeticiones` simulaciones (las elecciones son deterministas)"""
+    resultados = [funcion() for _ in range(repeticiones)]
+    return min(r[0] for r in resultados), resultados[0][1]
+
+
+def _registrar_dict(usados: dict, alimento: dict, dia: int) -> None:
+    usados.setdefault(alimento['nombre'], []).append(dia)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reglas de variedad: historial por nombre vs máscaras de bits')
+    parser.add_argument('--alimentos', type=int, default=600)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--referencia', help='motor_recomendacion.py de otra versión (historial {nombre: [días]})')
+    args = parser.parse_args()
+
+    from Core.motor_recomendacion import MotorRecomendacion
+    from Core.seguimiento_repeticiones import SeguimientoRepeticiones
+    from benchmarks.datos_sinteticos import alimentos_sinteticos, grupos_sinteticos
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        motor = MotorRecomendacion()
+        referencia = _cargar_referencia(args.referencia)() if args.referencia else None
+    grupos = grupos_sinteticos(alimentos_sinteticos(args.alimentos))
+
+    print("=" * 72)
+    print(f"FILTROS DE REPETICIÓN ({args.alimentos} alimentos, ms por plan)")
+    print("=" * 72)
+    print(f"{'días':>6}{'referencia':>14}{'actual':>12}{'aceleración':>14}{'mismas elecciones':>20}")
+    for dias in (7, 14, 28):
+        t_actual, elecciones = _mejor_de(args.repeticiones, lambda: simular(
+            motor, grupos, dias, SeguimientoRepeticiones,
+            lambda usados, alimento, dia: usados.registrar_alimento(alimento, dia)))
+        if referencia is None:
+            print(f"{dias:>6}{'-':>14}{t_actual * 1000:>12.2f}")
+            continue
+        t_referencia, elecciones_ref = _mejor_de(args.repeticiones, lambda: simular(
+            referencia, grupos, dias, dict, _registrar_dict))
+        iguales = 'sí' if elecciones == elecciones_ref else ('no (límites por semana)' if dias > 7 else 'NO')
+        print(f"{dias:>6}{t_referencia * 1000:>14.2f}{t_actual * 1000:>12.2f}"
+              f"{t_referencia / t_actual:>13.2f}x{iguales:>20}")
+
+
+if __name__ == "__main__":
+    main()
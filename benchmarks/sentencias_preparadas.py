@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# sentencias_preparadas.py
+# Consultas calientes en tres modos:
+#   - ad hoc: prepare=False, parse + plan en cada llamada,
+#   - psycopg: prepare=None (lo de siempre), psycopg la prepara sola en cada
+#     conexión a partir de la ejecución prepare_threshold (5),
+#   - registro: ejecutar_sentencia de Core/bd_conexion.py, preparada en el
+#     servidor desde la primera llamada de cada conexión (prepare=True).
+#
+# Necesita PostgreSQL (DATABASE_URL o PG*), pero no toca las tablas reales: se
+# crean en un esquema propio que se borra al terminar (pacientes sintéticos de
+# benchmarks/perfil_paciente.py, roles, límites de la clínica). Se mide:
+#   - ms por llamada de cada consulta en una conexión ya caliente,
+#   - ms de las primeras --primeras llamadas en conexiones recién abiertas
+#     (lo único en lo que registro puede diferir de psycopg por defecto),
+#   - el "Planning Time" del servidor para la versión ad hoc,
+#   - ms por petición en rutas que repiten estas consultas.
+# Las de roles y límites son las mismas que registra main.py.
+#
+# Resultados con PostgreSQL 16.2 (ms por llamada; registro = prepare=True):
+#
+#   consulta                      ad hoc  psycopg  registro  planning
+#   socket local (RTT ~0), 500 llamadas en caliente, 5 primeras x 50 conexiones:
+#   roles_usuario      caliente    0.203    0.047     0.055     0.233
+#                      primeras    0.490    0.485     0.484
+#   limites_clinica    caliente    0.076    0.057     0.053     0.105
+#                      primeras    0.298    0.293     0.287
+#   perfil_paciente    caliente    1.043    0.264     0.228     1.255
+#                      primeras    1.664    1.708     1.892
+#   ingredientes_plan  caliente    0.610    0.512     0.515     0.186
+#                      primeras    0.696    0.978     0.817
+#   proxy TCP con 20 ms de RTT, 50 llamadas en caliente, 5 primeras x 10 conexiones:
+#   roles_usuario      caliente   21.691   21.435    21.664
+#                      primeras   22.256   23.151    26.566
+#   perfil_paciente    caliente   23.211   22.296    22.611
+#                      primeras   24.385   24.969    28.516
+#
+# En caliente registro rinde como psycopg (ambas preparadas) y hasta 4x menos
+# que ad hoc en perfil_paciente, cuyo plan cuesta ~1.2 ms. Lo que se paga es la
+# ida y vuelta del Parse en la primera llamada de cada conexión (~20 ms una vez,
+# +4 ms de media en las 5 primeras con RTT real); las conexiones del pool viven
+# hasta una hora, así que se amortiza. Una alternativa probada y descartada fue
+# PREPARE en el configure del pool y EXECUTE nombre(...) en cada llamada: evita
+# esa ida y vuelta pero los parámetros de EXECUTE van como literales (el
+# servidor no les infiere tipo) y cada llamada caliente cuesta 0.05-0.15 ms más.
+#
+# Uso: python -m benchmarks.sentencias_preparadas [--pacientes 200] [--llamadas 500]
+#          [--conexiones 50] [--primeras 5]
+
+import io
+import sys
+import time
+import random
+import argparse
+import contextlib
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+ESQUEMA = "benchmark_preparadas"
+
+TABLAS_EXTRA = """
+    ALTER TABLE ingrediente ADD COLUMN kcal numeric, ADD COLUMN cho numeric, ADD COLUMN pro numeric,
+        ADD COLUMN fat numeric, ADD COLUMN fibra numeric, ADD COLUMN porcion_base numeric DEFAULT 100,
+        ADD COLUMN unidad_base text DEFAULT 'g', ADD COLUMN ig numeric, ADD COLUMN activo boolean DEFAULT TRUE;
+    CREATE TABLE rol (id serial PRIMARY KEY, nombre text);
+    CREATE TABLE usuario_rol (usuario_id int, rol_id int, PRIMARY KEY (usuario_id, rol_id));
+    CREATE TABLE config_clinica (org_id text PRIMARY KEY, limites_json jsonb);
+    INSERT INTO rol (nombre) VALUES ('admin'), ('nutricionista'), ('paciente');
+    INSERT INTO usuario_rol SELECT u, 1 + u % 3 FROM generate_series(1, 500) u;
+    INSERT INTO config_clinica VALUES ('default', '{"peso": [20, 300], "hba1c": [3, 20]}');
+    ANALYZE;
+"""
+
+SQL_ROLES = """
+    SELECT r.nombre
+    FROM usuario_rol ur
+    JOIN rol r ON r.id = ur.rol_id
+    WHERE ur.usuario_id = %s
+"""
+SQL_LIMITES = "SELECT limites_json FROM config_clinica WHERE org_id=%s"
+
+MODOS = ('ad hoc', 'psycopg', 'registro')
+PREPARE = {'ad hoc': False, 'psycopg': None}
+
+# Rutas de petición: qué consultas repiten (el decorador de auth pide los roles)
+RUTAS = {
+    'petición autenticada': ('roles_usuario',),
+    'generar plan': ('roles_usuario', 'perfil_paciente'),
+    'guardar plan': ('roles_usuario', 'ingredientes_plan'),
+    'guardar paciente': ('roles_usuario', 'limites_clinica'),
+}
+
+
+def _parametros(azar, pacientes: int) -> dict:
+    """Generadores de parámetros para cada consulta"""
+    return {
+        'roles_usuario': lambda: (azar.randint(1, 500),),
+        'limites_clinica': lambda: ('default',),
+        'perfil_paciente': lambda: (azar.randint(1, pacientes),),
+        'ingredientes_plan': lambda: (sorted(azar.sample(range(1, 301), 10)),
+                                      sorted(f"ingrediente_{i}" for i in azar.sample(range(1, 301), 10))),
+    }
+
+
+def _ejecutar(cur, modo: str, nombre: str, params: tuple):
+    from Core.bd_conexion import _sentencias, ejecutar_sentencia
+    if modo == 'registro':
+        ejecutar_sentencia(cur, nombre, params)
+    else:
+        cur.execute(_sentencias[nombre].sql, params, prepare=PREPARE[modo])
+    cur.fetchall()
+
+
+def _conectar(conninfo: str):
+    import psycopg
+    return psycopg.connect(conninfo, autocommit=True, options=f"-c search_path={ESQUEMA}")
+
+
+def _tiempo_planificacion(conn, sql: str, params: tuple) -> float:
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params, prepare=False)
+        return float(cur.fetchone()[0][0]["Planning Time"])
+
+
+def _caliente(conninfo: str, modo: str, nombre: str, parametros, llamadas: int) -> float:
+    """ms por llamada en una conexión que ya pasó el umbral de psycopg"""
+    with _conectar(conninfo) as conn, conn.cursor() as cur:
+        for _ in range(10):
+            _ejecutar(cur, modo, nombre, parametros())
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            _ejecutar(cur, modo, nombre, parametros())
+        return (time.perf_counter() - inicio) / llamadas * 1000
+
+
+def _primeras(conninfo: str, modo: str, nombre: str, parametros, conexiones: int, llamadas: int) -> float:
+    """ms medios de las primeras `llamadas` en conexiones recién abiertas"""
+    total = 0.0
+    for _ in range(conexiones):
+        with _conectar(conninfo) as conn, conn.cursor() as cur:
+            inicio = time.perf_counter()
+            for _ in range(llamadas):
+                _ejecutar(cur, modo, nombre, parametros())
+            total += time.perf_counter() - inicio
+    return total / (conexiones * llamadas) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consultas calientes: ad hoc vs psycopg por defecto vs sentencias con nombre')
+    parser.add_argument('--pacientes', type=int, default=200)
+    parser.add_argument('--llamadas', type=int, default=500)
+    parser.add_argument('--conexiones', type=int, default=50)
+    parser.add_argument('--primeras', type=int, default=5)
+    args = parser.parse_args()
+
+    import psycopg
+    with contextlib.redirect_stdout(io.StringIO()):
+        from Core.bd_conexion import CONNINFO, registrar_sentencia, _sentencias
+        import Core.guardado_plan  # noqa: F401  registra ingredientes_plan
+        import Core.perfil_paciente  # noqa: F401  registra perfil_paciente
+    from benchmarks.perfil_paciente import TABLAS, poblar
+    registrar_sentencia("roles_usuario", SQL_ROLES)
+    registrar_sentencia("limites_clinica", SQL_LIMITES)
+
+    with psycopg.connect(CONNINFO, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE")
+        conn.execute(f"CREATE SCHEMA {ESQUEMA}")
+    try:
+        with _conectar(CONNINFO) as conn:
+            with conn.transaction(), conn.cursor() as cur:
+                cur.execute(TABLAS.replace("CREATE TEMP TABLE", "CREATE TABLE"))
+                poblar(cur, args.pacientes)
+                cur.execute(TABLAS_EXTRA)
+
+            print("=" * 78)
+            print(f"SENTENCIAS PREPARADAS ({args.pacientes} pacientes, {args.llamadas} llamadas en caliente, "
+                  f"{args.primeras} primeras x {args.conexiones} conexiones)")
+            print("=" * 78)
+            print(f"{'consulta':<20}{'':<10}" + "".join(f"{m:>11}" for m in MODOS) + f"{'planning':>11}")
+            por_llamada = {}
+            for nombre in _parametros(random.Random(0), args.pacientes):
+                caliente = {m: _caliente(CONNINFO, m, nombre, _parametros(random.Random(1), args.pacientes)[nombre],
+                                         args.llamadas) for m in MODOS}
+                primeras = {m: _primeras(CONNINFO, m, nombre, _parametros(random.Random(1), args.pacientes)[nombre],
+                                         args.conexiones, args.primeras) for m in MODOS}
+                planning = _tiempo_planificacion(conn, _sentencias[nombre].sql,
+                                                 _parametros(random.Random(2), args.pacientes)[nombre]())
+                por_llamada[nombre] = caliente
+                print(f"{nombre:<20}{'caliente':<10}" + "".join(f"{caliente[m]:>11.3f}" for m in MODOS)
+                      + f"{planning:>11.3f}")
+                print(f"{'':<20}{'primeras':<10}" + "".join(f"{primeras[m]:>11.3f}" for m in MODOS))
+
+            print()
+            print(f"{'ruta (caliente)':<24}" + "".join(f"{m:>11}" for m in MODOS))
+            for ruta, consultas in RUTAS.items():
+                print(f"{ruta:<24}" + "".join(f"{sum(por_llamada[c][m] for c in consultas):>11.3f}" for m in MODOS))
+    finally:
+        with psycopg.connect(CONNINFO, autocommit=True) as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE")
+
+
+if __name__ == "__main__":
+    main()
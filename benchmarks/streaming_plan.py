@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# streaming_plan.py
+# Tiempo hasta el primer día: generar_plan_semanal_completo (todo el plan y luego
+# la respuesta) vs generar_plan_semanal_stream (un evento por día generado y
+# optimizado, ver /api/recomendacion/generar/stream)
+#
+# Sin BD: el perfil, las metas y los ingredientes son los sintéticos de
+# benchmarks/datos_sinteticos.py e indice_ingredientes.py (reemplazados en la
+# instancia del motor), la caché de planes se desactiva y no se consulta la
+# firma del catálogo. Se verifica además que ambos caminos den el mismo plan con
+# la misma semilla.
+#
+# Uso: python -m benchmarks.streaming_plan [--alimentos 600] [--dias 7] [--repeticiones 3]
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+
+def _motor_sin_bd(ingredientes: list):
+    from Core.motor_recomendacion import MotorRecomendacion
+    from benchmarks.datos_sinteticos import metas_sinteticas, perfil_sintetico
+    from benchmarks.indice_ingredientes import _preparar
+
+    motor = _preparar(MotorRecomendacion())
+    motor.obtener_perfil_paciente = lambda paciente_id: perfil_sintetico(paciente_id)
+    motor.calcular_metas_nutricionales = lambda perfil, configuracion=None, skip_ml_ajuste=False: metas_sinteticas()
+    motor.obtener_ingredientes_recomendados = lambda perfil, metas, filtros=None: [dict(a) for a in ingredientes]
+    return motor
+
+
+def completo(ingredientes: list, dias: int) -> tuple:
+    motor = _motor_sin_bd(ingredientes)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = motor.generar_plan_semanal_completo(1, dias=dias, semilla=7)
+    total = time.perf_counter() - inicio
+    return total, total, resultado
+
+
+def stream(ingredientes: list, dias: int) -> tuple:
+    motor = _motor_sin_bd(ingredientes)
+    inicio = time.perf_counter()
+    primer_dia = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for tipo, datos in motor.generar_plan_semanal_stream(1, dias=dias, semilla=7):
+            if tipo == 'dia' and primer_dia is None:
+                primer_dia = time.perf_counter() - inicio
+            if tipo == 'fin':
+                resultado = datos
+    return primer_dia, time.perf_counter() - inicio, resultado
+
+
+def _firma(resultado: dict) -> str:
+    return json.dumps({'plan': resultado['plan_semanal'], 'resumen': resultado['resumen_semanal']},
+                      sort_keys=True, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tiempo hasta el primer día: plan completo vs streaming')
+    parser.add_argument('--alimentos', type=int, default=600)
+    parser.add_argument('--dias', type=int, default=7)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ['CACHE_PLANES'] = '0'
+    os.environ['CATALOGO_VERIFICACION_SEG'] = '1e12'  # sin BD: no consultar la firma del catálogo
+    from benchmarks.indice_ingredientes import ingredientes_benchmark
+    ingredientes = ingredientes_benchmark(args.alimentos)
+
+    print("=" * 72)
+    print(f"STREAMING DEL PLAN ({args.alimentos} alimentos, {args.dias} días, mejor de {args.repeticiones})")
+    print("=" * 72)
+    print(f"{'':<12}{'primer día (s)':>16}{'total (s)':>12}")
+    firmas = {}
+    for nombre, funcion in (('completo', completo), ('streaming', stream)):
+        resultados = [funcion(ingredientes, args.dias) for _ in range(args.repeticiones)]
+        primero = min(r[0] for r in resultados)
+        total = min(r[1] for r in resultados)
+        firmas[nombre] = _firma(resultados[0][2])
+        print(f"{nombre:<12}{primero:>16.3f}{total:>12.3f}")
+    print(f"mismo plan: {'sí' if firmas['completo'] == firmas['streaming'] else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# warmup_primera_peticion.py
+# Latencia de la primera petición de un worker con y sin precarga en el maestro
+#
+# Simula el ciclo de gunicorn: un proceso "maestro" (con precarga importa main,
+# las librerías ML y los modelos; sin precarga no hace nada) hace fork y el
+# "worker" mide su arranque y su primera petición ML (scores del Modelo 2 y
+# respuesta glucémica del Modelo 1 sobre alimentos sintéticos). Cada medición
+# corre en un intérprete nuevo para que las importaciones empiecen en frío.
+#
+# Uso: python -m benchmarks.warmup_primera_peticion [--repeticiones 3] [--alimentos 200]
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODOS = ['sin_precarga', 'con_precarga']
+
+
+def _primera_peticion(n_alimentos: int) -> float:
+    from Core.motor_recomendacion import MotorRecomendacion
+    from benchmarks.datos_sinteticos import perfil_sintetico, alimentos_sinteticos, necesidades_sinteticas
+
+    perfil = perfil_sintetico()
+    alimentos = alimentos_sinteticos(n_alimentos)
+    inicio = time.perf_counter()
+    motor = MotorRecomendacion()
+    motor.calcular_score_idoneidad_alimentos_batch(perfil, alimentos, necesidades_sinteticas())
+    motor.predecir_respuesta_glucemica_batch(perfil, alimentos, {'tiempo_comida': 'alm', 'hora': 13})
+    return time.perf_counter() - inicio
+
+
+def _medir(modo: str, n_alimentos: int) -> dict:
+    """Se ejecuta en un intérprete nuevo: maestro -> fork -> worker"""
+    resultado = {'modo': modo}
+    if modo == 'con_precarga':
+        inicio = time.perf_counter()
+        import main  # noqa: F401  (igual que preload_app)
+        from Core.precarga import precargar_aplicacion
+        from Core.bd_conexion import cerrar_pool
+        precargar_aplicacion()
+        cerrar_pool()
+        resultado['maestro_s'] = time.perf_counter() - inicio
+
+    lectura, escritura = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(lectura)
+        datos = {}
+        try:
+            inicio = time.perf_counter()
+            import main  # noqa: F401  (sin precarga el worker importa la app)
+            if modo == 'con_precarga':
+                from Core.bd_conexion import reabrir_pool
+                reabrir_pool()
+            datos['arranque_worker_s'] = time.perf_counter() - inicio
+            datos['primera_peticion_s'] = _primera_peticion(n_alimentos)
+            datos['segunda_peticion_s'] = _primera_peticion(n_alimentos)
+        except Exception as e:
+            datos['error'] = str(e)
+        os.write(escritura, json.dumps(datos).encode())
+        os.close(escritura)
+        os._exit(0)
+
+    os.close(escritura)
+    crudo = b''
+    while True:
+        bloque = os.read(lectura, 65536)
+        if not bloque:
+            break
+        crudo += bloque
+    os.waitpid(pid, 0)
+    resultado.update(json.loads(crudo or b'{}'))
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la primera petición con/sin precarga')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--alimentos', type=int, default=200)
+    parser.add_argument('--modo', choices=MODOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        print("[WARN]  Este benchmark requiere os.fork (Linux/macOS), igual que gunicorn")
+        return
+
+    if args.modo:
+        # Proceso hijo del benchmark: imprimir solo el resultado en la última línea
+        print(json.dumps(_medir(args.modo, args.alimentos)))
+        return
+
+    resultados = {modo: [] for modo in MODOS}
+    for _ in range(args.repeticiones):
+        for modo in MODOS:
+            proc = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.warmup_primera_peticion',
+                 '--modo', modo, '--alimentos', str(args.alimentos)],
+                capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            )
+            lineas = [l for l in proc.stdout.strip().splitlines() if l.startswith('{')]
+            if not lineas:
+                print(f"[WARN]  Fallo en modo {modo}:\n{proc.stderr[-2000:]}")
+                continue
+            resultados[modo].append(json.loads(lineas[-1]))
+
+    print("=" * 80)
+    print(f"PRIMERA PETICIÓN POR WORKER ({args.alimentos} alimentos, {args.repeticiones} repeticiones)")
+    print("=" * 80)
+    for modo in MODOS:
+        filas = [r for r in resultados[modo] if 'error' not in r]
+        if not filas:
+            errores = [r.get('error') for r in resultados[modo]]
+            print(f"{modo:<14} sin datos {errores}")
+            continue
+        def _media(clave):
+            valores = [r[clave] for r in filas if clave in r]
+            return sum(valores) / len(valores) if valores else 0.0
+        print(f"{modo:<14} maestro {_media('maestro_s'):7.3f}s | arranque worker "
+              f"{_media('arranque_worker_s'):7.3f}s | 1ª petición {_media('primera_peticion_s') * 1000:9.1f} ms | "
+              f"2ª petición {_media('segunda_peticion_s') * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
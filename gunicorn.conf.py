@@ -0,0 +1,53 @@
+# gunicorn.conf.py
+# Configuración de gunicorn (Procfile: gunicorn -c gunicorn.conf.py main:app)
+#
+# Con GUNICORN_PRELOAD=1 (por defecto) la app, las librerías ML y los cuatro
+# modelos se cargan una vez en el maestro y los workers los comparten por fork.
+# El pool de PostgreSQL que abre Core/bd_conexion.py al importarse se cierra en
+# el maestro antes de crear workers y cada worker abre el suyo en post_fork.
+#
+# El vigilante de modelos (Core/vigilante_modelos.py) y los trabajadores de la
+# cola de planes (Core/cola_planes.py) arrancan solo en post_fork, con o sin
+# precarga: el maestro no tiene threads propios al hacer fork ni reclama trabajos.
+
+import os
+
+# Workers con hilos: una espera de long-polling de la cola (hasta 25 s) o el
+# streaming de un plan ocupan un hilo, no el worker entero
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+if worker_class == "sync":
+    # gunicorn pasa a gthread si threads > 1. Con sync cada espera bloquearía el
+    # proceso: esperas cortas (el cliente vuelve a preguntar)
+    threads = 1
+    os.environ.setdefault("COLA_PLANES_ESPERA_MAX_SEG", "2")
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+# Construir también la matriz del catálogo de ingredientes en el maestro
+precargar_catalogo = os.getenv("GUNICORN_PRELOAD_CATALOGO", "0") == "1"
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    from Core.precarga import precargar_aplicacion
+    from Core.bd_conexion import cerrar_pool
+    from Core.vigilante_modelos import detener_vigilante
+    try:
+        precargar_aplicacion(incluir_catalogo=precargar_catalogo)
+    except Exception as e:
+        server.log.warning(f"Precarga de modelos fallida (se cargarán bajo demanda): {e}")
+    # Las conexiones y threads no sobreviven al fork. El vigilante ya no arranca
+    # al importar main; si algo lo inició en el maestro, se espera a su thread
+    detener_vigilante()
+    cerrar_pool()
+
+
+def post_fork(server, worker):
+    from Core.cola_planes import iniciar_trabajadores
+    from Core.vigilante_modelos import iniciar_vigilante
+    if server.cfg.preload_app:
+        from Core.bd_conexion import reabrir_pool
+        reabrir_pool()
+    iniciar_vigilante()
+    iniciar_trabajadores()
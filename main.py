@@ -5,7 +5,7 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context
 from dotenv import load_dotenv
 from urllib.parse import urlencode
 import os
@@ -18,7 +18,16 @@ from decimal import Decimal, InvalidOperation
 from datetime import date
 import traceback
 
-from Core.bd_conexion import fetch_one, fetch_all, execute
+from Core.bd_conexion import (
+    fetch_one, fetch_all, execute, run_transaction,
+    registrar_sentencia, fetch_one_prepared, fetch_all_prepared,
+)
+from Core.cache_ingredientes import invalidar_paciente
+from Core.cache_planes import invalidar_planes_paciente
+from Core.catalogo_ingredientes import invalidar_catalogo
+from Core.guardado_plan import guardar_plan
+from Core.vigilante_modelos import iniciar_vigilante
+from Core.cola_planes import iniciar_trabajadores
 from Core.motor_recomendacion import MotorRecomendacion
 from Core.motor_recomendacion_basico import MotorRecomendacionBasico
 from utils.envio_email import enviar_token_activacion
@@ -34,6 +43,12 @@ app = Flask(__name__, template_folder="templates", static_folder="static")
 app.secret_key = os.getenv("FLASK_SECRET", "cambia-esto-en-.env")
 app.permanent_session_lifetime = timedelta(minutes=5)
 
+# Ni el vigilante de modelos (recarga en caliente, un thread por proceso) ni los
+# trabajadores de la cola de planes arrancan al importar: el maestro de gunicorn
+# haría fork con sus threads vivos y un script tomaría trabajos de la cola.
+# Arrancan en post_fork (gunicorn.conf.py), en __main__ más abajo o, la cola,
+# con `python -m Core.cola_planes`
+
 def build_activation_link(dni: str, token: str) -> str:
     base = url_for("activar", _external=True)
     return f"{base}?{urlencode({'dni': dni, 'token': token})}"
@@ -110,13 +125,17 @@ def paciente_required(view_func):
     return wrapper
 
 
+# Se consulta en cada petición (decoradores de auth): sentencia con nombre
+registrar_sentencia("roles_usuario", """
+    SELECT r.nombre
+    FROM usuario_rol ur
+    JOIN rol r ON r.id = ur.rol_id
+    WHERE ur.usuario_id = %s
+""")
+
+
 def get_user_roles(user_id: int) -> list[str]:
-    rows = fetch_all("""
-        SELECT r.nombre
-        FROM usuario_rol ur
-        JOIN rol r ON r.id = ur.rol_id
-        WHERE ur.usuario_id = %s
-    """, (user_id,))
+    rows = fetch_all_prepared("roles_usuario", (user_id,))
     return [r[0] for r in rows] if rows else []
 
 
@@ -266,20 +285,17 @@ def api_planes_crear():
             if metas_nutricionales['grasas_porcentaje']:
                 metas_nutricionales['grasas_g'] = round((kcal * float(metas_nutricionales['grasas_porcentaje']) / 100) / 9, 1)
         
-        # Crear el plan en la base de datos
+        # Crear el plan con sus comidas y alimentos en una sola transacción
         user_id = session.get('user_id')
-        plan_id = fetch_one("""
-            INSERT INTO plan (paciente_id, metas_json, fecha_ini, fecha_fin, estado, creado_por, version_modelo)
-            VALUES (%s, %s, %s, %s, %s, %s, 'motor_recomendacion_v1')
-            RETURNING id
-        """, (
+        plan_id, _ = guardar_plan(
             paciente_id,
             json.dumps(metas_nutricionales),
             fecha_inicio,
             fecha_fin,
             estado,
-            user_id
-        ))[0]
+            user_id,
+            plan
+        )
         
         # Hook de aprendizaje continuo (opcional, no afecta si falla)
         try:
@@ -288,181 +304,6 @@ def api_planes_crear():
         except:
             pass  # Silenciosamente ignorar si no está disponible
         
-        # Mapeo de nombres de comidas a códigos
-        tiempo_map = {
-            'desayuno': 'des',
-            'media_manana': 'mm',
-            'almuerzo': 'alm',
-            'media_tarde': 'mt',
-            'cena': 'cena'
-        }
-        
-        # Procesar todas las semanas y días del plan
-        semanas = plan.get('semanas', [])
-        for semana in semanas:
-            dias = semana.get('dias', [])
-            for dia_data in dias:
-                dia_fecha_str = dia_data.get('fecha')
-                if not dia_fecha_str:
-                    continue
-                
-                try:
-                    dia_fecha = datetime.strptime(dia_fecha_str, '%Y-%m-%d').date()
-                except:
-                    continue
-                
-                comidas = dia_data.get('comidas', {})
-                
-                # Procesar cada comida del día
-                for comida_nombre, comida_data in comidas.items():
-                    tiempo_codigo = tiempo_map.get(comida_nombre)
-                    if not tiempo_codigo:
-                        continue
-                    
-                    alimentos = comida_data.get('alimentos', [])
-                    if not alimentos:
-                        continue
-                    
-                    # Crear detalle del plan (comida)
-                    detalle_id = fetch_one("""
-                        INSERT INTO plan_detalle (plan_id, dia, tiempo)
-                        VALUES (%s, %s, %s)
-                        RETURNING id
-                    """, (plan_id, dia_fecha, tiempo_codigo))[0]
-                    
-                    # Insertar cada alimento
-                    for alimento in alimentos:
-                        # Intentar obtener ingrediente_id directamente (más confiable)
-                        ingrediente_id = alimento.get('ingrediente_id')
-                        ingrediente_nombre = alimento.get('nombre') or alimento.get('ingrediente', {}).get('nombre')
-                        
-                        # Si no hay ID, buscar por nombre
-                        if not ingrediente_id:
-                            if not ingrediente_nombre:
-                                print(f"⚠️ Alimento sin nombre ni ID: {alimento}")
-                                continue
-                            
-                            # Buscar ingrediente por nombre
-                            ingrediente_row = fetch_one("""
-                                SELECT id, kcal, cho, pro, fat, fibra, porcion_base, unidad_base, ig
-                                FROM ingrediente 
-                                WHERE nombre = %s AND activo = TRUE 
-                                LIMIT 1
-                            """, (ingrediente_nombre,))
-                            
-                            if not ingrediente_row:
-                                print(f"⚠️ Ingrediente no encontrado: {ingrediente_nombre}")
-                                continue
-                            
-                            ingrediente_id = ingrediente_row[0]
-                            ingrediente_kcal_100g = float(ingrediente_row[1] or 0)
-                            ingrediente_cho_100g = float(ingrediente_row[2] or 0)
-                            ingrediente_pro_100g = float(ingrediente_row[3] or 0)
-                            ingrediente_fat_100g = float(ingrediente_row[4] or 0)
-                            ingrediente_fibra_100g = float(ingrediente_row[5] or 0)
-                            ingrediente_ig = float(ingrediente_row[8] or 0)
-                            porcion_base = float(ingrediente_row[6] or 100)
-                            unidad_base = ingrediente_row[7] or 'g'
-                        else:
-                            # Si tenemos el ID, obtener datos del ingrediente
-                            ingrediente_row = fetch_one("""
-                                SELECT id, kcal, cho, pro, fat, fibra, porcion_base, unidad_base, ig
-                                FROM ingrediente 
-                                WHERE id = %s AND activo = TRUE 
-                                LIMIT 1
-                            """, (ingrediente_id,))
-                            
-                            if not ingrediente_row:
-                                print(f"⚠️ Ingrediente con ID {ingrediente_id} no encontrado")
-                                continue
-                            
-                            ingrediente_kcal_100g = float(ingrediente_row[1] or 0)
-                            ingrediente_cho_100g = float(ingrediente_row[2] or 0)
-                            ingrediente_pro_100g = float(ingrediente_row[3] or 0)
-                            ingrediente_fat_100g = float(ingrediente_row[4] or 0)
-                            ingrediente_fibra_100g = float(ingrediente_row[5] or 0)
-                            ingrediente_ig = float(ingrediente_row[8] or 0)
-                            porcion_base = float(ingrediente_row[6] or 100)
-                            unidad_base = ingrediente_row[7] or 'g'
-                        
-                        # Extraer cantidad y unidad
-                        cantidad = alimento.get('cantidad_num')  # Intentar obtener número directamente
-                        cantidad_str = alimento.get('cantidad', '')
-                        unidad = alimento.get('unidad') or unidad_base
-                        
-                        if cantidad is None and cantidad_str:
-                            # Extraer número y unidad (ej: "120g" -> 120, "g")
-                            match = re.match(r'(\d+\.?\d*)\s*(\w*)', str(cantidad_str))
-                            if match:
-                                cantidad = float(match.group(1))
-                                unidad = match.group(2) or unidad_base
-                        
-                        # Si no hay cantidad, usar porción base por defecto
-                        if not cantidad:
-                            cantidad = porcion_base
-                        
-                        # Valores nutricionales del alimento (del objeto o calcular desde ingrediente)
-                        kcal = alimento.get('kcal')
-                        cho = alimento.get('cho')
-                        pro = alimento.get('pro')
-                        fat = alimento.get('fat')
-                        fibra = alimento.get('fibra')
-                        
-                        # Calcular valores nutricionales basados en la cantidad si no están presentes o son 0
-                        factor = cantidad / 100.0  # Factor de conversión
-                        
-                        # Calcular cada valor si no está presente o es 0
-                        if kcal is None or kcal == 0:
-                            kcal = ingrediente_kcal_100g * factor
-                        else:
-                            kcal = float(kcal or 0)
-                            
-                        if cho is None or cho == 0:
-                            cho = ingrediente_cho_100g * factor
-                        else:
-                            cho = float(cho or 0)
-                            
-                        if pro is None or pro == 0:
-                            pro = ingrediente_pro_100g * factor
-                        else:
-                            pro = float(pro or 0)
-                            
-                        if fat is None or fat == 0:
-                            fat = ingrediente_fat_100g * factor
-                        else:
-                            fat = float(fat or 0)
-                            
-                        if fibra is None or fibra == 0:
-                            fibra = ingrediente_fibra_100g * factor
-                        else:
-                            fibra = float(fibra or 0)
-                        
-                        # Calcular CG (carbohidratos glucémicos) si hay IG
-                        cg = None
-                        if cho and ingrediente_ig:
-                            cg = round(cho * (ingrediente_ig / 100.0), 2)
-                        elif cho:
-                            cg = round(cho, 2)  # Aproximación si no hay IG
-                        
-                        # Insertar alimento en el plan
-                        execute("""
-                            INSERT INTO plan_alimento (plan_detalle_id, ingrediente_id, cantidad, unidad, kcal, cho, pro, fat, fibra, cg)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (
-                            detalle_id,
-                            ingrediente_id,
-                            cantidad,
-                            unidad,
-                            round(kcal, 2),
-                            round(cho, 2),
-                            round(pro, 2),
-                            round(fat, 2),
-                            round(fibra, 2),
-                            cg
-                        ))
-                        
-                        print(f"✅ Alimento guardado: {ingrediente_nombre or 'ID ' + str(ingrediente_id)} - {cantidad}{unidad}")
-        
         detalle_url = url_for('admin_plan_ver', pid=plan_id)
         return jsonify({
             'id': plan_id,
@@ -2165,123 +2006,130 @@ def admin_paciente_guardar():
     ensure_preregistro(dni, nombres, apellidos, telefono, email)
     usuario_id = get_or_create_user_with_paciente_role(email) if email else None
 
-    # 1️⃣ Buscar paciente existente o crear uno nuevo
-    paciente_existente = None
-    if dni:
-        paciente_existente = fetch_one("""
-            SELECT id FROM paciente WHERE dni=%s LIMIT 1
-        """, (dni,))
-    elif usuario_id:
-        paciente_existente = fetch_one("""
-            SELECT id FROM paciente WHERE usuario_id=%s LIMIT 1
-        """, (usuario_id,))
-    
-    if paciente_existente:
-        # Paciente existe: actualizar datos básicos y agregar registros históricos
-        pid = paciente_existente[0]
-        execute("""
-            UPDATE paciente
-               SET usuario_id=COALESCE(%s, usuario_id), 
-                   sexo=COALESCE(%s, sexo), 
-                   fecha_nac=COALESCE(%s, fecha_nac), 
-                   telefono=COALESCE(%s, telefono), 
-                   actualizado_en=NOW()
-             WHERE id=%s
-        """, (usuario_id, sexo, fecha_nac, telefono, pid))
-    else:
-        # Paciente no existe: crear nuevo
-        pid = fetch_one("""
-            INSERT INTO paciente (usuario_id, dni, sexo, fecha_nac, telefono, creado_en, actualizado_en)
-            VALUES (%s,%s,%s,%s,%s,NOW(),NOW())
-            RETURNING id
-        """, (usuario_id, dni, sexo, fecha_nac, telefono))[0]
+    # Paciente, antropometría, clínico, medicamentos y alergias en una sola transacción
+    # (run_transaction la repite completa ante errores SSL o de conexión)
+    def _guardar(tx):
+        # 1️⃣ Buscar paciente existente o crear uno nuevo
+        paciente_existente = None
+        if dni:
+            paciente_existente = tx.fetch_one("""
+                SELECT id FROM paciente WHERE dni=%s LIMIT 1
+            """, (dni,))
+        elif usuario_id:
+            paciente_existente = tx.fetch_one("""
+                SELECT id FROM paciente WHERE usuario_id=%s LIMIT 1
+            """, (usuario_id,))
+    
+        if paciente_existente:
+            # Paciente existe: actualizar datos básicos y agregar registros históricos
+            pid = paciente_existente[0]
+            tx.execute("""
+                UPDATE paciente
+                   SET usuario_id=COALESCE(%s, usuario_id), 
+                       sexo=COALESCE(%s, sexo), 
+                       fecha_nac=COALESCE(%s, fecha_nac), 
+                       telefono=COALESCE(%s, telefono), 
+                       actualizado_en=NOW()
+                 WHERE id=%s
+            """, (usuario_id, sexo, fecha_nac, telefono, pid))
+        else:
+            # Paciente no existe: crear nuevo
+            pid = tx.fetch_one("""
+                INSERT INTO paciente (usuario_id, dni, sexo, fecha_nac, telefono, creado_en, actualizado_en)
+                VALUES (%s,%s,%s,%s,%s,NOW(),NOW())
+                RETURNING id
+            """, (usuario_id, dni, sexo, fecha_nac, telefono))[0]
 
-    # 2️⃣ Insertar nuevo registro de antropometría (historial) si hay datos
-    # Permitir fecha personalizada para seguimiento histórico
-    fecha_medicion = request.form.get("fecha_medicion") or None
-    if fecha_medicion:
-        try:
-            from datetime import datetime
-            fecha_medicion = datetime.strptime(fecha_medicion, '%Y-%m-%d').date()
-        except:
+        # 2️⃣ Insertar nuevo registro de antropometría (historial) si hay datos
+        # Permitir fecha personalizada para seguimiento histórico
+        fecha_medicion = request.form.get("fecha_medicion") or None
+        if fecha_medicion:
+            try:
+                from datetime import datetime
+                fecha_medicion = datetime.strptime(fecha_medicion, '%Y-%m-%d').date()
+            except:
+                fecha_medicion = date.today()
+        else:
             fecha_medicion = date.today()
-    else:
-        fecha_medicion = date.today()
     
-    if any([peso, talla, cc, bf_pct, actividad]):
-        # Verificar si ya existe un registro para esta fecha
-        existe_antropo = fetch_one("""
-            SELECT id FROM antropometria 
-            WHERE paciente_id=%s AND fecha=%s 
-            LIMIT 1
-        """, (pid, fecha_medicion))
+        if any([peso, talla, cc, bf_pct, actividad]):
+            # Verificar si ya existe un registro para esta fecha
+            existe_antropo = tx.fetch_one("""
+                SELECT id FROM antropometria 
+                WHERE paciente_id=%s AND fecha=%s 
+                LIMIT 1
+            """, (pid, fecha_medicion))
         
-        if existe_antropo:
-            # Si ya existe registro para esta fecha, actualizar ese registro
-            execute("""
-                UPDATE antropometria
-                   SET peso=%s, talla=%s, cc=%s, bf_pct=%s, actividad=%s
-                 WHERE id=%s
-            """, (peso, talla, cc, bf_pct, actividad, existe_antropo[0]))
-        else:
-            # Si no existe registro para esta fecha, insertar nuevo (seguimiento histórico)
-            execute("""
-                INSERT INTO antropometria (paciente_id, fecha, peso, talla, cc, bf_pct, actividad)
-                VALUES (%s, %s, %s,%s,%s,%s,%s)
-            """, (pid, fecha_medicion, peso, talla, cc, bf_pct, actividad))
-
-    # 3️⃣ Insertar nuevo registro clínico (historial) si hay datos cuantitativos
-    if any([hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia]):
-        # Verificar si ya existe un registro para esta fecha
-        existe_clinico = fetch_one("""
-            SELECT id FROM clinico 
-            WHERE paciente_id=%s AND fecha=%s 
-            LIMIT 1
-        """, (pid, fecha_medicion))
+            if existe_antropo:
+                # Si ya existe registro para esta fecha, actualizar ese registro
+                tx.execute("""
+                    UPDATE antropometria
+                       SET peso=%s, talla=%s, cc=%s, bf_pct=%s, actividad=%s
+                     WHERE id=%s
+                """, (peso, talla, cc, bf_pct, actividad, existe_antropo[0]))
+            else:
+                # Si no existe registro para esta fecha, insertar nuevo (seguimiento histórico)
+                tx.execute("""
+                    INSERT INTO antropometria (paciente_id, fecha, peso, talla, cc, bf_pct, actividad)
+                    VALUES (%s, %s, %s,%s,%s,%s,%s)
+                """, (pid, fecha_medicion, peso, talla, cc, bf_pct, actividad))
+
+        # 3️⃣ Insertar nuevo registro clínico (historial) si hay datos cuantitativos
+        if any([hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia]):
+            # Verificar si ya existe un registro para esta fecha
+            existe_clinico = tx.fetch_one("""
+                SELECT id FROM clinico 
+                WHERE paciente_id=%s AND fecha=%s 
+                LIMIT 1
+            """, (pid, fecha_medicion))
         
-        if existe_clinico:
-            # Si ya existe registro para esta fecha, actualizar ese registro
-            execute("""
-                UPDATE clinico
-                   SET hba1c=%s, glucosa_ayunas=%s, ldl=%s, trigliceridos=%s, pa_sis=%s, pa_dia=%s
-                 WHERE id=%s
-            """, (hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia, existe_clinico[0]))
-        else:
-            # Si no existe registro para esta fecha, insertar nuevo (seguimiento histórico)
-            execute("""
-                INSERT INTO clinico (paciente_id, fecha, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia)
-                VALUES (%s, %s, %s,%s,%s,%s,%s,%s)
-            """, (pid, fecha_medicion, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia))
+            if existe_clinico:
+                # Si ya existe registro para esta fecha, actualizar ese registro
+                tx.execute("""
+                    UPDATE clinico
+                       SET hba1c=%s, glucosa_ayunas=%s, ldl=%s, trigliceridos=%s, pa_sis=%s, pa_dia=%s
+                     WHERE id=%s
+                """, (hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia, existe_clinico[0]))
+            else:
+                # Si no existe registro para esta fecha, insertar nuevo (seguimiento histórico)
+                tx.execute("""
+                    INSERT INTO clinico (paciente_id, fecha, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia)
+                    VALUES (%s, %s, %s,%s,%s,%s,%s,%s)
+                """, (pid, fecha_medicion, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia))
 
         # 4️⃣ Guardar medicamentos y alergias desde JSON enriquecido
-    meds_json = request.form.get("meds_json")
-    alergias_json = request.form.get("alergias_json")
+        # (cada bloque en su savepoint: si falla se deshace sólo ese bloque)
+        meds_json = request.form.get("meds_json")
+        alergias_json = request.form.get("alergias_json")
 
-    # --- MEDICAMENTOS ---
-    if meds_json:
-        try:
-            meds = json.loads(meds_json)
-            for m in meds:
-                execute("""
-                    INSERT INTO paciente_medicamento (paciente_id, nombre, dosis, frecuencia, activo, creado_en)
-                    VALUES (%s, %s, %s, %s, TRUE, NOW())
-                """, (pid, m.get("nombre"), m.get("dosis"), m.get("frecuencia")))
-        except Exception as e:
-            print("Error guardando medicamentos:", e)
+        # --- MEDICAMENTOS ---
+        if meds_json:
+            try:
+                meds = json.loads(meds_json)
+                with tx.savepoint():
+                    tx.executemany("""
+                        INSERT INTO paciente_medicamento (paciente_id, nombre, dosis, frecuencia, activo, creado_en)
+                        VALUES (%s, %s, %s, %s, TRUE, NOW())
+                    """, [(pid, m.get("nombre"), m.get("dosis"), m.get("frecuencia")) for m in meds])
+            except Exception as e:
+                print("Error guardando medicamentos:", e)
 
-    # --- ALERGIAS ---
-    if alergias_json:
-        try:
-            als = json.loads(alergias_json)
-            for a in als:
-                execute("""
-                    INSERT INTO paciente_alergia (paciente_id, ingrediente_id, descripcion, creado_en)
-                    VALUES (%s, %s, %s, NOW())
-                """, (pid, a.get("ingrediente_id"), a.get("descripcion")))
+        # --- ALERGIAS ---
+        if alergias_json:
+            try:
+                als = json.loads(alergias_json)
+                with tx.savepoint():
+                    tx.executemany("""
+                        INSERT INTO paciente_alergia (paciente_id, ingrediente_id, descripcion, creado_en)
+                        VALUES (%s, %s, %s, NOW())
+                    """, [(pid, a.get("ingrediente_id"), a.get("descripcion")) for a in als])
+            except Exception as e:
+                print("Error guardando alergias:", e)
 
-        except Exception as e:
-            print("Error guardando alergias:", e)
+        return pid
 
+    pid = run_transaction(_guardar)
+    invalidar_paciente(pid)
 
     flash("✅ Registro integral guardado correctamente", "success")
     return redirect(url_for("admin_pacientes"))
@@ -2356,62 +2204,24 @@ def admin_paciente_editar(pid):
     ensure_preregistro(dni, nombres, apellidos, telefono, email)
     usuario_id = get_or_create_user_with_paciente_role(email) if email else None
 
-    # Actualiza la tabla paciente
-    execute("""
-        UPDATE paciente
-           SET usuario_id=%s, dni=%s, sexo=%s, fecha_nac=%s, telefono=%s, actualizado_en=NOW()
-         WHERE id=%s
-    """, (usuario_id, dni, sexo, fecha_nac, telefono, pid))
-
-    # --- ANTROPOMETRÍA ---
-    peso = request.form.get("peso") or None
-    talla = request.form.get("talla") or None
-    cc = request.form.get("cc") or None
-    bf_pct = request.form.get("bf_pct") or None
-    actividad = request.form.get("actividad") or None
-    
-    # Permitir fecha personalizada para seguimiento histórico, o usar fecha actual
-    fecha_medicion = request.form.get("fecha_medicion") or None
-    if fecha_medicion:
-        try:
-            from datetime import datetime
-            fecha_medicion = datetime.strptime(fecha_medicion, "%Y-%m-%d").date()
-        except:
-            fecha_medicion = None
-    
-    if any([peso, talla, cc, bf_pct, actividad]):
-        # Verificar si ya existe un registro para la fecha especificada (o hoy)
-        fecha_a_usar = fecha_medicion if fecha_medicion else date.today()
-        existe_hoy = fetch_one("""
-            SELECT id FROM antropometria 
-            WHERE paciente_id=%s AND fecha=%s 
-            LIMIT 1
-        """, (pid, fecha_a_usar))
-        
-        if existe_hoy:
-            # Si ya existe registro para esta fecha, actualizar ese registro
-            execute("""
-                UPDATE antropometria
-                   SET peso=%s, talla=%s, cc=%s, bf_pct=%s, actividad=%s
-                 WHERE id=%s
-            """, (peso, talla, cc, bf_pct, actividad, existe_hoy[0]))
-        else:
-            # Si no existe registro para esta fecha, insertar nuevo (seguimiento histórico)
-            execute("""
-                INSERT INTO antropometria (paciente_id, fecha, peso, talla, cc, bf_pct, actividad)
-                VALUES (%s, %s, %s,%s,%s,%s,%s)
-            """, (pid, fecha_a_usar, peso, talla, cc, bf_pct, actividad))
+    # Paciente, antropometría, clínico, medicamentos y alergias en una sola transacción
+    # (run_transaction la repite completa ante errores SSL o de conexión)
+    def _editar(tx):
+        # Actualiza la tabla paciente
+        tx.execute("""
+            UPDATE paciente
+               SET usuario_id=%s, dni=%s, sexo=%s, fecha_nac=%s, telefono=%s, actualizado_en=NOW()
+             WHERE id=%s
+        """, (usuario_id, dni, sexo, fecha_nac, telefono, pid))
 
-    # --- CLÍNICO ---
-    hba1c = request.form.get("hba1c") or None
-    glucosa_ayunas = request.form.get("glucosa_ayunas") or None
-    ldl = request.form.get("ldl") or None
-    trigliceridos = request.form.get("trigliceridos") or None
-    pa_sis = request.form.get("pa_sis") or None
-    pa_dia = request.form.get("pa_dia") or None
+        # --- ANTROPOMETRÍA ---
+        peso = request.form.get("peso") or None
+        talla = request.form.get("talla") or None
+        cc = request.form.get("cc") or None
+        bf_pct = request.form.get("bf_pct") or None
+        actividad = request.form.get("actividad") or None
     
-    # Usar la misma fecha de medición que para antropometría
-    if not fecha_medicion:
+        # Permitir fecha personalizada para seguimiento histórico, o usar fecha actual
         fecha_medicion = request.form.get("fecha_medicion") or None
         if fecha_medicion:
             try:
@@ -2420,56 +2230,101 @@ def admin_paciente_editar(pid):
             except:
                 fecha_medicion = None
     
-    if any([hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia]):
-        # Verificar si ya existe un registro para la fecha especificada (o hoy)
-        fecha_a_usar = fecha_medicion if fecha_medicion else date.today()
-        existe_hoy = fetch_one("""
-            SELECT id FROM clinico 
-            WHERE paciente_id=%s AND fecha=%s 
-            LIMIT 1
-        """, (pid, fecha_a_usar))
+        if any([peso, talla, cc, bf_pct, actividad]):
+            # Verificar si ya existe un registro para la fecha especificada (o hoy)
+            fecha_a_usar = fecha_medicion if fecha_medicion else date.today()
+            existe_hoy = tx.fetch_one("""
+                SELECT id FROM antropometria 
+                WHERE paciente_id=%s AND fecha=%s 
+                LIMIT 1
+            """, (pid, fecha_a_usar))
         
-        if existe_hoy:
-            # Si ya existe registro para esta fecha, actualizar ese registro
-            execute("""
-                UPDATE clinico
-                   SET hba1c=%s, glucosa_ayunas=%s, ldl=%s, trigliceridos=%s, pa_sis=%s, pa_dia=%s
-                 WHERE id=%s
-            """, (hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia, existe_hoy[0]))
-        else:
-            # Si no existe registro para esta fecha, insertar nuevo (seguimiento histórico)
-            execute("""
-                INSERT INTO clinico (paciente_id, fecha, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia)
-                VALUES (%s, %s, %s,%s,%s,%s,%s,%s)
-            """, (pid, fecha_a_usar, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia))
+            if existe_hoy:
+                # Si ya existe registro para esta fecha, actualizar ese registro
+                tx.execute("""
+                    UPDATE antropometria
+                       SET peso=%s, talla=%s, cc=%s, bf_pct=%s, actividad=%s
+                     WHERE id=%s
+                """, (peso, talla, cc, bf_pct, actividad, existe_hoy[0]))
+            else:
+                # Si no existe registro para esta fecha, insertar nuevo (seguimiento histórico)
+                tx.execute("""
+                    INSERT INTO antropometria (paciente_id, fecha, peso, talla, cc, bf_pct, actividad)
+                    VALUES (%s, %s, %s,%s,%s,%s,%s)
+                """, (pid, fecha_a_usar, peso, talla, cc, bf_pct, actividad))
+
+        # --- CLÍNICO ---
+        hba1c = request.form.get("hba1c") or None
+        glucosa_ayunas = request.form.get("glucosa_ayunas") or None
+        ldl = request.form.get("ldl") or None
+        trigliceridos = request.form.get("trigliceridos") or None
+        pa_sis = request.form.get("pa_sis") or None
+        pa_dia = request.form.get("pa_dia") or None
+    
+        # Usar la misma fecha de medición que para antropometría
+        if not fecha_medicion:
+            fecha_medicion = request.form.get("fecha_medicion") or None
+            if fecha_medicion:
+                try:
+                    from datetime import datetime
+                    fecha_medicion = datetime.strptime(fecha_medicion, "%Y-%m-%d").date()
+                except:
+                    fecha_medicion = None
+    
+        if any([hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia]):
+            # Verificar si ya existe un registro para la fecha especificada (o hoy)
+            fecha_a_usar = fecha_medicion if fecha_medicion else date.today()
+            existe_hoy = tx.fetch_one("""
+                SELECT id FROM clinico 
+                WHERE paciente_id=%s AND fecha=%s 
+                LIMIT 1
+            """, (pid, fecha_a_usar))
+        
+            if existe_hoy:
+                # Si ya existe registro para esta fecha, actualizar ese registro
+                tx.execute("""
+                    UPDATE clinico
+                       SET hba1c=%s, glucosa_ayunas=%s, ldl=%s, trigliceridos=%s, pa_sis=%s, pa_dia=%s
+                     WHERE id=%s
+                """, (hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia, existe_hoy[0]))
+            else:
+                # Si no existe registro para esta fecha, insertar nuevo (seguimiento histórico)
+                tx.execute("""
+                    INSERT INTO clinico (paciente_id, fecha, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia)
+                    VALUES (%s, %s, %s,%s,%s,%s,%s,%s)
+                """, (pid, fecha_a_usar, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia))
+
+        # --- MEDICAMENTOS ---
+        # (savepoint: si falla el reemplazo se conservan los medicamentos anteriores)
+        meds_json = request.form.get("meds_json")
+        if meds_json:
+            try:
+                meds = json.loads(meds_json)
+                with tx.savepoint():
+                    tx.execute("DELETE FROM paciente_medicamento WHERE paciente_id=%s", (pid,))
+                    tx.executemany("""
+                        INSERT INTO paciente_medicamento (paciente_id, nombre, dosis, frecuencia, activo, creado_en)
+                        VALUES (%s, %s, %s, %s, TRUE, NOW())
+                    """, [(pid, m.get("nombre"), m.get("dosis"), m.get("frecuencia")) for m in meds])
+            except Exception as e:
+                print("Error guardando medicamentos:", e)
 
-    # --- MEDICAMENTOS ---
-    meds_json = request.form.get("meds_json")
-    if meds_json:
-        try:
-            meds = json.loads(meds_json)
-            execute("DELETE FROM paciente_medicamento WHERE paciente_id=%s", (pid,))
-            for m in meds:
-                execute("""
-                    INSERT INTO paciente_medicamento (paciente_id, nombre, dosis, frecuencia, activo, creado_en)
-                    VALUES (%s, %s, %s, %s, TRUE, NOW())
-                """, (pid, m.get("nombre"), m.get("dosis"), m.get("frecuencia")))
-        except Exception as e:
-            print("Error guardando medicamentos:", e)
+        # --- ALERGIAS ---
+        alergias_json = request.form.get("alergias_json")
+        if alergias_json:
+            try:
+                als = json.loads(alergias_json)
+                with tx.savepoint():
+                    tx.execute("DELETE FROM paciente_alergia WHERE paciente_id=%s", (pid,))
+                    tx.executemany("""
+                        INSERT INTO paciente_alergia (paciente_id, ingrediente_id, descripcion, creado_en)
+                        VALUES (%s, %s, %s, NOW())
+                    """, [(pid, a.get("ingrediente_id"), a.get("descripcion")) for a in als])
+            except Exception as e:
+                print("Error guardando alergias:", e)
 
-    # --- ALERGIAS ---
-    alergias_json = request.form.get("alergias_json")
-    if alergias_json:
-        try:
-            als = json.loads(alergias_json)
-            execute("DELETE FROM paciente_alergia WHERE paciente_id=%s", (pid,))
-            for a in als:
-                execute("""
-                    INSERT INTO paciente_alergia (paciente_id, ingrediente_id, descripcion, creado_en)
-                    VALUES (%s, %s, %s, NOW())
-                """, (pid, a.get("ingrediente_id"), a.get("descripcion")))
-        except Exception as e:
-            print("Error guardando alergias:", e)
+    run_transaction(_editar)
+    invalidar_paciente(pid)
 
     if request.is_json or request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return {"ok": True, "msg": "Registro actualizado correctamente"}
@@ -2671,6 +2526,7 @@ def api_paciente_alergias_save(pid):
                 "INSERT INTO paciente_alergia (paciente_id, descripcion) VALUES (%s,%s)",
                 (pid, desc)
             )
+    invalidar_paciente(pid)
     return {"ok": True}
 
 
@@ -2684,6 +2540,8 @@ def admin_paciente_borrar(pid):
     execute("DELETE FROM clinico WHERE paciente_id=%s", (pid,))
     execute("DELETE FROM antropometria WHERE paciente_id=%s", (pid,))
     execute("DELETE FROM paciente WHERE id=%s", (pid,))
+    invalidar_paciente(pid)
+    invalidar_planes_paciente(pid)
     flash("🗑️ Paciente y sus datos asociados eliminados correctamente", "success")
     return redirect(url_for("admin_pacientes"))
 
@@ -2695,6 +2553,7 @@ from time import time
 
 # Cachea los límites durante 60 segundos para no consultar en cada request
 _CACHE_LIM = {"data": None, "ts": 0}
+registrar_sentencia("limites_clinica", "SELECT limites_json FROM config_clinica WHERE org_id=%s")
 
 def cargar_limites_clinica(org_id: str = "default") -> dict:
     """Devuelve los límites configurados (desde config_clinica.limites_json)."""
@@ -2703,7 +2562,7 @@ def cargar_limites_clinica(org_id: str = "default") -> dict:
     if _CACHE_LIM["data"] and ahora - _CACHE_LIM["ts"] < 60:
         return _CACHE_LIM["data"]
 
-    row = fetch_one("SELECT limites_json FROM config_clinica WHERE org_id=%s", (org_id,))
+    row = fetch_one_prepared("limites_clinica", (org_id,))
     if not row or not row[0]:
         _CACHE_LIM = {"data": {}, "ts": ahora}
         return {}
@@ -3963,6 +3822,7 @@ def admin_clinico_nuevo():
         INSERT INTO clinico (paciente_id, fecha, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia)
         VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
     """, (paciente_id, fecha, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia))
+    invalidar_paciente(paciente_id)
 
     flash("Registro clínico creado correctamente.", "success")
     return redirect(url_for("admin_clinico"))
@@ -3974,7 +3834,7 @@ def admin_clinico_editar(cid):
     """
     Edita un registro clínico existente.
     """
-    row = fetch_one("SELECT id FROM clinico WHERE id=%s", (cid,))
+    row = fetch_one("SELECT id, paciente_id FROM clinico WHERE id=%s", (cid,))
     if not row:
         flash("El registro clínico no existe.", "error")
         return redirect(url_for("admin_clinico"))
@@ -4013,6 +3873,8 @@ def admin_clinico_editar(cid):
                pa_dia=%s
          WHERE id=%s
     """, (paciente_id, fecha, hba1c, glucosa_ayunas, ldl, trigliceridos, pa_sis, pa_dia, cid))
+    invalidar_paciente(row[1])
+    invalidar_paciente(paciente_id)
 
     flash("Registro clínico actualizado correctamente.", "success")
     return redirect(url_for("admin_clinico"))
@@ -4024,7 +3886,10 @@ def admin_clinico_borrar(cid):
     """
     Elimina un registro clínico.
     """
+    row = fetch_one("SELECT paciente_id FROM clinico WHERE id=%s", (cid,))
     execute("DELETE FROM clinico WHERE id=%s", (cid,))
+    if row:
+        invalidar_paciente(row[0])
     flash("Registro clínico eliminado.", "success")
     return redirect(url_for("admin_clinico"))
 
@@ -4124,6 +3989,7 @@ def admin_antropo_nuevo():
         INSERT INTO antropometria (paciente_id, fecha, peso, talla, cc, bf_pct, actividad)
         VALUES (%s,%s,%s,%s,%s,%s,%s)
     """, (paciente_id, fecha, peso, talla, cc, bf_pct, actividad))
+    invalidar_paciente(paciente_id)
 
     flash("Registro de antropometría creado.", "success")
     return redirect(url_for("admin_antropometria"))
@@ -4132,7 +3998,7 @@ def admin_antropo_nuevo():
 @app.route("/admin/antropometria/<int:aid>/editar", methods=["POST"])
 @admin_required
 def admin_antropo_editar(aid):
-    row = fetch_one("SELECT id FROM antropometria WHERE id=%s", (aid,))
+    row = fetch_one("SELECT id, paciente_id FROM antropometria WHERE id=%s", (aid,))
     if not row:
         flash("El registro no existe.", "error")
         return redirect(url_for("admin_antropometria"))
@@ -4160,6 +4026,8 @@ def admin_antropo_editar(aid):
                actividad=%s
          WHERE id=%s
     """, (paciente_id, fecha, peso, talla, cc, bf_pct, actividad, aid))
+    invalidar_paciente(row[1])
+    invalidar_paciente(paciente_id)
 
     flash("Registro de antropometría actualizado.", "success")
     return redirect(url_for("admin_antropometria"))
@@ -4168,7 +4036,10 @@ def admin_antropo_editar(aid):
 @app.route("/admin/antropometria/<int:aid>/borrar", methods=["POST"])
 @admin_required
 def admin_antropo_borrar(aid):
+    row = fetch_one("SELECT paciente_id FROM antropometria WHERE id=%s", (aid,))
     execute("DELETE FROM antropometria WHERE id=%s", (aid,))
+    if row:
+        invalidar_paciente(row[0])
     flash("Registro de antropometría eliminado.", "success")
     return redirect(url_for("admin_antropometria"))
 
@@ -4500,6 +4371,7 @@ def api_ing_nuevo():
             VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
         """, (nombre, grupo, kcal, cho, pro, fat, fibra, ig, sodio, costo,
               unidad, porcion, json.dumps(tags) if tags else None, activo))
+        invalidar_catalogo(f"(nuevo: {nombre})")
 
         return {"ok": True, "message": "Ingrediente creado correctamente."}
         
@@ -4545,6 +4417,7 @@ def admin_ing_nuevo():
         VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
     """, (nombre, grupo, kcal, cho, pro, fat, fibra, ig, sodio, costo,
           unidad, porcion, json.dumps(tags) if tags else None, activo))
+    invalidar_catalogo(f"(nuevo: {nombre})")
 
     flash("Alimento creado.", "success")
     return redirect(url_for("admin_ingredientes"))
@@ -4593,6 +4466,7 @@ def api_ing_editar(iid):
         """, (nombre, grupo, kcal, cho, pro, fat, fibra,
               ig, sodio, costo, unidad, porcion,
               json.dumps(tags) if tags else None, activo, iid))
+        invalidar_catalogo(f"(editado: {iid})")
 
         return {"ok": True, "message": "Ingrediente actualizado correctamente."}
         
@@ -4644,6 +4518,7 @@ def admin_ing_editar(iid):
     """, (nombre, grupo, kcal, cho, pro, fat, fibra,
           ig, sodio, costo, unidad, porcion,
           json.dumps(tags) if tags else None, activo, iid))
+    invalidar_catalogo(f"(editado: {iid})")
 
     flash("Alimento actualizado.", "success")
     return redirect(url_for("admin_ingredientes"))
@@ -4653,6 +4528,7 @@ def admin_ing_editar(iid):
 @admin_required
 def admin_ing_toggle(iid):
     execute("UPDATE ingrediente SET activo = NOT activo WHERE id=%s", (iid,))
+    invalidar_catalogo(f"(toggle: {iid})")
     flash("Estado de alimento actualizado.", "success")
     return redirect(url_for("admin_ingredientes"))
 
@@ -4677,6 +4553,7 @@ def admin_ing_borrar(iid):
     
     try:
         execute("DELETE FROM ingrediente WHERE id=%s", (iid,))
+        invalidar_catalogo(f"(borrado: {iid})")
         flash("Alimento eliminado correctamente.", "success")
     except Exception as e:
         # Capturar cualquier otro error de clave foránea (por si hay otras referencias)
@@ -5742,6 +5619,25 @@ def _determinar_control_glucemico(probabilidad_ajustada, probabilidad_ml, perfil
     # Por defecto, BUENO
     return 'BUENO'
 
+@app.route("/api/recomendacion/modelos")
+@admin_required
+def api_recomendacion_modelos():
+    """Estado del registro de modelos ML del proceso (versión, tiempo de carga, memoria)"""
+    from Core.registro_modelos import obtener_registro
+    from Core.cache_ingredientes import estadisticas_cache
+    from Core.cache_planes import estadisticas_cache as estadisticas_cache_planes
+    from Core.vigilante_modelos import estadisticas_vigilante
+    registro = obtener_registro()
+    return {
+        "ok": True,
+        "pid": os.getpid(),
+        "version_global": registro.version_global(),
+        "modelos": registro.estadisticas(),
+        "vigilante": estadisticas_vigilante(),
+        "cache_ingredientes": estadisticas_cache(),
+        "cache_planes": estadisticas_cache_planes()
+    }
+
 @app.route("/api/recomendacion/configuracion/<int:paciente_id>", methods=["GET"])
 @login_required
 def api_recomendacion_configuracion(paciente_id):
@@ -5927,11 +5823,14 @@ def api_recomendacion_generar():
         motor = MotorRecomendacion()
         
         # Generar plan semanal específico del paciente con la configuración y filtros recibidos
+        # (misma entrada y semilla -> plan cacheado; "forzar_regeneracion" pide otra variante)
         resultado = motor.generar_plan_semanal_completo(
             paciente_id=paciente_id,
             dias=configuracion.get('dias_plan', 7),
             configuracion=configuracion,
-            ingredientes=ingredientes
+            ingredientes=ingredientes,
+            semilla=data.get('semilla', configuracion.get('semilla')),
+            forzar=bool(data.get('forzar_regeneracion', False))
         )
         
         return resultado, 200
@@ -5941,6 +5840,135 @@ def api_recomendacion_generar():
         print(f"TRACEBACK: {traceback.format_exc()}")
         return {"error": f"No se pudo generar la recomendación: {str(e)}"}, 500
 
+@app.route("/api/recomendacion/generar/stream", methods=["POST"])
+@login_required
+def api_recomendacion_generar_stream():
+    """
+    Variante de /api/recomendacion/generar con Server-Sent Events (mismo cuerpo):
+    eventos "inicio", un "dia" por día generado y optimizado, "resumen",
+    "lista_compras" y "fin" (plan completo); "error" si falla a mitad de camino.
+    """
+    data = request.get_json() or {}
+    paciente_id = data.get('paciente_id')
+    configuracion = data.get('configuracion', {})
+    ingredientes = data.get('ingredientes', {})
+    if not paciente_id:
+        return {"error": "ID de paciente requerido"}, 400
+    
+    def _evento(tipo, datos):
+        return f"event: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False, default=str)}\n\n"
+    
+    def eventos():
+        motor = MotorRecomendacion()
+        try:
+            for tipo, datos in motor.generar_plan_semanal_stream(
+                paciente_id=paciente_id,
+                dias=configuracion.get('dias_plan', 7),
+                configuracion=configuracion,
+                ingredientes=ingredientes,
+                semilla=data.get('semilla', configuracion.get('semilla')),
+                forzar=bool(data.get('forzar_regeneracion', False))
+            ):
+                yield _evento(tipo, datos)
+        except Exception as e:
+            print(f"ERROR en api_recomendacion_generar_stream: {str(e)}")
+            print(f"TRACEBACK: {traceback.format_exc()}")
+            yield _evento("error", {"error": f"No se pudo generar la recomendación: {str(e)}"})
+    
+    return Response(stream_with_context(eventos()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Sin buffer en proxies (nginx/Render)
+    })
+
+@app.route("/api/recomendacion/trabajos", methods=["POST"])
+@login_required
+def api_recomendacion_trabajos_crear():
+    """Encola la generación del plan (mismo cuerpo que /api/recomendacion/generar) y devuelve el id del trabajo"""
+    try:
+        from Core.cola_planes import encolar
+        data = request.get_json() or {}
+        paciente_id = data.get('paciente_id')
+        configuracion = data.get('configuracion', {})
+        if not paciente_id:
+            return {"error": "ID de paciente requerido"}, 400
+        
+        trabajo_id = encolar(paciente_id, {
+            'dias': configuracion.get('dias_plan', 7),
+            'configuracion': configuracion,
+            'ingredientes': data.get('ingredientes', {}),
+            'semilla': data.get('semilla', configuracion.get('semilla')),
+            'forzar': bool(data.get('forzar_regeneracion', False)),
+        }, usuario_id=session.get("user_id"))
+        
+        return {
+            "ok": True,
+            "trabajo_id": trabajo_id,
+            "estado": "pendiente",
+            "url_estado": url_for("api_recomendacion_trabajo_estado", trabajo_id=trabajo_id)
+        }, 202
+        
+    except Exception as e:
+        print(f"ERROR en api_recomendacion_trabajos_crear: {str(e)}")
+        return {"error": f"No se pudo encolar la recomendación: {str(e)}"}, 500
+
+@app.route("/api/recomendacion/trabajos/<int:trabajo_id>")
+@login_required
+def api_recomendacion_trabajo_estado(trabajo_id):
+    """
+    Estado del trabajo (pendiente / en_proceso / terminado / error), posición en la
+    cola y tiempos; con ?esperar=N (segundos, máx. 25) responde al terminar (long-polling).
+    Al terminar incluye el plan en "resultado".
+    """
+    try:
+        from Core.cola_planes import esperar_trabajo, obtener_trabajo
+        # Autorizar antes de esperar: nadie retiene un worker con trabajos ajenos.
+        # Un trabajo ajeno responde 404 igual que uno inexistente (no revela ids).
+        trabajo = obtener_trabajo(trabajo_id, incluir_resultado=False)
+        user_id = session.get("user_id")
+        if trabajo is not None and trabajo['usuario_id'] != user_id:
+            user_roles = get_user_roles(user_id)
+            if "admin" not in user_roles and "nutricionista" not in user_roles:
+                trabajo = None
+        if trabajo is None:
+            return {"error": "Trabajo no encontrado"}, 404
+        
+        trabajo = esperar_trabajo(trabajo_id, request.args.get('esperar', 0, type=float)) or trabajo
+        return trabajo, 200
+        
+    except Exception as e:
+        print(f"ERROR en api_recomendacion_trabajo_estado: {str(e)}")
+        return {"error": f"No se pudo consultar el trabajo: {str(e)}"}, 500
+
+@app.route("/api/recomendacion/trabajos/estadisticas")
+@admin_required
+def api_recomendacion_trabajos_estadisticas():
+    """Profundidad de la cola de planes, tiempos de espera/ejecución y trabajadores del proceso"""
+    from Core.cola_planes import estadisticas_cola
+    return {"ok": True, "pid": os.getpid(), **estadisticas_cola()}
+
+@app.route("/admin/bd/estadisticas")
+@admin_required
+def admin_bd_estadisticas():
+    """Latencia por sentencia, espera del pool, reintentos, sentencias con nombre y consultas lentas del proceso.
+
+    ?top=N (20), ?orden=total|n|p95, ?reiniciar=1 vuelve a cero después de responder.
+    """
+    from Core.bd_conexion import estadisticas_pool, estadisticas_preparadas
+    from Core.metricas_bd import consultas_lentas, estadisticas_bd, reiniciar_metricas
+    top = request.args.get("top", default=20, type=int)
+    orden = request.args.get("orden", default="total")
+    respuesta = {
+        "ok": True,
+        "pid": os.getpid(),
+        "pool": estadisticas_pool(),
+        **estadisticas_bd(top=top, orden=orden),
+        "preparadas": estadisticas_preparadas(),
+        "lentas": consultas_lentas(),
+    }
+    if request.args.get("reiniciar") == "1":
+        reiniciar_metricas()
+    return jsonify(respuesta)
+
 @app.route("/api/recomendacion/<int:paciente_id>")
 @login_required
 def api_recomendacion_paciente(paciente_id):
@@ -6636,4 +6664,8 @@ def admin_recomendacion_estadisticas():
 # ---------- Punto de entrada ----------
 if __name__ == "__main__":
     debug = os.getenv("FLASK_ENV", "development") == "development"
+    # Con el reloader solo el proceso hijo (el que atiende) vigila modelos y consume la cola
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        iniciar_vigilante()
+        iniciar_trabajadores()
     app.run(debug=debug)
@@ -3,12 +3,27 @@ Script para entrenar el Modelo 1: Predicción de Respuesta Glucémica Postprandi
 
 Algoritmo: XGBoost Regressor
 Targets: glucose_increment, glucose_peak, time_to_peak
+
+Modos:
+  --modo por_target   (por defecto) un XGBRegressor por target
+  --modo multisalida  un solo XGBRegressor multi-target (árboles con hojas
+                      vectoriales, multi_strategy='multi_output_tree'): el
+                      servidor obtiene los tres targets con una sola llamada a
+                      predict. Entrena también los modelos por target y muestra
+                      la comparación de precisión y tiempo de inferencia.
+  --comparar          con --modo por_target, entrena además el multisalida solo
+                      para el reporte (se guarda únicamente el modo elegido)
+
+Uso: python ml/entrenar_modelo1_respuesta_glucemica.py [--modo multisalida] [--comparar]
 """
 
 import pandas as pd
 import numpy as np
 import os
+import sys
+import time
 import pickle
+import argparse
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
@@ -16,18 +31,200 @@ import xgboost as xgb
 import warnings
 warnings.filterwarnings('ignore')
 
+# Exportación sin pickle (Core/artefactos_modelo.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Core.artefactos_modelo import exportar_junto_a_pickle
+
 # Configuración de rutas
 INPUT_FILE = r"D:\Sistema Tesis\data_para_entrenamiento\modelo1_respuesta_glucemica.csv"
 OUTPUT_DIR = r"D:\Sistema Tesis\ApartadoInteligente\ModeloML"
 MODEL_FILE = os.path.join(OUTPUT_DIR, "modelo_respuesta_glucemica.pkl")
 SCALER_FILE = os.path.join(OUTPUT_DIR, "scaler_respuesta_glucemica.pkl")
 
-def entrenar_modelo1():
+# Clave del modelo multi-target dentro de modelo_completo['modelos']
+CLAVE_MULTISALIDA = 'multisalida'
+
+PARAMETROS_XGB = {
+    'n_estimators': 200,
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'random_state': 42,
+    'n_jobs': -1,
+    'verbosity': 0
+}
+
+
+def _metricas(y_real, y_pred) -> dict:
+    return {
+        'mae': mean_absolute_error(y_real, y_pred),
+        'rmse': np.sqrt(mean_squared_error(y_real, y_pred)),
+        'r2': r2_score(y_real, y_pred)
+    }
+
+
+def entrenar_por_target(X_train_scaled, y_train, X_test_scaled, y_test, target_columns):
+    """
+    Entrena un XGBRegressor por target (cada uno con sus filas válidas).
+
+    Returns:
+        (modelos, resultados) con modelos[target] y métricas train/test por target
+    """
+    modelos = {}
+    resultados = {}
+    
+    for target in target_columns:
+        print(f"\n  📈 Entrenando modelo para: {target}")
+        
+        y_train_target = y_train[target].values
+        y_test_target = y_test[target].values
+        
+        # Filtrar valores válidos
+        mask_train = ~np.isnan(y_train_target) & np.isfinite(y_train_target)
+        mask_test = ~np.isnan(y_test_target) & np.isfinite(y_test_target)
+        
+        X_train_clean = X_train_scaled[mask_train]
+        y_train_clean = y_train_target[mask_train]
+        X_test_clean = X_test_scaled[mask_test]
+        y_test_clean = y_test_target[mask_test]
+        
+        if len(X_train_clean) == 0:
+            print(f"    ⚠️  No hay datos válidos para {target}, saltando...")
+            continue
+        
+        # Configurar modelo XGBoost
+        modelo = xgb.XGBRegressor(**PARAMETROS_XGB)
+        
+        # Entrenar
+        modelo.fit(X_train_clean, y_train_clean)
+        
+        # Calcular métricas
+        train = _metricas(y_train_clean, modelo.predict(X_train_clean))
+        test = _metricas(y_test_clean, modelo.predict(X_test_clean))
+        
+        modelos[target] = modelo
+        resultados[target] = {
+            'mae_train': train['mae'],
+            'mae_test': test['mae'],
+            'rmse_train': train['rmse'],
+            'rmse_test': test['rmse'],
+            'r2_train': train['r2'],
+            'r2_test': test['r2']
+        }
+        
+        print(f"    ✅ Entrenamiento completado")
+        print(f"       MAE (train/test): {train['mae']:.2f} / {test['mae']:.2f}")
+        print(f"       RMSE (train/test): {train['rmse']:.2f} / {test['rmse']:.2f}")
+        print(f"       R² (train/test): {train['r2']:.3f} / {test['r2']:.3f}")
+    
+    return modelos, resultados
+
+
+def entrenar_multisalida(X_train_scaled, y_train, X_test_scaled, y_test, target_columns):
+    """
+    Entrena un solo XGBRegressor multi-target. Los árboles tienen hojas
+    vectoriales (un valor por target), así que una llamada a predict devuelve
+    la matriz (n x targets). Usa las filas con todos los targets válidos.
+
+    Returns:
+        (modelo, resultados) con métricas train/test por target
+    """
+    print(f"\n  📈 Entrenando modelo multisalida para: {', '.join(target_columns)}")
+    
+    mask_train = np.isfinite(y_train[target_columns].values).all(axis=1)
+    mask_test = np.isfinite(y_test[target_columns].values).all(axis=1)
+    X_train_clean = X_train_scaled[mask_train]
+    y_train_clean = y_train[target_columns].values[mask_train]
+    X_test_clean = X_test_scaled[mask_test]
+    y_test_clean = y_test[target_columns].values[mask_test]
+    print(f"    📊 Filas con los {len(target_columns)} targets válidos: {len(X_train_clean):,} / {len(X_train_scaled):,}")
+    
+    if len(X_train_clean) == 0:
+        print("    ⚠️  No hay filas con todos los targets válidos")
+        return None, {}
+    
+    modelo = xgb.XGBRegressor(**PARAMETROS_XGB, tree_method='hist', multi_strategy='multi_output_tree')
+    modelo.fit(X_train_clean, y_train_clean)
+    
+    pred_train = modelo.predict(X_train_clean).reshape(len(X_train_clean), -1)
+    pred_test = modelo.predict(X_test_clean).reshape(len(X_test_clean), -1)
+    
+    resultados = {}
+    for j, target in enumerate(target_columns):
+        train = _metricas(y_train_clean[:, j], pred_train[:, j])
+        test = _metricas(y_test_clean[:, j], pred_test[:, j])
+        resultados[target] = {
+            'mae_train': train['mae'],
+            'mae_test': test['mae'],
+            'rmse_train': train['rmse'],
+            'rmse_test': test['rmse'],
+            'r2_train': train['r2'],
+            'r2_test': test['r2']
+        }
+        print(f"    ✅ {target}: MAE (test) {test['mae']:.2f}, RMSE (test) {test['rmse']:.2f}, R² (test) {test['r2']:.3f}")
+    
+    return modelo, resultados
+
+
+def _mediana_ms(funcion, repeticiones: int = 30) -> float:
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return float(np.median(tiempos)) * 1000
+
+
+def comparar_modelos(modelos_por_target, resultados_por_target, modelo_multisalida, resultados_multisalida,
+                     X_test_scaled, target_columns) -> dict:
+    """
+    Compara precisión (métricas de prueba) y tiempo de inferencia de ambos modos.
+    La inferencia se mide como en el servidor: los tres targets para 1 fila
+    (un alimento) y para un lote (catálogo filtrado).
+    """
+    print("\n" + "=" * 70)
+    print("⚖️  COMPARACIÓN: POR TARGET vs MULTISALIDA")
+    print("=" * 70)
+    print(f"\n{'target':<20}{'métrica':<10}{'por target':>14}{'multisalida':>14}{'diferencia':>14}")
+    for target in target_columns:
+        if target not in resultados_por_target or target not in resultados_multisalida:
+            continue
+        for metrica in ('mae_test', 'rmse_test', 'r2_test'):
+            a = resultados_por_target[target][metrica]
+            b = resultados_multisalida[target][metrica]
+            print(f"{target:<20}{metrica:<10}{a:>14.3f}{b:>14.3f}{b - a:>+14.3f}")
+    
+    def _por_target(X):
+        return [modelos_por_target[t].predict(X) for t in target_columns if t in modelos_por_target]
+    
+    def _multisalida(X):
+        return modelo_multisalida.predict(X)
+    
+    tiempos = {}
+    lote = X_test_scaled.iloc[:1000]
+    print(f"\n{'inferencia (ms, mediana)':<30}{'por target':>14}{'multisalida':>14}{'aceleración':>14}")
+    for nombre, X in (('1 fila', X_test_scaled.iloc[:1]), (f'lote de {len(lote)} filas', lote)):
+        t_por_target = _mediana_ms(lambda: _por_target(X))
+        t_multisalida = _mediana_ms(lambda: _multisalida(X))
+        tiempos[nombre] = {'por_target_ms': t_por_target, 'multisalida_ms': t_multisalida}
+        print(f"{nombre:<30}{t_por_target:>14.2f}{t_multisalida:>14.2f}{t_por_target / t_multisalida:>13.1f}x")
+    
+    return {'por_target': resultados_por_target, 'multisalida': resultados_multisalida, 'inferencia': tiempos}
+
+
+def entrenar_modelo1(modo: str = 'por_target', comparar: bool = False):
     """
     Entrena el modelo de predicción de respuesta glucémica.
+
+    Args:
+        modo: 'por_target' (un modelo por target) o 'multisalida' (un solo modelo multi-target)
+        comparar: Entrenar también el otro modo y reportar precisión e inferencia
     """
     print("=" * 70)
     print("🤖 ENTRENANDO MODELO 1: PREDICCIÓN DE RESPUESTA GLUCÉMICA")
+    print(f"   Modo: {modo}")
     print("=" * 70)
     print()
     
@@ -103,79 +300,38 @@ def entrenar_modelo1():
     # 5. Entrenar modelos para cada target
     print("\n🤖 Entrenando modelos XGBoost...")
     
-    modelos = {}
-    resultados = {}
+    modelos_por_target, resultados = entrenar_por_target(
+        X_train_scaled, y_train, X_test_scaled, y_test, target_columns
+    )
+    modelos = modelos_por_target
+    comparacion = None
     
-    for target in target_columns:
-        print(f"\n  📈 Entrenando modelo para: {target}")
-        
-        y_train_target = y_train[target].values
-        y_test_target = y_test[target].values
-        
-        # Filtrar valores válidos
-        mask_train = ~np.isnan(y_train_target) & np.isfinite(y_train_target)
-        mask_test = ~np.isnan(y_test_target) & np.isfinite(y_test_target)
-        
-        X_train_clean = X_train_scaled[mask_train]
-        y_train_clean = y_train_target[mask_train]
-        X_test_clean = X_test_scaled[mask_test]
-        y_test_clean = y_test_target[mask_test]
-        
-        if len(X_train_clean) == 0:
-            print(f"    ⚠️  No hay datos válidos para {target}, saltando...")
-            continue
-        
-        # Configurar modelo XGBoost
-        modelo = xgb.XGBRegressor(
-            n_estimators=200,
-            max_depth=6,
-            learning_rate=0.1,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            random_state=42,
-            n_jobs=-1,
-            verbosity=0
+    if modo == 'multisalida' or comparar:
+        modelo_multisalida, resultados_multisalida = entrenar_multisalida(
+            X_train_scaled, y_train, X_test_scaled, y_test, target_columns
         )
-        
-        # Entrenar
-        modelo.fit(X_train_clean, y_train_clean)
-        
-        # Predecir
-        y_pred_train = modelo.predict(X_train_clean)
-        y_pred_test = modelo.predict(X_test_clean)
-        
-        # Calcular métricas
-        mae_train = mean_absolute_error(y_train_clean, y_pred_train)
-        mae_test = mean_absolute_error(y_test_clean, y_pred_test)
-        rmse_train = np.sqrt(mean_squared_error(y_train_clean, y_pred_train))
-        rmse_test = np.sqrt(mean_squared_error(y_test_clean, y_pred_test))
-        r2_train = r2_score(y_train_clean, y_pred_train)
-        r2_test = r2_score(y_test_clean, y_pred_test)
-        
-        modelos[target] = modelo
-        resultados[target] = {
-            'mae_train': mae_train,
-            'mae_test': mae_test,
-            'rmse_train': rmse_train,
-            'rmse_test': rmse_test,
-            'r2_train': r2_train,
-            'r2_test': r2_test
-        }
-        
-        print(f"    ✅ Entrenamiento completado")
-        print(f"       MAE (train/test): {mae_train:.2f} / {mae_test:.2f}")
-        print(f"       RMSE (train/test): {rmse_train:.2f} / {rmse_test:.2f}")
-        print(f"       R² (train/test): {r2_train:.3f} / {r2_test:.3f}")
+        if modelo_multisalida is not None:
+            comparacion = comparar_modelos(modelos_por_target, resultados, modelo_multisalida,
+                                           resultados_multisalida, X_test_scaled, target_columns)
+            if modo == 'multisalida':
+                modelos = {CLAVE_MULTISALIDA: modelo_multisalida}
+                resultados = resultados_multisalida
+        elif modo == 'multisalida':
+            print("  ⚠️  No se pudo entrenar el modelo multisalida, se guardan los modelos por target")
+            modo = 'por_target'
     
     # 6. Guardar modelos y scaler
     print("\n💾 Guardando modelos y scaler...")
     
     modelo_completo = {
         'modelos': modelos,
+        'modo': modo,
         'feature_columns': feature_columns,
         'target_columns': target_columns,
         'scaler': scaler
     }
+    if comparacion is not None:
+        modelo_completo['comparacion'] = comparacion
     
     with open(MODEL_FILE, 'wb') as f:
         pickle.dump(modelo_completo, f)
@@ -186,6 +342,11 @@ def entrenar_modelo1():
     print(f"  ✅ Modelo guardado en: {MODEL_FILE}")
     print(f"  ✅ Scaler guardado en: {SCALER_FILE}")
     
+    # Exportar también en formato sin pickle (boosters .ubj + manifest) para carga rápida
+    ruta_export = exportar_junto_a_pickle(modelo_completo, MODEL_FILE, 'respuesta_glucemica')
+    if ruta_export:
+        print(f"  ✅ Modelo exportado en: {ruta_export.parent}")
+    
     # 7. Resumen final
     print("\n" + "=" * 70)
     print("✅ ENTRENAMIENTO COMPLETO")
@@ -204,6 +365,16 @@ def entrenar_modelo1():
     print("✅ FIN DEL ENTRENAMIENTO")
     print("=" * 70)
 
+def main():
+    parser = argparse.ArgumentParser(description='Entrenar Modelo 1: respuesta glucémica')
+    parser.add_argument('--modo', choices=['por_target', 'multisalida'], default='por_target',
+                        help='Modelo a guardar: uno por target o uno multi-target')
+    parser.add_argument('--comparar', action='store_true',
+                        help='Entrenar también el otro modo y reportar precisión e inferencia')
+    args = parser.parse_args()
+    entrenar_modelo1(args.modo, args.comparar)
+
+
 if __name__ == "__main__":
-    entrenar_modelo1()
+    main()
 
@@ -8,6 +8,7 @@ Target: score_calidad (regresión) o clasificación binaria (buena/mala combinac
 import pandas as pd
 import numpy as np
 import os
+import sys
 import pickle
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
@@ -17,6 +18,10 @@ import xgboost as xgb
 import warnings
 warnings.filterwarnings('ignore')
 
+# Exportación sin pickle (Core/artefactos_modelo.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Core.artefactos_modelo import exportar_junto_a_pickle
+
 # Configuración de rutas
 INPUT_FILE = r"D:\Sistema Tesis\data_para_entrenamiento\modelo3_combinaciones.csv"
 OUTPUT_DIR = r"D:\Sistema Tesis\ApartadoInteligente\ModeloML"
@@ -183,6 +188,11 @@ def entrenar_modelo3():
     
     print(f"  ✅ Modelo guardado en: {MODEL_FILE}")
     
+    # Exportar también en formato sin pickle (boosters .ubj + manifest) para carga rápida
+    ruta_export = exportar_junto_a_pickle(modelo_completo, MODEL_FILE, 'optimizacion_combinaciones')
+    if ruta_export:
+        print(f"  ✅ Modelo exportado en: {ruta_export.parent}")
+    
     # 7. Resumen final
     print("\n" + "=" * 70)
     print("✅ ENTRENAMIENTO COMPLETO")
@@ -0,0 +1,82 @@
+"""
+Script para exportar los modelos actuales (pickles) al formato sin pickle:
+boosters XGBoost en .ubj y parámetros de scaler/imputer/encoders + feature_columns
+en un manifest JSON con arreglos .npy (ver Core/artefactos_modelo.py).
+
+Útil para modelos ya entrenados; los scripts ml/entrenar_modelo*.py exportan
+automáticamente al terminar. El servidor usa el artefacto exportado cuando
+existe y corresponde al pickle actual (sha1 guardado en el manifest).
+
+Uso: python ml/exportar_modelos.py [--destino DIR]
+"""
+
+import os
+import sys
+import pickle
+import argparse
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Core.artefactos_modelo import exportar_modelo, directorio_exportado
+from Core.registro_modelos import (
+    DEFINICIONES,
+    MODELO_CONTROL_GLUCEMICO,
+)
+
+
+def _leer(ruta: Path):
+    with open(ruta, 'rb') as f:
+        return pickle.load(f)
+
+
+def exportar_modelos_actuales(destino: Path = None) -> dict:
+    """
+    Exporta cada modelo del registro desde sus pickles.
+
+    Args:
+        destino: Directorio alternativo (por defecto, junto a cada .pkl)
+
+    Returns:
+        Diccionario nombre -> (ruta del pickle, ruta del manifest exportado)
+    """
+    # Localizar siempre los pickles, aunque ya exista una exportación
+    formato_anterior = os.environ.get("MODELOS_FORMATO")
+    os.environ["MODELOS_FORMATO"] = "pickle"
+    try:
+        localizados = {nombre: localizar() for nombre, (localizar, _) in DEFINICIONES.items()}
+    finally:
+        if formato_anterior is None:
+            os.environ.pop("MODELOS_FORMATO", None)
+        else:
+            os.environ["MODELOS_FORMATO"] = formato_anterior
+
+    exportados = {}
+    for nombre, rutas in localizados.items():
+        if not rutas:
+            print(f"⚠️  {nombre}: sin pickle, se omite")
+            continue
+
+        if nombre == MODELO_CONTROL_GLUCEMICO:
+            objeto = {'modelo': _leer(rutas[0]), 'preprocesadores': _leer(rutas[1])}
+        else:
+            # Modelos 1-3: el scaler ya está dentro del diccionario del modelo
+            objeto = _leer(rutas[0])
+
+        directorio = directorio_exportado(rutas[0])
+        if destino is not None:
+            directorio = Path(destino) / directorio.name
+        exportados[nombre] = (rutas[0], exportar_modelo(objeto, directorio, nombre, origen=rutas[0]))
+        print(f"✅ {nombre}: {rutas[0].name} -> {directorio}")
+    return exportados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exportar modelos a formato sin pickle')
+    parser.add_argument('--destino', help='Directorio de salida (por defecto junto a cada .pkl)')
+    args = parser.parse_args()
+    exportar_modelos_actuales(Path(args.destino) if args.destino else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Job offline: genera la biblioteca de plantillas de comida (desayuno, almuerzo y
+cena) a partir del catálogo de ingredientes activos (ver Core/plantillas_comidas.py).
+
+Enumera combinaciones por tiempo de comida, descarta las que no pasan las reglas
+de combinación apetitosa del optimizador, las puntúa en lote con el Modelo 3 y
+guarda las mejores indexadas por perfil de macronutrientes. Conviene volver a
+ejecutarlo después de cambios importantes del catálogo o de reentrenar el
+Modelo 3; los servidores recargan el archivo al detectar que cambió.
+
+Uso: python ml/generar_plantillas_comidas.py [--destino RUTA] [--max-por-comida 2000]
+                                             [--max-evaluadas 20000] [--semilla 42]
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Core.cache_ingredientes import huella
+from Core.catalogo_ingredientes import obtener_catalogo
+from Core.plantillas_comidas import (
+    ARCHIVO_PLANTILLAS,
+    PERFIL_REFERENCIA,
+    generar_plantillas,
+    guardar_biblioteca,
+)
+from Core.registro_modelos import MODELO_OPTIMIZACION_COMBINACIONES
+
+
+def firma_catalogo(filas: list) -> str:
+    """Huella de los datos del catálogo usados en las plantillas"""
+    return huella([(f['id'], f['nombre'], f['grupo'], f['kcal'], f['cho'], f['pro'], f['fat'],
+                    f['fibra'], f['ig'], f.get('porciones_intercambio')) for f in filas])
+
+
+def generar_biblioteca(destino: Path = None, max_por_comida: int = 2000,
+                       max_evaluadas: int = 20000, semilla: int = 42) -> Path:
+    from Core.motor_recomendacion import MotorRecomendacion
+    from Core.optimizador_plan import OptimizadorPlan
+
+    catalogo = obtener_catalogo()
+    if catalogo is None or not len(catalogo):
+        raise RuntimeError("No se pudo cargar el catálogo de ingredientes activos")
+
+    motor = MotorRecomendacion()
+    with contextlib.redirect_stdout(io.StringIO()):
+        optimizador = OptimizadorPlan(motor_recomendacion=motor)
+        modelo3 = optimizador._modelo3_disponible()
+    if not modelo3:
+        print("⚠️  Modelo 3 no disponible: las plantillas se puntúan solo con reglas (IG y fibra)")
+
+    def puntuar(combinaciones, contextos):
+        if not modelo3:
+            return None
+        return motor.evaluar_combinaciones_batch(PERFIL_REFERENCIA, combinaciones, contextos)
+
+    inicio = time.perf_counter()
+    plantillas = generar_plantillas(
+        catalogo.filas,
+        gramos=motor._convertir_porciones_a_gramos,
+        puntuar=puntuar,
+        es_apetitosa=optimizador._es_combinacion_apetitosa,
+        max_por_tiempo=max_por_comida,
+        max_evaluadas=max_evaluadas,
+        semilla=semilla,
+        version=catalogo.version,
+    )
+    ruta = guardar_biblioteca(plantillas, destino, metadatos={
+        'firma_catalogo': firma_catalogo(catalogo.filas),
+        'ingredientes_catalogo': len(catalogo),
+        'modelo3': motor._versiones_modelos.get(MODELO_OPTIMIZACION_COMBINACIONES) if modelo3 else None,
+        'perfil_referencia': PERFIL_REFERENCIA,
+        'semilla': semilla,
+    })
+    total = sum(len(lista) for lista in plantillas.values())
+    print(f"✅ {total} plantillas en {time.perf_counter() - inicio:.1f}s -> {ruta}")
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar la biblioteca de plantillas de comida')
+    parser.add_argument('--destino', help=f'Archivo de salida (por defecto {ARCHIVO_PLANTILLAS})')
+    parser.add_argument('--max-por-comida', type=int, default=2000)
+    parser.add_argument('--max-evaluadas', type=int, default=20000)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+    generar_biblioteca(Path(args.destino) if args.destino else None,
+                       args.max_por_comida, args.max_evaluadas, args.semilla)
+
+
+if __name__ == "__main__":
+    main()
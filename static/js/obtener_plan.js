@@ -1351,32 +1351,27 @@ async function generarPlan() {
         console.log('📋 Datos del plan recopilados:', datosPlan);
         
         // Generar el plan
-        console.log('🌐 Enviando solicitud a /api/recomendacion/generar...');
-        
         // Actualizar mensaje de loading para indicar optimización
         let loadingText = document.querySelector('#loading-overlay p');
         if (loadingText) {
             loadingText.textContent = 'Generando plan nutricional...';
         }
         
-        const respuesta = await fetch('/api/recomendacion/generar', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(datosPlan)
-        });
-        
-        // Actualizar mensaje durante la generación
-        if (loadingText) {
-            loadingText.textContent = 'Optimizando plan para cumplir objetivos nutricionales...';
-        }
-        
-        if (!respuesta.ok) {
-            throw new Error(`Error del servidor: ${respuesta.status}`);
+        // Día por día con el stream; si no está disponible, el endpoint de siempre
+        let planGenerado;
+        try {
+            console.log('🌐 Enviando solicitud a /api/recomendacion/generar/stream...');
+            planGenerado = await solicitarPlanStream(datosPlan, manejadoresProgresoGeneracion());
+        } catch (error) {
+            if (!error.sinStream) {
+                throw error;
+            }
+            console.warn('⚠️ Stream no disponible, usando /api/recomendacion/generar:', error.message);
+            if (loadingText) {
+                loadingText.textContent = 'Optimizando plan para cumplir objetivos nutricionales...';
+            }
+            planGenerado = await solicitarPlanBloqueante(datosPlan);
         }
-        
-        const planGenerado = await respuesta.json();
         console.log('📦 Plan generado desde API:', planGenerado);
         console.log('📦 Estructura del plan:', JSON.stringify(planGenerado, null, 2));
         
@@ -1568,6 +1563,161 @@ async function generarPlan() {
 
 // ============ FUNCIONES AUXILIARES PARA GENERACIÓN DE PLAN ============
 
+// /api/recomendacion/generar/stream manda el plan por partes (Server-Sent Events):
+// "inicio" (metas), un "dia" por día listo, "resumen", "lista_compras" y "fin"
+// (el mismo plan que /api/recomendacion/generar). Si el stream no se puede abrir
+// o se corta antes de "fin", el error lleva sinStream y se usa el endpoint bloqueante.
+function errorSinStream(mensaje) {
+    const error = new Error(mensaje);
+    error.sinStream = true;
+    return error;
+}
+
+async function solicitarPlanBloqueante(datosPlan) {
+    const respuesta = await fetch('/api/recomendacion/generar', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(datosPlan)
+    });
+    
+    if (!respuesta.ok) {
+        throw new Error(`Error del servidor: ${respuesta.status}`);
+    }
+    
+    return await respuesta.json();
+}
+
+async function solicitarPlanStream(datosPlan, manejadores) {
+    let respuesta;
+    try {
+        respuesta = await fetch('/api/recomendacion/generar/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify(datosPlan)
+        });
+    } catch (error) {
+        throw errorSinStream(error.message);
+    }
+    
+    const tipoContenido = respuesta.headers.get('Content-Type') || '';
+    if (!respuesta.ok || !respuesta.body || !tipoContenido.includes('text/event-stream')) {
+        throw errorSinStream(`HTTP ${respuesta.status} (${tipoContenido || 'sin Content-Type'})`);
+    }
+    
+    const lector = respuesta.body.getReader();
+    const decodificador = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        let lectura;
+        try {
+            lectura = await lector.read();
+        } catch (error) {
+            throw errorSinStream(`Stream interrumpido: ${error.message}`);
+        }
+        if (lectura.done) {
+            break;
+        }
+        buffer += decodificador.decode(lectura.value, { stream: true });
+        
+        // Cada evento termina con una línea en blanco
+        let corte;
+        while ((corte = buffer.indexOf('\n\n')) !== -1) {
+            const bloque = buffer.slice(0, corte);
+            buffer = buffer.slice(corte + 2);
+            
+            let tipo = 'message';
+            const lineasDatos = [];
+            bloque.split('\n').forEach(linea => {
+                if (linea.startsWith('event:')) {
+                    tipo = linea.slice(6).trim();
+                } else if (linea.startsWith('data:')) {
+                    lineasDatos.push(linea.slice(5).trimStart());
+                }
+            });
+            if (!lineasDatos.length) {
+                continue;
+            }
+            
+            let datos;
+            try {
+                datos = JSON.parse(lineasDatos.join('\n'));
+            } catch (error) {
+                throw errorSinStream(`Evento "${tipo}" ilegible: ${error.message}`);
+            }
+            
+            if (tipo === 'error') {
+                // El servidor falló generando el plan: repetirlo sin stream no ayuda
+                throw new Error(datos.error || 'No se pudo generar la recomendación');
+            }
+            if (tipo === 'fin') {
+                lector.cancel().catch(() => {});
+                return datos;
+            }
+            if (manejadores && manejadores[tipo]) {
+                manejadores[tipo](datos);
+            }
+        }
+    }
+    
+    throw errorSinStream('El stream terminó antes del evento "fin"');
+}
+
+function manejadoresProgresoGeneracion() {
+    let totalDias = 0;
+    let diasListos = 0;
+    
+    return {
+        inicio: (datos) => {
+            totalDias = datos.dias || 0;
+            console.log('📡 Stream iniciado:', datos);
+            // Las metas se conocen antes que los días: mostrarlas ya
+            if (datos.metas_nutricionales) {
+                mostrarConfiguracionRecomendada({ metas_nutricionales: datos.metas_nutricionales });
+            }
+            actualizarProgresoGeneracion(0, totalDias, datos.desde_cache
+                ? 'Plan encontrado en caché, cargando...'
+                : `Metas calculadas. Generando ${totalDias} días...`);
+        },
+        dia: (datos) => {
+            diasListos += 1;
+            const kcal = Object.values(datos.datos || {})
+                .reduce((total, comida) => total + (comida && comida.kcal_total ? comida.kcal_total : 0), 0);
+            console.log(`📅 ${datos.dia} listo en ${datos.transcurrido_s}s`);
+            actualizarProgresoGeneracion(diasListos, totalDias,
+                `Día ${diasListos} de ${totalDias} listo${datos.fecha ? ` (${datos.fecha})` : ''}` +
+                `${kcal ? ` · ${Math.round(kcal)} kcal` : ''}`);
+        },
+        resumen: () => {
+            actualizarProgresoGeneracion(totalDias, totalDias, 'Preparando resumen y lista de compras...');
+        }
+    };
+}
+
+function actualizarProgresoGeneracion(hechos, total, mensaje) {
+    const loadingOverlay = document.getElementById('loading-overlay');
+    const progressBar = document.getElementById('loading-progress');
+    const loadingText = document.querySelector('#loading-overlay p');
+    
+    // Con progreso real ya no hace falta el simulado
+    if (loadingOverlay && loadingOverlay.dataset.intervalId) {
+        clearInterval(parseInt(loadingOverlay.dataset.intervalId));
+        delete loadingOverlay.dataset.intervalId;
+    }
+    if (progressBar && total > 0) {
+        // Hasta 95%: falta guardar el plan
+        progressBar.style.width = Math.min(95, 5 + (hechos / total) * 90) + '%';
+    }
+    if (loadingText && mensaje) {
+        loadingText.textContent = mensaje;
+    }
+}
+
 function mostrarConfiguracionRecomendada(planGenerado) {
     const card = document.getElementById('configRecomendadaCard');
     const content = document.getElementById('configRecomendadaContent');